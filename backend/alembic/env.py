@@ -14,8 +14,12 @@ from app.models.question import Question  # noqa: F401
 from app.models.answer import Answer  # noqa: F401
 from app.models.question_image import QuestionImage  # noqa: F401
 from app.models.mock_exam import MockExam  # noqa: F401
+from app.models.mock_exam_analysis_cache import MockExamAnalysisCache  # noqa: F401
+from app.models.mock_exam_pool import MockExamPoolSet  # noqa: F401
+from app.models.mock_exam_score_bin import MockExamScoreBin  # noqa: F401
 from app.models.study_plan import StudyPlan  # noqa: F401
 from app.models.review_item import ReviewItem  # noqa: F401
+from app.models.chat_conversation import ChatConversation, ChatMessage  # noqa: F401
 
 # Alembic Configオブジェクト
 config = context.config
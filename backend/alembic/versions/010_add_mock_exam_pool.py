@@ -0,0 +1,43 @@
+"""add mock_exam_pool_sets table
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-03-02 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "010"
+down_revision: Union[str, None] = "009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mock_exam_pool_sets",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("question_fingerprint", sa.String(32), nullable=False),
+        sa.Column("total_questions", sa.Integer(), nullable=False),
+        sa.Column("payload", postgresql.JSONB(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        op.f("ix_mock_exam_pool_sets_question_fingerprint"),
+        "mock_exam_pool_sets",
+        ["question_fingerprint"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_mock_exam_pool_sets_question_fingerprint"),
+        table_name="mock_exam_pool_sets",
+    )
+    op.drop_table("mock_exam_pool_sets")
@@ -0,0 +1,38 @@
+"""add (user_id, started_at DESC, id DESC) index on mock_exams
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-03-03 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "011"
+down_revision: Union[str, None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_mock_exams_user_id_started_at_id",
+        "mock_exams",
+        ["user_id", sa.text("started_at DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+    # 先頭列が user_id の複合インデックスで代替できるため削除
+    op.drop_index(op.f("ix_mock_exams_user_id"), table_name="mock_exams")
+
+
+def downgrade() -> None:
+    op.create_index(
+        op.f("ix_mock_exams_user_id"),
+        "mock_exams",
+        ["user_id"],
+        unique=False,
+    )
+    op.drop_index("ix_mock_exams_user_id_started_at_id", table_name="mock_exams")
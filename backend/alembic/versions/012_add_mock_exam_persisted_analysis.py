@@ -0,0 +1,34 @@
+"""add topic_scores and analysis columns to mock_exams
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-03-04 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "012"
+down_revision: Union[str, None] = "011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "mock_exams",
+        sa.Column("topic_scores", postgresql.JSONB(), nullable=True),
+    )
+    op.add_column(
+        "mock_exams",
+        sa.Column("analysis", sa.Text(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("mock_exams", "analysis")
+    op.drop_column("mock_exams", "topic_scores")
@@ -0,0 +1,34 @@
+"""add mock_exam_analysis_cache table
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-03-05 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "013"
+down_revision: Union[str, None] = "012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mock_exam_analysis_cache",
+        sa.Column("profile_key", sa.String(64), primary_key=True),
+        sa.Column("profile", postgresql.JSONB(), nullable=False),
+        sa.Column("ai_analysis", sa.Text(), nullable=False),
+        sa.Column("hit_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("mock_exam_analysis_cache")
@@ -0,0 +1,30 @@
+"""add mock_exam_score_bins table
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-03-06 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "014"
+down_revision: Union[str, None] = "013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mock_exam_score_bins",
+        sa.Column("area", sa.String(255), primary_key=True),
+        sa.Column("bin", sa.Integer(), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("mock_exam_score_bins")
@@ -0,0 +1,31 @@
+"""add partial index on in-progress mock_exams
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-03-07 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "015"
+down_revision: Union[str, None] = "014"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_mock_exams_in_progress_started_at",
+        "mock_exams",
+        ["started_at"],
+        unique=False,
+        postgresql_where=sa.text("status = 'in_progress'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_mock_exams_in_progress_started_at", table_name="mock_exams")
@@ -0,0 +1,52 @@
+"""add spaced-repetition schedule columns to review_items
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-03-08 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "016"
+down_revision: Union[str, None] = "015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "review_items",
+        sa.Column("interval_days", sa.Integer(), nullable=False, server_default="1"),
+    )
+    op.add_column(
+        "review_items",
+        sa.Column("ease", sa.Float(), nullable=False, server_default="2.5"),
+    )
+    op.add_column(
+        "review_items",
+        sa.Column("next_review_at", sa.DateTime(), nullable=True),
+    )
+    # 既存のactiveアイテムは最終回答の翌日を復習期限とする
+    op.execute(
+        "UPDATE review_items "
+        "SET next_review_at = last_answered_at + interval '1 day' "
+        "WHERE status = 'active'"
+    )
+    op.create_index(
+        "ix_review_items_user_id_next_review_at",
+        "review_items",
+        ["user_id", "next_review_at"],
+        unique=False,
+        postgresql_where=sa.text("status = 'active'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_review_items_user_id_next_review_at", table_name="review_items")
+    op.drop_column("review_items", "next_review_at")
+    op.drop_column("review_items", "ease")
+    op.drop_column("review_items", "interval_days")
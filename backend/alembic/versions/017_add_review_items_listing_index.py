@@ -0,0 +1,31 @@
+"""add review_items listing index
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-03-09 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "017"
+down_revision: Union[str, None] = "016"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_review_items_user_id_last_answered_at_id",
+        "review_items",
+        ["user_id", "last_answered_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_review_items_user_id_last_answered_at_id", table_name="review_items"
+    )
@@ -11,7 +11,10 @@ from app.core.database import get_db
 from app.models.answer import Answer
 from app.models.question import Question
 from app.schemas.answer import AnswerCreate, AnswerResponse
-from app.services.review_service import update_review_on_answer
+from app.services.review_service import (
+    invalidate_review_stats,
+    update_review_on_answer,
+)
 
 router = APIRouter(prefix="/api/answers", tags=["answers"])
 
@@ -67,6 +70,8 @@ async def create_answer_service(
     )
 
     await db.commit()
+    # コミット前のデータで作り直された統計キャッシュを捨てる
+    invalidate_review_stats(answer.user_id)
     await db.refresh(answer)
     return answer
 
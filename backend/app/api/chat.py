@@ -1,27 +1,74 @@
 """チャットAPIエンドポイント"""
 import uuid
+from functools import partial
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.models.question import Question
-from app.schemas.chat import ChatRequest
-from app.services.chat_service import stream_chat_response
+from app.schemas.chat import (
+    ChatConversationResponse,
+    ChatGenerationStatsResponse,
+    ChatRequest,
+)
+from app.services.chat_answer_cache import (
+    get_answer_cache_stats,
+    lookup_answer,
+    question_context_hash,
+    store_answer,
+)
+from app.services.chat_conversation import (
+    get_conversation_messages,
+    save_chat_reply,
+    start_conversation_turn,
+)
+from app.services.chat_service import (
+    get_chat_generation_stats,
+    load_question_snapshot,
+    replay_cached_answer,
+    stream_chat_response,
+    stream_until_disconnect,
+)
+from app.services.llm_cache import get_llm_cache
 
 router = APIRouter(prefix="/api/questions", tags=["chat"])
 
 
+async def _wait_for_disconnect(http_request: Request) -> None:
+    """クライアントが切断するまで待機（リクエストボディは読み込み済み）"""
+    while True:
+        message = await http_request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+@router.get("/chat/generations", response_model=ChatGenerationStatsResponse)
+async def get_chat_generations() -> dict:
+    """生成中のチャットの件数・経過時間と回答・LLMキャッシュの状況（監視用）"""
+    return {
+        **get_chat_generation_stats(),
+        "answer_cache": get_answer_cache_stats(),
+        "llm_cache": await get_llm_cache().stats(),
+    }
+
+
 @router.post("/{question_id}/chat")
 async def chat_about_question(
     question_id: uuid.UUID,
     request: ChatRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_db),
 ) -> StreamingResponse:
     """問題について追加質問するチャットエンドポイント
 
+    会話はサーバー側に保存し、会話IDを X-Conversation-Id ヘッダーで返す。
+    問題はスナップショットとして読み込み、ストリーミング開始前にセッションを
+    閉じて接続をプールに返す（応答の生成中は接続を保持しない）。
+    応答は生成し終えた時点で別のセッションで会話に追加する。
+    会話の最初の質問は、類似した質問のキャッシュ済み回答があればそれを返す。
+    クライアントが切断した時点で生成を中止する。
+
     Args:
         question_id: 問題ID
         request: チャットリクエスト（メッセージ + 会話履歴）
@@ -29,11 +76,7 @@ async def chat_about_question(
     Returns:
         SSEストリーミングレスポンス
     """
-    result = await db.execute(
-        select(Question).where(Question.id == question_id)
-    )
-    question = result.scalar_one_or_none()
-
+    question = await load_question_snapshot(db, question_id)
     if not question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -41,15 +84,89 @@ async def chat_about_question(
         )
 
     history = [{"role": msg.role, "content": msg.content} for msg in request.history]
+    context = await start_conversation_turn(
+        db,
+        question_id,
+        request.conversation_id,
+        request.message,
+        seed_history=history,
+    )
+    if context is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="会話が見つかりません",
+        )
+    await db.commit()
+    await db.close()
+
+    save_reply = partial(save_chat_reply, context.conversation_id)
+    headers = {"X-Conversation-Id": str(context.conversation_id)}
+
+    # 前の会話に依存しない最初の質問だけ回答キャッシュを使う
+    cacheable = not context.history and not context.summary
+    context_hash = question_context_hash(
+        question.content,
+        question.choices,
+        question.correct_answer,
+        question.explanation,
+    )
+    cached = (
+        lookup_answer(question_id, context_hash, request.message) if cacheable else None
+    )
+    if cached is not None:
+        return StreamingResponse(
+            replay_cached_answer(cached, on_complete=save_reply),
+            media_type="text/event-stream",
+            headers=headers,
+        )
+
+    async def record_reply(reply: str) -> None:
+        await save_reply(reply)
+        if cacheable:
+            store_answer(question_id, context_hash, request.message, reply)
+
+    stream = stream_chat_response(
+        question_content=question.content,
+        choices=question.choices,
+        correct_answer=question.correct_answer,
+        explanation=question.explanation,
+        history=context.history,
+        user_message=request.message,
+        summary=context.summary,
+        on_complete=record_reply,
+    )
 
     return StreamingResponse(
-        stream_chat_response(
-            question_content=question.content,
-            choices=question.choices,
-            correct_answer=question.correct_answer,
-            explanation=question.explanation,
-            history=history,
-            user_message=request.message,
+        stream_until_disconnect(
+            stream,
+            lambda: _wait_for_disconnect(http_request),
+            question_id=str(question_id),
         ),
         media_type="text/event-stream",
+        headers=headers,
+    )
+
+
+@router.get(
+    "/{question_id}/chat/{conversation_id}",
+    response_model=ChatConversationResponse,
+)
+async def get_chat_conversation(
+    question_id: uuid.UUID,
+    conversation_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+) -> ChatConversationResponse:
+    """保存済みの会話（要約済みのメッセージも含む）を取得"""
+    found = await get_conversation_messages(db, question_id, conversation_id)
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="会話が見つかりません",
+        )
+    conversation, messages = found
+    return ChatConversationResponse(
+        id=conversation.id,
+        question_id=conversation.question_id,
+        summary=conversation.summary,
+        messages=messages,
     )
@@ -1,22 +1,26 @@
 """模試APIエンドポイント"""
+import asyncio
 import logging
 import uuid
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func, select
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from app.core.database import get_db
-from app.models.mock_exam import MockExam, MockExamAnswer
-from app.models.question import Question
+from app.core.pagination import decode_cursor, encode_cursor
+from app.models.mock_exam import MockExam
 from app.schemas.mock_exam import (
+    AIAnalysisPendingResponse,
     AIAnalysisResponse,
     CategoryScoreDetail,
     MockExamAnswerRequest,
     MockExamAnswerResponse,
+    MockExamBatchAnswerRequest,
+    MockExamBatchAnswerResponse,
     MockExamFinishRequest,
     MockExamHistoryItem,
     MockExamHistoryResponse,
@@ -26,28 +30,51 @@ from app.schemas.mock_exam import (
     MockExamStartResponse,
 )
 from app.services.mock_exam_ai_analysis import generate_ai_analysis
+from app.services.mock_exam_analysis_cache import (
+    build_score_profile,
+    get_cached_analysis,
+    is_ai_analysis_failed,
+    is_ai_analysis_pending,
+    start_ai_analysis,
+)
 from app.services.mock_exam_config import PASSING_THRESHOLD, TIME_LIMIT_MINUTES
 from app.services.mock_exam_service import (
-    calculate_scores,
+    aggregate_exam_scores,
+    finish_exam,
     generate_rule_based_analysis,
+    get_exam_status,
+    insert_exam_rows,
+    record_exam_answers,
     select_questions_for_exam,
+    serialize_selected_question,
 )
-from app.services.review_service import update_review_on_answer
+from app.services.mock_exam_percentile import get_exam_percentiles
+from app.services.mock_exam_pool import pop_exam_set
+from app.services.review_service import invalidate_review_stats
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/mock-exam", tags=["mock-exam"])
 
+# 履歴のページサイズ
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
 
 @router.post("/start", response_model=MockExamStartResponse)
 async def start_mock_exam(
     request: MockExamStartRequest,
     db: AsyncSession = Depends(get_db),
 ) -> MockExamStartResponse:
-    """模試を開始（100問生成、セッション作成）"""
-    # 問題選択
-    selected = await select_questions_for_exam(db)
-    if not selected:
+    """模試を開始（100問生成、セッション作成）
+
+    事前組み立て済みのプールにセットがあればそれを使い、なければその場で選択する。
+    """
+    exam_items = await pop_exam_set(db)
+    if exam_items is None:
+        selected = await select_questions_for_exam(db)
+        exam_items = [serialize_selected_question(item) for item in selected]
+    if not exam_items:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="問題が不足しています。先に問題をインポートしてください。",
@@ -56,115 +83,120 @@ async def start_mock_exam(
     now = datetime.utcnow()
     exam_id = uuid.uuid4()
 
-    # 模試セッション作成
-    exam = MockExam(
-        id=exam_id,
-        user_id=request.user_id,
-        started_at=now,
-        total_questions=len(selected),
-        status="in_progress",
-    )
-    db.add(exam)
-
-    # 回答レコードを作成
+    # 回答枠とレスポンスを構築
+    answer_rows: list[dict[str, Any]] = []
     questions_response: list[MockExamQuestionResponse] = []
-    for i, item in enumerate(selected):
-        q = item["question"]
-        answer = MockExamAnswer(
-            id=uuid.uuid4(),
-            mock_exam_id=exam_id,
-            question_id=q.id,
-            question_index=i,
-            category_name=item["category_name"],
-            exam_area=item["exam_area"],
-            topic=q.topic,
-        )
-        db.add(answer)
-
-        # 画像情報の変換
-        images = []
-        if hasattr(q, "images") and q.images:
-            for img in q.images:
-                images.append({
-                    "id": str(img.id),
-                    "question_id": str(img.question_id),
-                    "file_path": img.file_path,
-                    "alt_text": img.alt_text,
-                    "position": img.position,
-                    "image_type": getattr(img, "image_type", None),
-                })
-
+    for i, item in enumerate(exam_items):
+        question_id = uuid.UUID(item["question_id"])
+        answer_rows.append({
+            "id": uuid.uuid4(),
+            "mock_exam_id": exam_id,
+            "question_id": question_id,
+            "question_index": i,
+            "category_name": item["category_name"],
+            "exam_area": item["exam_area"],
+            "topic": item["topic"],
+        })
         questions_response.append(
             MockExamQuestionResponse(
                 question_index=i,
-                question_id=q.id,
-                content=q.content,
-                choices=q.choices,
-                content_type=q.content_type or "plain",
+                question_id=question_id,
+                content=item["content"],
+                choices=item["choices"],
+                content_type=item["content_type"],
                 exam_area=item["exam_area"],
-                topic=q.topic,
-                images=images,
+                topic=item["topic"],
+                images=item["images"],
             )
         )
 
+    # 模試セッションと回答枠をまとめて作成
+    await insert_exam_rows(
+        db,
+        exam_row={
+            "id": exam_id,
+            "user_id": request.user_id,
+            "started_at": now,
+            "total_questions": len(exam_items),
+            "correct_count": 0,
+            "score": 0.0,
+            "status": "in_progress",
+        },
+        answer_rows=answer_rows,
+    )
+
     await db.commit()
 
     return MockExamStartResponse(
         exam_id=exam_id,
-        total_questions=len(selected),
+        total_questions=len(exam_items),
         time_limit_minutes=TIME_LIMIT_MINUTES,
         questions=questions_response,
         started_at=now,
     )
 
 
+async def _raise_answer_not_recorded(
+    db: AsyncSession,
+    exam_id: uuid.UUID,
+) -> None:
+    """回答が1件も記録されなかった理由を判定して例外を送出"""
+    exam_status = await get_exam_status(db, exam_id)
+    if exam_status is None:
+        raise HTTPException(status_code=404, detail="模試が見つかりません")
+    if exam_status != "in_progress":
+        raise HTTPException(status_code=400, detail="この模試は既に終了しています")
+    raise HTTPException(status_code=404, detail="問題が見つかりません")
+
+
 @router.post("/{exam_id}/answer", response_model=MockExamAnswerResponse)
 async def submit_answer(
     exam_id: uuid.UUID,
     request: MockExamAnswerRequest,
     db: AsyncSession = Depends(get_db),
 ) -> MockExamAnswerResponse:
-    """回答送信（1問ずつ）"""
-    # 模試を取得
-    exam_result = await db.execute(
-        select(MockExam).where(MockExam.id == exam_id)
-    )
-    exam = exam_result.scalar_one_or_none()
-    if not exam:
-        raise HTTPException(status_code=404, detail="模試が見つかりません")
-    if exam.status != "in_progress":
-        raise HTTPException(status_code=400, detail="この模試は既に終了しています")
+    """回答送信（1問ずつ）
 
-    # 対応する回答レコードを取得
-    answer_result = await db.execute(
-        select(MockExamAnswer).where(
-            MockExamAnswer.mock_exam_id == exam_id,
-            MockExamAnswer.question_index == request.question_index,
-        )
+    正誤判定・模試の状態確認・記録を1つのUPDATE文で行う。
+    """
+    recorded = await record_exam_answers(
+        db, exam_id, {request.question_index: request.selected_answer}
     )
-    answer = answer_result.scalar_one_or_none()
-    if not answer:
-        raise HTTPException(status_code=404, detail="問題が見つかりません")
+    if request.question_index not in recorded:
+        await _raise_answer_not_recorded(db, exam_id)
 
-    # 問題の正解を取得
-    question_result = await db.execute(
-        select(Question).where(Question.id == answer.question_id)
+    await db.commit()
+
+    return MockExamAnswerResponse(
+        question_index=request.question_index,
+        is_correct=recorded[request.question_index],
     )
-    question = question_result.scalar_one_or_none()
-    if not question:
-        raise HTTPException(status_code=404, detail="問題データが見つかりません")
 
-    # 回答を記録
-    is_correct = request.selected_answer == question.correct_answer
-    answer.selected_answer = request.selected_answer
-    answer.is_correct = is_correct
-    answer.answered_at = datetime.utcnow()
+
+@router.post("/{exam_id}/answers", response_model=MockExamBatchAnswerResponse)
+async def submit_answers_batch(
+    exam_id: uuid.UUID,
+    request: MockExamBatchAnswerRequest,
+    db: AsyncSession = Depends(get_db),
+) -> MockExamBatchAnswerResponse:
+    """複数の回答をまとめて送信（オフライン中にバッファした回答用）
+
+    同じ問題番号が複数含まれる場合は後の回答を採用する。
+    存在しない問題番号は missing_indexes に返す。
+    """
+    selections = {a.question_index: a.selected_answer for a in request.answers}
+    recorded = await record_exam_answers(db, exam_id, selections)
+    if not recorded:
+        await _raise_answer_not_recorded(db, exam_id)
 
     await db.commit()
 
-    return MockExamAnswerResponse(
-        question_index=request.question_index,
-        is_correct=is_correct,
+    return MockExamBatchAnswerResponse(
+        results=[
+            MockExamAnswerResponse(question_index=index, is_correct=is_correct)
+            for index, is_correct in sorted(recorded.items())
+        ],
+        missing_indexes=sorted(set(selections) - set(recorded)),
     )
 
 
@@ -175,54 +207,33 @@ async def finish_mock_exam(
     db: AsyncSession = Depends(get_db),
 ) -> MockExamResultResponse:
     """模試終了（スコア計算・分析生成）"""
+    # スイーパーと同時に終了処理しないよう行ロックを取る
     exam_result = await db.execute(
-        select(MockExam)
-        .options(selectinload(MockExam.answers))
-        .where(MockExam.id == exam_id)
+        select(MockExam).where(MockExam.id == exam_id).with_for_update()
     )
     exam = exam_result.scalar_one_or_none()
     if not exam:
         raise HTTPException(status_code=404, detail="模試が見つかりません")
+    # スイーパーが先に期限切れにした模試は回答が削除済みなので採点しない
+    if exam.status == "expired":
+        raise HTTPException(
+            status_code=400, detail="この模試は期限切れのため終了できません"
+        )
+    # 終了済み（スイーパーや重複リクエスト）なら保存済みの結果を返す
+    if exam.status == "finished":
+        response = await _build_stored_result(db, exam)
+        await db.commit()
+        return response
 
-    # 回答データを集計
-    answers_data = []
-    for a in exam.answers:
-        answers_data.append({
-            "is_correct": a.is_correct,
-            "exam_area": a.exam_area,
-            "topic": a.topic,
-        })
-
-    # スコア計算
-    scores = calculate_scores(answers_data)
+    # 採点・分析・復習アイテム連携
+    scores = await finish_exam(db, exam)
 
-    # ルールベース分析
-    analysis = generate_rule_based_analysis(
-        score=scores["score"],
-        correct_count=scores["correct_count"],
-        total=len(answers_data) if answers_data else exam.total_questions,
-        passed=scores["passed"],
-        category_scores=scores["category_scores"],
+    percentile, area_percentiles = await get_exam_percentiles(
+        db, scores["score"], scores["category_scores"]
     )
-
-    # 模試を更新
-    now = datetime.utcnow()
-    exam.finished_at = now
-    exam.correct_count = scores["correct_count"]
-    exam.score = scores["score"]
-    exam.passed = scores["passed"]
-    exam.category_scores = scores["category_scores"]
-    exam.status = "finished"
-
-    # 各回答を復習アイテムに連携
-    for a in exam.answers:
-        if a.is_correct is not None:
-            try:
-                await update_review_on_answer(db, a.question_id, exam.user_id, a.is_correct)
-            except Exception as e:
-                logger.warning(f"復習アイテム更新失敗 (question_id={a.question_id}): {e}")
-
     await db.commit()
+    # コミット前のデータで作り直された復習統計キャッシュを捨てる
+    invalidate_review_stats(exam.user_id)
 
     # レスポンス構築
     category_scores_list = [
@@ -232,6 +243,7 @@ async def finish_mock_exam(
             correct=detail["correct"],
             accuracy=detail["accuracy"],
             grade=detail["grade"],
+            percentile=area_percentiles.get(area),
         )
         for area, detail in scores["category_scores"].items()
     ]
@@ -240,14 +252,15 @@ async def finish_mock_exam(
         exam_id=exam.id,
         user_id=exam.user_id,
         started_at=exam.started_at,
-        finished_at=now,
+        finished_at=exam.finished_at,
         total_questions=exam.total_questions,
         correct_count=scores["correct_count"],
         score=scores["score"],
         passed=scores["passed"],
         passing_threshold=PASSING_THRESHOLD,
+        percentile=percentile,
         category_scores=category_scores_list,
-        analysis=analysis,
+        analysis=scores["analysis"],
         ai_analysis=exam.ai_analysis,
         status="finished",
     )
@@ -256,34 +269,89 @@ async def finish_mock_exam(
 @router.get("/history", response_model=MockExamHistoryResponse)
 async def get_mock_exam_history(
     user_id: str = Query(..., description="ユーザーID"),
+    cursor: Optional[str] = Query(None, description="前ページの next_cursor"),
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
     db: AsyncSession = Depends(get_db),
 ) -> MockExamHistoryResponse:
-    """模試履歴一覧を取得"""
-    exams_result = await db.execute(
-        select(MockExam)
+    """模試履歴一覧を取得
+
+    履歴に必要な列だけを (user_id, started_at DESC, id DESC) インデックス順に取得する。
+    開始日時が同じ模試がページ境界をまたいでも漏れないよう、カーソルは
+    (開始日時, ID) の組にする。総件数は同じ文のスカラーサブクエリで返す。
+    """
+    decoded_cursor = None
+    if cursor is not None:
+        try:
+            decoded_cursor = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Invalid cursor",
+            ) from None
+
+    total_subquery = (
+        select(func.count())
+        .select_from(MockExam)
         .where(MockExam.user_id == user_id)
-        .order_by(MockExam.started_at.desc())
+        .scalar_subquery()
     )
-    exams = list(exams_result.scalars().all())
-
-    count_result = await db.execute(
-        select(func.count(MockExam.id)).where(MockExam.user_id == user_id)
+    query = (
+        select(
+            MockExam.id,
+            MockExam.started_at,
+            MockExam.finished_at,
+            MockExam.score,
+            MockExam.passed,
+            MockExam.status,
+            total_subquery.label("total_count"),
+        )
+        .where(MockExam.user_id == user_id)
+        .order_by(MockExam.started_at.desc(), MockExam.id.desc())
+        .limit(limit + 1)
     )
-    total_count = count_result.scalar_one()
+    if decoded_cursor is not None:
+        query = query.where(
+            tuple_(MockExam.started_at, MockExam.id) < tuple_(*decoded_cursor)
+        )
+    rows = list((await db.execute(query)).all())
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if rows:
+        total_count = rows[0].total_count
+    elif decoded_cursor is None:
+        total_count = 0
+    else:
+        # カーソル以降が空の場合のみ件数を別途取得
+        count_result = await db.execute(
+            select(func.count())
+            .select_from(MockExam)
+            .where(MockExam.user_id == user_id)
+        )
+        total_count = count_result.scalar_one()
 
     items = [
         MockExamHistoryItem(
-            exam_id=e.id,
-            started_at=e.started_at,
-            finished_at=e.finished_at,
-            score=e.score,
-            passed=e.passed,
-            status=e.status,
+            exam_id=r.id,
+            started_at=r.started_at,
+            finished_at=r.finished_at,
+            score=r.score,
+            passed=r.passed,
+            status=r.status,
         )
-        for e in exams
+        for r in rows
     ]
 
-    return MockExamHistoryResponse(exams=items, total_count=total_count)
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[-1].started_at, rows[-1].id)
+
+    return MockExamHistoryResponse(
+        exams=items,
+        total_count=total_count,
+        next_cursor=next_cursor,
+    )
 
 
 @router.get("/{exam_id}", response_model=MockExamResultResponse)
@@ -299,6 +367,22 @@ async def get_mock_exam_result(
     if not exam:
         raise HTTPException(status_code=404, detail="模試が見つかりません")
 
+    return await _build_stored_result(db, exam)
+
+
+async def _build_stored_result(
+    db: AsyncSession,
+    exam: MockExam,
+) -> MockExamResultResponse:
+    """保存済みの採点結果からレスポンスを作成"""
+    # 終了済みならスコア分布からパーセンタイルを取得
+    percentile: Optional[float] = None
+    area_percentiles: dict[str, Optional[float]] = {}
+    if exam.status == "finished":
+        percentile, area_percentiles = await get_exam_percentiles(
+            db, exam.score, exam.category_scores
+        )
+
     # カテゴリスコアをレスポンス形式に変換
     category_scores_list = []
     if exam.category_scores:
@@ -310,12 +394,13 @@ async def get_mock_exam_result(
                     correct=detail.get("correct", 0),
                     accuracy=detail.get("accuracy", 0.0),
                     grade=detail.get("grade", "F"),
+                    percentile=area_percentiles.get(area),
                 )
             )
 
-    # ルールベース分析を再生成
-    analysis = ""
-    if exam.status == "finished" and exam.category_scores:
+    # 終了時に保存した分析を返す（保存前に終了した模試のみ再生成）
+    analysis = exam.analysis or ""
+    if not analysis and exam.status == "finished" and exam.category_scores:
         analysis = generate_rule_based_analysis(
             score=exam.score,
             correct_count=exam.correct_count,
@@ -334,6 +419,7 @@ async def get_mock_exam_result(
         score=exam.score,
         passed=exam.passed,
         passing_threshold=PASSING_THRESHOLD,
+        percentile=percentile,
         category_scores=category_scores_list,
         analysis=analysis,
         ai_analysis=exam.ai_analysis,
@@ -341,13 +427,24 @@ async def get_mock_exam_result(
     )
 
 
-@router.post("/{exam_id}/ai-analysis", response_model=AIAnalysisResponse)
+@router.post(
+    "/{exam_id}/ai-analysis",
+    response_model=AIAnalysisResponse,
+    responses={202: {"model": AIAnalysisPendingResponse}},
+)
 async def request_ai_analysis(
     exam_id: uuid.UUID,
     request: MockExamFinishRequest,
+    wait: bool = Query(
+        True, description="Falseの場合は生成完了を待たずに202を返す"
+    ),
     db: AsyncSession = Depends(get_db),
-) -> AIAnalysisResponse:
-    """AI分析を生成"""
+) -> Any:
+    """AI分析を生成
+
+    スコアプロファイルが一致するキャッシュがあれば即座に返す。
+    ない場合は生成を開始し、wait=False なら202とポーリング先を返す。
+    """
     exam_result = await db.execute(
         select(MockExam).where(MockExam.id == exam_id)
     )
@@ -357,50 +454,98 @@ async def request_ai_analysis(
     if exam.status != "finished":
         raise HTTPException(status_code=400, detail="模試が終了していません")
 
-    # トピック別集計を構築
-    answers_result = await db.execute(
-        select(MockExamAnswer).where(MockExamAnswer.mock_exam_id == exam_id)
-    )
-    exam_answers = list(answers_result.scalars().all())
-    topic_stats: dict[str, dict[str, int]] = {}
-    for a in exam_answers:
-        if not a.topic:
-            continue
-        if a.topic not in topic_stats:
-            topic_stats[a.topic] = {"total": 0, "correct": 0}
-        topic_stats[a.topic]["total"] += 1
-        if a.is_correct is True:
-            topic_stats[a.topic]["correct"] += 1
-
-    topic_scores: dict[str, dict[str, Any]] = {}
-    for topic, stats in topic_stats.items():
-        accuracy = (stats["correct"] / stats["total"]) * 100.0 if stats["total"] > 0 else 0.0
-        topic_scores[topic] = {
-            "total": stats["total"],
-            "correct": stats["correct"],
-            "accuracy": round(accuracy, 1),
-        }
-
-    # AI分析を生成
-    ai_analysis = await generate_ai_analysis(
-        score=exam.score,
-        correct_count=exam.correct_count,
-        total=exam.total_questions,
+    # トピック別集計は終了時に保存済み（保存前に終了した模試のみDBで再集計）
+    topic_scores = exam.topic_scores
+    if topic_scores is None:
+        topic_scores = (await aggregate_exam_scores(db, exam.id))["topic_scores"]
+        exam.topic_scores = topic_scores
+
+    profile = build_score_profile(
         passed=exam.passed or False,
         category_scores=exam.category_scores or {},
-        topic_scores=topic_scores if topic_scores else None,
+        topic_scores=topic_scores,
+    )
+    cached = await get_cached_analysis(db, profile)
+    if cached:
+        exam.ai_analysis = cached
+    await db.commit()
+    if cached:
+        return AIAnalysisResponse(exam_id=exam.id, ai_analysis=cached)
+
+    # AI分析を生成（同じ模試への同時リクエストは1本にまとめる）
+    generation_kwargs: dict[str, Any] = {
+        "score": exam.score,
+        "correct_count": exam.correct_count,
+        "total": exam.total_questions,
+        "passed": exam.passed or False,
+        "category_scores": exam.category_scores or {},
+        "topic_scores": topic_scores if topic_scores else None,
+    }
+    task = start_ai_analysis(
+        exam.id,
+        profile,
+        lambda: generate_ai_analysis(**generation_kwargs),
     )
 
+    if not wait:
+        pending = AIAnalysisPendingResponse(
+            exam_id=exam.id,
+            poll_url=f"{router.prefix}/{exam.id}/ai-analysis",
+        )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=pending.model_dump(mode="json"),
+        )
+
+    # 待機中のリクエストが切断されても生成は継続させる
+    ai_analysis = await asyncio.shield(task)
     if not ai_analysis:
         raise HTTPException(
             status_code=503,
             detail="AI分析の生成に失敗しました。後でもう一度お試しください。",
         )
 
-    exam.ai_analysis = ai_analysis
-    await db.commit()
-
     return AIAnalysisResponse(
         exam_id=exam.id,
         ai_analysis=ai_analysis,
     )
+
+
+@router.get(
+    "/{exam_id}/ai-analysis",
+    response_model=AIAnalysisResponse,
+    responses={202: {"model": AIAnalysisPendingResponse}},
+)
+async def get_ai_analysis(
+    exam_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+) -> Any:
+    """AI分析の生成状況を取得（wait=False で開始した生成のポーリング用）
+
+    生成に失敗した場合は502を返す（POST で再生成できる）。
+    """
+    if is_ai_analysis_pending(exam_id):
+        pending = AIAnalysisPendingResponse(
+            exam_id=exam_id,
+            poll_url=f"{router.prefix}/{exam_id}/ai-analysis",
+        )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=pending.model_dump(mode="json"),
+        )
+
+    result = await db.execute(
+        select(MockExam.ai_analysis).where(MockExam.id == exam_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="模試が見つかりません")
+    if not row.ai_analysis:
+        if is_ai_analysis_failed(exam_id):
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="AI分析の生成に失敗しました。もう一度生成をリクエストしてください。",
+            )
+        raise HTTPException(status_code=404, detail="AI分析がまだ生成されていません")
+
+    return AIAnalysisResponse(exam_id=exam_id, ai_analysis=row.ai_analysis)
@@ -1,12 +1,13 @@
 """問題APIエンドポイント"""
 import logging
+import random
 import uuid
 from pathlib import Path
 from typing import Any, Optional
 
 from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
 from fastapi.responses import FileResponse, RedirectResponse
-from sqlalchemy import func, select
+from sqlalchemy import func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -21,36 +22,54 @@ from app.schemas.question_api import (
     AutoClassifyResponse,
     CategoryUpdateRequest,
     CategoryUpdateResponse,
+    ExtractionStats,
     ImportResponse,
     RegenerateExplanationResponse,
     RegenerateExplanationsResponse,
 )
+from app.services.chat_answer_cache import (
+    clear_answer_cache,
+    invalidate_question_answers,
+)
 from app.services.framework_detector import detect_framework
 from app.services.image_linker import (
+    insert_question_images,
     link_images_by_semantic_matching,
-    link_images_to_existing_question,
+    prepare_question_images,
 )
 from app.services.image_storage import ImageStorage
+from app.services.llm_cache import get_llm_cache
 from app.services.mineru_extractor import (
     MinerUExtractor,
     MinerUError,
     MinerUNotAvailableError,
 )
+from app.services.mock_exam_pool import mark_pool_stale
 from app.services.pdf_extractor import (
+    ExtractionReport,
     PDFExtractionError,
     extract_questions_from_text,
     extract_text_from_pdf,
 )
+from app.services.pdf_process_pool import spool_pdf
 from app.services.question_service import (
     DEFAULT_CATEGORY_NAME,
     create_question_service,
     get_or_create_default_category,
     get_question_by_id_service,
     get_question_hash,
+    get_questions_by_hashes,
     get_questions_service,
     get_random_question_service,
     resolve_category_id,
 )
+from app.services.recall_ranker import (
+    SMART_CANDIDATE_COUNT,
+    invalidate_question_catalog,
+    load_category_weakness,
+    load_question_arrays,
+    rank_top_k,
+)
 from app.services.vlm_analyzer import VLMAnalyzer
 from app.services.explanation_generator import (
     generate_explanation,
@@ -118,36 +137,13 @@ async def get_smart_question(
     user_id: str,
     db: AsyncSession = Depends(get_db),
 ) -> Question:
-    """苦手分野を優先してスマートに問題を出題
+    """忘れかけている問題・苦手分野を優先してスマートに問題を出題
 
     アルゴリズム:
-    1. ユーザーの苦手カテゴリ（正解率が低い）を取得
-    2. 苦手カテゴリがあれば、そこから優先的に出題
-    3. 最近回答した問題は除外
-    4. 苦手カテゴリがなければランダム出題
+    1. 最近回答した問題（直近20問）を除外した候補を配列として読み込む
+    2. 忘却曲線の想起確率とカテゴリの苦手度から優先度を一括計算
+    3. 優先度の上位 SMART_CANDIDATE_COUNT 件（同点はランダム）からランダムに1問出題
     """
-    # 苦手カテゴリを取得（正解率50%未満、最低5問以上回答）
-    from sqlalchemy import Integer, cast as sql_cast
-
-    weak_areas_result = await db.execute(
-        select(
-            Category.id,
-            Category.name,
-            func.count(Answer.id).label("total"),
-            func.sum(sql_cast(Answer.is_correct, Integer)).label("correct"),
-            (func.sum(sql_cast(Answer.is_correct, Integer)) * 100.0 / func.count(Answer.id)).label("accuracy"),
-        )
-        .join(Question, Question.category_id == Category.id)
-        .join(Answer, Answer.question_id == Question.id)
-        .where(Answer.user_id == user_id)
-        .group_by(Category.id, Category.name)
-        .having(func.count(Answer.id) >= 5)
-        .having((func.sum(sql_cast(Answer.is_correct, Integer)) * 100.0 / func.count(Answer.id)) < 50)
-        .order_by("accuracy")
-        .limit(3)
-    )
-    weak_areas = weak_areas_result.all()
-
     # 最近回答した問題IDを取得（直近20問）
     recent_result = await db.execute(
         select(Answer.question_id)
@@ -157,49 +153,31 @@ async def get_smart_question(
     )
     recent_question_ids = [row for row in recent_result.scalars().all()]
 
-    # 出題クエリを構築
-    query = select(Question).options(selectinload(Question.images))
-
-    # TensorFlow専用問題を除外
-    query = query.where(
-        (Question.framework.is_(None)) | (Question.framework != "tensorflow")
+    weakness = await load_category_weakness(db, user_id)
+    arrays = await load_question_arrays(
+        db, user_id, weakness, exclude_ids=recent_question_ids
     )
-
-    # 最近の問題を除外
-    if recent_question_ids:
-        query = query.where(Question.id.notin_(recent_question_ids))
-
-    # 苦手カテゴリがあればそこから優先出題
-    if weak_areas:
-        weak_category_ids = [area[0] for area in weak_areas]
-        query = query.where(Question.category_id.in_(weak_category_ids))
-
-    # ランダムに1問取得
-    query = query.order_by(func.random()).limit(1)
-    result = await db.execute(query)
-    question = result.scalar_one_or_none()
-
-    # 苦手カテゴリから問題が見つからない場合、全体からランダム
-    if not question:
-        fallback_query = select(Question).options(selectinload(Question.images))
-        # TensorFlow専用問題を除外
-        fallback_query = fallback_query.where(
-            (Question.framework.is_(None))
-            | (Question.framework != "tensorflow")
+    ranked = rank_top_k(arrays, SMART_CANDIDATE_COUNT, shuffle_ties=True)
+    if not ranked:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No questions found",
         )
-        if recent_question_ids:
-            fallback_query = fallback_query.where(Question.id.notin_(recent_question_ids))
-        fallback_query = fallback_query.order_by(func.random()).limit(1)
-        result = await db.execute(fallback_query)
-        question = result.scalar_one_or_none()
 
-    if not question:
+    # 問題一覧はキャッシュなので、削除済みの候補を除いてから選ぶ
+    result = await db.execute(
+        select(Question)
+        .options(selectinload(Question.images))
+        .where(Question.id.in_([r.id for r in ranked]))
+    )
+    questions = list(result.scalars().all())
+    if not questions:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No questions found",
         )
 
-    return question
+    return random.choice(questions)
 
 
 @router.get("/{question_id}", response_model=QuestionResponse)
@@ -223,7 +201,10 @@ async def create_question(
     db: AsyncSession = Depends(get_db),
 ) -> Question:
     """問題を作成"""
-    return await create_question_service(db, question_data)
+    question = await create_question_service(db, question_data)
+    mark_pool_stale()
+    invalidate_question_catalog()
+    return question
 
 
 @router.post("/import", response_model=ImportResponse)
@@ -268,9 +249,12 @@ async def import_questions_from_pdf(
             detail="PDF file is required",
         )
 
+    # PDF全体をメモリに読み込まず、一時ファイルに書き出してパスで各段に渡す
+    pdf_path = await spool_pdf(file.file)
     try:
-        content = await file.read()
-        logger.info(f"Received PDF file: {file.filename}, size: {len(content)} bytes")
+        logger.info(
+            f"Received PDF file: {file.filename}, size: {pdf_path.stat().st_size} bytes"
+        )
 
         # 画像データをファイル名でインデックス化
         image_index: dict[str, dict[str, Any]] = {}
@@ -280,7 +264,7 @@ async def import_questions_from_pdf(
         if use_mineru:
             try:
                 extractor = MinerUExtractor()
-                result = await extractor.extract(content, fallback_on_error=True)
+                result = await extractor.extract(pdf_path, fallback_on_error=True)
                 text = result.markdown
                 # ファイル名でインデックス化
                 for img in result.images:
@@ -300,9 +284,9 @@ async def import_questions_from_pdf(
                     logger.info(f"Image filenames: {list(image_index.keys())}")
             except (MinerUError, MinerUNotAvailableError) as e:
                 logger.warning(f"MinerU failed, falling back to pypdf: {e}")
-                text = await extract_text_from_pdf(content)
+                text = await extract_text_from_pdf(pdf_path)
         else:
-            text = await extract_text_from_pdf(content)
+            text = await extract_text_from_pdf(pdf_path)
 
         logger.info(f"Extracted text length: {len(text)} chars")
 
@@ -314,17 +298,22 @@ async def import_questions_from_pdf(
 
         # AIで問題を抽出
         logger.info("Calling Claude CLI for question extraction...")
+        extraction_report = ExtractionReport()
         questions = await extract_questions_from_text(
             text,
             source=file.filename or "PDF Import",
             category_id=category_id,
+            report=extraction_report,
         )
         logger.info(f"Extracted {len(questions)} questions from PDF")
 
         # 画像参照の統計をログ出力
         questions_with_refs = sum(1 for q in questions if q.get("image_refs"))
         all_refs = [ref for q in questions for ref in q.get("image_refs", [])]
-        logger.info(f"Questions with image_refs: {questions_with_refs}, Total refs: {len(all_refs)}")
+        logger.info(
+            f"Questions with image_refs: {questions_with_refs}, "
+            f"Total refs: {len(all_refs)}"
+        )
         if all_refs:
             logger.info(f"Sample image_refs: {all_refs[:5]}")
 
@@ -346,25 +335,42 @@ async def import_questions_from_pdf(
             vlm_analyzer = VLMAnalyzer() if image_index else None
             image_storage = ImageStorage() if image_index else None
 
+            # 重複チェック: 全問のハッシュで既存問題をまとめて取得
+            hashed = [(get_question_hash(q["content"]), q) for q in questions]
+            existing_by_hash = await get_questions_by_hashes(
+                db, (content_hash for content_hash, _ in hashed)
+            )
+
+            question_rows: list[dict[str, Any]] = []
+            image_rows: list[dict[str, Any]] = []
+            seen_hashes: set[str] = set()
             skipped_count = 0
-            for q in questions:
+            for content_hash, q in hashed:
                 try:
-                    # 重複チェック
-                    content_hash = get_question_hash(q["content"])
-                    existing = await db.execute(
-                        select(Question)
-                        .options(selectinload(Question.images))
-                        .where(Question.content_hash == content_hash)
-                    )
-                    existing_q = existing.scalar_one_or_none()
-                    if existing_q:
+                    image_refs = q.get("image_refs", [])
+                    existing_q = existing_by_hash.get(content_hash)
+                    if existing_q or content_hash in seen_hashes:
                         # 既存問題に画像がなく、新規importに画像参照がある場合は画像を追加
-                        image_refs = q.get("image_refs", [])
-                        if len(existing_q.images) == 0 and image_refs and image_index and vlm_analyzer and image_storage:
-                            await link_images_to_existing_question(
-                                db, existing_q, image_refs, image_index, vlm_analyzer, image_storage,
-                            )
-                        logger.info(f"Skipping duplicate question: {content_hash[:8]}...")
+                        if (
+                            existing_q is not None
+                            and content_hash not in seen_hashes
+                            and len(existing_q.images) == 0
+                            and image_refs
+                            and image_index
+                            and vlm_analyzer
+                            and image_storage
+                        ):
+                            image_rows.extend(await prepare_question_images(
+                                existing_q.id,
+                                image_refs,
+                                image_index,
+                                vlm_analyzer,
+                                image_storage,
+                            ))
+                        seen_hashes.add(content_hash)
+                        logger.info(
+                            f"Skipping duplicate question: {content_hash[:8]}..."
+                        )
                         skipped_count += 1
                         continue
 
@@ -378,99 +384,48 @@ async def import_questions_from_pdf(
                     framework = detect_framework(
                         q["content"], q["choices"]
                     )
-                    question = Question(
-                        id=question_id,
-                        category_id=effective_category_id,
-                        content=q["content"],
-                        choices=q["choices"],
-                        correct_answer=q["correct_answer"],
-                        explanation=q.get("explanation", ""),
-                        difficulty=q.get("difficulty", 3),
-                        source=q.get("source", file.filename),
-                        content_type=q.get("content_type", "plain"),
-                        content_hash=content_hash,
-                        framework=framework,
-                        topic=q.get("topic"),
-                    )
-                    db.add(question)
+                    question_rows.append({
+                        "id": question_id,
+                        "category_id": effective_category_id,
+                        "content": q["content"],
+                        "choices": q["choices"],
+                        "correct_answer": q["correct_answer"],
+                        "explanation": q.get("explanation", ""),
+                        "difficulty": q.get("difficulty", 3),
+                        "source": q.get("source", file.filename),
+                        "content_type": q.get("content_type", "plain"),
+                        "content_hash": content_hash,
+                        "framework": framework,
+                        "topic": q.get("topic"),
+                    })
+                    seen_hashes.add(content_hash)
 
                     # 問題に関連する画像を紐付け（image_refsに基づく）
-                    image_refs = q.get("image_refs", [])
-                    images_linked = 0
                     if image_refs:
                         logger.info(f"Question has image_refs: {image_refs}")
                     if image_refs and image_index and vlm_analyzer and image_storage:
-                        for pos, img_filename in enumerate(image_refs):
-                            if img_filename not in image_index:
-                                logger.warning(
-                                    f"Image not found: {img_filename} for question {question_id}"
-                                )
-                                continue
-
-                            img_info_data = image_index[img_filename]
-                            img_data = img_info_data["data"]
-
-                            try:
-                                # VLMで画像解析（タイムアウト時はNone）
-                                vlm_result = await vlm_analyzer.analyze(
-                                    img_data,
-                                    detect_type=True,
-                                    fallback_on_error=True,
-                                )
-
-                                alt_text = None
-                                image_type = "unknown"
-                                if vlm_result:
-                                    alt_text = vlm_result.description
-                                    image_type = vlm_result.image_type
-
-                                # 画像をファイルに保存
-                                img_info = image_storage.save(
-                                    image_data=img_data,
-                                    question_id=question_id,
-                                    position=pos,
-                                    alt_text=alt_text,
-                                    image_type=image_type,
-                                )
-
-                                # 既存の同一画像レコードをチェック
-                                existing_img = await db.execute(
-                                    select(QuestionImage).where(
-                                        QuestionImage.question_id == question_id,
-                                        QuestionImage.file_path == img_info.file_path,
-                                    )
-                                )
-                                if existing_img.scalar_one_or_none():
-                                    logger.info(
-                                        f"Skipping duplicate image {img_info.file_path} "
-                                        f"for question {question_id}"
-                                    )
-                                    continue
-
-                                # QuestionImageレコード作成
-                                question_image = QuestionImage(
-                                    id=img_info.id,
-                                    question_id=question_id,
-                                    file_path=img_info.file_path,
-                                    alt_text=alt_text,
-                                    position=pos,
-                                    image_type=image_type,
-                                )
-                                db.add(question_image)
-                                images_linked += 1
-                                logger.info(
-                                    f"Saved image {img_filename} for question {question_id}"
-                                )
-                            except Exception as img_e:
-                                logger.warning(f"Failed to process image {img_filename}: {img_e}")
-                                continue
+                        image_rows.extend(await prepare_question_images(
+                            question_id,
+                            image_refs,
+                            image_index,
+                            vlm_analyzer,
+                            image_storage,
+                        ))
 
                     saved_count += 1
                 except Exception as e:
                     logger.warning(f"Failed to save question: {e}")
                     continue
 
+            # 問題・画像はそれぞれ1回のINSERTでまとめて書き込む
+            if question_rows:
+                await db.execute(insert(Question), question_rows)
+            linked_images = await insert_question_images(db, image_rows)
+            logger.info(f"Saved {linked_images} images from image_refs")
+
             await db.commit()
+            mark_pool_stale()
+            invalidate_question_catalog()
             if skipped_count > 0:
                 logger.info(f"Skipped {skipped_count} duplicate questions")
             logger.info(f"Saved {saved_count} questions to database")
@@ -509,6 +464,7 @@ async def import_questions_from_pdf(
             image_filenames=list(image_index.keys())[:10],
             questions_with_refs=questions_with_refs,
             sample_refs=all_refs[:10],
+            extraction=ExtractionStats.model_validate(extraction_report),
         )
 
     except PDFExtractionError as e:
@@ -523,6 +479,8 @@ async def import_questions_from_pdf(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process PDF: {e}",
         )
+    finally:
+        pdf_path.unlink(missing_ok=True)
 
 
 @router.get("/{question_id}/images/{image_id}")
@@ -580,10 +538,6 @@ async def get_question_image(
     )
 
 
-# キャッシュディレクトリ
-CACHE_DIR = Path(__file__).parent.parent.parent / ".cache" / "pdf_extractions"
-
-
 @router.delete("/all")
 async def delete_all_questions(
     confirm: str = Query(..., description="確認トークン: 'DELETE_ALL_QUESTIONS'と入力"),
@@ -640,16 +594,17 @@ async def delete_all_questions(
     await db.execute(Question.__table__.delete())
 
     await db.commit()
+    mark_pool_stale()
+    invalidate_question_catalog()
+    clear_answer_cache()
 
     # キャッシュクリア
     cache_cleared = False
-    if clear_cache and CACHE_DIR.exists():
+    if clear_cache:
         try:
-            import shutil
-            shutil.rmtree(CACHE_DIR)
-            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            deleted = await get_llm_cache().clear()
             cache_cleared = True
-            logger.info("Cache cleared")
+            logger.info(f"Cache cleared ({deleted} entries)")
         except Exception as e:
             logger.warning(f"Failed to clear cache: {e}")
 
@@ -684,6 +639,8 @@ async def update_question_category(
     # カテゴリを更新
     question.category_id = request.category_id
     await db.commit()
+    mark_pool_stale()
+    invalidate_question_catalog()
 
     return CategoryUpdateResponse(
         id=question.id,
@@ -780,6 +737,8 @@ async def auto_classify_questions(
 
     if not dry_run:
         await db.commit()
+        mark_pool_stale()
+        invalidate_question_catalog()
 
     return AutoClassifyResponse(
         total=total,
@@ -818,6 +777,7 @@ async def regenerate_explanation_single(
 
     question.explanation = new_explanation
     await db.commit()
+    invalidate_question_answers(question.id)
 
     return RegenerateExplanationResponse(
         question_id=str(question.id),
@@ -886,6 +846,7 @@ async def regenerate_explanations_bulk(
                 q_obj = question_map.get(q_id)
                 if q_obj:
                     q_obj.explanation = br["explanation"]
+                    invalidate_question_answers(q_obj.id)
             regenerated += 1
             results.append({
                 "question_id": q_id,
@@ -1,23 +1,32 @@
 """復習APIエンドポイント"""
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
+from app.core.pagination import decode_cursor
 from app.schemas.review import (
     BackfillRequest,
     BackfillResponse,
     ReviewItemDetailResponse,
     ReviewItemResponse,
+    ReviewNextItemResponse,
     ReviewStatsResponse,
 )
 from app.services.review_service import (
+    DETAILED_ITEMS_MAX_PAGE_SIZE,
+    DETAILED_ITEMS_PAGE_SIZE,
+    DUE_ITEMS_DEFAULT_LIMIT,
+    NEXT_ITEMS_DEFAULT_LIMIT,
     backfill_review_items_for_user,
     get_active_review_items,
+    get_due_review_items,
     get_mastered_items,
+    get_next_review_items,
     get_review_items_with_details,
     get_review_stats,
+    invalidate_review_stats,
 )
 
 router = APIRouter(prefix="/api/review", tags=["review"])
@@ -33,6 +42,35 @@ async def get_review_items(
     return [ReviewItemResponse.model_validate(item) for item in items]
 
 
+@router.get("/due", response_model=list[ReviewItemResponse])
+async def get_due_items(
+    user_id: str,
+    limit: int = Query(DUE_ITEMS_DEFAULT_LIMIT, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+) -> list[ReviewItemResponse]:
+    """復習期限が来たアイテムを期限の古い順に取得"""
+    items = await get_due_review_items(db, user_id, limit=limit)
+    return [ReviewItemResponse.model_validate(item) for item in items]
+
+
+@router.get("/next", response_model=list[ReviewNextItemResponse])
+async def get_next_items(
+    user_id: str,
+    limit: int = Query(NEXT_ITEMS_DEFAULT_LIMIT, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+) -> list[ReviewNextItemResponse]:
+    """忘れかけているアイテムを優先度の高い順に取得"""
+    ranked = await get_next_review_items(db, user_id, limit=limit)
+    return [
+        ReviewNextItemResponse(
+            **ReviewItemResponse.model_validate(item).model_dump(),
+            priority=r.priority,
+            recall_probability=r.recall_probability,
+        )
+        for item, r in ranked
+    ]
+
+
 @router.get("/mastered", response_model=list[ReviewItemResponse])
 async def get_mastered(
     user_id: str,
@@ -45,13 +83,43 @@ async def get_mastered(
 
 @router.get("/items/detailed", response_model=list[ReviewItemDetailResponse])
 async def get_review_items_detailed(
+    response: Response,
     user_id: str,
-    status: Optional[str] = Query(None, description="フィルタ: active or mastered"),
+    status_filter: Optional[str] = Query(
+        None, alias="status", description="フィルタ: active or mastered"
+    ),
+    cursor: Optional[str] = Query(
+        None, description="前ページの X-Next-Cursor ヘッダーの値"
+    ),
+    limit: int = Query(DETAILED_ITEMS_PAGE_SIZE, ge=1, le=DETAILED_ITEMS_MAX_PAGE_SIZE),
     db: AsyncSession = Depends(get_db),
 ) -> list[ReviewItemDetailResponse]:
-    """復習アイテムを問題内容・カテゴリ名と共に取得"""
-    items = await get_review_items_with_details(db, user_id, status_filter=status)
-    return [ReviewItemDetailResponse(**item) for item in items]
+    """復習アイテムを問題内容・カテゴリ名と共に最終回答の新しい順に取得
+
+    総件数は X-Total-Count、次ページのカーソルは X-Next-Cursor ヘッダーで返す
+    （最終ページでは X-Next-Cursor を付けない）。
+    """
+    decoded_cursor = None
+    if cursor is not None:
+        try:
+            decoded_cursor = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Invalid cursor",
+            ) from None
+
+    page = await get_review_items_with_details(
+        db,
+        user_id,
+        status_filter=status_filter,
+        limit=limit,
+        cursor=decoded_cursor,
+    )
+    response.headers["X-Total-Count"] = str(page["total_count"])
+    if page["next_cursor"] is not None:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return [ReviewItemDetailResponse(**item) for item in page["items"]]
 
 
 @router.post("/backfill", response_model=BackfillResponse)
@@ -62,6 +130,8 @@ async def backfill_review_items(
     """既存の完了済み模試から復習アイテムを遡及的に作成"""
     result = await backfill_review_items_for_user(db, request.user_id)
     await db.commit()
+    # コミット前のデータで作り直された統計キャッシュを捨てる
+    invalidate_review_stats(request.user_id)
     return BackfillResponse(**result)
 
 
@@ -56,5 +56,53 @@ class Settings(BaseSettings):
     # 本番環境フラグ（Trueの場合、PDFインポート機能を無効化）
     is_production: bool = False
 
+    # 模試プール（事前組み立て済み問題セット）
+    mock_exam_pool_enabled: bool = True
+    mock_exam_pool_size: int = 5
+    mock_exam_pool_refill_batch: int = 2
+    mock_exam_pool_refill_interval_seconds: int = 60
+    mock_exam_pool_max_age_seconds: int = 3600
+
+    # 模試AI分析（スコアプロファイル単位のキャッシュ）
+    mock_exam_ai_analysis_cache_enabled: bool = True
+
+    # 放置模試のスイーパー（制限時間 + 猶予を過ぎた in_progress を片付ける）
+    mock_exam_sweeper_enabled: bool = True
+    mock_exam_sweep_interval_seconds: int = 300
+    mock_exam_sweep_grace_minutes: int = 30
+    mock_exam_sweep_batch_size: int = 50
+
+    # 復習統計のユーザー別キャッシュ（秒、0で無効）
+    review_stats_cache_ttl_seconds: int = 60
+
+    # PDFインポート（問題抽出で同時に処理するチャンク数）
+    pdf_extraction_concurrency: int = 4
+    # PDF解析のプロセス数（1以下ならスレッドのみ）と、
+    # ページ範囲で並列化するPDFの最小サイズ
+    pdf_parse_workers: int = 4
+    pdf_parse_parallel_min_bytes: int = 2097152
+
+    # LLM応答のローカルキャッシュ（SQLite）
+    # パス未指定時は backend/.cache/llm_cache.sqlite3
+    llm_cache_path: str = ""
+    llm_cache_max_bytes: int = 268435456
+
+    # 問題チャット（api: Anthropic API / cli: Claude CLI / auto: APIキーがあればapi）
+    chat_backend: str = "auto"
+    chat_model: str = "claude-sonnet-4-5-20250929"
+    chat_max_tokens: int = 2048
+    chat_max_concurrency: int = 32
+    chat_api_base_url: str = ""
+    chat_api_timeout_seconds: float = 120.0
+    chat_http_max_connections: int = 64
+    chat_http_max_keepalive_connections: int = 32
+    # 会話履歴（直近メッセージと要約のトークン予算）
+    chat_history_token_budget: int = 2000
+    chat_summary_token_budget: int = 600
+    # 会話の最初の質問への回答キャッシュ（件数0で無効、類似度はコサイン類似度）
+    chat_answer_cache_max_entries: int = 2000
+    chat_answer_cache_ttl_seconds: int = 604800
+    chat_answer_cache_similarity: float = 0.8
+
 
 settings = Settings()
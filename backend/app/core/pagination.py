@@ -0,0 +1,18 @@
+"""キーセットページネーションのカーソル
+
+(日時, ID) の降順で並べる一覧の次ページカーソルを "<日時ISO>_<ID>" の文字列で
+やり取りする。復習アイテム詳細一覧と模試履歴で共通の形式。
+"""
+import uuid
+from datetime import datetime
+
+
+def encode_cursor(timestamp: datetime, row_id: uuid.UUID) -> str:
+    """前ページ末尾の (日時, ID) からカーソルを作成"""
+    return f"{timestamp.isoformat()}_{row_id}"
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """encode_cursor の逆変換（不正な形式は ValueError）"""
+    timestamp, _, row_id = cursor.rpartition("_")
+    return datetime.fromisoformat(timestamp), uuid.UUID(row_id)
@@ -1,6 +1,9 @@
 """FastAPIアプリケーションのエントリーポイント"""
+import asyncio
 import logging
 import sys
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -11,6 +14,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import questions, answers, categories, stats, study_plan, mock_exam, review, chat
 from app.core.config import settings
 from app.core.database import get_db
+from app.services.anthropic_client import close_anthropic_client
+from app.services.llm_cache import close_llm_cache
+from app.services.pdf_process_pool import shutdown_pdf_process_pool
+from app.services.mock_exam_pool import run_pool_refiller
+from app.services.mock_exam_sweeper import run_exam_sweeper
 
 # ログ設定: appモジュール以下のログをINFOレベルで出力
 logging.basicConfig(
@@ -21,10 +29,31 @@ logging.basicConfig(
 # appモジュールのログレベルをINFOに設定
 logging.getLogger("app").setLevel(logging.INFO)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """バックグラウンドタスクの起動・停止"""
+    background_tasks: list[asyncio.Task] = []
+    if settings.mock_exam_pool_enabled:
+        background_tasks.append(asyncio.create_task(run_pool_refiller()))
+    if settings.mock_exam_sweeper_enabled:
+        background_tasks.append(asyncio.create_task(run_exam_sweeper()))
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await close_anthropic_client()
+    close_llm_cache()
+    shutdown_pdf_process_pool()
+
+
 app = FastAPI(
     title="E資格学習API",
     description="E資格学習アプリのバックエンドAPI",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS設定
@@ -40,6 +69,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # ページング情報をレスポンスヘッダーで返すエンドポイント用
+    expose_headers=["X-Total-Count", "X-Next-Cursor", "X-Conversation-Id"],
 )
 
 # ルーター登録
@@ -2,21 +2,30 @@
 from app.models.base import Base
 from app.models.answer import Answer
 from app.models.category import Category
+from app.models.chat_conversation import ChatConversation, ChatMessage
 from app.models.question import Question
 from app.models.question_image import QuestionImage
 from app.models.study_plan import StudyPlan, DailyGoal
 from app.models.mock_exam import MockExam, MockExamAnswer
+from app.models.mock_exam_analysis_cache import MockExamAnalysisCache
+from app.models.mock_exam_pool import MockExamPoolSet
+from app.models.mock_exam_score_bin import MockExamScoreBin
 from app.models.review_item import ReviewItem
 
 __all__ = [
     "Base",
     "Answer",
     "Category",
+    "ChatConversation",
+    "ChatMessage",
     "Question",
     "QuestionImage",
     "StudyPlan",
     "DailyGoal",
     "MockExam",
     "MockExamAnswer",
+    "MockExamAnalysisCache",
+    "MockExamPoolSet",
+    "MockExamScoreBin",
     "ReviewItem",
 ]
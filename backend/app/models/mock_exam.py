@@ -3,7 +3,17 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    text,
+)
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -14,6 +24,20 @@ class MockExam(Base):
     """模擬試験"""
 
     __tablename__ = "mock_exams"
+    __table_args__ = (
+        Index(
+            "ix_mock_exams_user_id_started_at_id",
+            "user_id",
+            text("started_at DESC"),
+            text("id DESC"),
+        ),
+        # 放置模試のスイープ用（終了済みの模試は含めない）
+        Index(
+            "ix_mock_exams_in_progress_started_at",
+            "started_at",
+            postgresql_where=text("status = 'in_progress'"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -28,6 +52,8 @@ class MockExam(Base):
     score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
     passed: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True)
     category_scores: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    topic_scores: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    analysis: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     ai_analysis: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     status: Mapped[str] = mapped_column(
         String(20), nullable=False, default="in_progress"
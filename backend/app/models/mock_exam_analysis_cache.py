@@ -0,0 +1,25 @@
+"""模試AI分析キャッシュモデル"""
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class MockExamAnalysisCache(Base):
+    """スコアプロファイル単位で共有するAI分析
+
+    profile には正規化したスコアプロファイル（分野別正答率の帯・合否・弱点トピック）を、
+    profile_key にはそのハッシュを保持する。
+    """
+
+    __tablename__ = "mock_exam_analysis_cache"
+
+    profile_key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    profile: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    ai_analysis: Mapped[str] = mapped_column(Text, nullable=False)
+    hit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
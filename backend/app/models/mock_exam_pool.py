@@ -0,0 +1,32 @@
+"""模試プールモデル"""
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class MockExamPoolSet(Base):
+    """事前組み立て済みの模試問題セット
+
+    payload には /start のレスポンスに必要な問題データをシリアライズして保持する。
+    question_fingerprint が現在の問題データと一致しないセットは
+    古いものとして破棄される。
+    """
+
+    __tablename__ = "mock_exam_pool_sets"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+    question_fingerprint: Mapped[str] = mapped_column(
+        String(32), nullable=False, index=True
+    )
+    total_questions: Mapped[int] = mapped_column(Integer, nullable=False)
+    payload: Mapped[list[dict]] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -0,0 +1,18 @@
+"""模試スコア分布モデル"""
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class MockExamScoreBin(Base):
+    """終了済み模試のスコア分布（固定幅ヒストグラムの1ビン）
+
+    area が OVERALL_AREA の行は総合スコア、それ以外は分野別正答率の分布。
+    """
+
+    __tablename__ = "mock_exam_score_bins"
+
+    area: Mapped[str] = mapped_column(String(255), primary_key=True)
+    bin: Mapped[int] = mapped_column(Integer, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
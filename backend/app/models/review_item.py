@@ -3,7 +3,16 @@ import uuid
 from datetime import datetime
 from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import (
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    text,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -21,6 +30,20 @@ class ReviewItem(Base):
         UniqueConstraint(
             "question_id", "user_id", name="uq_review_items_question_user"
         ),
+        # 復習期限が来たactiveアイテムの取得用
+        Index(
+            "ix_review_items_user_id_next_review_at",
+            "user_id",
+            "next_review_at",
+            postgresql_where=text("status = 'active'"),
+        ),
+        # 詳細一覧のキーセットページング用（最終回答日時の新しい順）
+        Index(
+            "ix_review_items_user_id_last_answered_at_id",
+            "user_id",
+            "last_answered_at",
+            "id",
+        ),
     )
 
     id: Mapped[uuid.UUID] = mapped_column(
@@ -49,6 +72,14 @@ class ReviewItem(Base):
     mastered_at: Mapped[Optional[datetime]] = mapped_column(
         DateTime, nullable=True, default=None
     )
+    # 間隔反復スケジュール
+    interval_days: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1
+    )
+    ease: Mapped[float] = mapped_column(Float, nullable=False, default=2.5)
+    next_review_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, nullable=True, default=None
+    )
 
     # リレーションシップ
     question: Mapped["Question"] = relationship("Question")
@@ -1,5 +1,7 @@
 """チャットスキーマ"""
-from typing import Literal
+import uuid
+from datetime import datetime
+from typing import Any, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -12,7 +14,56 @@ class ChatMessage(BaseModel):
 
 
 class ChatRequest(BaseModel):
-    """チャットリクエスト"""
+    """チャットリクエスト
+
+    conversation_id を指定すると、サーバーに保存した会話の続きとして扱う。
+    history は新しい会話を始めるときだけ既存の履歴として取り込む。
+    """
 
     message: str = Field(..., min_length=1)
+    conversation_id: Optional[uuid.UUID] = None
     history: list[ChatMessage] = []
+
+
+class ChatConversationMessage(BaseModel):
+    """保存済みの会話メッセージ"""
+
+    model_config = {"from_attributes": True}
+
+    role: str
+    content: str
+    created_at: datetime
+
+
+class ChatConversationResponse(BaseModel):
+    """保存済みの会話"""
+
+    id: uuid.UUID
+    question_id: uuid.UUID
+    summary: str
+    messages: list[ChatConversationMessage]
+
+
+class ChatGenerationInfo(BaseModel):
+    """生成中のチャット"""
+
+    id: str
+    question_id: Optional[str] = None
+    backend: str
+    started_at: datetime
+    age_seconds: float
+    chunk_count: int
+
+
+class ChatGenerationStatsResponse(BaseModel):
+    """生成中のチャットの監視情報"""
+
+    active_count: int
+    by_backend: dict[str, int]
+    oldest_age_seconds: float
+    completed_total: int
+    cancelled_total: int
+    failed_total: int
+    generations: list[ChatGenerationInfo]
+    answer_cache: dict[str, int] = {}
+    llm_cache: dict[str, Any] = {}
@@ -3,7 +3,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class MockExamStartRequest(BaseModel):
@@ -39,6 +39,15 @@ class MockExamAnswerResponse(BaseModel):
     is_correct: bool
 
 
+class MockExamBatchAnswerRequest(BaseModel):
+    answers: list[MockExamAnswerRequest] = Field(..., min_length=1)
+
+
+class MockExamBatchAnswerResponse(BaseModel):
+    results: list[MockExamAnswerResponse]
+    missing_indexes: list[int] = []
+
+
 class MockExamFinishRequest(BaseModel):
     user_id: str
 
@@ -49,6 +58,7 @@ class CategoryScoreDetail(BaseModel):
     correct: int
     accuracy: float
     grade: str
+    percentile: Optional[float] = None
 
 
 class MockExamResultResponse(BaseModel):
@@ -61,6 +71,7 @@ class MockExamResultResponse(BaseModel):
     score: float
     passed: Optional[bool]
     passing_threshold: float = 65.0
+    percentile: Optional[float] = None
     category_scores: list[CategoryScoreDetail]
     analysis: str
     ai_analysis: Optional[str]
@@ -79,8 +90,16 @@ class MockExamHistoryItem(BaseModel):
 class MockExamHistoryResponse(BaseModel):
     exams: list[MockExamHistoryItem]
     total_count: int
+    next_cursor: Optional[str] = None
 
 
 class AIAnalysisResponse(BaseModel):
     exam_id: uuid.UUID
     ai_analysis: str
+
+
+class AIAnalysisPendingResponse(BaseModel):
+    """AI分析をバックグラウンドで生成中（202）"""
+    exam_id: uuid.UUID
+    status: str = "pending"
+    poll_url: str
@@ -1,10 +1,40 @@
 """問題APIエンドポイント用のスキーマ"""
 import uuid
-from typing import Any
+from typing import Any, Optional
 
 from pydantic import BaseModel
 
 
+class ExtractionChunkStats(BaseModel):
+    """チャンクごとの問題抽出結果"""
+    model_config = {"from_attributes": True}
+
+    index: int
+    chars: int
+    latency_seconds: float
+    question_count: int
+    cached: bool = False
+    error: Optional[str] = None
+
+
+class ExtractionStats(BaseModel):
+    """問題抽出の所要時間とチャンクキャッシュのヒット率
+
+    serial_seconds は順に処理した場合の見積もり
+    """
+    model_config = {"from_attributes": True}
+
+    chunk_count: int = 0
+    cache_hits: int = 0
+    cache_hit_rate: float = 0.0
+    failed_chunks: int = 0
+    concurrency: int = 1
+    wall_seconds: float = 0.0
+    serial_seconds: float = 0.0
+    speedup: float = 1.0
+    chunks: list[ExtractionChunkStats] = []
+
+
 class ImportResponse(BaseModel):
     """PDFインポートレスポンス"""
     questions: list[dict[str, Any]]
@@ -14,6 +44,7 @@ class ImportResponse(BaseModel):
     image_filenames: list[str] = []
     questions_with_refs: int = 0
     sample_refs: list[str] = []
+    extraction: Optional[ExtractionStats] = None
 
 
 class CategoryUpdateRequest(BaseModel):
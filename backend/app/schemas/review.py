@@ -17,16 +17,38 @@ class ReviewItemResponse(BaseModel):
     first_wrong_at: datetime
     last_answered_at: datetime
     mastered_at: Optional[datetime] = None
+    interval_days: Optional[int] = None
+    ease: Optional[float] = None
+    next_review_at: Optional[datetime] = None
 
     model_config = {"from_attributes": True}
 
 
+class ReviewNextItemResponse(ReviewItemResponse):
+    """優先度付き復習アイテムレスポンス"""
+
+    priority: float
+    recall_probability: float
+
+
+class ReviewCategoryCount(BaseModel):
+    """カテゴリ別の復習アイテム数"""
+
+    category_id: uuid.UUID
+    category_name: str
+    active_count: int
+    mastered_count: int
+    due_today_count: int
+
+
 class ReviewStatsResponse(BaseModel):
     """復習統計レスポンス"""
 
     active_count: int
     mastered_count: int
     total_count: int
+    due_today_count: int = 0
+    category_counts: list[ReviewCategoryCount] = []
 
 
 class ReviewItemDetailResponse(ReviewItemResponse):
@@ -0,0 +1,74 @@
+"""Anthropic API共通クライアント
+
+接続プール付きの AsyncAnthropic クライアントをプロセス内で1つだけ作り、
+リクエスト間で HTTP 接続（TLS セッション）を使い回す。
+"""
+import logging
+from collections.abc import AsyncGenerator
+from typing import Optional, Union
+
+import httpx
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[AsyncAnthropic] = None
+
+
+def get_anthropic_client() -> AsyncAnthropic:
+    """共有クライアントを取得（初回呼び出し時に作成）"""
+    global _client
+    if _client is None:
+        # SDK既定のHTTPクライアント（TCP keepalive 等）に接続数の上限だけ指定する
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.chat_http_max_connections,
+                max_keepalive_connections=settings.chat_http_max_keepalive_connections,
+            ),
+        )
+        _client = AsyncAnthropic(
+            api_key=settings.anthropic_api_key,
+            base_url=settings.chat_api_base_url or None,
+            timeout=settings.chat_api_timeout_seconds,
+            http_client=http_client,
+        )
+    return _client
+
+
+async def close_anthropic_client() -> None:
+    """共有クライアントの接続プールを閉じる（アプリ終了時）"""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.close()
+
+
+async def stream_message_text(
+    system: Union[str, list[dict]],
+    messages: list[dict],
+    model: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+) -> AsyncGenerator[str, None]:
+    """Messages API のストリーミングでテキスト差分を順にyieldする
+
+    Args:
+        system: システムプロンプト（文字列、または cache_control 付きのブロック）
+        messages: 会話 [{role, content}]
+        model: モデル名（省略時は settings.chat_model）
+        max_tokens: 最大出力トークン数（省略時は settings.chat_max_tokens）
+
+    Yields:
+        テキストの差分
+    """
+    client = get_anthropic_client()
+    async with client.messages.stream(
+        model=model or settings.chat_model,
+        max_tokens=max_tokens or settings.chat_max_tokens,
+        system=system,
+        messages=messages,
+    ) as stream:
+        async for text in stream.text_stream:
+            if text:
+                yield text
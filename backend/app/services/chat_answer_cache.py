@@ -0,0 +1,229 @@
+"""問題チャットの回答キャッシュ
+
+同じ問題への「なぜBが間違い？」のような定番の質問は、会話の最初のメッセージで
+あれば回答も同じになる。正規化したメッセージを文字 n-gram のハッシュベクトルに
+埋め込み、同じ問題のキャッシュ済みメッセージとのコサイン類似度が
+settings.chat_answer_cache_similarity 以上なら保存済みの回答を返す。
+
+- 選択肢の記号などの英数字トークンと、否定・正誤・利点欠点などの極性を表す語は
+  完全一致も必要（「なぜBが」と「なぜCが」、「正解の理由」と「不正解の理由」を区別する。
+  n-gram の類似度だけでは1文字の否定を見分けられない）
+- プロセス内のキャッシュ（LRU、最大 settings.chat_answer_cache_max_entries 件）
+- settings.chat_answer_cache_ttl_seconds を過ぎたエントリは使わない
+- エントリは問題文・選択肢・正解・解説のハッシュと組で保存し、解説が変わると
+  別プロセスで再生成された場合でもヒットしない（再生成時は明示的にも破棄する）
+"""
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 埋め込みの次元数（文字 n-gram をハッシュで振り分ける）
+EMBEDDING_DIM = 1024
+# 使う文字 n-gram の長さ
+NGRAM_SIZES = (1, 2, 3)
+
+# 句読点・記号・空白は類似度に影響させない
+_IGNORED = re.compile(r"[\s\W_]+", re.UNICODE)
+# 意味を変えない文末表現（長いものから順に取り除く）
+_FILLER_SUFFIXES = (
+    "なのでしょうか", "でしょうか", "なのですか", "のですか", "ですか",
+    "ますか", "てください", "ください", "なの", "のか", "か",
+)
+# 選択肢の記号・数値・英単語（1文字違いで意味が変わるため完全一致を要求する）
+_KEY_TOKENS = re.compile(r"[a-z0-9]+")
+# 意味を反転させる語（否定・正誤・利点欠点・大小）
+# 含む語の組み合わせが一致する場合だけ比べる
+_POLARITY_MARKERS = (
+    "ない", "なく", "ません", "不", "未", "非", "無", "否",
+    "正し", "正解", "誤", "間違", "適切", "以外",
+    "利点", "欠点", "長所", "短所", "メリット", "デメリット", "強み", "弱み",
+    "以上", "以下", "未満", "超", "最大", "最小",
+    "大き", "小さ", "高", "低", "増", "減",
+)
+# 長い語から順に照合する（「デメリット」の中の「メリット」を拾わない）
+_POLARITY = re.compile(
+    "|".join(sorted(_POLARITY_MARKERS, key=len, reverse=True))
+)
+
+
+@dataclass(eq=False)
+class CachedAnswer:
+    """キャッシュ済みの回答1件"""
+    question_id: uuid.UUID
+    context_hash: str
+    normalized: str
+    tokens: frozenset[str]
+    vector: np.ndarray
+    answer: str
+    created_at: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+# (question_id, 正規化メッセージ) → CachedAnswer（末尾ほど最近使ったもの）
+_entries: "OrderedDict[tuple[uuid.UUID, str], CachedAnswer]" = OrderedDict()
+_question_keys: dict[uuid.UUID, set[tuple[uuid.UUID, str]]] = {}
+_stats = {"hits": 0, "misses": 0}
+
+
+def normalize_message(message: str) -> str:
+    """全角半角・大文字小文字を揃え、空白・記号・丁寧な文末表現を除く"""
+    text = _IGNORED.sub("", unicodedata.normalize("NFKC", message).lower())
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in _FILLER_SUFFIXES:
+            if text.endswith(suffix) and len(text) > len(suffix):
+                text = text[: -len(suffix)]
+                stripped = True
+                break
+    return text
+
+
+def key_tokens(normalized: str) -> frozenset[str]:
+    """完全一致が必要なトークン（選択肢の記号などの英数字と極性を表す語）"""
+    return frozenset(_KEY_TOKENS.findall(normalized) + _POLARITY.findall(normalized))
+
+
+def embed_message(normalized: str) -> np.ndarray:
+    """正規化済みメッセージの文字 n-gram ハッシュベクトル（L2正規化済み）"""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for n in NGRAM_SIZES:
+        for i in range(len(normalized) - n + 1):
+            digest = hashlib.blake2b(
+                normalized[i:i + n].encode(), digest_size=8
+            ).digest()
+            vector[int.from_bytes(digest, "little") % EMBEDDING_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def question_context_hash(
+    content: str,
+    choices: list[str],
+    correct_answer: int,
+    explanation: str,
+) -> str:
+    """回答の前提になる問題データのハッシュ"""
+    payload = "\x1f".join([content, *choices, str(correct_answer), explanation])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _remove(key: tuple[uuid.UUID, str]) -> None:
+    entry = _entries.pop(key, None)
+    if entry is None:
+        return
+    keys = _question_keys.get(entry.question_id)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del _question_keys[entry.question_id]
+
+
+def _is_expired(entry: CachedAnswer, now: float) -> bool:
+    return now - entry.created_at > settings.chat_answer_cache_ttl_seconds
+
+
+def lookup_answer(
+    question_id: uuid.UUID,
+    context_hash: str,
+    message: str,
+) -> Optional[str]:
+    """類似したメッセージのキャッシュ済み回答を探す
+
+    Returns:
+        回答テキスト。見つからなければNone
+    """
+    if settings.chat_answer_cache_max_entries <= 0:
+        return None
+
+    normalized = normalize_message(message)
+    tokens = key_tokens(normalized)
+    now = time.monotonic()
+    candidates: list[CachedAnswer] = []
+    for key in list(_question_keys.get(question_id, ())):
+        entry = _entries[key]
+        if entry.context_hash != context_hash or _is_expired(entry, now):
+            _remove(key)
+            continue
+        if entry.tokens == tokens:
+            candidates.append(entry)
+
+    # 期限切れ・解説変更のエントリは上で取り除いてあるので、残っていれば完全一致
+    best = _entries.get((question_id, normalized))
+    if best is None and candidates and normalized:
+        similarities = np.stack([c.vector for c in candidates]) @ embed_message(
+            normalized
+        )
+        index = int(np.argmax(similarities))
+        if similarities[index] >= settings.chat_answer_cache_similarity:
+            best = candidates[index]
+
+    if best is None:
+        _stats["misses"] += 1
+        return None
+
+    _stats["hits"] += 1
+    best.hits += 1
+    _entries.move_to_end((best.question_id, best.normalized))
+    logger.info(
+        f"Chat answer cache hit: question={question_id}, hits={best.hits}"
+    )
+    return best.answer
+
+
+def store_answer(
+    question_id: uuid.UUID,
+    context_hash: str,
+    message: str,
+    answer: str,
+) -> None:
+    """回答をキャッシュに保存し、上限を超えたら最も古く使われたものから捨てる"""
+    max_entries = settings.chat_answer_cache_max_entries
+    normalized = normalize_message(message)
+    if max_entries <= 0 or not normalized or not answer:
+        return
+
+    key = (question_id, normalized)
+    _remove(key)
+    _entries[key] = CachedAnswer(
+        question_id=question_id,
+        context_hash=context_hash,
+        normalized=normalized,
+        tokens=key_tokens(normalized),
+        vector=embed_message(normalized),
+        answer=answer,
+    )
+    _question_keys.setdefault(question_id, set()).add(key)
+    while len(_entries) > max_entries:
+        _remove(next(iter(_entries)))
+
+
+def invalidate_question_answers(question_id: uuid.UUID) -> None:
+    """問題のキャッシュ済み回答を破棄（解説の再生成時）"""
+    for key in list(_question_keys.get(question_id, ())):
+        _remove(key)
+
+
+def clear_answer_cache() -> None:
+    """キャッシュ全体を破棄"""
+    _entries.clear()
+    _question_keys.clear()
+    _stats["hits"] = 0
+    _stats["misses"] = 0
+
+
+def get_answer_cache_stats() -> dict[str, int]:
+    """キャッシュの件数とヒット数（監視用）"""
+    return {"entries": len(_entries), **_stats}
@@ -0,0 +1,233 @@
+"""問題チャットの会話履歴
+
+会話はサーバー側に保存し、クライアントは conversation_id だけを送る。
+プロンプトに含める直近のメッセージはトークン予算（settings.chat_history_token_budget）
+に収め、予算を超えた古いターンは抽出的な要約（各メッセージの冒頭文）に畳み込む。
+要約自体も settings.chat_summary_token_budget を超えたら古い行から捨てるため、
+1ターンあたりのプロンプトサイズは会話の長さによらずほぼ一定になる。
+"""
+import logging
+import math
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.chat_conversation import ChatConversation, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# 要約に残す1メッセージあたりの最大文字数
+SUMMARY_SNIPPET_CHARS = 120
+# 直近の何メッセージは予算を超えても要約しない（最新のやり取りは原文で渡す）
+MIN_RECENT_MESSAGES = 2
+
+_SENTENCE_END = re.compile(r"(?<=[。．！？!?])\s*|\n")
+
+
+@dataclass
+class ConversationContext:
+    """1ターン分のプロンプトに使う会話の状態"""
+    conversation_id: uuid.UUID
+    summary: str
+    history: list[dict]
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（ASCIIは4文字で1トークン、それ以外は1文字1トークン）"""
+    ascii_count = sum(1 for c in text if c.isascii())
+    return math.ceil(ascii_count / 4) + (len(text) - ascii_count)
+
+
+def _snippet(text: str) -> str:
+    """メッセージの冒頭文（空白を詰めて SUMMARY_SNIPPET_CHARS 文字まで）"""
+    first = next((s for s in _SENTENCE_END.split(text.strip()) if s.strip()), "")
+    first = " ".join(first.split())
+    if len(first) > SUMMARY_SNIPPET_CHARS:
+        first = first[:SUMMARY_SNIPPET_CHARS] + "…"
+    return first
+
+
+def summarize_messages(messages: Sequence[ChatMessage]) -> list[str]:
+    """メッセージを要約の行に変換"""
+    return [
+        f"{'ユーザー' if m.role == 'user' else 'アシスタント'}: {_snippet(m.content)}"
+        for m in messages
+    ]
+
+
+def trim_summary(lines: list[str], budget: int) -> list[str]:
+    """要約が予算を超えないよう古い行から捨てる"""
+    total = sum(estimate_tokens(line) for line in lines)
+    start = 0
+    while total > budget and start < len(lines):
+        total -= estimate_tokens(lines[start])
+        start += 1
+    return lines[start:]
+
+
+def compact_messages(
+    summary: str,
+    messages: Sequence[ChatMessage],
+    budget: int,
+    summary_budget: int,
+) -> tuple[str, int]:
+    """予算を超えた古いメッセージを要約に畳み込む
+
+    Args:
+        summary: 現在の要約
+        messages: 未要約のメッセージ（seq順）
+        budget: 直近メッセージのトークン予算
+        summary_budget: 要約のトークン予算
+
+    Returns:
+        (新しい要約, 要約に畳み込んだメッセージ数)
+    """
+    total = sum(m.token_count for m in messages)
+    folded = 0
+    while total > budget and len(messages) - folded > MIN_RECENT_MESSAGES:
+        total -= messages[folded].token_count
+        folded += 1
+    # ユーザーの質問と回答を分けないよう、回答の途中で切れたらその回答まで含める
+    while (
+        folded
+        and folded < len(messages) - 1
+        and messages[folded].role == "assistant"
+    ):
+        folded += 1
+    if not folded:
+        return summary, 0
+
+    lines = summary.splitlines() if summary else []
+    lines.extend(summarize_messages(messages[:folded]))
+    return "\n".join(trim_summary(lines, summary_budget)), folded
+
+
+def _new_message(
+    conversation: ChatConversation, role: str, content: str
+) -> ChatMessage:
+    """会話の末尾に追加するメッセージ（message_count を進める）"""
+    message = ChatMessage(
+        conversation_id=conversation.id,
+        seq=conversation.message_count,
+        role=role,
+        content=content,
+        token_count=estimate_tokens(content),
+    )
+    conversation.message_count += 1
+    conversation.updated_at = datetime.utcnow()
+    return message
+
+
+async def _lock_conversation(
+    db: AsyncSession, conversation_id: uuid.UUID
+) -> Optional[ChatConversation]:
+    result = await db.execute(
+        select(ChatConversation)
+        .where(ChatConversation.id == conversation_id)
+        .with_for_update()
+    )
+    return result.scalar_one_or_none()
+
+
+async def start_conversation_turn(
+    db: AsyncSession,
+    question_id: uuid.UUID,
+    conversation_id: Optional[uuid.UUID],
+    user_message: str,
+    seed_history: Optional[list[dict]] = None,
+) -> Optional[ConversationContext]:
+    """ユーザーのメッセージを保存し、プロンプト用の要約と直近の履歴を返す
+
+    conversation_id がなければ会話を新規作成する（seed_history があれば
+    それを既存の履歴として取り込む）。コミットは呼び出し側で行う。
+
+    Returns:
+        会話の状態。conversation_id の会話が存在しない・別の問題の会話の場合はNone
+    """
+    if conversation_id is not None:
+        conversation = await _lock_conversation(db, conversation_id)
+        if conversation is None or conversation.question_id != question_id:
+            return None
+    else:
+        conversation = ChatConversation(
+            id=uuid.uuid4(),
+            question_id=question_id,
+            summary="",
+            summarized_until=0,
+            message_count=0,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        )
+        db.add(conversation)
+        for msg in seed_history or []:
+            db.add(_new_message(conversation, msg["role"], msg["content"]))
+        await db.flush()
+
+    result = await db.execute(
+        select(ChatMessage)
+        .where(
+            ChatMessage.conversation_id == conversation.id,
+            ChatMessage.seq >= conversation.summarized_until,
+        )
+        .order_by(ChatMessage.seq)
+    )
+    recent = list(result.scalars().all())
+
+    summary, folded = compact_messages(
+        conversation.summary,
+        recent,
+        settings.chat_history_token_budget,
+        settings.chat_summary_token_budget,
+    )
+    if folded:
+        conversation.summary = summary
+        conversation.summarized_until = recent[folded].seq
+        recent = recent[folded:]
+
+    db.add(_new_message(conversation, "user", user_message))
+
+    return ConversationContext(
+        conversation_id=conversation.id,
+        summary=conversation.summary,
+        history=[{"role": m.role, "content": m.content} for m in recent],
+    )
+
+
+async def save_chat_reply(conversation_id: uuid.UUID, content: str) -> None:
+    """生成し終えたアシスタントの応答を会話に追加する（短いセッションで書き込む）"""
+    async with async_session_maker() as db:
+        conversation = await _lock_conversation(db, conversation_id)
+        if conversation is None:
+            return
+        db.add(_new_message(conversation, "assistant", content))
+        await db.commit()
+
+
+async def get_conversation_messages(
+    db: AsyncSession,
+    question_id: uuid.UUID,
+    conversation_id: uuid.UUID,
+) -> Optional[tuple[ChatConversation, list[ChatMessage]]]:
+    """会話と全メッセージ（要約済みも含む）を取得"""
+    result = await db.execute(
+        select(ChatConversation).where(
+            ChatConversation.id == conversation_id,
+            ChatConversation.question_id == question_id,
+        )
+    )
+    conversation = result.scalar_one_or_none()
+    if conversation is None:
+        return None
+    messages = await db.execute(
+        select(ChatMessage)
+        .where(ChatMessage.conversation_id == conversation_id)
+        .order_by(ChatMessage.seq)
+    )
+    return conversation, list(messages.scalars().all())
@@ -1,15 +1,65 @@
 """チャットサービス
 
-問題コンテキスト + 会話履歴からプロンプトを構築し、
-Claude CLIをストリーミング実行する。
+問題コンテキスト + 会話履歴からプロンプトを構築し、AIの応答をストリーミングする。
+
+- api: 共有の AsyncAnthropic クライアント（接続プール）で Messages API をストリーミング
+- cli: Claude CLI をリクエストごとに起動（APIキー未設定時・API失敗時のフォールバック）
+- 同時に生成するチャット数は settings.chat_max_concurrency で制限する
+- 生成中のチャットはレジストリで管理し、クライアント切断時は生成を中止する
 """
 import asyncio
 import json
 import logging
-from collections.abc import AsyncGenerator
+import time
+import uuid
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.question import Question
+from app.services.anthropic_client import stream_message_text
+from app.services.claude_cli import stream_claude_cli
 
 logger = logging.getLogger(__name__)
 
+CHAT_ERROR_EVENT = "data: [エラー] AI応答の生成に失敗しました\n\n"
+
+_chat_slots: Optional[asyncio.Semaphore] = None
+
+
+@dataclass(frozen=True)
+class QuestionSnapshot:
+    """チャットに必要な問題データ（DBセッションから切り離したコピー）"""
+    id: uuid.UUID
+    content: str
+    choices: list[str]
+    correct_answer: int
+    explanation: str
+
+
+@dataclass
+class ChatGeneration:
+    """生成中のチャット1件"""
+    id: str
+    question_id: Optional[str]
+    backend: str
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    started_monotonic: float = field(default_factory=time.monotonic)
+    chunk_count: int = 0
+
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.started_monotonic
+
+
+# 生成中のチャット（id → ChatGeneration）と終了件数
+_generations: dict[str, ChatGeneration] = {}
+_generation_totals = {"completed": 0, "cancelled": 0, "failed": 0}
+
 SYSTEM_CONTEXT_TEMPLATE = """あなたはE資格試験の学習を支援するAIチューターです。
 以下の問題とその解説に基づいて、ユーザーの追加質問に丁寧に回答してください。
 
@@ -33,6 +83,114 @@ SYSTEM_CONTEXT_TEMPLATE = """あなたはE資格試験の学習を支援するAI
 - Markdown形式で簡潔に回答する
 - 関連する概念の補足説明も適宜行う"""
 
+SUMMARY_TEMPLATE = """## これまでの会話の要約
+{summary}"""
+
+
+async def load_question_snapshot(
+    db: AsyncSession,
+    question_id: uuid.UUID,
+) -> Optional[QuestionSnapshot]:
+    """チャット用に問題を読み込み、ORMから切り離したスナップショットを返す
+
+    ストリーミング中はDBを使わないため、呼び出し側は読み込み後すぐに
+    セッションを閉じて接続をプールに返せる。
+    """
+    result = await db.execute(select(Question).where(Question.id == question_id))
+    question = result.scalar_one_or_none()
+    if question is None:
+        return None
+    return QuestionSnapshot(
+        id=question.id,
+        content=question.content,
+        choices=list(question.choices),
+        correct_answer=question.correct_answer,
+        explanation=question.explanation,
+    )
+
+
+def build_system_prompt(
+    question_content: str,
+    choices: list[str],
+    correct_answer: int,
+    explanation: str,
+) -> str:
+    """問題コンテキストのシステムプロンプトを構築する"""
+    choices_text = "\n".join(
+        f"{chr(65 + i)}. {choice}" for i, choice in enumerate(choices)
+    )
+    correct_label = f"{chr(65 + correct_answer)}. {choices[correct_answer]}"
+
+    return SYSTEM_CONTEXT_TEMPLATE.format(
+        content=question_content,
+        choices_text=choices_text,
+        correct_answer=correct_label,
+        explanation=explanation,
+    )
+
+
+def build_messages(history: list[dict], user_message: str) -> list[dict]:
+    """会話履歴 + 新しいメッセージを Messages API の messages に変換する
+
+    API は user から始まり user/assistant が交互に並ぶ必要があるため、
+    先頭の assistant は除き、同じ role が続く場合は1つにまとめる。
+    """
+    messages: list[dict] = []
+    for msg in [*history, {"role": "user", "content": user_message}]:
+        role = "assistant" if msg.get("role") == "assistant" else "user"
+        content = msg.get("content") or ""
+        if not content or (not messages and role == "assistant"):
+            continue
+        if messages and messages[-1]["role"] == role:
+            messages[-1]["content"] += f"\n\n{content}"
+        else:
+            messages.append({"role": role, "content": content})
+    return messages
+
+
+def build_system_blocks(
+    question_context: str,
+    summary: str = "",
+) -> list[dict]:
+    """Messages API の system ブロック
+
+    問題コンテキストは会話を通して変わらないためキャッシュ可能なプレフィックスにし、
+    ターンごとに変わる要約はその後ろに置く。
+    """
+    blocks: list[dict] = [
+        {
+            "type": "text",
+            "text": question_context,
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+    if summary:
+        blocks.append(
+            {"type": "text", "text": SUMMARY_TEMPLATE.format(summary=summary)}
+        )
+    return blocks
+
+
+def resolve_chat_backend() -> str:
+    """使用するバックエンド（"api" / "cli"）を決定する"""
+    backend = settings.chat_backend
+    if backend in ("api", "cli"):
+        return backend
+    return "api" if settings.anthropic_api_key else "cli"
+
+
+def _get_chat_slots() -> asyncio.Semaphore:
+    """同時生成数を制限するセマフォ（プロセス全体で共有）"""
+    global _chat_slots
+    if _chat_slots is None:
+        _chat_slots = asyncio.Semaphore(settings.chat_max_concurrency)
+    return _chat_slots
+
+
+def _sse(text: str) -> str:
+    """テキストをSSEイベントに変換（JSON encodeで改行を安全にエスケープ）"""
+    return f"data: {json.dumps(text, ensure_ascii=False)}\n\n"
+
 
 def build_prompt(
     question_content: str,
@@ -41,8 +199,9 @@ def build_prompt(
     explanation: str,
     history: list[dict],
     user_message: str,
+    summary: str = "",
 ) -> str:
-    """プロンプトを構築する
+    """CLI用のプロンプトを構築する（会話履歴もテキストとして埋め込む）
 
     Args:
         question_content: 問題文
@@ -51,21 +210,16 @@ def build_prompt(
         explanation: 解説テキスト
         history: 会話履歴 [{role, content}]
         user_message: ユーザーの新しいメッセージ
+        summary: 履歴より前の会話の要約
 
     Returns:
         構築されたプロンプト文字列
     """
-    choices_text = "\n".join(
-        f"{chr(65 + i)}. {choice}" for i, choice in enumerate(choices)
-    )
-    correct_label = f"{chr(65 + correct_answer)}. {choices[correct_answer]}"
-
-    context = SYSTEM_CONTEXT_TEMPLATE.format(
-        content=question_content,
-        choices_text=choices_text,
-        correct_answer=correct_label,
-        explanation=explanation,
+    context = build_system_prompt(
+        question_content, choices, correct_answer, explanation
     )
+    if summary:
+        context += "\n\n" + SUMMARY_TEMPLATE.format(summary=summary)
 
     # 会話履歴を追加
     conversation = ""
@@ -85,8 +239,12 @@ async def stream_chat_response(
     explanation: str,
     history: list[dict],
     user_message: str,
+    summary: str = "",
+    on_complete: Optional[Callable[[str], Awaitable[None]]] = None,
 ) -> AsyncGenerator[str, None]:
-    """Claude CLIを呼び出し、SSE形式でチャンクをyieldする
+    """AIの応答を生成し、SSE形式でチャンクをyieldする
+
+    api バックエンドが最初のチャンクを返す前に失敗した場合は CLI で生成し直す。
 
     Args:
         question_content: 問題文
@@ -95,60 +253,171 @@ async def stream_chat_response(
         explanation: 解説テキスト
         history: 会話履歴
         user_message: ユーザーの新しいメッセージ
+        summary: 履歴より前の会話の要約
+        on_complete: 生成し終えた応答全文を受け取るコールバック
+            （失敗・中断時は呼ばない）
 
     Yields:
         SSE形式のテキストチャンク ("data: {text}\\n\\n")
     """
-    prompt = build_prompt(
-        question_content=question_content,
-        choices=choices,
-        correct_answer=correct_answer,
-        explanation=explanation,
-        history=history,
-        user_message=user_message,
+    backend = resolve_chat_backend()
+    parts: list[str] = []
+
+    async with _get_chat_slots():
+        use_cli = backend != "api"
+        if not use_cli:
+            system = build_system_blocks(
+                build_system_prompt(
+                    question_content, choices, correct_answer, explanation
+                ),
+                summary,
+            )
+            try:
+                async for text in stream_message_text(
+                    system, build_messages(history, user_message)
+                ):
+                    parts.append(text)
+                    yield _sse(text)
+            except Exception as e:
+                if parts:
+                    logger.error(f"Chat streaming error (api): {e}")
+                    yield CHAT_ERROR_EVENT
+                    return
+                logger.warning(f"Anthropic APIでの生成に失敗、CLIにフォールバック: {e}")
+                use_cli = True
+
+        if use_cli:
+            prompt = build_prompt(
+                question_content=question_content,
+                choices=choices,
+                correct_answer=correct_answer,
+                explanation=explanation,
+                history=history,
+                user_message=user_message,
+                summary=summary,
+            )
+            logger.debug(f"Chat prompt length: {len(prompt)} chars")
+
+            try:
+                async for text in stream_claude_cli(prompt):
+                    parts.append(text)
+                    yield _sse(text)
+            except Exception as e:
+                logger.error(f"Chat streaming error: {e}")
+                yield CHAT_ERROR_EVENT
+                return
+
+    if on_complete is not None and parts:
+        await on_complete("".join(parts))
+
+
+async def replay_cached_answer(
+    answer: str,
+    on_complete: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> AsyncGenerator[str, None]:
+    """キャッシュ済みの回答をSSE形式でそのまま返す"""
+    yield _sse(answer)
+    if on_complete is not None:
+        await on_complete(answer)
+
+
+def get_chat_generation_stats() -> dict[str, Any]:
+    """生成中のチャットの件数・経過時間（監視用）"""
+    generations = sorted(
+        _generations.values(), key=lambda g: g.started_monotonic
     )
+    by_backend: dict[str, int] = {}
+    for generation in generations:
+        by_backend[generation.backend] = by_backend.get(generation.backend, 0) + 1
+    return {
+        "active_count": len(generations),
+        "by_backend": by_backend,
+        "oldest_age_seconds": generations[0].age_seconds() if generations else 0.0,
+        **{f"{key}_total": count for key, count in _generation_totals.items()},
+        "generations": [
+            {
+                "id": g.id,
+                "question_id": g.question_id,
+                "backend": g.backend,
+                "started_at": g.started_at,
+                "age_seconds": g.age_seconds(),
+                "chunk_count": g.chunk_count,
+            }
+            for g in generations
+        ],
+    }
 
-    logger.debug(f"Chat prompt length: {len(prompt)} chars")
 
-    try:
-        process = await asyncio.create_subprocess_exec(
-            "claude", "-p", prompt, "--output-format", "stream-json", "--verbose",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
+async def stream_until_disconnect(
+    stream: AsyncGenerator[str, None],
+    wait_for_disconnect: Callable[[], Awaitable[Any]],
+    question_id: Optional[str] = None,
+) -> AsyncGenerator[str, None]:
+    """生成をレジストリに登録して中継し、クライアントが切断したら中止する
 
-        # stdoutを行単位で読み取り、JSONパースしてテキストチャンクをyield
-        while True:
-            line = await process.stdout.readline()
-            if not line:
-                break
+    生成は別タスクで実行し、wait_for_disconnect が完了した時点でそのタスクを
+    キャンセルする（CLI プロセスの終了・API ストリームの切断は各ジェネレーターの
+    後始末で行われる）。
 
-            line_str = line.decode().strip()
-            if not line_str:
-                continue
+    Args:
+        stream: stream_chat_response などのSSEジェネレーター
+        wait_for_disconnect: クライアント切断まで待機するコルーチン関数
+        question_id: 監視用の問題ID
 
-            try:
-                data = json.loads(line_str)
-            except json.JSONDecodeError:
-                continue
+    Yields:
+        stream のチャンク
+    """
+    generation = ChatGeneration(
+        id=uuid.uuid4().hex,
+        question_id=question_id,
+        backend=resolve_chat_backend(),
+    )
+    queue: asyncio.Queue[str] = asyncio.Queue()
 
-            # stream-json --verbose形式: assistantイベントのcontentからテキスト抽出
-            if data.get("type") == "assistant" and "message" in data:
-                for block in data["message"].get("content", []):
-                    if block.get("type") == "text":
-                        text = block.get("text", "")
-                        if text:
-                            # JSON encodeで改行を安全にエスケープしてSSE送信
-                            yield f"data: {json.dumps(text, ensure_ascii=False)}\n\n"
-
-        await process.wait()
-
-        if process.returncode != 0:
-            stderr_text = await process.stderr.read()
-            error_msg = stderr_text.decode() if stderr_text else "不明なエラー"
-            logger.error(f"Claude CLI failed: {error_msg}")
-            yield f"data: [エラー] AI応答の生成に失敗しました\n\n"
-
-    except Exception as e:
-        logger.error(f"Chat streaming error: {e}")
-        yield f"data: [エラー] AI応答の生成に失敗しました\n\n"
+    async def pump() -> None:
+        async for chunk in stream:
+            await queue.put(chunk)
+
+    _generations[generation.id] = generation
+    producer = asyncio.create_task(pump())
+    disconnect = asyncio.create_task(wait_for_disconnect())
+    getter: Optional[asyncio.Task] = None
+    outcome = "cancelled"
+    try:
+        while True:
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait(
+                {getter, producer, disconnect},
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if getter in done:
+                generation.chunk_count += 1
+                yield getter.result()
+                continue
+            if disconnect in done:
+                return
+            # 生成が終わったら残りを送り切る
+            while not queue.empty():
+                generation.chunk_count += 1
+                yield queue.get_nowait()
+            outcome = "failed" if producer.exception() else "completed"
+            producer.result()
+            return
+    finally:
+        # 呼び出し側がキャンセルされた場合は以降の await も中断されうるため、
+        # 登録解除とタスクのキャンセルを先に済ませる
+        _generations.pop(generation.id, None)
+        _generation_totals[outcome] += 1
+        if outcome == "cancelled":
+            logger.info(
+                f"Chat generation {generation.id} cancelled "
+                f"({generation.age_seconds():.1f}s, {generation.chunk_count} chunks)"
+            )
+        for task in (getter, disconnect, producer):
+            if task is not None and not task.done():
+                task.cancel()
+        # 生成側の後始末（プロセス終了など）が終わるまで待つ。
+        # ここで再度キャンセルされても後始末自体は中断させない
+        await asyncio.shield(
+            asyncio.gather(producer, disconnect, return_exceptions=True)
+        )
@@ -3,10 +3,15 @@
 Claude Code CLIのsubprocess呼び出しを一元管理する
 """
 import asyncio
+import json
 import logging
+from collections.abc import AsyncGenerator
 
 logger = logging.getLogger(__name__)
 
+# 中断時に terminate してから kill するまでの猶予（秒）
+TERMINATE_TIMEOUT_SECONDS = 5.0
+
 
 class ClaudeCLIError(Exception):
     """Claude CLI呼び出しエラー"""
@@ -54,3 +59,80 @@ async def call_claude_cli(prompt: str) -> str:
 
     logger.debug(f"Claude CLI response length: {len(stdout_text)} chars")
     return stdout_text
+
+
+async def stream_claude_cli(prompt: str) -> AsyncGenerator[str, None]:
+    """
+    Claude Code CLIを stream-json 形式で実行し、テキストブロックを順にyieldする
+
+    途中でキャンセル・close された場合は CLI プロセスを終了させる。
+
+    Args:
+        prompt: 送信するプロンプト
+
+    Yields:
+        assistantイベントのテキスト
+
+    Raises:
+        ClaudeCLIError: CLIが異常終了した場合
+    """
+    logger.debug(f"Streaming Claude CLI with prompt length: {len(prompt)} chars")
+
+    process = await asyncio.create_subprocess_exec(
+        "claude", "-p", prompt, "--output-format", "stream-json", "--verbose",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    try:
+        # stdoutを行単位で読み取り、JSONパースしてテキストを取り出す
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                break
+
+            line_str = line.decode().strip()
+            if not line_str:
+                continue
+
+            try:
+                data = json.loads(line_str)
+            except json.JSONDecodeError:
+                continue
+
+            # stream-json --verbose形式: assistantイベントのcontentからテキスト抽出
+            if data.get("type") == "assistant" and "message" in data:
+                for block in data["message"].get("content", []):
+                    if block.get("type") == "text":
+                        text = block.get("text", "")
+                        if text:
+                            yield text
+
+        await process.wait()
+    finally:
+        # キャンセル・途中終了時はプロセスを残さない
+        if process.returncode is None:
+            await _terminate_process(process)
+
+    if process.returncode != 0:
+        stderr_text = await process.stderr.read()
+        error_msg = stderr_text.decode() if stderr_text else "不明なエラー"
+        logger.error(f"Claude CLI failed: {error_msg}")
+        raise ClaudeCLIError(
+            f"Claude CLI error (code={process.returncode}): {error_msg}"
+        )
+
+
+async def _terminate_process(process: asyncio.subprocess.Process) -> None:
+    """SIGTERM で終了を待ち、猶予を過ぎたら SIGKILL する"""
+    try:
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), TERMINATE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("Claude CLI did not exit after SIGTERM, killing")
+            process.kill()
+            await process.wait()
+    except ProcessLookupError:
+        pass
+    logger.info(f"Claude CLI terminated (pid={process.pid})")
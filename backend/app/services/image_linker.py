@@ -3,13 +3,12 @@ import logging
 import uuid
 from typing import Any, Optional
 
-from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from app.models.question import Question
 from app.models.question_image import QuestionImage
-from app.services.question_service import get_question_hash
+from app.services.question_service import get_question_hash, get_questions_by_hashes
 from app.services.image_matcher import ImageMatcherService
 from app.services.image_storage import ImageStorage
 from app.services.vlm_analyzer import VLMAnalyzer
@@ -17,6 +16,102 @@ from app.services.vlm_analyzer import VLMAnalyzer
 logger = logging.getLogger(__name__)
 
 
+async def insert_question_images(
+    db: AsyncSession,
+    rows: list[dict[str, Any]],
+) -> int:
+    """question_images の行をまとめて挿入
+
+    同じ問題・同じファイルパスの行が既にあればスキップする（uq_question_image_path）。
+
+    Args:
+        db: データベースセッション
+        rows: question_images の行の値のリスト
+
+    Returns:
+        挿入した行数
+    """
+    if not rows:
+        return 0
+    result = await db.execute(
+        pg_insert(QuestionImage)
+        .values(rows)
+        .on_conflict_do_nothing(constraint="uq_question_image_path")
+        .returning(QuestionImage.id)
+    )
+    inserted = len(result.all())
+    if inserted < len(rows):
+        logger.info(f"Skipped {len(rows) - inserted} duplicate images")
+    return inserted
+
+
+async def prepare_question_images(
+    question_id: uuid.UUID,
+    image_refs: list[str],
+    image_index: dict[str, dict[str, Any]],
+    vlm_analyzer: VLMAnalyzer,
+    image_storage: ImageStorage,
+) -> list[dict[str, Any]]:
+    """image_refsの画像を解析・保存し、question_images の行を作る
+
+    DBには書き込まない（insert_question_images でまとめて挿入する）。
+    見つからない・処理に失敗した画像はスキップする。
+
+    Args:
+        question_id: 問題ID
+        image_refs: 画像ファイル名のリスト
+        image_index: ファイル名→画像データの辞書
+        vlm_analyzer: VLM解析器
+        image_storage: 画像ストレージ
+
+    Returns:
+        question_images の行の値のリスト
+    """
+    rows: list[dict[str, Any]] = []
+    for pos, img_filename in enumerate(image_refs):
+        if img_filename not in image_index:
+            logger.warning(
+                f"Image not found: {img_filename} for question {question_id}"
+            )
+            continue
+
+        img_data = image_index[img_filename]["data"]
+        try:
+            # VLMで画像解析（タイムアウト時はNone）
+            vlm_result = await vlm_analyzer.analyze(
+                img_data, detect_type=True, fallback_on_error=True,
+            )
+
+            alt_text = None
+            image_type = "unknown"
+            if vlm_result:
+                alt_text = vlm_result.description
+                image_type = vlm_result.image_type
+
+            # 画像をファイルに保存
+            img_info = image_storage.save(
+                image_data=img_data,
+                question_id=question_id,
+                position=pos,
+                alt_text=alt_text,
+                image_type=image_type,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to process image {img_filename}: {e}")
+            continue
+
+        rows.append({
+            "id": img_info.id,
+            "question_id": question_id,
+            "file_path": img_info.file_path,
+            "alt_text": alt_text,
+            "position": pos,
+            "image_type": image_type,
+        })
+        logger.info(f"Prepared image {img_filename} for question {question_id}")
+    return rows
+
+
 async def link_images_by_semantic_matching(
     db: AsyncSession,
     questions: list[dict[str, Any]],
@@ -45,22 +140,19 @@ async def link_images_by_semantic_matching(
     logger.info("Starting semantic matching for image linking...")
 
     # Step 1: 画像にまだ紐付いていない問題を取得
-    questions_without_images: list[dict[str, Any]] = []
-    for q in questions:
-        # content_hashで問題を検索
-        content_hash = get_question_hash(q["content"])
-        result = await db.execute(
-            select(Question)
-            .options(selectinload(Question.images))
-            .where(Question.content_hash == content_hash)
-        )
-        existing_q = result.scalar_one_or_none()
-        if existing_q and len(existing_q.images) == 0:
-            questions_without_images.append({
-                "id": str(existing_q.id),
-                "content": existing_q.content,
-                "db_question": existing_q,
-            })
+    # content_hashで問題をまとめて検索
+    by_hash = await get_questions_by_hashes(
+        db, (get_question_hash(q["content"]) for q in questions)
+    )
+    questions_without_images: list[dict[str, Any]] = [
+        {
+            "id": str(existing_q.id),
+            "content": existing_q.content,
+            "db_question": existing_q,
+        }
+        for existing_q in by_hash.values()
+        if len(existing_q.images) == 0
+    ]
 
     if not questions_without_images:
         logger.info("All questions already have images linked")
@@ -108,11 +200,10 @@ async def link_images_by_semantic_matching(
         logger.warning(f"Semantic matching failed: {e}")
         return 0
 
-    # Step 4: マッチ結果で画像を紐付け
-    linked_count = 0
+    # Step 4: マッチ結果で画像を保存し、レコードはまとめて挿入
+    image_rows: list[dict[str, Any]] = []
     for q_info in questions_without_images:
         question_id = q_info["id"]
-        db_question = q_info["db_question"]
 
         if question_id not in matches:
             continue
@@ -132,39 +223,24 @@ async def link_images_by_semantic_matching(
                     image_type=caption_info["image_type"],
                 )
 
-                # 既存の同一画像レコードをチェック
-                existing_img = await db.execute(
-                    select(QuestionImage).where(
-                        QuestionImage.question_id == uuid.UUID(question_id),
-                        QuestionImage.file_path == img_info.file_path,
-                    )
-                )
-                if existing_img.scalar_one_or_none():
-                    logger.info(
-                        f"Skipping duplicate image {img_info.file_path} "
-                        f"for question {question_id}"
-                    )
-                    continue
-
-                # QuestionImageレコード作成
-                question_image = QuestionImage(
-                    id=img_info.id,
-                    question_id=uuid.UUID(question_id),
-                    file_path=img_info.file_path,
-                    alt_text=caption_info["caption"],
-                    position=pos,
-                    image_type=caption_info["image_type"],
-                )
-                db.add(question_image)
-                linked_count += 1
+                image_rows.append({
+                    "id": img_info.id,
+                    "question_id": uuid.UUID(question_id),
+                    "file_path": img_info.file_path,
+                    "alt_text": caption_info["caption"],
+                    "position": pos,
+                    "image_type": caption_info["image_type"],
+                })
                 logger.info(
-                    f"Linked image {caption_info['filename']} to question {question_id} "
+                    f"Matched image {caption_info['filename']} "
+                    f"to question {question_id} "
                     f"(score: {match['score']:.2f})"
                 )
             except Exception as e:
                 logger.warning(f"Failed to link image to question {question_id}: {e}")
                 continue
 
+    linked_count = await insert_question_images(db, image_rows)
     if linked_count > 0:
         await db.commit()
         logger.info(f"Linked {linked_count} images via semantic matching")
@@ -196,69 +272,11 @@ async def link_images_to_existing_question(
     Returns:
         紐付けられた画像数
     """
-    linked_count = 0
-    for pos, img_filename in enumerate(image_refs):
-        if img_filename not in image_index:
-            logger.warning(
-                f"Image not found: {img_filename} for existing question {question.id}"
-            )
-            continue
-
-        img_info_data = image_index[img_filename]
-        img_data = img_info_data["data"]
-
-        try:
-            vlm_result = await vlm_analyzer.analyze(
-                img_data, detect_type=True, fallback_on_error=True,
-            )
-
-            alt_text = None
-            image_type = "unknown"
-            if vlm_result:
-                alt_text = vlm_result.description
-                image_type = vlm_result.image_type
-
-            img_info = image_storage.save(
-                image_data=img_data,
-                question_id=question.id,
-                position=pos,
-                alt_text=alt_text,
-                image_type=image_type,
-            )
-
-            # 既存の同一画像レコードをチェック
-            existing_img = await db.execute(
-                select(QuestionImage).where(
-                    QuestionImage.question_id == question.id,
-                    QuestionImage.file_path == img_info.file_path,
-                )
-            )
-            if existing_img.scalar_one_or_none():
-                logger.info(
-                    f"Skipping duplicate image {img_info.file_path} "
-                    f"for existing question {question.id}"
-                )
-                continue
-
-            question_image = QuestionImage(
-                id=img_info.id,
-                question_id=question.id,
-                file_path=img_info.file_path,
-                alt_text=alt_text,
-                position=pos,
-                image_type=image_type,
-            )
-            db.add(question_image)
-            linked_count += 1
-            logger.info(
-                f"Linked image {img_filename} to existing question {question.id}"
-            )
-        except Exception as e:
-            logger.warning(f"Failed to link image {img_filename} to existing question: {e}")
-            continue
-
+    rows = await prepare_question_images(
+        question.id, image_refs, image_index, vlm_analyzer, image_storage,
+    )
+    linked_count = await insert_question_images(db, rows)
     if linked_count > 0:
-        await db.flush()
         logger.info(f"Linked {linked_count} images to existing question {question.id}")
 
     return linked_count
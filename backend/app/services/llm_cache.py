@@ -0,0 +1,219 @@
+"""LLM応答のローカルキャッシュ
+
+Claude CLI などの LLM 呼び出しの結果を1つの SQLite ファイル（WAL モード）に
+保存する。値は JSON を zlib で圧縮して格納し、合計サイズが
+settings.llm_cache_max_bytes を超えたら最後に使われた日時の古いものから捨てる（LRU）。
+
+- サービスごとに namespace を分けて使う（例: "pdf_extraction"）
+- エントリごとに作成日時・最終利用日時・ヒット数を記録する
+- SQLite の呼び出しはブロッキングなのでスレッドで実行し、イベントループを止めない
+- WAL モードのため複数ワーカーから同時に読み書きできる
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = (
+    Path(__file__).parent.parent.parent / ".cache" / "llm_cache.sqlite3"
+)
+# zlib の圧縮レベル（JSONテキストは6程度で十分縮む）
+COMPRESSION_LEVEL = 6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at);
+"""
+
+_UPSERT = """
+INSERT INTO entries (namespace, key, value, size, created_at, accessed_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (namespace, key) DO UPDATE SET
+    value = excluded.value,
+    size = excluded.size,
+    created_at = excluded.created_at,
+    accessed_at = excluded.accessed_at
+"""
+
+# 最近使われたものから累積サイズを数え、上限を超えた分を削除する
+_EVICT = """
+DELETE FROM entries WHERE rowid IN (
+    SELECT rowid FROM (
+        SELECT rowid, SUM(size) OVER (
+            ORDER BY accessed_at DESC, rowid DESC
+        ) AS kept
+        FROM entries
+    ) WHERE kept > ?
+)
+"""
+
+
+class LLMCache:
+    """namespace 付きのキーバリューストア（SQLite）"""
+
+    def __init__(self, path: Path, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._hits = 0
+        self._misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "UPDATE entries SET accessed_at = ?, hits = hits + 1 "
+                "WHERE namespace = ? AND key = ? RETURNING value",
+                (time.time(), namespace, key),
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def _set(self, namespace: str, key: str, value: Any) -> None:
+        blob = zlib.compress(
+            json.dumps(value, ensure_ascii=False).encode(), COMPRESSION_LEVEL
+        )
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(_UPSERT, (namespace, key, blob, len(blob), now, now))
+                evicted = conn.execute(_EVICT, (self.max_bytes,)).rowcount
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if evicted:
+            logger.info(
+                f"LLM cache evicted {evicted} entries (max {self.max_bytes} bytes)"
+            )
+
+    def _clear(self, namespace: Optional[str]) -> int:
+        with self._lock:
+            conn = self._connect()
+            if namespace is None:
+                return conn.execute("DELETE FROM entries").rowcount
+            return conn.execute(
+                "DELETE FROM entries WHERE namespace = ?", (namespace,)
+            ).rowcount
+
+    def _stats(self) -> dict[str, Any]:
+        with self._lock:
+            conn = self._connect()
+            namespaces = {
+                row[0]: {
+                    "entries": row[1],
+                    "bytes": row[2],
+                    "hits": row[3],
+                    "oldest_access": row[4],
+                    "newest_access": row[5],
+                }
+                for row in conn.execute(
+                    "SELECT namespace, COUNT(*), SUM(size), SUM(hits), "
+                    "MIN(accessed_at), MAX(accessed_at) "
+                    "FROM entries GROUP BY namespace ORDER BY namespace"
+                )
+            }
+            return {
+                "entries": sum(n["entries"] for n in namespaces.values()),
+                "bytes": sum(n["bytes"] for n in namespaces.values()),
+                "max_bytes": self.max_bytes,
+                "session_hits": self._hits,
+                "session_misses": self._misses,
+                "namespaces": namespaces,
+            }
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        """値を取得（最終利用日時とヒット数を更新）。なければNone"""
+        try:
+            return await asyncio.to_thread(self._get, namespace, key)
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            logger.warning(f"Failed to read LLM cache {namespace}/{key}: {e}")
+            return None
+
+    async def set(self, namespace: str, key: str, value: Any) -> None:
+        """値を保存し、上限を超えたら古く使われたものから削除する"""
+        try:
+            await asyncio.to_thread(self._set, namespace, key, value)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write LLM cache {namespace}/{key}: {e}")
+
+    async def clear(self, namespace: Optional[str] = None) -> int:
+        """namespace（省略時は全体）のエントリを削除し、削除件数を返す"""
+        return await asyncio.to_thread(self._clear, namespace)
+
+    async def stats(self) -> dict[str, Any]:
+        """件数・サイズ・ヒット数と namespace ごとの最終利用日時（監視用）
+
+        読み込みに失敗した場合は空の dict を返す。
+        """
+        try:
+            return await asyncio.to_thread(self._stats)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read LLM cache stats: {e}")
+            return {}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    """共有キャッシュを取得（初回呼び出し時に作成）"""
+    global _cache
+    if _cache is None:
+        path = (
+            Path(settings.llm_cache_path)
+            if settings.llm_cache_path
+            else DEFAULT_CACHE_PATH
+        )
+        _cache = LLMCache(path, settings.llm_cache_max_bytes)
+    return _cache
+
+
+def close_llm_cache() -> None:
+    """共有キャッシュの接続を閉じる（アプリ終了時）"""
+    global _cache
+    if _cache is not None:
+        cache, _cache = _cache, None
+        cache.close()
@@ -8,13 +8,14 @@ import importlib.util
 import logging
 import tempfile
 from dataclasses import dataclass, field
-from io import BytesIO
 from pathlib import Path
 from typing import Optional
 
 import pymupdf
 
 from app.services.image_converter import ImageConverter
+from app.services.pdf_extractor import count_pdf_pages, extract_page_texts
+from app.services.pdf_process_pool import PdfSource, map_page_ranges, pdf_source_size
 
 logger = logging.getLogger(__name__)
 
@@ -87,6 +88,60 @@ class MinerUExtractionResult:
         }
 
 
+def _open_document(source: PdfSource) -> pymupdf.Document:
+    """PyMuPDFでPDFを開く（バイト列またはファイルパス）"""
+    if isinstance(source, bytes):
+        return pymupdf.open(stream=source, filetype="pdf")
+    return pymupdf.open(str(source), filetype="pdf")
+
+
+def count_pymupdf_pages(source: PdfSource) -> int:
+    """PDFのページ数（プロセスプールで実行）"""
+    doc = _open_document(source)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def extract_page_images(
+    source: PdfSource,
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> list[tuple[int, int, Optional[bytes]]]:
+    """ページ範囲の画像をPyMuPDFで抽出する（プロセスプール・スレッドで実行）
+
+    範囲内で同一xrefの画像は1回だけ抽出する。
+
+    Returns:
+        画像ごとの (ページ番号, xref, PNGデータ（抽出失敗時はNone）)
+    """
+    doc = _open_document(source)
+    try:
+        pages = doc if start == 0 and stop is None else doc.pages(start, stop)
+        results: list[tuple[int, int, Optional[bytes]]] = []
+        seen_xrefs: set[int] = set()
+        for page in pages:
+            for img_info in page.get_images(full=True):
+                xref = img_info[0]
+
+                # 同一xrefの画像を重複抽出しない
+                if xref in seen_xrefs:
+                    logger.debug(
+                        f"Skipping duplicate xref={xref} on page {page.number}"
+                    )
+                    continue
+                seen_xrefs.add(xref)
+
+                # より堅牢な抽出メソッドを使用
+                results.append(
+                    (page.number, xref, ImageConverter.extract_image_robust(doc, xref))
+                )
+        return results
+    finally:
+        doc.close()
+
+
 class MinerUExtractor:
     """MinerU PDFレイアウト解析クラス
 
@@ -112,11 +167,11 @@ class MinerUExtractor:
         """
         return importlib.util.find_spec("magic_pdf") is not None
 
-    async def _run_mineru(self, pdf_data: bytes) -> MinerUExtractionResult:
+    async def _run_mineru(self, pdf_data: PdfSource) -> MinerUExtractionResult:
         """MinerUを実行してPDFを処理
 
         Args:
-            pdf_data: PDFバイナリデータ
+            pdf_data: PDFバイナリデータまたはファイルパス
 
         Returns:
             抽出結果
@@ -141,9 +196,11 @@ class MinerUExtractor:
                 output_path = temp_path / "output"
                 output_path.mkdir()
 
-                # PDFを一時ファイルに書き込み
-                with open(input_path, "wb") as f:
-                    f.write(pdf_data)
+                # PDFを一時ファイルに書き込み（ファイルならコピーせずリンクする）
+                if isinstance(pdf_data, bytes):
+                    input_path.write_bytes(pdf_data)
+                else:
+                    input_path.symlink_to(Path(pdf_data).resolve())
 
                 # MinerUで処理（非同期で実行）
                 def run_extraction():
@@ -204,29 +261,24 @@ class MinerUExtractor:
             logger.error(f"MinerU extraction failed: {e}")
             raise MinerUError(f"MinerU extraction failed: {e}") from e
 
-    async def _fallback_pypdf(self, pdf_data: bytes) -> MinerUExtractionResult:
+    async def _fallback_pypdf(self, pdf_data: PdfSource) -> MinerUExtractionResult:
         """pypdfにフォールバックしてテキスト抽出
 
         テキストはpypdfで抽出し、画像はPyMuPDFで抽出する。
+        どちらもイベントループの外（大きいPDFはプロセスプール）で実行する。
 
         Args:
-            pdf_data: PDFバイナリデータ
+            pdf_data: PDFバイナリデータまたはファイルパス
 
         Returns:
             抽出結果
         """
-        from pypdf import PdfReader
-
         try:
-            reader = PdfReader(BytesIO(pdf_data))
-            text_parts = []
-
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
-
-            markdown = "\n\n".join(text_parts)
+            pages = await map_page_ranges(extract_page_texts, count_pdf_pages, pdf_data)
+            for i, _, error in pages:
+                if error:
+                    logger.warning(f"Page {i + 1} extraction failed: {error}")
+            markdown = "\n\n".join(text for _, text, _ in pages if text)
 
             # PyMuPDFで画像抽出（DeviceN/CMYK対応）
             images = await self._extract_images_with_fallback(pdf_data)
@@ -235,7 +287,7 @@ class MinerUExtractor:
                 markdown=markdown,
                 images=images,
                 metadata={
-                    "page_count": len(reader.pages),
+                    "page_count": len(pages),
                     "image_count": len(images),
                     "fallback": True,
                 },
@@ -245,7 +297,7 @@ class MinerUExtractor:
 
     async def _extract_images_with_fallback(
         self,
-        pdf_data: bytes,
+        pdf_data: PdfSource,
     ) -> list[ExtractedImage]:
         """PyMuPDFを使用して画像を抽出する
 
@@ -253,7 +305,7 @@ class MinerUExtractor:
         抽出に失敗した画像はスキップして継続する。
 
         Args:
-            pdf_data: PDFバイナリデータ
+            pdf_data: PDFバイナリデータまたはファイルパス
 
         Returns:
             抽出された画像のリスト
@@ -261,50 +313,40 @@ class MinerUExtractor:
         images: list[ExtractedImage] = []
 
         try:
-            doc = pymupdf.open(stream=pdf_data, filetype="pdf")
-            position = 0
-            seen_xrefs: set[int] = set()
-
-            for page in doc:
-                page_images = page.get_images(full=True)
-
-                for img_info in page_images:
-                    xref = img_info[0]
-
-                    # 同一xrefの画像を重複抽出しない
-                    if xref in seen_xrefs:
-                        logger.debug(f"Skipping duplicate xref={xref} on page {page.number}")
-                        continue
-                    seen_xrefs.add(xref)
-
-                    # より堅牢な抽出メソッドを使用
-                    data = ImageConverter.extract_image_robust(doc, xref)
-
-                    if data is not None:
-                        # MinerUと同じ命名規則で画像紐付けを可能にする
-                        images.append(ExtractedImage(
-                            filename=f"image_{position}.png",
-                            data=data,
-                            page_number=page.number,
-                            position=position,
-                        ))
-                        position += 1
-                    else:
-                        logger.warning(
-                            f"Skipped image xref={xref} on page {page.number}"
-                        )
-
-            doc.close()
-            logger.info(f"Fallback extracted {len(images)} images")
-
+            page_images = await map_page_ranges(
+                extract_page_images, count_pymupdf_pages, pdf_data
+            )
         except Exception as e:
             logger.error(f"Fallback image extraction failed: {e}")
-
+            return images
+
+        # ページ範囲をまたぐ同一xrefは最初のページのものだけ使う
+        position = 0
+        seen_xrefs: set[int] = set()
+        for page_number, xref, data in page_images:
+            if xref in seen_xrefs:
+                logger.debug(f"Skipping duplicate xref={xref} on page {page_number}")
+                continue
+            seen_xrefs.add(xref)
+
+            if data is not None:
+                # MinerUと同じ命名規則で画像紐付けを可能にする
+                images.append(ExtractedImage(
+                    filename=f"image_{position}.png",
+                    data=data,
+                    page_number=page_number,
+                    position=position,
+                ))
+                position += 1
+            else:
+                logger.warning(f"Skipped image xref={xref} on page {page_number}")
+
+        logger.info(f"Fallback extracted {len(images)} images")
         return images
 
     async def extract(
         self,
-        pdf_data: bytes,
+        pdf_data: PdfSource,
         fallback_on_error: bool = False,
     ) -> MinerUExtractionResult:
         """PDFからテキストと画像を抽出
@@ -313,7 +355,8 @@ class MinerUExtractor:
         DeviceN/CMYKカラースペースの画像もRGBに変換して抽出。
 
         Args:
-            pdf_data: PDFバイナリデータ
+            pdf_data: PDFバイナリデータまたはファイルパス
+              （大きいPDFはパスで渡すとメモリに読み込まずに済む）
             fallback_on_error: エラー時にpypdfにフォールバックするか
 
         Returns:
@@ -323,7 +366,7 @@ class MinerUExtractor:
             MinerUError: 抽出エラー
             MinerUNotAvailableError: MinerUが利用不可（fallback_on_error=False時）
         """
-        if not pdf_data:
+        if not pdf_source_size(pdf_data):
             raise MinerUError("Empty PDF data provided")
 
         try:
@@ -362,14 +405,14 @@ class MinerUExtractor:
 
 
 async def extract_pdf_with_layout(
-    pdf_data: bytes,
+    pdf_data: PdfSource,
     timeout: int = DEFAULT_TIMEOUT,
     fallback_on_error: bool = True,
 ) -> MinerUExtractionResult:
     """PDFからレイアウトを保持して抽出するヘルパー関数
 
     Args:
-        pdf_data: PDFバイナリデータ
+        pdf_data: PDFバイナリデータまたはファイルパス
         timeout: タイムアウト（秒）
         fallback_on_error: エラー時にpypdfにフォールバックするか
 
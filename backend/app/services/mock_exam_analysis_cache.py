@@ -0,0 +1,226 @@
+"""模試AI分析のキャッシュとバックグラウンド生成
+
+AI分析はスコアの細かな差ではほぼ変わらないため、分野別正答率を帯に丸めた
+「スコアプロファイル」単位で生成結果を共有する。
+キャッシュにない場合の生成は模試ごとに1本だけ走らせ（single-flight）、
+同じ模試への同時リクエストはその完了を待つ。
+生成に失敗した模試は FAILED_STATUS_TTL_SECONDS の間だけ失敗として記録し、
+ポーリングに失敗を返す。
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.mock_exam import MockExam
+from app.models.mock_exam_analysis_cache import MockExamAnalysisCache
+from app.services.mock_exam_config import PASSING_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+# 分野別正答率を丸める幅（%）
+ACCURACY_BUCKET_WIDTH = 10
+# プロファイルに含める弱点トピック数
+WEAK_TOPIC_COUNT = 3
+# 生成の失敗をポーリングに返す期間（秒）
+FAILED_STATUS_TTL_SECONDS = 600.0
+
+# 生成中のAI分析（模試ID → タスク）
+_inflight: dict[uuid.UUID, "asyncio.Task[Optional[str]]"] = {}
+# 生成に失敗したAI分析（模試ID → 失敗時刻、失敗時刻の古い順）
+_failed: dict[uuid.UUID, float] = {}
+
+
+def build_score_profile(
+    passed: bool,
+    category_scores: dict[str, dict[str, Any]],
+    topic_scores: Optional[dict[str, dict[str, Any]]] = None,
+) -> dict[str, Any]:
+    """スコアを正規化したプロファイルを作成
+
+    - 分野別正答率は ACCURACY_BUCKET_WIDTH 刻みの帯に丸める
+    - 弱点トピックは合格ライン未満のうち正答率の低い順に WEAK_TOPIC_COUNT 件
+    """
+    areas = {
+        area: int(detail.get("accuracy", 0.0) // ACCURACY_BUCKET_WIDTH)
+        * ACCURACY_BUCKET_WIDTH
+        for area, detail in category_scores.items()
+    }
+
+    weak_topics: list[str] = []
+    if topic_scores:
+        below = [
+            (detail.get("accuracy", 0.0), topic)
+            for topic, detail in topic_scores.items()
+            if detail.get("accuracy", 0.0) < PASSING_THRESHOLD
+        ]
+        weak_topics = [topic for _, topic in sorted(below)[:WEAK_TOPIC_COUNT]]
+
+    return {
+        "passed": passed,
+        "areas": dict(sorted(areas.items())),
+        "weak_topics": weak_topics,
+    }
+
+
+def score_profile_key(profile: dict[str, Any]) -> str:
+    """プロファイルのキャッシュキー（SHA-256）"""
+    encoded = json.dumps(profile, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+async def get_cached_analysis(
+    db: AsyncSession,
+    profile: dict[str, Any],
+) -> Optional[str]:
+    """プロファイルに一致するAI分析を取得（ヒット数・最終利用日時も更新）"""
+    if not settings.mock_exam_ai_analysis_cache_enabled:
+        return None
+
+    result = await db.execute(
+        update(MockExamAnalysisCache)
+        .where(MockExamAnalysisCache.profile_key == score_profile_key(profile))
+        .values(
+            hit_count=MockExamAnalysisCache.hit_count + 1,
+            last_used_at=datetime.utcnow(),
+        )
+        .returning(MockExamAnalysisCache.ai_analysis)
+    )
+    return result.scalar_one_or_none()
+
+
+async def save_ai_analysis(
+    exam_id: uuid.UUID,
+    profile: dict[str, Any],
+    ai_analysis: str,
+) -> None:
+    """生成したAI分析を模試とキャッシュに保存
+
+    リクエストのセッションとは独立したセッションで書き込むため、
+    クライアントが切断しても生成結果は保存される。
+    """
+    now = datetime.utcnow()
+    async with async_session_maker() as db:
+        await db.execute(
+            update(MockExam)
+            .where(MockExam.id == exam_id)
+            .values(ai_analysis=ai_analysis)
+        )
+        if settings.mock_exam_ai_analysis_cache_enabled:
+            await db.execute(
+                pg_insert(MockExamAnalysisCache)
+                .values(
+                    profile_key=score_profile_key(profile),
+                    profile=profile,
+                    ai_analysis=ai_analysis,
+                    hit_count=0,
+                    created_at=now,
+                    last_used_at=now,
+                )
+                .on_conflict_do_nothing(index_elements=["profile_key"])
+            )
+        await db.commit()
+
+
+async def _generate_and_save(
+    exam_id: uuid.UUID,
+    profile: dict[str, Any],
+    generate: Callable[[], Awaitable[Optional[str]]],
+) -> Optional[str]:
+    ai_analysis = await generate()
+    if not ai_analysis:
+        return None
+    try:
+        await save_ai_analysis(exam_id, profile, ai_analysis)
+    except Exception as e:
+        logger.error(f"AI分析の保存に失敗 (exam_id={exam_id}): {e}")
+    return ai_analysis
+
+
+def _record_failure(exam_id: uuid.UUID) -> None:
+    """生成の失敗を記録し、期限切れの記録を古い順に捨てる"""
+    now = time.monotonic()
+    # 記録し直す場合も末尾に移し、失敗時刻の順序を保つ
+    _failed.pop(exam_id, None)
+    _failed[exam_id] = now
+    while True:
+        oldest_id, failed_at = next(iter(_failed.items()))
+        if now - failed_at < FAILED_STATUS_TTL_SECONDS:
+            break
+        del _failed[oldest_id]
+
+
+def _on_generation_done(
+    exam_id: uuid.UUID,
+    task: "asyncio.Task[Optional[str]]",
+) -> None:
+    """生成タスクの完了処理（生成中から外し、失敗を記録）"""
+    _inflight.pop(exam_id, None)
+    if task.cancelled():
+        logger.warning(f"AI分析の生成がキャンセルされました (exam_id={exam_id})")
+        _record_failure(exam_id)
+        return
+
+    error = task.exception()
+    if error is not None:
+        logger.error(
+            f"AI分析の生成に失敗 (exam_id={exam_id}): {error}",
+            exc_info=error,
+        )
+        _record_failure(exam_id)
+    elif not task.result():
+        logger.warning(f"AI分析を生成できませんでした (exam_id={exam_id})")
+        _record_failure(exam_id)
+
+
+def start_ai_analysis(
+    exam_id: uuid.UUID,
+    profile: dict[str, Any],
+    generate: Callable[[], Awaitable[Optional[str]]],
+) -> "asyncio.Task[Optional[str]]":
+    """AI分析の生成を開始（同じ模試で生成中ならそのタスクを返す）
+
+    Args:
+        exam_id: 模試ID
+        profile: build_score_profile で作成したプロファイル
+        generate: AI分析を生成するコルーチン関数（失敗時はNoneを返す）
+
+    Returns:
+        生成結果（失敗時はNone）を返すタスク
+    """
+    task = _inflight.get(exam_id)
+    if task is not None:
+        return task
+
+    # 再生成を始めたら以前の失敗は消す
+    _failed.pop(exam_id, None)
+    task = asyncio.create_task(_generate_and_save(exam_id, profile, generate))
+    _inflight[exam_id] = task
+    task.add_done_callback(lambda done: _on_generation_done(exam_id, done))
+    return task
+
+
+def is_ai_analysis_pending(exam_id: uuid.UUID) -> bool:
+    """模試のAI分析を生成中か"""
+    return exam_id in _inflight
+
+
+def is_ai_analysis_failed(exam_id: uuid.UUID) -> bool:
+    """模試のAI分析の直近の生成が失敗したか（FAILED_STATUS_TTL_SECONDS 以内）"""
+    failed_at = _failed.get(exam_id)
+    if failed_at is None:
+        return False
+    if time.monotonic() - failed_at >= FAILED_STATUS_TTL_SECONDS:
+        _failed.pop(exam_id, None)
+        return False
+    return True
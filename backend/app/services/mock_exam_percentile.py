@@ -0,0 +1,162 @@
+"""模試スコアのパーセンタイル算出
+
+終了済み模試の総合スコア・分野別正答率を 1% 幅の固定ビンで数えたヒストグラム
+（mock_exam_score_bins）を模試終了時に加算しておき、パーセンタイルは
+ビン数（BIN_COUNT）に比例する計算で求める。模試件数には依存しない。
+"""
+from collections import defaultdict
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.mock_exam import MockExam
+from app.models.mock_exam_score_bin import MockExamScoreBin
+
+# 総合スコアの分布に使う area 値
+OVERALL_AREA = "__overall__"
+# 0〜100% を 1% 幅で区切る（100% は独立したビン）
+BIN_COUNT = 101
+# 再構築時に一度に読み込む模試数
+REBUILD_BATCH_SIZE = 1000
+
+
+def score_bin(score: float) -> int:
+    """スコア（%）をビン番号に変換"""
+    return min(max(int(score), 0), BIN_COUNT - 1)
+
+
+def _exam_bins(
+    score: float,
+    category_scores: Optional[dict[str, dict[str, Any]]],
+) -> list[tuple[str, int]]:
+    """1回の模試が加算される (area, bin) の一覧"""
+    bins = [(OVERALL_AREA, score_bin(score))]
+    for area, detail in (category_scores or {}).items():
+        bins.append((area, score_bin(detail.get("accuracy", 0.0))))
+    return bins
+
+
+async def record_exam_scores(
+    db: AsyncSession,
+    score: float,
+    category_scores: Optional[dict[str, dict[str, Any]]],
+) -> None:
+    """終了した模試のスコアを分布に加算（1文のUPSERT）"""
+    stmt = pg_insert(MockExamScoreBin).values(
+        [
+            {"area": area, "bin": bin_, "count": 1}
+            # 同時に終了した模試同士でロック順序を揃える
+            for area, bin_ in sorted(_exam_bins(score, category_scores))
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["area", "bin"],
+        set_={"count": MockExamScoreBin.count + stmt.excluded.count},
+    )
+    await db.execute(stmt)
+
+
+def percentile_from_bins(bins: list[int], score: float) -> Optional[float]:
+    """ヒストグラムからパーセンタイルを計算
+
+    同じビンの件数は半分を「下位」として数える（mid-rank）。
+
+    Returns:
+        0〜100 のパーセンタイル、分布が空の場合はNone
+    """
+    total = sum(bins)
+    if total == 0:
+        return None
+    target = score_bin(score)
+    below = sum(bins[:target])
+    return round((below + bins[target] / 2) / total * 100.0, 1)
+
+
+async def load_score_distributions(
+    db: AsyncSession,
+    areas: Iterable[str],
+) -> dict[str, list[int]]:
+    """指定した area のヒストグラムをまとめて取得
+
+    Returns:
+        area → 長さ BIN_COUNT の件数リスト
+    """
+    area_list = list(areas)
+    result = await db.execute(
+        select(MockExamScoreBin.area, MockExamScoreBin.bin, MockExamScoreBin.count)
+        .where(MockExamScoreBin.area.in_(area_list))
+    )
+    distributions = {area: [0] * BIN_COUNT for area in area_list}
+    for row in result.all():
+        if 0 <= row.bin < BIN_COUNT:
+            distributions[row.area][row.bin] = row.count
+    return distributions
+
+
+async def get_exam_percentiles(
+    db: AsyncSession,
+    score: float,
+    category_scores: Optional[dict[str, dict[str, Any]]],
+) -> tuple[Optional[float], dict[str, Optional[float]]]:
+    """総合・分野別のパーセンタイルを取得
+
+    Returns:
+        (総合パーセンタイル, 分野名 → パーセンタイル)
+    """
+    category_scores = category_scores or {}
+    distributions = await load_score_distributions(
+        db, [OVERALL_AREA, *category_scores.keys()]
+    )
+    overall = percentile_from_bins(distributions[OVERALL_AREA], score)
+    by_area = {
+        area: percentile_from_bins(distributions[area], detail.get("accuracy", 0.0))
+        for area, detail in category_scores.items()
+    }
+    return overall, by_area
+
+
+async def rebuild_score_distribution(
+    db: AsyncSession,
+    batch_size: int = REBUILD_BATCH_SIZE,
+) -> int:
+    """終了済み模試から分布を作り直す
+
+    模試はサーバーサイドカーソルで batch_size 件ずつ読み込み、
+    ビンごとの件数だけをメモリに保持する。
+    読み込み前に分布テーブルを EXCLUSIVE モードでロックし、再構築中に終了した
+    模試の加算をトランザクション終了まで待たせる（参照はブロックしない）。
+    ロック前に加算済みの模試は読み込みに含まれ、待たされた模試は再構築後の
+    分布に加算されるため、二重計上も取りこぼしも起きない。
+
+    Returns:
+        集計した模試数
+    """
+    counts: dict[tuple[str, int], int] = defaultdict(int)
+    exam_count = 0
+
+    await db.execute(
+        text(f"LOCK TABLE {MockExamScoreBin.__tablename__} IN EXCLUSIVE MODE")
+    )
+
+    stream = await db.stream(
+        select(MockExam.score, MockExam.category_scores)
+        .where(MockExam.status == "finished")
+        .execution_options(yield_per=batch_size)
+    )
+    async for row in stream:
+        exam_count += 1
+        for key in _exam_bins(row.score, row.category_scores):
+            counts[key] += 1
+
+    await db.execute(delete(MockExamScoreBin))
+    if counts:
+        await db.execute(
+            pg_insert(MockExamScoreBin),
+            [
+                {"area": area, "bin": bin_, "count": count}
+                for (area, bin_), count in counts.items()
+            ],
+        )
+    return exam_count
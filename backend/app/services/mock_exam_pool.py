@@ -0,0 +1,258 @@
+"""模試プールサービス
+
+事前に組み立てた模試問題セットをDBにプールし、/start で即座に払い出す。
+- バックグラウンドタスクが定期的にプールを補充する
+- EXAM_AREAS の配分を満たすセットのみ格納する
+- 問題データのフィンガープリントが変わったセット、古すぎるセットは破棄する
+"""
+import asyncio
+import logging
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import String, cast, delete, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.category import Category
+from app.models.mock_exam_pool import MockExamPoolSet
+from app.models.question import Question
+from app.models.question_image import QuestionImage
+from app.services.mock_exam_config import EXAM_AREAS
+from app.services.mock_exam_service import (
+    select_questions_for_exam,
+    serialize_selected_question,
+)
+
+logger = logging.getLogger(__name__)
+
+# 直近の補充時に計算した問題データのフィンガープリント
+# Noneの間はプールを使わない（未補充 or 問題データ変更直後）
+_current_fingerprint: Optional[str] = None
+
+
+def get_current_fingerprint() -> Optional[str]:
+    """プール払い出しに使うフィンガープリントを取得"""
+    return _current_fingerprint
+
+
+def mark_pool_stale() -> None:
+    """問題データが変更されたことを通知する
+
+    次回の補充でフィンガープリントが再計算されるまでプールは使われない。
+    """
+    global _current_fingerprint
+    _current_fingerprint = None
+
+
+def _ordered_md5(expr: Any, order_by: Any) -> Any:
+    """行ごとの文字列を順序付きで連結したmd5を返すSQL式"""
+    return func.md5(
+        func.coalesce(
+            func.string_agg(expr, aggregate_order_by(literal_column("','"), order_by)),
+            "",
+        )
+    )
+
+
+async def compute_question_fingerprint(db: AsyncSession) -> str:
+    """模試セットの内容に影響する問題データのフィンガープリントを計算
+
+    問題・画像・カテゴリのいずれかが変わると値が変わる。
+
+    Args:
+        db: データベースセッション
+
+    Returns:
+        32文字のmd5ハッシュ
+    """
+    questions_md5 = (
+        select(
+            _ordered_md5(
+                func.concat_ws(
+                    ":",
+                    cast(Question.id, String),
+                    cast(Question.category_id, String),
+                    func.md5(Question.content),
+                    cast(Question.choices, String),
+                    Question.content_type,
+                    Question.framework,
+                    Question.topic,
+                ),
+                Question.id,
+            )
+        )
+        .scalar_subquery()
+    )
+    images_md5 = (
+        select(
+            _ordered_md5(
+                func.concat_ws(
+                    ":",
+                    cast(QuestionImage.id, String),
+                    QuestionImage.file_path,
+                    QuestionImage.alt_text,
+                    cast(QuestionImage.position, String),
+                    QuestionImage.image_type,
+                ),
+                QuestionImage.id,
+            )
+        )
+        .scalar_subquery()
+    )
+    categories_md5 = (
+        select(
+            _ordered_md5(
+                func.concat_ws(
+                    ":",
+                    cast(Category.id, String),
+                    Category.name,
+                    cast(Category.parent_id, String),
+                ),
+                Category.id,
+            )
+        )
+        .scalar_subquery()
+    )
+
+    result = await db.execute(
+        select(func.md5(func.concat(questions_md5, images_md5, categories_md5)))
+    )
+    return result.scalar_one()
+
+
+def validate_exam_set(payload: list[dict[str, Any]]) -> bool:
+    """問題セットが EXAM_AREAS の配分どおりか検証
+
+    Args:
+        payload: serialize_selected_question の出力リスト
+
+    Returns:
+        全分野の問題数が設定と一致し、問題の重複がなければTrue
+    """
+    area_counts = Counter(item["exam_area"] for item in payload)
+    expected = {
+        area: config["question_count"] for area, config in EXAM_AREAS.items()
+    }
+    if dict(area_counts) != expected:
+        return False
+
+    question_ids = [item["question_id"] for item in payload]
+    return len(question_ids) == len(set(question_ids))
+
+
+async def refill_pool(db: AsyncSession) -> int:
+    """プールの古いセットを破棄し、不足分を補充する
+
+    Args:
+        db: データベースセッション
+
+    Returns:
+        新たに格納したセット数
+    """
+    global _current_fingerprint
+
+    fingerprint = await compute_question_fingerprint(db)
+    cutoff = datetime.utcnow() - timedelta(
+        seconds=settings.mock_exam_pool_max_age_seconds
+    )
+
+    # 問題データが変わったセット・期限切れのセットを破棄
+    await db.execute(
+        delete(MockExamPoolSet).where(
+            or_(
+                MockExamPoolSet.question_fingerprint != fingerprint,
+                MockExamPoolSet.created_at < cutoff,
+            )
+        )
+    )
+
+    count_result = await db.execute(select(func.count(MockExamPoolSet.id)))
+    pooled = count_result.scalar_one()
+    needed = min(
+        settings.mock_exam_pool_refill_batch,
+        settings.mock_exam_pool_size - pooled,
+    )
+
+    created = 0
+    for _ in range(max(needed, 0)):
+        selected = await select_questions_for_exam(db)
+        payload = [serialize_selected_question(item) for item in selected]
+        if not validate_exam_set(payload):
+            # 問題数が配分を満たさない場合は何度組み立てても同じなので打ち切る
+            logger.info("模試プール: 分野別の問題数が不足しているため補充をスキップ")
+            break
+
+        db.add(
+            MockExamPoolSet(
+                id=uuid.uuid4(),
+                question_fingerprint=fingerprint,
+                total_questions=len(payload),
+                payload=payload,
+                created_at=datetime.utcnow(),
+            )
+        )
+        created += 1
+
+    await db.commit()
+    _current_fingerprint = fingerprint
+    return created
+
+
+async def pop_exam_set(db: AsyncSession) -> Optional[list[dict[str, Any]]]:
+    """プールから有効な問題セットを1つ取り出す
+
+    DELETE ... RETURNING で取り出すため、同じセットが2人に払い出されることはない。
+    削除はリクエストのトランザクション内で行われ、commitで確定する。
+
+    Args:
+        db: データベースセッション
+
+    Returns:
+        問題データのリスト。利用可能なセットがなければNone
+    """
+    fingerprint = get_current_fingerprint()
+    if not settings.mock_exam_pool_enabled or fingerprint is None:
+        return None
+
+    cutoff = datetime.utcnow() - timedelta(
+        seconds=settings.mock_exam_pool_max_age_seconds
+    )
+    candidate = (
+        select(MockExamPoolSet.id)
+        .where(
+            MockExamPoolSet.question_fingerprint == fingerprint,
+            MockExamPoolSet.created_at >= cutoff,
+        )
+        .order_by(MockExamPoolSet.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        delete(MockExamPoolSet)
+        .where(MockExamPoolSet.id == candidate)
+        .returning(MockExamPoolSet.payload)
+    )
+    row = result.first()
+    return row[0] if row else None
+
+
+async def run_pool_refiller() -> None:
+    """プールを定期的に補充するバックグラウンドループ"""
+    interval = settings.mock_exam_pool_refill_interval_seconds
+    while True:
+        try:
+            async with async_session_maker() as db:
+                created = await refill_pool(db)
+            if created:
+                logger.info(f"模試プール: {created}セットを補充")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"模試プールの補充に失敗: {e}")
+        await asyncio.sleep(interval)
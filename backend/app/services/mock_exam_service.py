@@ -5,22 +5,38 @@
 import logging
 import math
 import uuid
+from datetime import datetime
 from typing import Any, Optional
 
-from sqlalchemy import func, select
+from sqlalchemy import (
+    Integer,
+    column,
+    func,
+    insert,
+    select,
+    tuple_,
+    update,
+    values,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.models.category import Category
+from app.models.mock_exam import MockExam, MockExamAnswer
 from app.models.question import Question
 from app.services.mock_exam_config import (
     EXAM_AREAS,
     PASSING_THRESHOLD,
     get_grade,
 )
+from app.services.mock_exam_percentile import record_exam_scores
+from app.services.review_service import apply_exam_answers_to_review_items
 
 logger = logging.getLogger(__name__)
 
+# この行数以上の回答枠は COPY で書き込む
+ANSWER_COPY_THRESHOLD = 500
+
 
 async def select_questions_for_exam(
     db: AsyncSession,
@@ -93,16 +109,170 @@ async def select_questions_for_exam(
     return selected
 
 
-def calculate_scores(answers: list[dict[str, Any]]) -> dict[str, Any]:
-    """回答リストからスコアを計算
+def serialize_selected_question(item: dict[str, Any]) -> dict[str, Any]:
+    """選択済み問題をJSON化可能な辞書に変換
+
+    模試プールへの格納と /start のレスポンス構築で共通の形式を使う。
 
     Args:
-        answers: 回答リスト（各要素に is_correct, exam_area を含む）
+        item: select_questions_for_exam の要素（question, exam_area, category_name）
 
     Returns:
-        correct_count, score, passed, category_scores を含む辞書
+        問題データの辞書
+    """
+    q = item["question"]
+
+    images = []
+    if hasattr(q, "images") and q.images:
+        for img in q.images:
+            images.append({
+                "id": str(img.id),
+                "question_id": str(img.question_id),
+                "file_path": img.file_path,
+                "alt_text": img.alt_text,
+                "position": img.position,
+                "image_type": getattr(img, "image_type", None),
+            })
+
+    return {
+        "question_id": str(q.id),
+        "content": q.content,
+        "choices": q.choices,
+        "content_type": q.content_type or "plain",
+        "exam_area": item["exam_area"],
+        "category_name": item["category_name"],
+        "topic": q.topic,
+        "images": images,
+    }
+
+
+async def insert_exam_rows(
+    db: AsyncSession,
+    exam_row: dict[str, Any],
+    answer_rows: list[dict[str, Any]],
+) -> None:
+    """模試ヘッダーと回答枠をまとめて書き込む
+
+    ORMのUnit of Work（identity map登録・1オブジェクトごとのflush処理）を経由せず、
+    Core の INSERT に行のリストを渡す。SQLAlchemy はこれを複数行 VALUES の
+    INSERT にまとめて送信する。ANSWER_COPY_THRESHOLD 行以上の場合は COPY を使う。
+
+    Args:
+        db: データベースセッション
+        exam_row: mock_exams の1行分の値
+        answer_rows: mock_exam_answers の行の値のリスト（全行で同じキーを持つ）
+    """
+    await db.execute(insert(MockExam), [exam_row])
+    if not answer_rows:
+        return
+
+    if len(answer_rows) >= ANSWER_COPY_THRESHOLD and await _copy_answer_rows(
+        db, answer_rows
+    ):
+        return
+
+    await db.execute(insert(MockExamAnswer), answer_rows)
+
+
+async def _copy_answer_rows(
+    db: AsyncSession,
+    answer_rows: list[dict[str, Any]],
+) -> bool:
+    """asyncpg の COPY で回答枠を書き込む
+
+    セッションと同じ接続・トランザクション上で実行される。
+
+    Returns:
+        COPYで書き込めた場合True（asyncpg以外のドライバではFalse）
+    """
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    if not hasattr(driver_connection, "copy_records_to_table"):
+        return False
+
+    columns = list(answer_rows[0].keys())
+    await driver_connection.copy_records_to_table(
+        MockExamAnswer.__tablename__,
+        records=[tuple(row[c] for c in columns) for row in answer_rows],
+        columns=columns,
+    )
+    return True
+
+
+async def record_exam_answers(
+    db: AsyncSession,
+    exam_id: uuid.UUID,
+    selections: dict[int, int],
+) -> dict[int, bool]:
+    """模試の回答を1つのUPDATE文で記録する
+
+    UPDATE mock_exam_answers ... FROM (VALUES ...), questions, mock_exams
+    で正誤判定と模試の状態確認を同時に行い、RETURNINGで正誤を受け取る。
+    模試が存在しない・終了済み・問題番号が存在しない場合は該当行が返らない。
+
+    Args:
+        db: データベースセッション
+        exam_id: 模試ID
+        selections: 問題番号 → 選択肢インデックス
+
+    Returns:
+        更新できた問題番号 → 正誤
     """
-    if not answers:
+    if not selections:
+        return {}
+
+    submitted = values(
+        column("question_index", Integer),
+        column("selected_answer", Integer),
+        name="submitted",
+    ).data(list(selections.items()))
+
+    result = await db.execute(
+        update(MockExamAnswer)
+        .where(
+            MockExamAnswer.mock_exam_id == exam_id,
+            MockExamAnswer.question_index == submitted.c.question_index,
+            MockExamAnswer.question_id == Question.id,
+            MockExam.id == MockExamAnswer.mock_exam_id,
+            MockExam.status == "in_progress",
+        )
+        .values(
+            selected_answer=submitted.c.selected_answer,
+            is_correct=Question.correct_answer == submitted.c.selected_answer,
+            answered_at=datetime.utcnow(),
+        )
+        .returning(MockExamAnswer.question_index, MockExamAnswer.is_correct)
+    )
+    return {row.question_index: row.is_correct for row in result.all()}
+
+
+async def get_exam_status(
+    db: AsyncSession,
+    exam_id: uuid.UUID,
+) -> Optional[str]:
+    """模試のステータスのみを取得（存在しなければNone）"""
+    result = await db.execute(
+        select(MockExam.status).where(MockExam.id == exam_id)
+    )
+    return result.scalar_one_or_none()
+
+
+def _build_scores(
+    area_stats: dict[str, dict[str, int]],
+    topic_stats: dict[str, dict[str, int]],
+) -> dict[str, Any]:
+    """分野別・トピック別の集計値からスコアを組み立てる
+
+    Args:
+        area_stats: 分野名 → {"total", "correct"}
+        topic_stats: トピック名 → {"total", "correct"}
+
+    Returns:
+        correct_count, score, passed, category_scores, topic_scores を含む辞書
+    """
+    total = sum(stats["total"] for stats in area_stats.values())
+    if total == 0:
         return {
             "correct_count": 0,
             "score": 0.0,
@@ -111,21 +281,10 @@ def calculate_scores(answers: list[dict[str, Any]]) -> dict[str, Any]:
             "topic_scores": {},
         }
 
-    total = len(answers)
-    correct_count = sum(1 for a in answers if a.get("is_correct") is True)
-    score = (correct_count / total) * 100.0 if total > 0 else 0.0
+    correct_count = sum(stats["correct"] for stats in area_stats.values())
+    score = (correct_count / total) * 100.0
     passed = score >= PASSING_THRESHOLD
 
-    # カテゴリ別スコア集計
-    area_stats: dict[str, dict[str, int]] = {}
-    for a in answers:
-        area = a.get("exam_area", "不明")
-        if area not in area_stats:
-            area_stats[area] = {"total": 0, "correct": 0}
-        area_stats[area]["total"] += 1
-        if a.get("is_correct") is True:
-            area_stats[area]["correct"] += 1
-
     category_scores: dict[str, dict[str, Any]] = {}
     for area, stats in area_stats.items():
         accuracy = (stats["correct"] / stats["total"]) * 100.0 if stats["total"] > 0 else 0.0
@@ -136,18 +295,6 @@ def calculate_scores(answers: list[dict[str, Any]]) -> dict[str, Any]:
             "grade": get_grade(accuracy),
         }
 
-    # トピック別スコア集計
-    topic_stats: dict[str, dict[str, int]] = {}
-    for a in answers:
-        topic = a.get("topic")
-        if not topic:
-            continue
-        if topic not in topic_stats:
-            topic_stats[topic] = {"total": 0, "correct": 0}
-        topic_stats[topic]["total"] += 1
-        if a.get("is_correct") is True:
-            topic_stats[topic]["correct"] += 1
-
     topic_scores: dict[str, dict[str, Any]] = {}
     for topic, stats in topic_stats.items():
         accuracy = (stats["correct"] / stats["total"]) * 100.0 if stats["total"] > 0 else 0.0
@@ -166,6 +313,148 @@ def calculate_scores(answers: list[dict[str, Any]]) -> dict[str, Any]:
     }
 
 
+def calculate_scores(answers: list[dict[str, Any]]) -> dict[str, Any]:
+    """回答リストからスコアを計算
+
+    Args:
+        answers: 回答リスト（各要素に is_correct, exam_area を含む）
+
+    Returns:
+        correct_count, score, passed, category_scores を含む辞書
+    """
+    # カテゴリ別スコア集計
+    area_stats: dict[str, dict[str, int]] = {}
+    for a in answers:
+        area = a.get("exam_area", "不明")
+        if area not in area_stats:
+            area_stats[area] = {"total": 0, "correct": 0}
+        area_stats[area]["total"] += 1
+        if a.get("is_correct") is True:
+            area_stats[area]["correct"] += 1
+
+    # トピック別スコア集計
+    topic_stats: dict[str, dict[str, int]] = {}
+    for a in answers:
+        topic = a.get("topic")
+        if not topic:
+            continue
+        if topic not in topic_stats:
+            topic_stats[topic] = {"total": 0, "correct": 0}
+        topic_stats[topic]["total"] += 1
+        if a.get("is_correct") is True:
+            topic_stats[topic]["correct"] += 1
+
+    return _build_scores(area_stats, topic_stats)
+
+
+async def aggregate_exam_scores(
+    db: AsyncSession,
+    exam_id: uuid.UUID,
+) -> dict[str, Any]:
+    """模試の回答をDB側で集計してスコアを計算
+
+    分野別・トピック別の件数を GROUPING SETS による1回のGROUP BYで取得するため、
+    問題数に関わらずラウンドトリップは1回。結果の形式は calculate_scores と同じ。
+
+    Args:
+        db: データベースセッション
+        exam_id: 模試ID
+
+    Returns:
+        correct_count, score, passed, category_scores, topic_scores を含む辞書
+    """
+    result = await db.execute(
+        select(
+            MockExamAnswer.exam_area,
+            MockExamAnswer.topic,
+            func.grouping(MockExamAnswer.exam_area).label("area_rolled_up"),
+            func.count().label("total"),
+            func.count()
+            .filter(MockExamAnswer.is_correct.is_(True))
+            .label("correct"),
+        )
+        .where(MockExamAnswer.mock_exam_id == exam_id)
+        .group_by(
+            func.grouping_sets(
+                tuple_(MockExamAnswer.exam_area),
+                tuple_(MockExamAnswer.topic),
+            )
+        )
+    )
+
+    area_stats: dict[str, dict[str, int]] = {}
+    topic_stats: dict[str, dict[str, int]] = {}
+    for row in result.all():
+        stats = {"total": row.total, "correct": row.correct}
+        if row.area_rolled_up == 0:
+            area_stats[row.exam_area] = stats
+        elif row.topic:
+            topic_stats[row.topic] = stats
+
+    return _build_scores(area_stats, topic_stats)
+
+
+async def finish_exam(
+    db: AsyncSession,
+    exam: MockExam,
+    now: Optional[datetime] = None,
+) -> dict[str, Any]:
+    """模試を採点して終了状態にする
+
+    /finish エンドポイントと放置模試のスイーパーで共通の処理。
+    - 回答をDB側で集計してスコア・ルールベース分析を保存
+    - 初回終了時のみスコア分布に加算し、回答結果を復習アイテムへ一括反映
+      （反映に失敗しても採点結果は確定させる）
+
+    コミットは呼び出し側で行う。
+
+    Args:
+        db: データベースセッション
+        exam: 終了する模試
+        now: 終了日時（省略時は現在時刻）
+
+    Returns:
+        aggregate_exam_scores の結果に analysis を加えた辞書
+    """
+    scores = await aggregate_exam_scores(db, exam.id)
+    answered_total = sum(d["total"] for d in scores["category_scores"].values())
+
+    # ルールベース分析
+    analysis = generate_rule_based_analysis(
+        score=scores["score"],
+        correct_count=scores["correct_count"],
+        total=answered_total or exam.total_questions,
+        passed=scores["passed"],
+        category_scores=scores["category_scores"],
+    )
+
+    # 模試を更新
+    newly_finished = exam.status != "finished"
+    exam.finished_at = now or datetime.utcnow()
+    exam.correct_count = scores["correct_count"]
+    exam.score = scores["score"]
+    exam.passed = scores["passed"]
+    exam.category_scores = scores["category_scores"]
+    exam.topic_scores = scores["topic_scores"]
+    exam.analysis = analysis
+    exam.status = "finished"
+
+    # 再終了時はスコア分布・復習アイテムに二重に反映しない
+    if not newly_finished:
+        return {**scores, "analysis": analysis}
+
+    await record_exam_scores(db, scores["score"], scores["category_scores"])
+
+    # 回答結果を復習アイテムに一括連携
+    try:
+        async with db.begin_nested():
+            await apply_exam_answers_to_review_items(db, exam.id, exam.user_id)
+    except Exception as e:
+        logger.warning(f"復習アイテム更新失敗 (exam_id={exam.id}): {e}")
+
+    return {**scores, "analysis": analysis}
+
+
 def generate_rule_based_analysis(
     score: float,
     correct_count: int,
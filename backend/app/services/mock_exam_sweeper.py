@@ -0,0 +1,132 @@
+"""放置された模試のスイーパー
+
+制限時間（TIME_LIMIT_MINUTES）+ 猶予を過ぎても in_progress のままの模試を
+定期的に片付ける。
+- 1問以上回答済み → 回答済みの内容で採点して finished にする
+- 未回答 → expired にし、空の回答枠を削除する
+
+1バッチは FOR UPDATE SKIP LOCKED で確保するため、複数プロセスで動かしても
+同じ模試を二重に処理しない。
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.mock_exam import MockExam, MockExamAnswer
+from app.services.mock_exam_config import TIME_LIMIT_MINUTES
+from app.services.mock_exam_service import finish_exam
+from app.services.review_service import clear_review_stats_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def sweep_abandoned_exams(
+    db: AsyncSession,
+    now: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+) -> dict[str, int]:
+    """放置された模試を1バッチ分処理する
+
+    コミットは呼び出し側で行う（コミットまで対象行のロックを保持する）。
+
+    Args:
+        db: データベースセッション
+        now: 基準時刻（省略時は現在時刻）
+        batch_size: 1バッチで処理する最大件数
+
+    Returns:
+        {"finished": 採点して終了した件数, "expired": 期限切れにした件数}
+    """
+    now = now or datetime.utcnow()
+    batch_size = batch_size or settings.mock_exam_sweep_batch_size
+    cutoff = now - timedelta(
+        minutes=TIME_LIMIT_MINUTES + settings.mock_exam_sweep_grace_minutes
+    )
+
+    result = await db.execute(
+        select(MockExam)
+        .where(
+            MockExam.status == "in_progress",
+            MockExam.started_at < cutoff,
+        )
+        .order_by(MockExam.started_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    exams = list(result.scalars().all())
+    if not exams:
+        return {"finished": 0, "expired": 0}
+
+    # 回答済みの模試を1回の集計で判定
+    answered_result = await db.execute(
+        select(MockExamAnswer.mock_exam_id)
+        .where(
+            MockExamAnswer.mock_exam_id.in_([e.id for e in exams]),
+            MockExamAnswer.selected_answer.is_not(None),
+        )
+        .group_by(MockExamAnswer.mock_exam_id)
+    )
+    answered_ids = set(answered_result.scalars().all())
+
+    expired_ids = [e.id for e in exams if e.id not in answered_ids]
+    if expired_ids:
+        await db.execute(
+            update(MockExam)
+            .where(MockExam.id.in_(expired_ids))
+            .values(status="expired", finished_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            delete(MockExamAnswer)
+            .where(MockExamAnswer.mock_exam_id.in_(expired_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+    finished = 0
+    for exam in exams:
+        if exam.id in answered_ids:
+            await finish_exam(db, exam, now=now)
+            finished += 1
+
+    return {"finished": finished, "expired": len(expired_ids)}
+
+
+async def sweep_all_abandoned_exams(now: Optional[datetime] = None) -> dict[str, int]:
+    """対象がなくなるまでバッチ単位で処理する（バッチごとにコミット）"""
+    batch_size = settings.mock_exam_sweep_batch_size
+    totals = {"finished": 0, "expired": 0}
+    while True:
+        async with async_session_maker() as db:
+            counts = await sweep_abandoned_exams(db, now=now, batch_size=batch_size)
+            await db.commit()
+        if counts["finished"]:
+            # コミット前のデータで作り直された復習統計キャッシュを捨てる
+            clear_review_stats_cache()
+        totals["finished"] += counts["finished"]
+        totals["expired"] += counts["expired"]
+        if counts["finished"] + counts["expired"] < batch_size:
+            return totals
+
+
+async def run_exam_sweeper() -> None:
+    """放置模試を定期的に片付けるバックグラウンドループ"""
+    interval = settings.mock_exam_sweep_interval_seconds
+    while True:
+        try:
+            totals = await sweep_all_abandoned_exams()
+            if totals["finished"] or totals["expired"]:
+                logger.info(
+                    f"放置模試スイープ: 採点終了 {totals['finished']}件, "
+                    f"期限切れ {totals['expired']}件"
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"放置模試のスイープに失敗: {e}")
+        await asyncio.sleep(interval)
@@ -2,20 +2,31 @@
 
 Claude Code CLIを使用してPDFテキストから問題を抽出する
 """
+import asyncio
 import hashlib
 import json
 import logging
 import re
+import time
 import uuid
-from pathlib import Path
+from dataclasses import dataclass, field
 from typing import Any, Optional
 
+from app.core.config import settings
+
 from .claude_cli import ClaudeCLIError, call_claude_cli
+from .llm_cache import get_llm_cache
+from .pdf_process_pool import PdfSource, map_page_ranges, open_pypdf
 
 logger = logging.getLogger(__name__)
 
-# キャッシュディレクトリ
-CACHE_DIR = Path(__file__).parent.parent.parent / ".cache" / "pdf_extractions"
+# pypdfのCMap関連警告を抑制（ノイズを減らす）
+# ロガーレベルはプロセス全体で共有されるため、抽出ごとに切り替えずインポート時に
+# 一度だけ設定する（プロセスプールのワーカーもこのモジュールをインポートする）
+logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+# LLMキャッシュの namespace
+CACHE_NAMESPACE = "pdf_extraction"
 
 
 class PDFExtractionError(Exception):
@@ -196,40 +207,24 @@ def parse_llm_response(response_text: str) -> list[dict[str, Any]]:
 MAX_TEXT_LENGTH = 20000
 
 
-def get_text_hash(text: str) -> str:
-    """テキストのハッシュを計算する"""
-    return hashlib.sha256(text.encode()).hexdigest()[:16]
+# プロンプトのバージョン（プロンプトを変更すると以前のチャンクキャッシュは使われない）
+EXTRACTION_PROMPT_VERSION = hashlib.sha256(EXTRACTION_PROMPT.encode()).hexdigest()[:8]
 
 
-def get_cache_path(text_hash: str) -> Path:
-    """キャッシュファイルのパスを取得する"""
-    return CACHE_DIR / f"{text_hash}.json"
+def get_chunk_cache_key(chunk: str) -> str:
+    """チャンクのキャッシュキー（プロンプトのバージョン + チャンクのハッシュ）"""
+    digest = hashlib.sha256(chunk.encode()).hexdigest()[:32]
+    return f"{EXTRACTION_PROMPT_VERSION}-{digest}"
 
 
-def load_from_cache(text_hash: str) -> Optional[list[dict[str, Any]]]:
+async def load_from_cache(cache_key: str) -> Optional[list[dict[str, Any]]]:
     """キャッシュから問題を読み込む"""
-    cache_path = get_cache_path(text_hash)
-    if cache_path.exists():
-        try:
-            with open(cache_path, encoding="utf-8") as f:
-                data = json.load(f)
-                logger.info(f"Loaded {len(data)} questions from cache")
-                return data
-        except Exception as e:
-            logger.warning(f"Failed to load cache: {e}")
-    return None
+    return await get_llm_cache().get(CACHE_NAMESPACE, cache_key)
 
 
-def save_to_cache(text_hash: str, questions: list[dict[str, Any]]) -> None:
+async def save_to_cache(cache_key: str, questions: list[dict[str, Any]]) -> None:
     """問題をキャッシュに保存する"""
-    try:
-        CACHE_DIR.mkdir(parents=True, exist_ok=True)
-        cache_path = get_cache_path(text_hash)
-        with open(cache_path, "w", encoding="utf-8") as f:
-            json.dump(questions, f, ensure_ascii=False, indent=2)
-        logger.info(f"Saved {len(questions)} questions to cache")
-    except Exception as e:
-        logger.warning(f"Failed to save cache: {e}")
+    await get_llm_cache().set(CACHE_NAMESPACE, cache_key, questions)
 
 
 QUESTION_BOUNDARY = re.compile(
@@ -318,22 +313,118 @@ def _find_last_question_boundary(text: str, max_length: int) -> int:
     return last_pos + 1 if last_pos > 0 else -1
 
 
+@dataclass
+class ChunkReport:
+    """チャンク1つ分の抽出結果"""
+    index: int
+    chars: int
+    latency_seconds: float = 0.0
+    question_count: int = 0
+    cached: bool = False
+    error: Optional[str] = None
+
+
+@dataclass
+class ExtractionReport:
+    """問題抽出の実行結果（チャンクごとの所要時間・キャッシュヒットと並列化の効果）"""
+    chunks: list[ChunkReport] = field(default_factory=list)
+    concurrency: int = 1
+    wall_seconds: float = 0.0
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def cache_hits(self) -> int:
+        return sum(1 for c in self.chunks if c.cached)
+
+    @property
+    def cache_hit_rate(self) -> float:
+        return self.cache_hits / len(self.chunks) if self.chunks else 0.0
+
+    @property
+    def failed_chunks(self) -> int:
+        return sum(1 for c in self.chunks if c.error)
+
+    @property
+    def serial_seconds(self) -> float:
+        """順に処理した場合の所要時間（各チャンクの所要時間の合計）"""
+        return sum(c.latency_seconds for c in self.chunks)
+
+    @property
+    def speedup(self) -> float:
+        return self.serial_seconds / self.wall_seconds if self.wall_seconds else 1.0
+
+
+async def _extract_chunk(
+    chunk: str,
+    report: ChunkReport,
+    total: int,
+    semaphore: asyncio.Semaphore,
+    use_cache: bool,
+) -> list[dict[str, Any]]:
+    """チャンク1つから問題を抽出する（エラーは report に記録して空リストを返す）"""
+    cache_key = get_chunk_cache_key(chunk)
+    if use_cache:
+        cached = await load_from_cache(cache_key)
+        if cached is not None:
+            report.cached = True
+            report.question_count = len(cached)
+            return cached
+
+    async with semaphore:
+        logger.info(f"Processing chunk {report.index}/{total} ({len(chunk)} chars)")
+        prompt = EXTRACTION_PROMPT.format(text=chunk)
+        start = time.perf_counter()
+        questions: list[dict[str, Any]] = []
+        try:
+            # Claude Code CLI を呼び出し
+            response_text = await call_claude_cli(prompt)
+            questions = parse_llm_response(response_text)
+        except PDFExtractionError as e:
+            # チャンク単位のエラーは記録して続行
+            report.error = f"Chunk {report.index} failed: {e}"
+        except Exception as e:
+            # 予期しないエラーも記録して続行（他のチャンクは止めない）
+            report.error = f"Chunk {report.index} unexpected error: {e}"
+        report.latency_seconds = time.perf_counter() - start
+
+    if report.error:
+        logger.warning(report.error)
+    else:
+        # 失敗したチャンクはキャッシュせず、次回のインポートで再試行する
+        if use_cache:
+            await save_to_cache(cache_key, questions)
+        report.question_count = len(questions)
+        logger.info(
+            f"Chunk {report.index}: extracted {len(questions)} questions "
+            f"in {report.latency_seconds:.1f}s"
+        )
+    return questions
+
+
 async def extract_questions_from_text(
     text: str,
     source: str,
     category_id: Optional[uuid.UUID] = None,
     use_cache: bool = True,
+    report: Optional[ExtractionReport] = None,
 ) -> list[dict[str, Any]]:
     """
     テキストから問題を抽出する
 
-    長いテキストは自動的にチャンク分割して処理される
-    同じテキストの場合はキャッシュから結果を返す
+    長いテキストは自動的にチャンク分割し、最大 settings.pdf_extraction_concurrency
+    チャンクずつ並行して処理する（結果はチャンク順）。
+    抽出結果はチャンク単位でキャッシュするため、改訂版のPDFを再インポートしても
+    内容が変わったチャンクだけを処理する
 
     Args:
         text: 抽出元のテキスト
         source: 出典情報
         category_id: カテゴリID（オプション）
+        use_cache: チャンク単位のキャッシュを使うか
+        report: 渡すとチャンクごとの所要時間などを記録する
 
     Returns:
         抽出された問題データのリスト
@@ -343,71 +434,45 @@ async def extract_questions_from_text(
     """
     if not text or not text.strip():
         raise PDFExtractionError("Empty text provided")
+    if report is None:
+        report = ExtractionReport()
 
-    # キャッシュを確認
-    text_hash = get_text_hash(text)
-    if use_cache:
-        cached = load_from_cache(text_hash)
-        if cached is not None:
-            # キャッシュからの結果にメタデータを追加
-            for q in cached:
-                q["source"] = source
-                if category_id:
-                    q["category_id"] = category_id
-            return cached
-
-    # テキストをチャンクに分割
+    # テキストをチャンクに分割し、並行して抽出
     chunks = split_text_into_chunks(text)
-    all_questions: list[dict[str, Any]] = []
-    errors: list[str] = []
-
-    for i, chunk in enumerate(chunks):
-        logger.info(f"Processing chunk {i + 1}/{len(chunks)} ({len(chunk)} chars)")
-
-        prompt = EXTRACTION_PROMPT.format(text=chunk)
+    report.concurrency = max(1, min(settings.pdf_extraction_concurrency, len(chunks)))
+    report.chunks = [
+        ChunkReport(index=i + 1, chars=len(c)) for i, c in enumerate(chunks)
+    ]
+    semaphore = asyncio.Semaphore(report.concurrency)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        _extract_chunk(chunk, chunk_report, len(chunks), semaphore, use_cache)
+        for chunk, chunk_report in zip(chunks, report.chunks, strict=True)
+    ])
+    report.wall_seconds = time.perf_counter() - start
 
-        try:
-            # Claude Code CLI を呼び出し
-            response_text = await call_claude_cli(prompt)
-            questions = parse_llm_response(response_text)
-
-            # メタデータを追加
-            for q in questions:
-                q["source"] = source
-                q["chunk_index"] = i + 1
-                if category_id:
-                    q["category_id"] = category_id
-
-            all_questions.extend(questions)
-            logger.info(f"Chunk {i + 1}: extracted {len(questions)} questions")
-
-        except PDFExtractionError as e:
-            # チャンク単位のエラーは記録して続行
-            error_msg = f"Chunk {i + 1} failed: {e}"
-            logger.warning(error_msg)
-            errors.append(error_msg)
-            continue
-        except Exception as e:
-            # 予期しないエラーもPDFExtractionErrorでラップ
-            error_msg = f"Chunk {i + 1} unexpected error: {e}"
-            logger.warning(error_msg)
-            errors.append(error_msg)
-            continue
+    all_questions: list[dict[str, Any]] = []
+    for chunk_report, questions in zip(report.chunks, results, strict=True):
+        # メタデータを追加
+        for q in questions:
+            q["source"] = source
+            q["chunk_index"] = chunk_report.index
+            if category_id:
+                q["category_id"] = category_id
+        all_questions.extend(questions)
 
+    errors = [c.error for c in report.chunks if c.error]
     if not all_questions and errors:
         # 全チャンクが失敗した場合
         raise PDFExtractionError(f"All chunks failed: {'; '.join(errors[:3])}")
 
-    # キャッシュに保存（メタデータなしで保存）
-    if use_cache and all_questions:
-        # source, category_id, chunk_indexを除いた状態で保存
-        cache_questions = []
-        for q in all_questions:
-            cache_q = {k: v for k, v in q.items() if k not in ("source", "category_id")}
-            cache_questions.append(cache_q)
-        save_to_cache(text_hash, cache_questions)
-
-    logger.info(f"Total questions extracted: {len(all_questions)}")
+    logger.info(
+        f"Total questions extracted: {len(all_questions)} from {len(chunks)} chunks "
+        f"in {report.wall_seconds:.1f}s (serial {report.serial_seconds:.1f}s, "
+        f"concurrency {report.concurrency}, speedup {report.speedup:.1f}x, "
+        f"cache hits {report.cache_hits}/{len(chunks)} = {report.cache_hit_rate:.0%})"
+    )
     return all_questions
 
 
@@ -438,12 +503,43 @@ async def extract_questions_from_text_single(
         raise PDFExtractionError(f"Failed to extract questions: {e}")
 
 
-async def extract_text_from_pdf(pdf_content: bytes) -> str:
+def count_pdf_pages(source: PdfSource) -> int:
+    """PDFのページ数（プロセスプールで実行）"""
+    return len(open_pypdf(source).pages)
+
+
+def extract_page_texts(
+    source: PdfSource,
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> list[tuple[int, str, Optional[str]]]:
+    """ページ範囲のテキストを抽出する（プロセスプール・スレッドで実行）
+
+    Returns:
+        ページごとの (ページ番号（0始まり）, テキスト, エラー)
+    """
+    reader = open_pypdf(source)
+    total_pages = len(reader.pages)
+    results: list[tuple[int, str, Optional[str]]] = []
+    for i in range(start, total_pages if stop is None else min(stop, total_pages)):
+        try:
+            # インデックスアクセスで個別にエラーハンドリング
+            page_text = reader.pages[i].extract_text()
+            results.append((i, page_text or "", None))
+        except Exception as e:
+            # ページエラーを記録し、次のページへ続行
+            results.append((i, "", str(e)))
+    return results
+
+
+async def extract_text_from_pdf(pdf_content: PdfSource) -> str:
     """
     PDFからテキストを抽出する
 
+    解析はイベントループの外（大きいPDFはページ範囲ごとにプロセスプール）で行う
+
     Args:
-        pdf_content: PDFファイルのバイナリデータ
+        pdf_content: PDFファイルのバイナリデータまたはファイルパス
 
     Returns:
         抽出されたテキスト
@@ -452,51 +548,32 @@ async def extract_text_from_pdf(pdf_content: bytes) -> str:
         PDFExtractionError: PDFの読み込みに失敗した場合、
                            または全ページからテキストを抽出できなかった場合
     """
-    from io import BytesIO
-
-    from pypdf import PdfReader
-
-    # pypdfのCMap関連警告を抑制（ノイズを減らす）
-    # pypdfはloggingモジュールを使用するため、ロガーレベルを調整
-    pypdf_logger = logging.getLogger("pypdf")
-    original_level = pypdf_logger.level
-    pypdf_logger.setLevel(logging.ERROR)
-
     try:
-        reader = PdfReader(BytesIO(pdf_content), strict=False)
-        text_parts = []
-        total_pages = len(reader.pages)
-
-        # 診断ログ: 総ページ数
-        logger.info(f"Processing PDF with {total_pages} pages")
-
-        for i in range(total_pages):
-            try:
-                # インデックスアクセスで個別にエラーハンドリング
-                page = reader.pages[i]
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
-                    # 診断ログ: ページごとの抽出結果（DEBUGレベル）
-                    logger.debug(f"Page {i + 1}: extracted {len(page_text)} chars")
-            except Exception as e:
-                # ページエラーをログに記録し、次のページへ続行
-                logger.warning(f"Page {i + 1} extraction failed: {e}")
-                continue
-
-        if not text_parts:
-            raise PDFExtractionError("No text could be extracted from any page")
-
-        total_text = "\n".join(text_parts)
-        # 診断ログ: 抽出結果サマリー
-        logger.info(f"Extracted {len(total_text)} chars from {len(text_parts)}/{total_pages} pages")
-
-        return total_text
-
-    except PDFExtractionError:
-        raise
+        pages = await map_page_ranges(extract_page_texts, count_pdf_pages, pdf_content)
     except Exception as e:
         raise PDFExtractionError(f"Failed to extract text from PDF: {e}")
-    finally:
-        # pypdfのロガーレベルを元に戻す
-        pypdf_logger.setLevel(original_level)
+
+    total_pages = len(pages)
+    # 診断ログ: 総ページ数
+    logger.info(f"Processing PDF with {total_pages} pages")
+
+    text_parts = []
+    for i, page_text, error in pages:
+        if error:
+            logger.warning(f"Page {i + 1} extraction failed: {error}")
+        elif page_text:
+            text_parts.append(page_text)
+            # 診断ログ: ページごとの抽出結果（DEBUGレベル）
+            logger.debug(f"Page {i + 1}: extracted {len(page_text)} chars")
+
+    if not text_parts:
+        raise PDFExtractionError("No text could be extracted from any page")
+
+    total_text = "\n".join(text_parts)
+    # 診断ログ: 抽出結果サマリー
+    logger.info(
+        f"Extracted {len(total_text)} chars "
+        f"from {len(text_parts)}/{total_pages} pages"
+    )
+
+    return total_text
@@ -0,0 +1,159 @@
+"""PDF解析用のプロセスプール
+
+pypdf / PyMuPDF の解析はCPUを使い続けるため、イベントループ上で実行すると
+その間ワーカーの他のリクエストがすべて止まる。解析はイベントループの外で行う:
+
+- settings.pdf_parse_parallel_min_bytes 未満の小さいPDFはスレッドで一括処理する
+  （プロセスへの受け渡しのコストの方が大きいため）
+- それ以上のPDFはページ範囲に分けてプロセスプールで並列に処理し、ページ順に結合する
+
+ページ範囲を処理する関数は fn(source, start, stop) の形で、source は PDF の
+バイト列またはファイルパス、stop が None なら最後のページまで処理する。
+プロセスに渡すためモジュールのトップレベルに定義すること。
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Optional, TypeVar, Union
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# PDFのバイト列またはファイルパス
+PdfSource = Union[bytes, str, Path]
+
+T = TypeVar("T")
+
+# 1ワーカーあたりのページ範囲の数（ページごとの重さの偏りをならす）
+RANGES_PER_WORKER = 2
+# アップロードを一時ファイルに書き出すときの読み書きの単位
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def open_pypdf(source: PdfSource) -> Any:
+    """pypdf の PdfReader を開く"""
+    from pypdf import PdfReader
+
+    if isinstance(source, bytes):
+        return PdfReader(BytesIO(source), strict=False)
+    return PdfReader(str(source), strict=False)
+
+
+def pdf_source_size(source: PdfSource) -> int:
+    """PDFのサイズ（バイト）"""
+    return len(source) if isinstance(source, bytes) else os.path.getsize(source)
+
+
+def split_page_ranges(page_count: int, parts: int) -> list[tuple[int, int]]:
+    """ページを連続した範囲にほぼ均等に分ける"""
+    parts = max(1, min(parts, page_count))
+    size, extra = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def get_pdf_process_pool() -> ProcessPoolExecutor:
+    """共有プロセスプールを取得（初回呼び出し時に作成）"""
+    global _pool
+    if _pool is None:
+        # イベントループやスレッドを抱えたプロセスを fork しないよう spawn で起動する
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.pdf_parse_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pdf_process_pool() -> None:
+    """プロセスプールを停止（アプリ終了時）"""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _write_temp_pdf(data: bytes) -> str:
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(data)
+        return f.name
+
+
+def _spool_to_temp_pdf(fileobj: BinaryIO) -> Path:
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        shutil.copyfileobj(fileobj, f, SPOOL_CHUNK_SIZE)
+        return Path(f.name)
+
+
+async def spool_pdf(fileobj: BinaryIO) -> Path:
+    """アップロードされたPDFを SPOOL_CHUNK_SIZE ずつ一時ファイルに書き出す
+
+    PDF全体をメモリに読み込まずに済むよう、以降の解析にはこのパスを渡す。
+    一時ファイルは呼び出し側で削除すること。
+    """
+    return await asyncio.to_thread(_spool_to_temp_pdf, fileobj)
+
+
+async def map_page_ranges(
+    fn: Callable[[PdfSource, int, Optional[int]], list[T]],
+    count_pages: Callable[[PdfSource], int],
+    source: PdfSource,
+) -> list[T]:
+    """PDFのページ範囲ごとに fn を実行し、結果をページ順に連結して返す
+
+    Args:
+        fn: ページ範囲を処理する関数（ページ順の結果リストを返す）
+        count_pages: ページ数を返す関数
+        source: PDFのバイト列またはファイルパス
+
+    Returns:
+        全ページ分の fn の結果（ページ順）
+    """
+    size = pdf_source_size(source)
+    if settings.pdf_parse_workers <= 1 or size < settings.pdf_parse_parallel_min_bytes:
+        return await asyncio.to_thread(fn, source, 0, None)
+
+    loop = asyncio.get_running_loop()
+    pool = get_pdf_process_pool()
+    # バイト列は一時ファイルに書き、各プロセスにはパスだけを渡す
+    temp_path = None
+    if isinstance(source, bytes):
+        temp_path = await asyncio.to_thread(_write_temp_pdf, source)
+        source = temp_path
+    try:
+        page_count = await loop.run_in_executor(pool, count_pages, source)
+        ranges = split_page_ranges(
+            page_count, settings.pdf_parse_workers * RANGES_PER_WORKER
+        )
+        logger.info(
+            f"Parsing {page_count} pages in {len(ranges)} ranges "
+            f"across {settings.pdf_parse_workers} processes"
+        )
+        parts = await asyncio.gather(*[
+            loop.run_in_executor(pool, fn, source, start, stop)
+            for start, stop in ranges
+        ])
+    except BrokenProcessPool:
+        # ワーカーが異常終了したプールは使えないので次回作り直す
+        shutdown_pdf_process_pool()
+        raise
+    finally:
+        if temp_path is not None:
+            os.unlink(temp_path)
+    return [item for part in parts for item in part]
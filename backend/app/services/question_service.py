@@ -1,9 +1,10 @@
 """問題関連のサービス層"""
 import hashlib
 import uuid
-from typing import Optional
+from typing import Iterable, Optional
 
-from sqlalchemy import func, select
+from sqlalchemy import String, any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -44,6 +45,41 @@ def resolve_category_id(
     return category_map.get(category_name)
 
 
+async def get_questions_by_hashes(
+    db: AsyncSession,
+    content_hashes: Iterable[str],
+) -> dict[str, Question]:
+    """content_hash が一致する既存問題を画像付きでまとめて取得
+
+    ハッシュの数によらず1回のクエリ（画像の selectinload を含めて2往復）で済むよう、
+    ハッシュは配列パラメータ1つとして ANY に渡す。
+
+    Args:
+        db: データベースセッション
+        content_hashes: 問題文のハッシュ
+
+    Returns:
+        content_hash → 問題。同じハッシュの問題が複数あれば最初の1件
+    """
+    hashes = sorted(set(content_hashes))
+    if not hashes:
+        return {}
+    result = await db.execute(
+        select(Question)
+        .options(selectinload(Question.images))
+        .where(
+            Question.content_hash
+            == any_(bindparam("content_hashes", hashes, type_=ARRAY(String)))
+        )
+        # 同じセッションで先に読み込んだ問題も画像を読み直す
+        .execution_options(populate_existing=True)
+    )
+    questions: dict[str, Question] = {}
+    for question in result.scalars().all():
+        questions.setdefault(question.content_hash, question)
+    return questions
+
+
 # デフォルトカテゴリ名
 DEFAULT_CATEGORY_NAME = "未分類"
 
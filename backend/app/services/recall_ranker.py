@@ -0,0 +1,341 @@
+"""忘却曲線による出題優先度のランキング
+
+ユーザーの候補（問題・復習アイテム）を列ごとの配列として読み込み、
+想起確率と優先度を NumPy で一括計算して上位 k 件を返す。
+
+- 想起確率: p = exp(-経過日数 / 安定度)
+  安定度 = BASE_STABILITY_DAYS * STABILITY_GROWTH ** 連続正解数
+- 未回答の候補は p = UNSEEN_RECALL とみなす
+- 優先度: (1 - p) * (1 + WEAKNESS_WEIGHT * カテゴリの苦手度)
+- カテゴリの苦手度: 1 - 平滑化した正答率（回答のないカテゴリは 0.5）
+
+出題候補の問題（ID・カテゴリ）はユーザーによらないため、プロセス内に
+QUESTION_CATALOG_TTL_SECONDS だけキャッシュし、リクエストごとにはユーザーの
+回答・復習アイテムだけを読み込む。
+"""
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import Float, Integer, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.answer import Answer
+from app.models.question import Question
+from app.models.review_item import ReviewItem
+
+# 連続正解0回の安定度（日）
+BASE_STABILITY_DAYS = 1.0
+# 連続正解1回あたりの安定度の伸び率
+STABILITY_GROWTH = 2.5
+# 未回答の候補の想起確率
+UNSEEN_RECALL = 0.5
+# /smart で出題候補とする上位件数（この中からランダムに選ぶ）
+SMART_CANDIDATE_COUNT = 5
+# 苦手度の重み
+WEAKNESS_WEIGHT = 1.0
+# 正答率の平滑化（正解 PRIOR_CORRECT / 回答 PRIOR_TOTAL を事前に加える）
+PRIOR_CORRECT = 1.0
+PRIOR_TOTAL = 2.0
+# 出題候補の問題一覧のキャッシュの有効期間（秒）。問題の追加・削除時は明示的に破棄する
+QUESTION_CATALOG_TTL_SECONDS = 300.0
+
+_SECONDS_PER_DAY = 86400.0
+_EPOCH = datetime(1970, 1, 1)
+
+# 同点の候補の順序を決める乱数
+_tie_break_rng = np.random.default_rng()
+
+
+@dataclass
+class RecallArrays:
+    """ランキング対象の候補を列ごとに保持する配列
+
+    Attributes:
+        ids: 候補のID（問題IDまたは復習アイテムID）
+        elapsed_days: 最終回答からの経過日数（未回答は NaN）
+        streak: 連続正解数
+        category_idx: category_weakness の添字（カテゴリなしは -1）
+        category_weakness: カテゴリごとの苦手度（0〜1）
+    """
+    ids: list[uuid.UUID]
+    elapsed_days: np.ndarray
+    streak: np.ndarray
+    category_idx: np.ndarray
+    category_weakness: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+@dataclass
+class QuestionCatalog:
+    """出題候補の問題（TensorFlow専用問題を除く）"""
+    ids: list[uuid.UUID]
+    category_ids: list[uuid.UUID]
+    loaded_at: float
+
+
+_catalog: Optional[QuestionCatalog] = None
+
+
+@dataclass
+class RankedItem:
+    """ランキング結果の1件"""
+    id: uuid.UUID
+    priority: float
+    recall_probability: float
+
+
+def epoch_seconds(value: datetime) -> float:
+    """naive な日時を UTC とみなした UNIX 秒
+
+    PostgreSQL の extract(epoch) と同じ扱い。
+    """
+    return (value - _EPOCH).total_seconds()
+
+
+def _epoch_column(column: Any) -> Any:
+    """日時列を UNIX 秒（double precision）として取得する式"""
+    return cast(func.extract("epoch", column), Float)
+
+
+def build_recall_arrays(
+    rows: Sequence[Any],
+    weakness: dict[uuid.UUID, float],
+    now: datetime,
+) -> RecallArrays:
+    """(id, category_id, 最終回答の UNIX 秒, 連続正解数) の行から配列を作成"""
+    categories = list(weakness)
+    category_index = {category_id: i for i, category_id in enumerate(categories)}
+    count = len(rows)
+
+    # 未回答（None）は NaN になり、経過日数も NaN のまま残る
+    last_answered = np.array([row[2] for row in rows], dtype=np.float64)
+    elapsed_days = (epoch_seconds(now) - last_answered) / _SECONDS_PER_DAY
+
+    return RecallArrays(
+        ids=[row[0] for row in rows],
+        elapsed_days=elapsed_days,
+        streak=np.fromiter(
+            (row[3] or 0 for row in rows), dtype=np.int32, count=count
+        ),
+        category_idx=np.array(
+            [category_index.get(row[1], -1) for row in rows], dtype=np.int32
+        ),
+        category_weakness=np.fromiter(
+            (weakness[c] for c in categories), dtype=np.float64, count=len(categories)
+        ),
+    )
+
+
+def recall_probability(elapsed_days: np.ndarray, streak: np.ndarray) -> np.ndarray:
+    """忘却曲線による想起確率（未回答は UNSEEN_RECALL）"""
+    stability = BASE_STABILITY_DAYS * np.power(
+        STABILITY_GROWTH, streak.astype(np.float64)
+    )
+    recall = np.exp(-np.clip(elapsed_days, 0.0, None) / stability)
+    return np.where(np.isnan(elapsed_days), UNSEEN_RECALL, recall)
+
+
+def priority_scores(arrays: RecallArrays) -> tuple[np.ndarray, np.ndarray]:
+    """優先度と想起確率を一括計算
+
+    Returns:
+        (優先度, 想起確率)
+    """
+    recall = recall_probability(arrays.elapsed_days, arrays.streak)
+    # カテゴリなし（-1）は中立の 0.5 として扱う
+    weakness_table = np.append(arrays.category_weakness, 0.5)
+    weakness = weakness_table[arrays.category_idx]
+    return (1.0 - recall) * (1.0 + WEAKNESS_WEIGHT * weakness), recall
+
+
+def top_k_indices(
+    scores: np.ndarray,
+    k: int,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """スコアの高い順に上位 k 件の添字
+
+    rng を渡すと並べる前に添字をシャッフルし、同点の候補をランダムに選ぶ
+    （渡さなければ同点は添字の小さい順）。
+    """
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.intp)
+    order = (
+        rng.permutation(scores.size) if rng is not None else np.arange(scores.size)
+    )
+    shuffled = scores[order]
+    if k < scores.size:
+        candidates = np.argpartition(-shuffled, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return order[candidates[np.argsort(-shuffled[candidates], kind="stable")]]
+
+
+def rank_top_k(
+    arrays: RecallArrays,
+    k: int,
+    shuffle_ties: bool = False,
+) -> list[RankedItem]:
+    """優先度の高い順に上位 k 件を返す
+
+    shuffle_ties=True なら同点の候補（同じカテゴリの未回答問題など）から
+    ランダムに選ぶ。
+    """
+    if len(arrays) == 0:
+        return []
+    priority, recall = priority_scores(arrays)
+    rng = _tie_break_rng if shuffle_ties else None
+    return [
+        RankedItem(
+            id=arrays.ids[i],
+            priority=float(priority[i]),
+            recall_probability=float(recall[i]),
+        )
+        for i in top_k_indices(priority, k, rng)
+    ]
+
+
+async def load_category_weakness(
+    db: AsyncSession,
+    user_id: str,
+) -> dict[uuid.UUID, float]:
+    """ユーザーのカテゴリごとの苦手度（1 - 平滑化した正答率）"""
+    result = await db.execute(
+        select(
+            Question.category_id,
+            func.count(Answer.id).label("total"),
+            func.sum(cast(Answer.is_correct, Integer)).label("correct"),
+        )
+        .join(Question, Question.id == Answer.question_id)
+        .where(Answer.user_id == user_id)
+        .group_by(Question.category_id)
+    )
+    return {
+        row.category_id: 1.0
+        - ((row.correct or 0) + PRIOR_CORRECT) / (row.total + PRIOR_TOTAL)
+        for row in result.all()
+    }
+
+
+def invalidate_question_catalog() -> None:
+    """出題候補の問題一覧のキャッシュを破棄（問題の追加・削除時）"""
+    global _catalog
+    _catalog = None
+
+
+async def get_question_catalog(db: AsyncSession) -> QuestionCatalog:
+    """出題候補の問題一覧を取得（QUESTION_CATALOG_TTL_SECONDS だけキャッシュ）"""
+    global _catalog
+    if (
+        _catalog is not None
+        and time.monotonic() - _catalog.loaded_at < QUESTION_CATALOG_TTL_SECONDS
+    ):
+        return _catalog
+
+    result = await db.execute(
+        select(Question.id, Question.category_id)
+        # TensorFlow専用問題を除外
+        .where((Question.framework.is_(None)) | (Question.framework != "tensorflow"))
+    )
+    rows = result.all()
+    _catalog = QuestionCatalog(
+        ids=[row[0] for row in rows],
+        category_ids=[row[1] for row in rows],
+        loaded_at=time.monotonic(),
+    )
+    return _catalog
+
+
+async def load_question_arrays(
+    db: AsyncSession,
+    user_id: str,
+    weakness: dict[uuid.UUID, float],
+    exclude_ids: Optional[Sequence[uuid.UUID]] = None,
+    now: Optional[datetime] = None,
+) -> RecallArrays:
+    """出題候補の問題を配列として読み込む
+
+    問題一覧はキャッシュを使い、DBからはユーザーの回答と復習アイテムだけを読む。
+    最終回答日時は回答と復習アイテム（模試での回答も含む）の新しい方を使う。
+    連続正解数は復習アイテムがあればその correct_count、
+    なければ（一度も間違えていないので）正解回数を使う。
+    """
+    now = now or datetime.now()
+    catalog = await get_question_catalog(db)
+
+    answer_stats = (
+        select(
+            Answer.question_id,
+            func.max(Answer.answered_at).label("last_answered_at"),
+            func.sum(cast(Answer.is_correct, Integer)).label("correct"),
+        )
+        .where(Answer.user_id == user_id)
+        .group_by(Answer.question_id)
+        .subquery()
+    )
+    review_stats = (
+        select(
+            ReviewItem.question_id,
+            ReviewItem.last_answered_at,
+            ReviewItem.correct_count,
+        )
+        .where(ReviewItem.user_id == user_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(
+            func.coalesce(answer_stats.c.question_id, review_stats.c.question_id),
+            # GREATEST は NULL を無視するので、片方しかなければその日時になる
+            _epoch_column(
+                func.greatest(
+                    answer_stats.c.last_answered_at,
+                    review_stats.c.last_answered_at,
+                )
+            ),
+            func.coalesce(review_stats.c.correct_count, answer_stats.c.correct),
+        ).select_from(
+            answer_stats.outerjoin(
+                review_stats,
+                review_stats.c.question_id == answer_stats.c.question_id,
+                full=True,
+            )
+        )
+    )
+    user_stats = {row[0]: (row[1], row[2]) for row in result.all()}
+
+    excluded = set(exclude_ids or ())
+    rows = [
+        (question_id, category_id, *user_stats.get(question_id, (None, None)))
+        for question_id, category_id in zip(
+            catalog.ids, catalog.category_ids, strict=True
+        )
+        if question_id not in excluded
+    ]
+    return build_recall_arrays(rows, weakness, now)
+
+
+async def load_review_item_arrays(
+    db: AsyncSession,
+    user_id: str,
+    weakness: dict[uuid.UUID, float],
+    now: Optional[datetime] = None,
+) -> RecallArrays:
+    """アクティブな復習アイテムを配列として読み込む"""
+    now = now or datetime.now()
+    result = await db.execute(
+        select(
+            ReviewItem.id,
+            Question.category_id,
+            _epoch_column(ReviewItem.last_answered_at),
+            ReviewItem.correct_count,
+        )
+        .join(Question, Question.id == ReviewItem.question_id)
+        .where(ReviewItem.user_id == user_id, ReviewItem.status == "active")
+    )
+    return build_recall_arrays(result.all(), weakness, now)
@@ -5,20 +5,105 @@
 - 正解 + active状態 → correct_count + 1
 - correct_count >= MASTERY_THRESHOLD → status="mastered"
 - mastered後に不正解 → 再活性化
+
+activeアイテムは間隔反復（SM-2の簡略版）で next_review_at を進める。
+- 不正解 → 間隔を1日に戻し、ease を下げる
+- 正解 → 間隔を ease 倍に伸ばす
 """
+import copy
+import math
+import time
 import uuid
-from datetime import datetime
-from typing import Optional
-
-from sqlalchemy import select, func
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import (
+    Integer,
+    Select,
+    and_,
+    case,
+    cast,
+    func,
+    literal,
+    or_,
+    select,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.models.mock_exam import MockExam
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.pagination import encode_cursor
+from app.models.answer import Answer
+from app.models.category import Category
+from app.models.mock_exam import MockExam, MockExamAnswer
+from app.models.question import Question
 from app.models.review_item import ReviewItem
+from app.services.recall_ranker import (
+    RankedItem,
+    load_category_weakness,
+    load_review_item_arrays,
+    rank_top_k,
+)
 
 # 習得に必要な連続正解数
 MASTERY_THRESHOLD = 3
 
+# 間隔反復スケジュール
+INITIAL_INTERVAL_DAYS = 1
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+EASE_PENALTY = 0.2
+# 期限到来アイテムの取得件数
+DUE_ITEMS_DEFAULT_LIMIT = 20
+# 優先度順に返す復習アイテムの件数
+NEXT_ITEMS_DEFAULT_LIMIT = 10
+# 詳細一覧の1ページの件数
+DETAILED_ITEMS_PAGE_SIZE = 50
+DETAILED_ITEMS_MAX_PAGE_SIZE = 200
+# 詳細一覧で返す問題文の最大文字数
+QUESTION_PREVIEW_LENGTH = 100
+# 復習統計キャッシュに保持するユーザー数の上限
+REVIEW_STATS_CACHE_MAX_USERS = 10_000
+
+# 復習統計のキャッシュ（user_id → (有効期限の monotonic 秒, 統計)）
+_stats_cache: "OrderedDict[str, tuple[float, dict[str, Any]]]" = OrderedDict()
+
+
+def invalidate_review_stats(user_id: str) -> None:
+    """ユーザーの復習統計キャッシュを破棄する
+
+    復習アイテムの書き込み時に呼ぶ。コミット前に同時の統計取得が古いデータで
+    キャッシュを作り直すことがあるため、コミットする呼び出し側はコミット後にも呼ぶ。
+    """
+    _stats_cache.pop(user_id, None)
+
+
+def clear_review_stats_cache() -> None:
+    """復習統計キャッシュを全て破棄する"""
+    _stats_cache.clear()
+
+
+def next_interval_days(interval_days: int, ease: float) -> int:
+    """正解時の次の復習間隔（日）"""
+    return max(interval_days + 1, math.ceil(interval_days * ease))
+
+
+def _schedule_after_incorrect(item: ReviewItem, now: datetime) -> None:
+    item.interval_days = INITIAL_INTERVAL_DAYS
+    item.ease = max(MIN_EASE, (item.ease or INITIAL_EASE) - EASE_PENALTY)
+    item.next_review_at = now + timedelta(days=INITIAL_INTERVAL_DAYS)
+
+
+def _schedule_after_correct(item: ReviewItem, now: datetime) -> None:
+    item.interval_days = next_interval_days(
+        item.interval_days or INITIAL_INTERVAL_DAYS, item.ease or INITIAL_EASE
+    )
+    item.next_review_at = now + timedelta(days=item.interval_days)
+
 
 async def handle_incorrect_answer(
     db: AsyncSession,
@@ -32,6 +117,7 @@ async def handle_incorrect_answer(
     - 既存mastered: 再活性化(status="active", correct_count=0)
     """
     now = datetime.now()
+    invalidate_review_stats(user_id)
 
     result = await db.execute(
         select(ReviewItem).where(
@@ -50,6 +136,9 @@ async def handle_incorrect_answer(
             status="active",
             first_wrong_at=now,
             last_answered_at=now,
+            interval_days=INITIAL_INTERVAL_DAYS,
+            ease=INITIAL_EASE,
+            next_review_at=now + timedelta(days=INITIAL_INTERVAL_DAYS),
         )
         db.add(item)
         return item
@@ -58,6 +147,7 @@ async def handle_incorrect_answer(
     existing.status = "active"
     existing.mastered_at = None
     existing.last_answered_at = now
+    _schedule_after_incorrect(existing, now)
     return existing
 
 
@@ -73,6 +163,7 @@ async def handle_correct_answer(
     - アイテムがなければNone
     """
     now = datetime.now()
+    invalidate_review_stats(user_id)
 
     result = await db.execute(
         select(ReviewItem).where(
@@ -92,6 +183,9 @@ async def handle_correct_answer(
     if existing.correct_count >= MASTERY_THRESHOLD:
         existing.status = "mastered"
         existing.mastered_at = now
+        existing.next_review_at = None
+    else:
+        _schedule_after_correct(existing, now)
 
     return existing
 
@@ -109,6 +203,120 @@ async def update_review_on_answer(
         return await handle_incorrect_answer(db, question_id, user_id)
 
 
+async def apply_exam_answers_to_review_items(
+    db: AsyncSession,
+    exam_id: uuid.UUID,
+    user_id: str,
+) -> int:
+    """模試の回答結果を復習アイテムへ一括反映する
+
+    update_review_on_answer と同じ遷移を、模試の回答から導出した
+    1回の INSERT ... SELECT ... ON CONFLICT DO UPDATE で適用する。
+    - 不正解 → 新規作成 or correct_countリセット・再活性化
+    - 正解 + 既存active → correct_count+1、閾値到達でmastered化
+    - 未回答、および正解でactiveアイテムがないもの → 対象外
+
+    Returns:
+        作成・更新された復習アイテム数
+    """
+    now = datetime.now()
+    existing = aliased(ReviewItem)
+
+    # 正解はcorrect_count=1、不正解は0としてソース行に載せ、
+    # 競合時の分岐に使う
+    source = (
+        select(
+            func.gen_random_uuid(),
+            MockExamAnswer.question_id,
+            literal(user_id),
+            case((MockExamAnswer.is_correct.is_(True), 1), else_=0),
+            literal("active"),
+            literal(now),
+            literal(now),
+            literal(INITIAL_INTERVAL_DAYS),
+            literal(INITIAL_EASE),
+            literal(now + timedelta(days=INITIAL_INTERVAL_DAYS)),
+        )
+        .select_from(MockExamAnswer)
+        .outerjoin(
+            existing,
+            and_(
+                existing.question_id == MockExamAnswer.question_id,
+                existing.user_id == user_id,
+            ),
+        )
+        .where(
+            MockExamAnswer.mock_exam_id == exam_id,
+            or_(
+                MockExamAnswer.is_correct.is_(False),
+                and_(
+                    MockExamAnswer.is_correct.is_(True),
+                    existing.status == "active",
+                ),
+            ),
+        )
+    )
+
+    stmt = pg_insert(ReviewItem).from_select(
+        [
+            "id",
+            "question_id",
+            "user_id",
+            "correct_count",
+            "status",
+            "first_wrong_at",
+            "last_answered_at",
+            "interval_days",
+            "ease",
+            "next_review_at",
+        ],
+        source,
+    )
+    was_wrong = stmt.excluded.correct_count == 0
+    next_count = ReviewItem.correct_count + 1
+    reaches_mastery = next_count >= MASTERY_THRESHOLD
+    # next_interval_days と同じ計算
+    grown_interval = func.greatest(
+        ReviewItem.interval_days + 1,
+        cast(func.ceil(ReviewItem.interval_days * ReviewItem.ease), Integer),
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_review_items_question_user",
+        set_={
+            "correct_count": case((was_wrong, 0), else_=next_count),
+            "status": case(
+                (was_wrong, "active"),
+                (reaches_mastery, "mastered"),
+                else_=ReviewItem.status,
+            ),
+            "mastered_at": case(
+                (was_wrong, None),
+                (reaches_mastery, stmt.excluded.last_answered_at),
+                else_=ReviewItem.mastered_at,
+            ),
+            "last_answered_at": stmt.excluded.last_answered_at,
+            "interval_days": case(
+                (was_wrong, INITIAL_INTERVAL_DAYS),
+                (reaches_mastery, ReviewItem.interval_days),
+                else_=grown_interval,
+            ),
+            "ease": case(
+                (was_wrong, func.greatest(MIN_EASE, ReviewItem.ease - EASE_PENALTY)),
+                else_=ReviewItem.ease,
+            ),
+            "next_review_at": case(
+                (was_wrong, stmt.excluded.next_review_at),
+                (reaches_mastery, None),
+                else_=stmt.excluded.last_answered_at
+                + func.make_interval(0, 0, 0, grown_interval),
+            ),
+        },
+    )
+    result = await db.execute(stmt)
+    invalidate_review_stats(user_id)
+    return result.rowcount or 0
+
+
 async def get_active_review_items(
     db: AsyncSession,
     user_id: str,
@@ -125,6 +333,55 @@ async def get_active_review_items(
     return list(result.scalars().all())
 
 
+async def get_due_review_items(
+    db: AsyncSession,
+    user_id: str,
+    limit: int = DUE_ITEMS_DEFAULT_LIMIT,
+    now: Optional[datetime] = None,
+) -> list[ReviewItem]:
+    """復習期限が来たactiveアイテムを期限の古い順に取得
+
+    (user_id, next_review_at) WHERE status='active' の部分インデックスを
+    範囲スキャンするため、バックログの件数に関わらず limit 件で打ち切られる。
+    """
+    now = now or datetime.now()
+    result = await db.execute(
+        select(ReviewItem)
+        .where(
+            ReviewItem.user_id == user_id,
+            ReviewItem.status == "active",
+            ReviewItem.next_review_at <= now,
+        )
+        .order_by(ReviewItem.next_review_at.asc())
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+async def get_next_review_items(
+    db: AsyncSession,
+    user_id: str,
+    limit: int = NEXT_ITEMS_DEFAULT_LIMIT,
+    now: Optional[datetime] = None,
+) -> list[tuple[ReviewItem, RankedItem]]:
+    """activeアイテムを忘却曲線の優先度が高い順に取得
+
+    全アイテムは (ID, カテゴリ, 最終回答日時, 連続正解数) の列だけを読み込んで
+    NumPy で一括スコアリングし、上位 limit 件だけを行として取得する。
+    """
+    weakness = await load_category_weakness(db, user_id)
+    arrays = await load_review_item_arrays(db, user_id, weakness, now=now)
+    ranked = rank_top_k(arrays, limit)
+    if not ranked:
+        return []
+
+    result = await db.execute(
+        select(ReviewItem).where(ReviewItem.id.in_([r.id for r in ranked]))
+    )
+    items = {item.id: item for item in result.scalars().all()}
+    return [(items[r.id], r) for r in ranked if r.id in items]
+
+
 async def get_mastered_items(
     db: AsyncSession,
     user_id: str,
@@ -141,118 +398,354 @@ async def get_mastered_items(
     return list(result.scalars().all())
 
 
-async def get_review_stats(
+async def _query_review_stats(
     db: AsyncSession,
     user_id: str,
-) -> dict[str, int]:
-    """復習統計を取得"""
-    active_result = await db.execute(
-        select(func.count(ReviewItem.id)).where(
-            ReviewItem.user_id == user_id,
-            ReviewItem.status == "active",
+    now: datetime,
+) -> dict[str, Any]:
+    """ステータス × カテゴリの1回の GROUP BY から統計を組み立てる"""
+    # 今日中（翌日0時より前）に期限が来る active アイテムを due_today とする
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    result = await db.execute(
+        select(
+            ReviewItem.status,
+            Question.category_id,
+            Category.name.label("category_name"),
+            func.count().label("count"),
+            func.count()
+            .filter(
+                ReviewItem.status == "active",
+                ReviewItem.next_review_at < tomorrow,
+            )
+            .label("due_today"),
         )
+        .join(Question, Question.id == ReviewItem.question_id)
+        .join(Category, Category.id == Question.category_id)
+        .where(ReviewItem.user_id == user_id)
+        .group_by(ReviewItem.status, Question.category_id, Category.name)
     )
-    active_count = active_result.scalar() or 0
 
-    mastered_result = await db.execute(
-        select(func.count(ReviewItem.id)).where(
-            ReviewItem.user_id == user_id,
-            ReviewItem.status == "mastered",
+    totals = {"active": 0, "mastered": 0}
+    due_today = 0
+    categories: dict[uuid.UUID, dict[str, Any]] = {}
+    for row in result.all():
+        if row.status not in totals:
+            continue
+        totals[row.status] += row.count
+        due_today += row.due_today
+        category = categories.setdefault(
+            row.category_id,
+            {
+                "category_id": row.category_id,
+                "category_name": row.category_name,
+                "active_count": 0,
+                "mastered_count": 0,
+                "due_today_count": 0,
+            },
         )
-    )
-    mastered_count = mastered_result.scalar() or 0
+        category[f"{row.status}_count"] += row.count
+        category["due_today_count"] += row.due_today
 
     return {
-        "active_count": active_count,
-        "mastered_count": mastered_count,
-        "total_count": active_count + mastered_count,
+        "active_count": totals["active"],
+        "mastered_count": totals["mastered"],
+        "total_count": totals["active"] + totals["mastered"],
+        "due_today_count": due_today,
+        "category_counts": sorted(
+            categories.values(),
+            key=lambda c: (-c["active_count"], c["category_name"]),
+        ),
     }
 
 
+async def get_review_stats(
+    db: AsyncSession,
+    user_id: str,
+    now: Optional[datetime] = None,
+) -> dict[str, Any]:
+    """復習統計を取得
+
+    結果はユーザーごとに review_stats_cache_ttl_seconds 秒キャッシュし、
+    復習アイテムの書き込み時に破棄する。now を指定した場合はキャッシュを使わない。
+    """
+    ttl = settings.review_stats_cache_ttl_seconds
+    use_cache = now is None and ttl > 0
+    if use_cache:
+        cached = _stats_cache.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            _stats_cache.move_to_end(user_id)
+            return copy.deepcopy(cached[1])
+
+    stats = await _query_review_stats(db, user_id, now or datetime.now())
+
+    if use_cache:
+        _stats_cache[user_id] = (time.monotonic() + ttl, stats)
+        _stats_cache.move_to_end(user_id)
+        while len(_stats_cache) > REVIEW_STATS_CACHE_MAX_USERS:
+            _stats_cache.popitem(last=False)
+        return copy.deepcopy(stats)
+    return stats
+
+
 async def get_review_items_with_details(
     db: AsyncSession,
     user_id: str,
     status_filter: Optional[str] = None,
-) -> list[dict]:
-    """復習アイテムを問題内容・カテゴリ名と共に取得する
-
-    N+1回避のため selectinload で question をプリフェッチ。
+    limit: int = DETAILED_ITEMS_PAGE_SIZE,
+    cursor: Optional[tuple[datetime, uuid.UUID]] = None,
+) -> dict[str, Any]:
+    """復習アイテムを問題内容（先頭100文字）・カテゴリ名と共に取得する
+
+    必要な列だけを射影し、問題文は left() でDB側で切り詰める。
+    (最終回答日時, ID) の降順でキーセットページングし、総件数は同じ文の
+    スカラーサブクエリで返す。
+
+    Args:
+        db: データベースセッション
+        user_id: ユーザーID
+        status_filter: "active" / "mastered"（省略時は全件）
+        limit: 1ページの件数
+        cursor: 前ページ末尾の (last_answered_at, id)
+
+    Returns:
+        {"items": 詳細の一覧, "total_count": 総件数,
+         "next_cursor": 次ページのカーソル or None}
     """
-    from sqlalchemy.orm import selectinload
-    from app.models.question import Question
+    conditions = [ReviewItem.user_id == user_id]
+    if status_filter:
+        conditions.append(ReviewItem.status == status_filter)
 
+    total_subquery = (
+        select(func.count()).select_from(ReviewItem).where(*conditions).scalar_subquery()
+    )
     query = (
-        select(ReviewItem)
-        .options(
-            selectinload(ReviewItem.question).selectinload(Question.category)
+        select(
+            ReviewItem.id,
+            ReviewItem.question_id,
+            ReviewItem.user_id,
+            ReviewItem.correct_count,
+            ReviewItem.status,
+            ReviewItem.first_wrong_at,
+            ReviewItem.last_answered_at,
+            ReviewItem.mastered_at,
+            ReviewItem.interval_days,
+            ReviewItem.ease,
+            ReviewItem.next_review_at,
+            func.left(Question.content, QUESTION_PREVIEW_LENGTH).label(
+                "question_content"
+            ),
+            Category.name.label("question_category_name"),
+            total_subquery.label("total_count"),
         )
-        .where(ReviewItem.user_id == user_id)
+        .join(Question, Question.id == ReviewItem.question_id)
+        .outerjoin(Category, Category.id == Question.category_id)
+        .where(*conditions)
+        .order_by(ReviewItem.last_answered_at.desc(), ReviewItem.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        query = query.where(
+            tuple_(ReviewItem.last_answered_at, ReviewItem.id) < tuple_(*cursor)
+        )
+    rows = list((await db.execute(query)).all())
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if rows:
+        total_count = rows[0].total_count
+    elif cursor is None:
+        total_count = 0
+    else:
+        # カーソル以降が空の場合のみ件数を別途取得
+        count_result = await db.execute(
+            select(func.count()).select_from(ReviewItem).where(*conditions)
+        )
+        total_count = count_result.scalar_one()
+
+    items = [
+        {key: value for key, value in row._mapping.items() if key != "total_count"}
+        for row in rows
+    ]
+    next_cursor = (
+        encode_cursor(rows[-1].last_answered_at, rows[-1].id)
+        if has_more
+        else None
     )
+    return {"items": items, "total_count": total_count, "next_cursor": next_cursor}
 
-    if status_filter:
-        query = query.where(ReviewItem.status == status_filter)
-
-    query = query.order_by(ReviewItem.last_answered_at.desc())
-    result = await db.execute(query)
-    items = result.scalars().all()
-
-    details = []
-    for item in items:
-        content = item.question.content if item.question else ""
-        # 100文字に切り詰め
-        truncated = content[:100] if len(content) > 100 else content
-
-        category_name = None
-        if item.question and hasattr(item.question, "category") and item.question.category:
-            category_name = item.question.category.name
-
-        details.append({
-            "id": item.id,
-            "question_id": item.question_id,
-            "user_id": item.user_id,
-            "correct_count": item.correct_count,
-            "status": item.status,
-            "first_wrong_at": item.first_wrong_at,
-            "last_answered_at": item.last_answered_at,
-            "mastered_at": item.mastered_at,
-            "question_content": truncated,
-            "question_category_name": category_name,
-        })
-
-    return details
+
+def build_review_replay_query(user_id: Optional[str] = None) -> Select[Any]:
+    """回答履歴を (user_id, question_id) ごとに集約する再生クエリ
+
+    answers と完了済み模試の mock_exam_answers を時系列に並べ、
+    ウィンドウ関数で最後の不正解の位置を求めて以下を返す（不正解のない組は除外）。
+    - first_wrong_at: 最初の不正解日時
+    - last_answered_at: 最終回答日時（習得済みなら習得した回答の日時）
+    - wrong_count: 不正解回数
+    - streak: 最後の不正解以降の連続正解数（MASTERY_THRESHOLD で頭打ち）
+    """
+    practice = select(
+        Answer.user_id,
+        Answer.question_id,
+        Answer.answered_at,
+        Answer.is_correct,
+    )
+    exam = (
+        select(
+            MockExam.user_id,
+            MockExamAnswer.question_id,
+            func.coalesce(MockExamAnswer.answered_at, MockExam.finished_at),
+            MockExamAnswer.is_correct,
+        )
+        .join(MockExam, MockExam.id == MockExamAnswer.mock_exam_id)
+        .where(
+            MockExam.status == "finished",
+            MockExamAnswer.is_correct.is_not(None),
+        )
+    )
+    if user_id is not None:
+        practice = practice.where(Answer.user_id == user_id)
+        exam = exam.where(MockExam.user_id == user_id)
+    events = union_all(practice, exam).subquery("events")
+
+    e = events.c
+    sequenced = select(
+        events,
+        func.row_number()
+        .over(partition_by=(e.user_id, e.question_id), order_by=e.answered_at)
+        .label("seq"),
+    ).subquery("sequenced")
+
+    q = sequenced.c
+    marked = select(
+        sequenced,
+        func.max(q.seq)
+        .filter(q.is_correct.is_(False))
+        .over(partition_by=(q.user_id, q.question_id))
+        .label("last_wrong_seq"),
+    ).subquery("marked")
+
+    m = marked.c
+    wrong = m.is_correct.is_(False)
+    # 習得後の正解はアイテムを更新しないため、習得した回答までを再生対象とする
+    replayed = m.seq <= m.last_wrong_seq + MASTERY_THRESHOLD
+    return (
+        select(
+            m.user_id,
+            m.question_id,
+            func.min(m.answered_at).filter(wrong).label("first_wrong_at"),
+            func.max(m.answered_at).filter(replayed).label("last_answered_at"),
+            func.count().filter(wrong).label("wrong_count"),
+            func.least(
+                func.count().filter(m.seq > m.last_wrong_seq), MASTERY_THRESHOLD
+            ).label("streak"),
+        )
+        .where(m.last_wrong_seq.is_not(None))
+        .group_by(m.user_id, m.question_id)
+    )
+
+
+def _replayed_interval(steps: Any, ease: Any) -> Any:
+    """初期間隔から next_interval_days を steps 回適用した間隔のSQL式"""
+    intervals: list[Any] = [literal(INITIAL_INTERVAL_DAYS)]
+    for _ in range(MASTERY_THRESHOLD - 1):
+        prev = intervals[-1]
+        intervals.append(
+            func.greatest(prev + 1, cast(func.ceil(prev * ease), Integer))
+        )
+    return case(
+        *[(steps == k, interval) for k, interval in enumerate(intervals)],
+        else_=intervals[-1],
+    )
+
+
+async def replay_review_history(
+    db: AsyncSession,
+    user_id: Optional[str] = None,
+) -> int:
+    """回答履歴を再生した結果で復習アイテムを作成・上書きする
+
+    update_review_on_answer を全回答に順に適用した場合と同じ状態
+    （スケジュールを含む）を、1回の INSERT ... SELECT ... ON CONFLICT DO UPDATE で
+    書き込む。
+    履歴全体から求めるため、何度実行しても結果は同じ。
+
+    Args:
+        db: データベースセッション
+        user_id: 対象ユーザー（省略時は全ユーザー）
+
+    Returns:
+        作成・更新された復習アイテム数
+    """
+    history = build_review_replay_query(user_id).subquery("history")
+    h = history.c
+    mastered = h.streak >= MASTERY_THRESHOLD
+    # 最初の不正解で INITIAL_EASE のアイテムが作られ、以降の不正解ごとに下がる
+    ease = func.greatest(MIN_EASE, INITIAL_EASE - EASE_PENALTY * (h.wrong_count - 1))
+    interval = _replayed_interval(func.least(h.streak, MASTERY_THRESHOLD - 1), ease)
+
+    source = select(
+        func.gen_random_uuid(),
+        h.question_id,
+        h.user_id,
+        h.streak,
+        case((mastered, "mastered"), else_="active"),
+        h.first_wrong_at,
+        h.last_answered_at,
+        case((mastered, h.last_answered_at)),
+        interval,
+        ease,
+        case(
+            (mastered, None),
+            else_=h.last_answered_at + func.make_interval(0, 0, 0, interval),
+        ),
+    )
+    columns = [
+        "id",
+        "question_id",
+        "user_id",
+        "correct_count",
+        "status",
+        "first_wrong_at",
+        "last_answered_at",
+        "mastered_at",
+        "interval_days",
+        "ease",
+        "next_review_at",
+    ]
+    stmt = pg_insert(ReviewItem).from_select(columns, source)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_review_items_question_user",
+        set_={name: stmt.excluded[name] for name in columns[3:]},
+    )
+    result = await db.execute(stmt)
+
+    if user_id is None:
+        clear_review_stats_cache()
+    else:
+        invalidate_review_stats(user_id)
+    return result.rowcount or 0
 
 
 async def backfill_review_items_for_user(
     db: AsyncSession,
     user_id: str,
 ) -> dict[str, int]:
-    """既存の完了済み模試から復習アイテムを遡及的に作成する
+    """既存の回答・完了済み模試から復習アイテムを遡及的に作成する
 
-    update_review_on_answer は冪等なので、2回実行しても安全。
+    replay_review_history で履歴全体を再生するため、2回実行しても安全。
     """
-    from sqlalchemy.orm import selectinload
-
-    result = await db.execute(
-        select(MockExam)
-        .options(selectinload(MockExam.answers))
-        .where(
+    exams_result = await db.execute(
+        select(func.count(MockExam.id)).where(
             MockExam.user_id == user_id,
             MockExam.status == "finished",
         )
     )
-    exams = result.scalars().all()
-
-    items_created = 0
-    for exam in exams:
-        for answer in exam.answers:
-            if answer.is_correct is not None:
-                item = await update_review_on_answer(
-                    db, answer.question_id, user_id, answer.is_correct
-                )
-                if item is not None:
-                    items_created += 1
+    exams_processed = exams_result.scalar() or 0
+    items_created = await replay_review_history(db, user_id)
 
     return {
-        "exams_processed": len(exams),
+        "exams_processed": exams_processed,
         "items_created": items_created,
     }
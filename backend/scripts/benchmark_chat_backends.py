@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""問題チャットのバックエンド比較ベンチマーク
+
+ローカルのスタブサーバー（Messages API のストリーミング形式を返す）を起動し、
+stream_chat_response を api / cli の各バックエンドで同時に実行して
+最初のチャンクまでの時間（TTFT）と完了までの時間を計測する。
+
+- api: 共有の AsyncAnthropic クライアントがスタブサーバーに直接接続する
+- cli: スタブの `claude` コマンド（Python スクリプト）を PATH の先頭に置き、
+  リクエストごとにプロセスを起動してスタブサーバーから応答を読む。
+  実際の CLI と同様、stream-json では応答が完成してから assistant イベントを1回出力する
+
+外部のAPIやCLIには接続しない。
+
+Usage:
+    # 同時 1 / 8 / 32 チャット
+    python scripts/benchmark_chat_backends.py
+    python scripts/benchmark_chat_backends.py \\
+        --concurrency 1 64 --tokens 40 --token-interval-ms 10
+    # CLI の起動コストを上乗せ
+    python scripts/benchmark_chat_backends.py --cli-startup-ms 400
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from app.core.config import settings
+from app.services import chat_service
+from app.services.anthropic_client import close_anthropic_client
+from app.services.chat_service import stream_chat_response
+
+STUB_CLI = '''\
+#!{python}
+"""ベンチマーク用のスタブ claude コマンド"""
+import json
+import sys
+import time
+import urllib.request
+
+time.sleep({startup_seconds})
+request = urllib.request.Request(
+    "{base_url}/v1/messages",
+    data=json.dumps(
+        {{"messages": [{{"role": "user", "content": sys.argv[2]}}]}}
+    ).encode(),
+    headers={{"content-type": "application/json"}},
+)
+text = ""
+with urllib.request.urlopen(request) as response:
+    for line in response:
+        line = line.decode().strip()
+        if line.startswith("data: "):
+            event = json.loads(line[6:])
+            if event.get("type") == "content_block_delta":
+                text += event["delta"]["text"]
+message = {{"content": [{{"type": "text", "text": text}}]}}
+for event in (
+    {{"type": "system", "subtype": "init"}},
+    {{"type": "assistant", "message": message}},
+    {{"type": "result", "subtype": "success", "result": text}},
+):
+    print(json.dumps(event), flush=True)
+'''
+
+
+def build_stub_app(
+    tokens: int,
+    first_token_ms: float,
+    token_interval_ms: float,
+) -> Starlette:
+    """Messages API のストリーミング応答を返すスタブアプリ"""
+
+    def sse(event: dict[str, Any]) -> bytes:
+        return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+    async def messages(request: Request) -> StreamingResponse:
+        await request.body()
+
+        async def events():
+            yield sse({
+                "type": "message_start",
+                "message": {
+                    "id": "msg_stub", "type": "message", "role": "assistant",
+                    "content": [], "model": "stub", "stop_reason": None,
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": 100, "output_tokens": 1},
+                },
+            })
+            yield sse({
+                "type": "content_block_start", "index": 0,
+                "content_block": {"type": "text", "text": ""},
+            })
+            await asyncio.sleep(first_token_ms / 1000)
+            for i in range(tokens):
+                if i:
+                    await asyncio.sleep(token_interval_ms / 1000)
+                yield sse({
+                    "type": "content_block_delta", "index": 0,
+                    "delta": {"type": "text_delta", "text": f"トークン{i} "},
+                })
+            yield sse({"type": "content_block_stop", "index": 0})
+            yield sse({
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": tokens},
+            })
+            yield sse({"type": "message_stop"})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/v1/messages", messages, methods=["POST"])])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def install_stub_cli(directory: Path, base_url: str, startup_ms: float) -> None:
+    """スタブの claude コマンドを作成し PATH の先頭に追加"""
+    path = directory / "claude"
+    path.write_text(
+        STUB_CLI.format(
+            python=sys.executable,
+            startup_seconds=startup_ms / 1000,
+            base_url=base_url,
+        )
+    )
+    path.chmod(0o755)
+    os.environ["PATH"] = f"{directory}{os.pathsep}{os.environ['PATH']}"
+
+
+async def run_chat() -> tuple[float, float, int]:
+    """1チャット分を実行し (TTFT秒, 完了秒, チャンク数) を返す"""
+    start = time.perf_counter()
+    first = None
+    chunks = 0
+    async for chunk in stream_chat_response(
+        question_content="活性化関数の役割として正しいものはどれか。",
+        choices=["正規化", "非線形性の導入", "損失計算", "勾配計算"],
+        correct_answer=1,
+        explanation="活性化関数はネットワークに非線形性を導入する。",
+        history=[],
+        user_message="ReLU と sigmoid の違いを教えてください",
+    ):
+        if "[エラー]" in chunk:
+            raise RuntimeError("チャットの生成に失敗しました")
+        if first is None:
+            first = time.perf_counter() - start
+        chunks += 1
+    return first or 0.0, time.perf_counter() - start, chunks
+
+
+async def measure(backend: str, concurrency: int) -> dict[str, float]:
+    settings.chat_backend = backend
+    start = time.perf_counter()
+    results = await asyncio.gather(*[run_chat() for _ in range(concurrency)])
+    wall = time.perf_counter() - start
+    ttft = sorted(r[0] for r in results)
+    return {
+        "ttft_p50": statistics.median(ttft) * 1000,
+        "ttft_p95": ttft[min(len(ttft) - 1, int(len(ttft) * 0.95))] * 1000,
+        "total_p50": statistics.median(r[1] for r in results) * 1000,
+        "chats_per_sec": concurrency / wall,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = uvicorn.Server(
+        uvicorn.Config(
+            build_stub_app(args.tokens, args.first_token_ms, args.token_interval_ms),
+            host="127.0.0.1",
+            port=port,
+            log_level="warning",
+        )
+    )
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    settings.anthropic_api_key = "stub-key"
+    settings.chat_api_base_url = base_url
+    settings.chat_max_concurrency = max(args.concurrency)
+    chat_service._chat_slots = None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        install_stub_cli(Path(tmp), base_url, args.cli_startup_ms)
+
+        print(
+            f"{'backend':>8} {'同時数':>6} {'TTFT p50(ms)':>13} {'TTFT p95(ms)':>13} "
+            f"{'完了 p50(ms)':>13} {'chats/s':>9}"
+        )
+        for backend in args.backends:
+            # 接続の確立をウォームアップで済ませておく
+            settings.chat_backend = backend
+            await run_chat()
+            for concurrency in args.concurrency:
+                r = await measure(backend, concurrency)
+                print(
+                    f"{backend:>8} {concurrency:>6} {r['ttft_p50']:>13.1f} "
+                    f"{r['ttft_p95']:>13.1f} {r['total_p50']:>13.1f} "
+                    f"{r['chats_per_sec']:>9.1f}"
+                )
+
+    await close_anthropic_client()
+    server.should_exit = True
+    await server_task
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="問題チャットのバックエンド比較")
+    parser.add_argument(
+        "--backends", nargs="+", default=["api", "cli"], choices=["api", "cli"]
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 8, 32], help="同時チャット数"
+    )
+    parser.add_argument("--tokens", type=int, default=30, help="1応答のトークン数")
+    parser.add_argument(
+        "--first-token-ms",
+        type=float,
+        default=300,
+        help="スタブの最初のトークンまでの遅延",
+    )
+    parser.add_argument(
+        "--token-interval-ms", type=float, default=15, help="スタブのトークン間隔"
+    )
+    parser.add_argument(
+        "--cli-startup-ms", type=float, default=0, help="スタブCLIに上乗せする起動時間"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""模試開始時の行書き込みベンチマーク
+
+ORMで1行ずつ add → flush する方式と、insert_exam_rows による複数行INSERTを比較する。
+計測はトランザクション内で行い、最後にロールバックするためDBにデータは残らない。
+既存の問題IDを使い回すため、事前に問題がインポートされている必要がある。
+
+Usage:
+    python scripts/benchmark_mock_exam_insert.py                  # 100問・1000問
+    python scripts/benchmark_mock_exam_insert.py --sizes 100 --repeat 20
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import async_session_maker
+from app.models.mock_exam import MockExam, MockExamAnswer
+from app.models.question import Question
+from app.services.mock_exam_service import insert_exam_rows
+
+
+def build_rows(
+    question_ids: list[uuid.UUID],
+    size: int,
+) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """ベンチマーク用の模試ヘッダーと回答枠を生成"""
+    exam_id = uuid.uuid4()
+    exam_row = {
+        "id": exam_id,
+        "user_id": "benchmark-user",
+        "started_at": datetime.utcnow(),
+        "total_questions": size,
+        "correct_count": 0,
+        "score": 0.0,
+        "status": "in_progress",
+    }
+    ids = itertools.cycle(question_ids)
+    answer_rows = [
+        {
+            "id": uuid.uuid4(),
+            "mock_exam_id": exam_id,
+            "question_id": next(ids),
+            "question_index": i,
+            "category_name": "benchmark",
+            "exam_area": "benchmark",
+            "topic": None,
+        }
+        for i in range(size)
+    ]
+    return exam_row, answer_rows
+
+
+async def write_with_orm(
+    db: AsyncSession,
+    exam_row: dict[str, Any],
+    answer_rows: list[dict[str, Any]],
+) -> None:
+    """従来方式: ORMオブジェクトを1件ずつ add して flush"""
+    db.add(MockExam(**exam_row))
+    for row in answer_rows:
+        db.add(MockExamAnswer(**row))
+    await db.flush()
+
+
+async def measure(
+    db: AsyncSession,
+    question_ids: list[uuid.UUID],
+    size: int,
+    repeat: int,
+    bulk: bool,
+) -> list[float]:
+    """書き込み時間（ミリ秒）を repeat 回計測"""
+    timings: list[float] = []
+    for _ in range(repeat):
+        exam_row, answer_rows = build_rows(question_ids, size)
+        start = time.perf_counter()
+        if bulk:
+            await insert_exam_rows(db, exam_row, answer_rows)
+        else:
+            await write_with_orm(db, exam_row, answer_rows)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.expunge_all()
+    return timings
+
+
+async def run(sizes: list[int], repeat: int) -> None:
+    """各サイズでORM方式と複数行INSERT方式を比較"""
+    async with async_session_maker() as db:
+        result = await db.execute(select(Question.id).limit(max(sizes)))
+        question_ids = list(result.scalars().all())
+        if not question_ids:
+            print("問題が登録されていません。先に問題をインポートしてください。")
+            return
+
+        print(f"{'問題数':>8} {'方式':<10} {'中央値(ms)':>12} {'最小(ms)':>10}")
+        try:
+            for size in sizes:
+                for label, bulk in (("ORM", False), ("bulk", True)):
+                    # 初回の接続確立・文のキャッシュを計測から除外
+                    await measure(db, question_ids, size, 1, bulk)
+                    timings = await measure(db, question_ids, size, repeat, bulk)
+                    print(
+                        f"{size:>8} {label:<10} "
+                        f"{statistics.median(timings):>12.1f} {min(timings):>10.1f}"
+                    )
+        finally:
+            await db.rollback()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="模試開始時の行書き込みベンチマーク")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100, 1000],
+        help="1模試あたりの問題数（複数指定可）",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=10,
+        help="各条件の計測回数",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
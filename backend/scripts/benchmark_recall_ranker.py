@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""忘却曲線ランキングのマイクロベンチマーク
+
+合成した候補データに対して、1件ずつ Python で優先度を計算してソートする方式と、
+recall_ranker の NumPy 一括計算（argpartition による上位k件）を比較する。
+DBには接続しない。
+
+Usage:
+    # 1,000 / 10,000 / 100,000件
+    python scripts/benchmark_recall_ranker.py
+    python scripts/benchmark_recall_ranker.py --sizes 5000 --top-k 20 --repeat 50
+"""
+import argparse
+import math
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.recall_ranker import (
+    BASE_STABILITY_DAYS,
+    STABILITY_GROWTH,
+    UNSEEN_RECALL,
+    WEAKNESS_WEIGHT,
+    build_recall_arrays,
+    epoch_seconds,
+    rank_top_k,
+)
+
+CATEGORY_COUNT = 30
+
+
+def build_rows(
+    size: int,
+    now: datetime,
+) -> tuple[list[tuple[Any, ...]], dict[uuid.UUID, float]]:
+    """ベンチマーク用の候補行とカテゴリ苦手度を生成（2割は未回答）
+
+    行は DB から読み込む形（最終回答日時は UNIX 秒）に合わせる。
+    """
+    rng = random.Random(size)
+    categories = [uuid.uuid4() for _ in range(CATEGORY_COUNT)]
+    weakness = {c: rng.random() for c in categories}
+    rows = []
+    for _ in range(size):
+        answered = rng.random() >= 0.2
+        rows.append(
+            (
+                uuid.uuid4(),
+                rng.choice(categories),
+                epoch_seconds(now - timedelta(hours=rng.uniform(0, 24 * 60)))
+                if answered
+                else None,
+                rng.randint(0, 4) if answered else None,
+            )
+        )
+    return rows, weakness
+
+
+def rank_with_python(
+    rows: list[tuple[Any, ...]],
+    weakness: dict[uuid.UUID, float],
+    now: datetime,
+    top_k: int,
+) -> list[float]:
+    """比較用: 1件ずつ優先度を計算して全件ソートし、上位k件の優先度を返す"""
+    now_ts = epoch_seconds(now)
+    scored = []
+    for question_id, category_id, last_answered_at, streak in rows:
+        if last_answered_at is None:
+            recall = UNSEEN_RECALL
+        else:
+            elapsed = (now_ts - last_answered_at) / 86400.0
+            stability = BASE_STABILITY_DAYS * STABILITY_GROWTH ** (streak or 0)
+            recall = math.exp(-max(elapsed, 0.0) / stability)
+        weak = weakness.get(category_id, 0.5)
+        scored.append(((1.0 - recall) * (1.0 + WEAKNESS_WEIGHT * weak), question_id))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [priority for priority, _ in scored[:top_k]]
+
+
+def measure_ms(func: Any, repeat: int) -> float:
+    """中央値（ミリ秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="忘却曲線ランキングのベンチマーク")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000, 100_000],
+        help="候補数",
+    )
+    parser.add_argument("--top-k", type=int, default=10, help="取得件数")
+    parser.add_argument("--repeat", type=int, default=20, help="計測回数")
+    args = parser.parse_args()
+
+    now = datetime.now()
+    print(
+        f"{'件数':>10} {'Python(ms)':>12} {'配列化(ms)':>12} "
+        f"{'NumPy(ms)':>12} {'倍率':>8}"
+    )
+    for size in args.sizes:
+        rows, weakness = build_rows(size, now)
+
+        python_ms = measure_ms(
+            partial(rank_with_python, rows, weakness, now, args.top_k), args.repeat
+        )
+        build_ms = measure_ms(
+            partial(build_recall_arrays, rows, weakness, now), args.repeat
+        )
+        arrays = build_recall_arrays(rows, weakness, now)
+        numpy_ms = measure_ms(partial(rank_top_k, arrays, args.top_k), args.repeat)
+
+        # 両方式の上位k件の優先度が一致することを確認（同点の並びは問わない）
+        expected = rank_with_python(rows, weakness, now, args.top_k)
+        actual = [r.priority for r in rank_top_k(arrays, args.top_k)]
+        matched = len(expected) == len(actual) and all(
+            math.isclose(e, a) for e, a in zip(expected, actual, strict=True)
+        )
+        if not matched:
+            print(f"警告: {size}件で上位{args.top_k}件が一致しません")
+
+        print(
+            f"{size:>10,} {python_ms:>12.2f} {build_ms:>12.2f} {numpy_ms:>12.2f} "
+            f"{python_ms / numpy_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
-"""既存answersテーブルから復習アイテムを生成する移行スクリプト
+"""既存の回答履歴から復習アイテムを生成する移行スクリプト
 
-各ユーザー×問題の回答履歴を分析し、review_itemsテーブルにデータを移行する。
+answers と完了済み模試の回答を時系列に再生し、review_itemsテーブルにデータを移行する。
+再生はSQL（replay_review_history）で行い、全ユーザー分を1回のUPSERTで書き込む。
 - 不正解が1回でもある問題 → review_item作成
 - 最終不正解以降の連続正解数をcorrect_countに設定
-- 連続正解が10回以上 → mastered
+- 連続正解が MASTERY_THRESHOLD 回以上 → mastered
+- 既存の review_item は再生結果で上書きする（何度実行しても同じ結果）
 
 Usage:
     python scripts/migrate_review_items.py --dry-run   # プレビュー
@@ -13,120 +15,50 @@ Usage:
 import argparse
 import asyncio
 import sys
-import uuid
-from collections import defaultdict
-from datetime import datetime
+import time
 from pathlib import Path
 
 # プロジェクトルートをパスに追加
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from sqlalchemy import select
+from sqlalchemy import func, select
 
 from app.core.database import async_session_maker
-from app.models.answer import Answer
-from app.models.review_item import ReviewItem
-from app.services.review_service import MASTERY_THRESHOLD
+from app.services.review_service import (
+    MASTERY_THRESHOLD,
+    build_review_replay_query,
+    replay_review_history,
+)
 
 
 async def migrate(dry_run: bool = False) -> None:
-    """answersテーブルからreview_itemsを生成"""
+    """回答履歴からreview_itemsを生成"""
     async with async_session_maker() as db:
-        # 全回答を時系列順に取得
+        history = build_review_replay_query().subquery("history")
         result = await db.execute(
-            select(Answer).order_by(Answer.answered_at.asc())
-        )
-        answers = list(result.scalars().all())
-
-        print(f"回答レコード数: {len(answers)}")
-
-        # ユーザー×問題ごとに回答履歴をグループ化
-        history: dict[tuple[str, str], list[Answer]] = defaultdict(list)
-        for answer in answers:
-            key = (answer.user_id, str(answer.question_id))
-            history[key].append(answer)
-
-        print(f"ユーザー×問題の組み合わせ数: {len(history)}")
-
-        created = 0
-        mastered = 0
-        skipped = 0
-
-        for (user_id, question_id_str), user_answers in history.items():
-            question_id = uuid.UUID(question_id_str)
-
-            # 不正解が1回もなければスキップ
-            has_incorrect = any(not a.is_correct for a in user_answers)
-            if not has_incorrect:
-                skipped += 1
-                continue
-
-            # 最初の不正解日時
-            first_wrong = next(
-                a.answered_at for a in user_answers if not a.is_correct
+            select(
+                func.count(),
+                func.count().filter(history.c.streak >= MASTERY_THRESHOLD),
             )
+        )
+        total, mastered = result.one()
 
-            # 最終不正解以降の連続正解数を計算
-            correct_count = 0
-            last_answered = user_answers[-1].answered_at
-            for a in reversed(user_answers):
-                if a.is_correct:
-                    correct_count += 1
-                else:
-                    break
-
-            # mastered判定
-            status = "mastered" if correct_count >= MASTERY_THRESHOLD else "active"
-            mastered_at = last_answered if status == "mastered" else None
-
-            if dry_run:
-                status_label = f"[{status}]"
-                print(
-                    f"  {status_label:10s} user={user_id[:20]}... "
-                    f"q={question_id_str[:8]}... "
-                    f"correct_count={correct_count}"
-                )
-            else:
-                # 既存チェック
-                existing_result = await db.execute(
-                    select(ReviewItem).where(
-                        ReviewItem.question_id == question_id,
-                        ReviewItem.user_id == user_id,
-                    )
-                )
-                if existing_result.scalar_one_or_none():
-                    skipped += 1
-                    continue
-
-                item = ReviewItem(
-                    id=uuid.uuid4(),
-                    question_id=question_id,
-                    user_id=user_id,
-                    correct_count=correct_count,
-                    status=status,
-                    first_wrong_at=first_wrong,
-                    last_answered_at=last_answered,
-                    mastered_at=mastered_at,
-                )
-                db.add(item)
-
-            created += 1
-            if status == "mastered":
-                mastered += 1
-
-        if not dry_run:
-            await db.commit()
+        print("\n--- 再生結果 ---")
+        print(f"復習アイテム: {total} (うちmastered: {mastered})")
 
-        print(f"\n--- 結果 ---")
-        print(f"作成: {created} (うちmastered: {mastered})")
-        print(f"スキップ（不正解なし or 既存）: {skipped}")
         if dry_run:
             print("(dry-runモード: データベースは変更されていません)")
+            return
+
+        start = time.perf_counter()
+        written = await replay_review_history(db)
+        await db.commit()
+        print(f"作成・更新: {written}件 ({time.perf_counter() - start:.2f}秒)")
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(
-        description="既存answersからreview_itemsを生成"
+        description="既存の回答履歴からreview_itemsを生成"
     )
     parser.add_argument(
         "--dry-run",
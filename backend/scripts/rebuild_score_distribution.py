@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""模試スコア分布（mock_exam_score_bins）を再構築するスクリプト
+
+終了済みの模試をサーバーサイドカーソルで順に読み込み、
+総合スコア・分野別正答率のヒストグラムを作り直す。
+導入前に終了した模試の取り込みや、分布の不整合の修復に使う。
+
+Usage:
+    python scripts/rebuild_score_distribution.py --dry-run   # プレビュー
+    python scripts/rebuild_score_distribution.py              # 実行
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import func, select
+
+from app.core.database import async_session_maker
+from app.models.mock_exam_score_bin import MockExamScoreBin
+from app.services.mock_exam_percentile import (
+    REBUILD_BATCH_SIZE,
+    rebuild_score_distribution,
+)
+
+
+async def rebuild(batch_size: int, dry_run: bool = False) -> None:
+    """スコア分布を再構築"""
+    async with async_session_maker() as db:
+        exam_count = await rebuild_score_distribution(db, batch_size=batch_size)
+        bin_count = (
+            await db.execute(select(func.count()).select_from(MockExamScoreBin))
+        ).scalar_one()
+
+        if dry_run:
+            await db.rollback()
+        else:
+            await db.commit()
+
+        print("\n--- 結果 ---")
+        print(f"集計した模試: {exam_count}")
+        print(f"ビン数: {bin_count}")
+        if dry_run:
+            print("(dry-runモード: データベースは変更されていません)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="終了済み模試からスコア分布を再構築"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=REBUILD_BATCH_SIZE,
+        help=f"一度に読み込む模試数（デフォルト: {REBUILD_BATCH_SIZE}）",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="プレビューのみ（DB変更なし）",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(rebuild(batch_size=args.batch_size, dry_run=args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Anthropic API共通クライアントのテスト"""
+import pytest
+
+from app.core.config import settings
+from app.services import anthropic_client
+from app.services.anthropic_client import close_anthropic_client, get_anthropic_client
+
+
+@pytest.fixture(autouse=True)
+def _reset_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(anthropic_client, "_client", None)
+
+
+class TestGetAnthropicClient:
+    """共有クライアントのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_returns_shared_client(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """2回目以降は同じクライアント（接続プール）を返す"""
+        monkeypatch.setattr(settings, "anthropic_api_key", "sk-test")
+
+        client = get_anthropic_client()
+
+        assert get_anthropic_client() is client
+        await close_anthropic_client()
+
+    @pytest.mark.asyncio
+    async def test_uses_configured_base_url(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """chat_api_base_url を指定するとその URL に接続する"""
+        monkeypatch.setattr(settings, "anthropic_api_key", "sk-test")
+        monkeypatch.setattr(settings, "chat_api_base_url", "http://127.0.0.1:8999")
+
+        client = get_anthropic_client()
+
+        assert str(client.base_url).startswith("http://127.0.0.1:8999")
+        await close_anthropic_client()
+
+    @pytest.mark.asyncio
+    async def test_close_discards_client(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """閉じた後は新しいクライアントが作られる"""
+        monkeypatch.setattr(settings, "anthropic_api_key", "sk-test")
+        client = get_anthropic_client()
+
+        await close_anthropic_client()
+
+        assert client.is_closed()
+        assert get_anthropic_client() is not client
+        await close_anthropic_client()
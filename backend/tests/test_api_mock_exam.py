@@ -2,17 +2,20 @@
 
 Sprint 3: 全エンドポイントの統合テスト
 """
+import asyncio
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import AsyncGenerator
+from typing import AsyncGenerator, AsyncIterator, Iterator
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy.dialects import postgresql
 
 from app.main import app
 from app.core.database import get_db
-from app.models.mock_exam import MockExam, MockExamAnswer
+from app.models.mock_exam import MockExam
 
 
 class MockCategory:
@@ -50,7 +53,7 @@ class MockDBSession:
         self._execute_results = results
         self._execute_index = 0
 
-    async def execute(self, query: object) -> MagicMock:
+    async def execute(self, query: object, params: object = None) -> MagicMock:
         if self._execute_index < len(self._execute_results):
             result = self._execute_results[self._execute_index]
             self._execute_index += 1
@@ -63,6 +66,10 @@ class MockDBSession:
     async def flush(self) -> None:
         pass
 
+    @asynccontextmanager
+    async def begin_nested(self) -> AsyncIterator[None]:
+        yield
+
     async def commit(self) -> None:
         self._committed = True
 
@@ -79,6 +86,8 @@ def _make_mock_exam(
     passed: bool | None = None,
     category_scores: dict | None = None,
     ai_analysis: str | None = None,
+    topic_scores: dict | None = None,
+    analysis: str | None = None,
 ) -> MockExam:
     """テスト用MockExamオブジェクト"""
     exam = MagicMock(spec=MockExam)
@@ -91,6 +100,8 @@ def _make_mock_exam(
     exam.score = score
     exam.passed = passed
     exam.category_scores = category_scores
+    exam.topic_scores = topic_scores
+    exam.analysis = analysis
     exam.ai_analysis = ai_analysis
     exam.status = status
     exam.answers = []
@@ -154,35 +165,23 @@ async def test_start_mock_exam() -> None:
         app.dependency_overrides.clear()
 
 
-@pytest.mark.asyncio
-async def test_answer_mock_exam() -> None:
-    """回答送信エンドポイント"""
-    mock_db = MockDBSession()
-    exam_id = uuid.uuid4()
-
-    # 模試取得結果
-    mock_exam = _make_mock_exam(exam_id=exam_id)
-    exam_result = MagicMock()
-    exam_result.scalar_one_or_none.return_value = mock_exam
-
-    # 回答検索結果
-    mock_answer = MagicMock(spec=MockExamAnswer)
-    mock_answer.question_index = 0
-    mock_answer.selected_answer = None
-    mock_answer.question_id = uuid.uuid4()
-
-    # Questionの正解を設定
-    mock_question = MagicMock()
-    mock_question.correct_answer = 0
+def _make_update_result(rows: list[tuple[int, bool]]) -> MagicMock:
+    """UPDATE ... RETURNING の結果"""
+    result = MagicMock()
+    result.all.return_value = [
+        MagicMock(question_index=index, is_correct=is_correct)
+        for index, is_correct in rows
+    ]
+    return result
 
-    answer_result = MagicMock()
-    answer_result.scalar_one_or_none.return_value = mock_answer
 
-    question_result = MagicMock()
-    question_result.scalar_one_or_none.return_value = mock_question
+def _make_status_result(exam_status: str | None) -> MagicMock:
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = exam_status
+    return result
 
-    mock_db.set_execute_results([exam_result, answer_result, question_result])
 
+async def _post_answer(mock_db: MockDBSession, path: str, payload: dict):
     async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
         yield mock_db
 
@@ -192,18 +191,166 @@ async def test_answer_mock_exam() -> None:
             transport=ASGITransport(app=app),
             base_url="http://test",
         ) as client:
-            response = await client.post(
-                f"/api/mock-exam/{exam_id}/answer",
-                json={"question_index": 0, "selected_answer": 0},
-            )
-        assert response.status_code == 200
-        data = response.json()
-        assert "question_index" in data
-        assert "is_correct" in data
+            return await client.post(path, json=payload)
     finally:
         app.dependency_overrides.clear()
 
 
+@pytest.mark.asyncio
+async def test_answer_mock_exam() -> None:
+    """回答送信エンドポイント"""
+    mock_db = MockDBSession()
+    exam_id = uuid.uuid4()
+    mock_db.set_execute_results([_make_update_result([(0, True)])])
+
+    response = await _post_answer(
+        mock_db,
+        f"/api/mock-exam/{exam_id}/answer",
+        {"question_index": 0, "selected_answer": 0},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["question_index"] == 0
+    assert data["is_correct"] is True
+    assert mock_db._committed is True
+
+
+@pytest.mark.asyncio
+async def test_answer_is_single_update_statement() -> None:
+    """正常系はUPDATE ... RETURNING の1文のみで完結すること"""
+    executed: list[object] = []
+    mock_db = MockDBSession()
+    mock_db.set_execute_results([_make_update_result([(3, False)])])
+    original_execute = mock_db.execute
+
+    async def recording_execute(query: object, params: object = None) -> MagicMock:
+        executed.append(query)
+        return await original_execute(query, params)
+
+    mock_db.execute = recording_execute  # type: ignore[method-assign]
+
+    response = await _post_answer(
+        mock_db,
+        f"/api/mock-exam/{uuid.uuid4()}/answer",
+        {"question_index": 3, "selected_answer": 2},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["is_correct"] is False
+    assert len(executed) == 1
+    sql = str(executed[0])
+    assert sql.startswith("UPDATE mock_exam_answers")
+    assert "RETURNING" in sql
+
+
+@pytest.mark.asyncio
+async def test_answer_nonexistent_exam_returns_404() -> None:
+    mock_db = MockDBSession()
+    mock_db.set_execute_results([_make_update_result([]), _make_status_result(None)])
+
+    response = await _post_answer(
+        mock_db,
+        f"/api/mock-exam/{uuid.uuid4()}/answer",
+        {"question_index": 0, "selected_answer": 0},
+    )
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "模試が見つかりません"
+    assert mock_db._committed is False
+
+
+@pytest.mark.asyncio
+async def test_answer_finished_exam_returns_400() -> None:
+    mock_db = MockDBSession()
+    mock_db.set_execute_results(
+        [_make_update_result([]), _make_status_result("finished")]
+    )
+
+    response = await _post_answer(
+        mock_db,
+        f"/api/mock-exam/{uuid.uuid4()}/answer",
+        {"question_index": 0, "selected_answer": 0},
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "この模試は既に終了しています"
+
+
+@pytest.mark.asyncio
+async def test_answer_unknown_index_returns_404() -> None:
+    mock_db = MockDBSession()
+    mock_db.set_execute_results(
+        [_make_update_result([]), _make_status_result("in_progress")]
+    )
+
+    response = await _post_answer(
+        mock_db,
+        f"/api/mock-exam/{uuid.uuid4()}/answer",
+        {"question_index": 999, "selected_answer": 0},
+    )
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "問題が見つかりません"
+
+
+@pytest.mark.asyncio
+async def test_batch_answers() -> None:
+    """まとめて送信した回答が記録され、存在しない問題番号は別途返ること"""
+    mock_db = MockDBSession()
+    mock_db.set_execute_results([_make_update_result([(2, True), (0, False)])])
+
+    response = await _post_answer(
+        mock_db,
+        f"/api/mock-exam/{uuid.uuid4()}/answers",
+        {
+            "answers": [
+                {"question_index": 0, "selected_answer": 1},
+                {"question_index": 2, "selected_answer": 3},
+                {"question_index": 500, "selected_answer": 0},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["results"] == [
+        {"question_index": 0, "is_correct": False},
+        {"question_index": 2, "is_correct": True},
+    ]
+    assert data["missing_indexes"] == [500]
+    assert mock_db._committed is True
+
+
+@pytest.mark.asyncio
+async def test_batch_answers_finished_exam_returns_400() -> None:
+    mock_db = MockDBSession()
+    mock_db.set_execute_results(
+        [_make_update_result([]), _make_status_result("finished")]
+    )
+
+    response = await _post_answer(
+        mock_db,
+        f"/api/mock-exam/{uuid.uuid4()}/answers",
+        {"answers": [{"question_index": 0, "selected_answer": 1}]},
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_batch_answers_requires_at_least_one() -> None:
+    mock_db = MockDBSession()
+
+    response = await _post_answer(
+        mock_db,
+        f"/api/mock-exam/{uuid.uuid4()}/answers",
+        {"answers": []},
+    )
+
+    assert response.status_code == 422
+
+
 @pytest.mark.asyncio
 async def test_finish_mock_exam() -> None:
     """模試終了エンドポイント"""
@@ -211,13 +358,20 @@ async def test_finish_mock_exam() -> None:
     exam_id = uuid.uuid4()
 
     mock_exam = _make_mock_exam(exam_id=exam_id)
-    mock_exam.answers = []
 
     # 模試取得
     exam_result = MagicMock()
     exam_result.scalar_one_or_none.return_value = mock_exam
 
-    mock_db.set_execute_results([exam_result])
+    # 分野別・トピック別集計
+    agg_result = MagicMock()
+    agg_result.all.return_value = [
+        MagicMock(
+            exam_area="機械学習", topic=None, area_rolled_up=0, total=2, correct=1
+        ),
+    ]
+
+    mock_db.set_execute_results([exam_result, agg_result])
 
     async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
         yield mock_db
@@ -282,6 +436,46 @@ async def test_get_mock_exam_result() -> None:
         app.dependency_overrides.clear()
 
 
+@pytest.mark.asyncio
+async def test_get_mock_exam_result_uses_persisted_analysis() -> None:
+    """終了時に保存した分析があれば再生成しない"""
+    mock_db = MockDBSession()
+    exam_id = uuid.uuid4()
+
+    mock_exam = _make_mock_exam(
+        exam_id=exam_id,
+        status="finished",
+        score=72.0,
+        correct_count=72,
+        passed=True,
+        category_scores={
+            "応用数学": {"total": 10, "correct": 7, "accuracy": 70.0, "grade": "B"},
+        },
+        analysis="## 保存済み分析",
+    )
+
+    exam_result = MagicMock()
+    exam_result.scalar_one_or_none.return_value = mock_exam
+    mock_db.set_execute_results([exam_result])
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with patch("app.api.mock_exam.generate_rule_based_analysis") as mock_generate:
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                response = await client.get(f"/api/mock-exam/{exam_id}")
+        assert response.status_code == 200
+        assert response.json()["analysis"] == "## 保存済み分析"
+        mock_generate.assert_not_called()
+    finally:
+        app.dependency_overrides.clear()
+
+
 @pytest.mark.asyncio
 async def test_get_mock_exam_history() -> None:
     """履歴取得エンドポイント"""
@@ -289,15 +483,11 @@ async def test_get_mock_exam_history() -> None:
 
     mock_exam = _make_mock_exam(status="finished", score=72.0, passed=True)
 
-    # 履歴クエリ
+    # 履歴クエリ（必要な列 + 総件数を1文で取得）
     exams_result = MagicMock()
-    exams_result.scalars.return_value = MagicMock(all=MagicMock(return_value=[mock_exam]))
-
-    # カウントクエリ
-    count_result = MagicMock()
-    count_result.scalar_one.return_value = 1
+    exams_result.all.return_value = [_history_row(mock_exam, total_count=1)]
 
-    mock_db.set_execute_results([exams_result, count_result])
+    mock_db.set_execute_results([exams_result])
 
     async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
         yield mock_db
@@ -312,13 +502,173 @@ async def test_get_mock_exam_history() -> None:
         assert response.status_code == 200
         data = response.json()
         assert "exams" in data
-        assert "total_count" in data
+        assert data["total_count"] == 1
+        assert data["next_cursor"] is None
+        assert mock_db._execute_index == 1
+    finally:
+        app.dependency_overrides.clear()
+
+
+def _history_row(exam: MockExam, total_count: int) -> MagicMock:
+    return MagicMock(
+        id=exam.id,
+        started_at=exam.started_at,
+        finished_at=exam.finished_at,
+        score=exam.score,
+        passed=exam.passed,
+        status=exam.status,
+        total_count=total_count,
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_mock_exam_history_paginates() -> None:
+    """limit+1件目があれば next_cursor に最終行の (開始日時, ID) を返す"""
+    mock_db = MockDBSession()
+    exams = [
+        _make_mock_exam(status="finished", score=60.0 + i, passed=True)
+        for i in range(3)
+    ]
+    for i, e in enumerate(exams):
+        e.started_at = datetime(2026, 3, 10 - i, 9, 0, 0)
+
+    exams_result = MagicMock()
+    exams_result.all.return_value = [_history_row(e, total_count=5) for e in exams]
+    mock_db.set_execute_results([exams_result])
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+        ) as client:
+            response = await client.get(
+                "/api/mock-exam/history",
+                params={"user_id": "test-user", "limit": 2},
+            )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["exams"]) == 2
+        assert data["total_count"] == 5
+        assert data["next_cursor"] == f"2026-03-09T09:00:00_{exams[1].id}"
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_get_mock_exam_history_empty_page_after_cursor() -> None:
+    """カーソル以降が空なら総件数を別途取得する"""
+    mock_db = MockDBSession()
+
+    exams_result = MagicMock()
+    exams_result.all.return_value = []
+    count_result = MagicMock()
+    count_result.scalar_one.return_value = 4
+    mock_db.set_execute_results([exams_result, count_result])
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+        ) as client:
+            response = await client.get(
+                "/api/mock-exam/history",
+                params={
+                    "user_id": "test-user",
+                    "cursor": f"2026-01-01T00:00:00_{uuid.uuid4()}",
+                },
+            )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["exams"] == []
+        assert data["total_count"] == 4
+        assert data["next_cursor"] is None
     finally:
         app.dependency_overrides.clear()
 
 
 @pytest.mark.asyncio
-async def test_ai_analysis_endpoint() -> None:
+async def test_get_mock_exam_history_cursor_breaks_ties_by_id() -> None:
+    """開始日時が同じ模試がページ境界をまたいでも (開始日時, ID) の行比較で続きを取る"""
+    mock_db = MockDBSession()
+    exams_result = MagicMock()
+    exams_result.all.return_value = []
+    count_result = MagicMock()
+    count_result.scalar_one.return_value = 0
+    mock_db.set_execute_results([exams_result, count_result])
+    mock_db.execute = AsyncMock(wraps=mock_db.execute)
+    exam_id = uuid.uuid4()
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+        ) as client:
+            response = await client.get(
+                "/api/mock-exam/history",
+                params={
+                    "user_id": "test-user",
+                    "cursor": f"2026-03-09T09:00:00_{exam_id}",
+                },
+            )
+        assert response.status_code == 200
+        query = mock_db.execute.await_args_list[0].args[0]
+        compiled = query.compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        assert "(mock_exams.started_at, mock_exams.id) < (" in sql
+        assert "ORDER BY mock_exams.started_at DESC, mock_exams.id DESC" in sql
+        assert exam_id in compiled.params.values()
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_get_mock_exam_history_invalid_cursor() -> None:
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield MockDBSession()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+        ) as client:
+            response = await client.get(
+                "/api/mock-exam/history",
+                params={"user_id": "test-user", "cursor": "2026-03-09T09:00:00"},
+            )
+        assert response.status_code == 422
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def analysis_cache_miss() -> Iterator[AsyncMock]:
+    """AI分析キャッシュをミスさせ、生成結果の保存を差し替える"""
+    with patch(
+        "app.api.mock_exam.get_cached_analysis",
+        new_callable=AsyncMock,
+        return_value=None,
+    ), patch(
+        "app.services.mock_exam_analysis_cache.save_ai_analysis",
+        new_callable=AsyncMock,
+    ) as mock_save:
+        yield mock_save
+
+
+@pytest.mark.asyncio
+async def test_ai_analysis_endpoint(analysis_cache_miss: AsyncMock) -> None:
     """AI分析エンドポイント"""
     mock_db = MockDBSession()
     exam_id = uuid.uuid4()
@@ -365,7 +715,57 @@ async def test_ai_analysis_endpoint() -> None:
 
 
 @pytest.mark.asyncio
-async def test_ai_analysis_failure_returns_503() -> None:
+async def test_ai_analysis_uses_persisted_topic_scores(
+    analysis_cache_miss: AsyncMock,
+) -> None:
+    """保存済みのトピック別スコアを使い、回答行を再読込しない"""
+    mock_db = MockDBSession()
+    exam_id = uuid.uuid4()
+    topic_scores = {"CNN": {"total": 4, "correct": 3, "accuracy": 75.0}}
+
+    mock_exam = _make_mock_exam(
+        exam_id=exam_id,
+        status="finished",
+        score=72.0,
+        correct_count=72,
+        passed=True,
+        category_scores={
+            "応用数学": {"total": 10, "correct": 7, "accuracy": 70.0, "grade": "B"},
+        },
+        topic_scores=topic_scores,
+    )
+
+    exam_result = MagicMock()
+    exam_result.scalar_one_or_none.return_value = mock_exam
+    mock_db.set_execute_results([exam_result])
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with patch(
+            "app.api.mock_exam.generate_ai_analysis",
+            new_callable=AsyncMock,
+            return_value="AI分析結果テスト",
+        ) as mock_generate:
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                response = await client.post(
+                    f"/api/mock-exam/{exam_id}/ai-analysis",
+                    json={"user_id": "test-user"},
+                )
+        assert response.status_code == 200
+        assert mock_generate.await_args.kwargs["topic_scores"] == topic_scores
+        assert mock_db._execute_index == 1
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_ai_analysis_failure_returns_503(analysis_cache_miss: AsyncMock) -> None:
     """AI分析生成失敗時に503が返ること"""
     mock_db = MockDBSession()
     exam_id = uuid.uuid4()
@@ -411,6 +811,221 @@ async def test_ai_analysis_failure_returns_503() -> None:
         app.dependency_overrides.clear()
 
 
+def _finished_exam_session(exam_id: uuid.UUID) -> MockDBSession:
+    mock_db = MockDBSession()
+    mock_exam = _make_mock_exam(
+        exam_id=exam_id,
+        status="finished",
+        score=72.0,
+        correct_count=72,
+        passed=True,
+        category_scores={
+            "応用数学": {"total": 10, "correct": 7, "accuracy": 70.0, "grade": "B"},
+        },
+        topic_scores={},
+    )
+    exam_result = MagicMock()
+    exam_result.scalar_one_or_none.return_value = mock_exam
+    mock_db.set_execute_results([exam_result])
+    return mock_db
+
+
+@pytest.mark.asyncio
+async def test_ai_analysis_cache_hit_skips_generation() -> None:
+    """スコアプロファイルが一致するキャッシュがあればAPIを呼ばない"""
+    exam_id = uuid.uuid4()
+    mock_db = _finished_exam_session(exam_id)
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with patch(
+            "app.api.mock_exam.get_cached_analysis",
+            new_callable=AsyncMock,
+            return_value="キャッシュ済み分析",
+        ), patch(
+            "app.api.mock_exam.generate_ai_analysis",
+            new_callable=AsyncMock,
+        ) as mock_generate:
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                response = await client.post(
+                    f"/api/mock-exam/{exam_id}/ai-analysis",
+                    json={"user_id": "test-user"},
+                )
+        assert response.status_code == 200
+        assert response.json()["ai_analysis"] == "キャッシュ済み分析"
+        mock_generate.assert_not_called()
+        assert mock_db._committed is True
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_ai_analysis_no_wait_returns_202(analysis_cache_miss: AsyncMock) -> None:
+    """wait=false では202とポーリング先を返し、生成はバックグラウンドで続く"""
+    exam_id = uuid.uuid4()
+    mock_db = _finished_exam_session(exam_id)
+    release = asyncio.Event()
+
+    async def slow_generate(**kwargs: object) -> str:
+        await release.wait()
+        return "バックグラウンド生成"
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with patch("app.api.mock_exam.generate_ai_analysis", side_effect=slow_generate):
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                response = await client.post(
+                    f"/api/mock-exam/{exam_id}/ai-analysis",
+                    params={"wait": "false"},
+                    json={"user_id": "test-user"},
+                )
+                assert response.status_code == 202
+                data = response.json()
+                assert data["status"] == "pending"
+                assert data["poll_url"] == f"/api/mock-exam/{exam_id}/ai-analysis"
+
+                poll = await client.get(data["poll_url"])
+                assert poll.status_code == 202
+
+                release.set()
+                for _ in range(10):
+                    await asyncio.sleep(0)
+
+        analysis_cache_miss.assert_awaited_once()
+        assert analysis_cache_miss.await_args.args[0] == exam_id
+        assert analysis_cache_miss.await_args.args[2] == "バックグラウンド生成"
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_ai_analysis_no_wait_failure_is_reported_by_poll(
+    analysis_cache_miss: AsyncMock,
+) -> None:
+    """wait=false で始めた生成が失敗したらポーリングは502を返す"""
+    exam_id = uuid.uuid4()
+    poll_db = MockDBSession()
+    row_result = MagicMock()
+    row_result.one_or_none.return_value = MagicMock(ai_analysis=None)
+    poll_db.set_execute_results([row_result])
+    sessions = [poll_db, _finished_exam_session(exam_id)]
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield sessions.pop()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with patch(
+            "app.api.mock_exam.generate_ai_analysis",
+            new_callable=AsyncMock,
+            side_effect=RuntimeError("LLM down"),
+        ):
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                response = await client.post(
+                    f"/api/mock-exam/{exam_id}/ai-analysis",
+                    params={"wait": "false"},
+                    json={"user_id": "test-user"},
+                )
+                assert response.status_code == 202
+                for _ in range(10):
+                    await asyncio.sleep(0)
+
+                poll = await client.get(response.json()["poll_url"])
+
+        assert poll.status_code == 502
+        assert "AI分析の生成に失敗しました" in poll.json()["detail"]
+        analysis_cache_miss.assert_not_called()
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_ai_analysis_concurrent_requests_share_generation(
+    analysis_cache_miss: AsyncMock,
+) -> None:
+    """同じ模試への同時リクエストは1回の生成を共有する"""
+    exam_id = uuid.uuid4()
+    sessions = [_finished_exam_session(exam_id) for _ in range(3)]
+    release = asyncio.Event()
+    calls = 0
+
+    async def slow_generate(**kwargs: object) -> str:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "共有された分析"
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield sessions.pop()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with patch("app.api.mock_exam.generate_ai_analysis", side_effect=slow_generate):
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                requests = [
+                    asyncio.create_task(
+                        client.post(
+                            f"/api/mock-exam/{exam_id}/ai-analysis",
+                            json={"user_id": "test-user"},
+                        )
+                    )
+                    for _ in range(3)
+                ]
+                for _ in range(20):
+                    await asyncio.sleep(0)
+                release.set()
+                responses = await asyncio.gather(*requests)
+
+        assert calls == 1
+        assert [r.status_code for r in responses] == [200, 200, 200]
+        assert {r.json()["ai_analysis"] for r in responses} == {"共有された分析"}
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_get_ai_analysis_returns_stored() -> None:
+    """生成済みのAI分析をポーリングで取得できる"""
+    mock_db = MockDBSession()
+    exam_id = uuid.uuid4()
+    row_result = MagicMock()
+    row_result.one_or_none.return_value = MagicMock(ai_analysis="保存済みAI分析")
+    mock_db.set_execute_results([row_result])
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+        ) as client:
+            response = await client.get(f"/api/mock-exam/{exam_id}/ai-analysis")
+        assert response.status_code == 200
+        assert response.json()["ai_analysis"] == "保存済みAI分析"
+    finally:
+        app.dependency_overrides.clear()
+
+
 @pytest.mark.asyncio
 async def test_get_nonexistent_exam() -> None:
     """存在しない模試取得で404"""
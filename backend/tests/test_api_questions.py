@@ -1,7 +1,7 @@
 """問題APIエンドポイントのテスト"""
 import uuid
 from typing import AsyncGenerator
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from httpx import ASGITransport, AsyncClient
@@ -378,24 +378,28 @@ class TestDeleteAllQuestions:
             yield mock_db
 
         app.dependency_overrides[get_db] = mock_get_db
+        mock_cache = MagicMock()
+        mock_cache.clear = AsyncMock(return_value=3)
 
         try:
-            async with AsyncClient(
-                transport=ASGITransport(app=app),
-                base_url="http://test",
-            ) as client:
-                response = await client.delete(
-                    "/api/questions/all",
-                    params={
-                        "confirm": "DELETE_ALL_QUESTIONS",
-                        "clear_cache": True,
-                    },
-                )
+            with patch("app.api.questions.get_llm_cache", return_value=mock_cache):
+                async with AsyncClient(
+                    transport=ASGITransport(app=app),
+                    base_url="http://test",
+                ) as client:
+                    response = await client.delete(
+                        "/api/questions/all",
+                        params={
+                            "confirm": "DELETE_ALL_QUESTIONS",
+                            "clear_cache": True,
+                        },
+                    )
 
             assert response.status_code == 200
             data = response.json()
             assert "deleted_count" in data
-            assert "cache_cleared" in data
+            assert data["cache_cleared"] is True
+            mock_cache.clear.assert_awaited_once()
         finally:
             app.dependency_overrides.clear()
 
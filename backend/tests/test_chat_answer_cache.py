@@ -0,0 +1,169 @@
+"""問題チャットの回答キャッシュのテスト"""
+import uuid
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import chat_answer_cache
+from app.services.chat_answer_cache import (
+    clear_answer_cache,
+    embed_message,
+    get_answer_cache_stats,
+    invalidate_question_answers,
+    key_tokens,
+    lookup_answer,
+    normalize_message,
+    question_context_hash,
+    store_answer,
+)
+
+QUESTION_ID = uuid.UUID("12345678-1234-1234-1234-123456789abc")
+CONTEXT = question_context_hash("問題文", ["A", "B", "C", "D"], 1, "解説")
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    clear_answer_cache()
+    yield
+    clear_answer_cache()
+
+
+class TestNormalizeMessage:
+    """メッセージの正規化"""
+
+    def test_ignores_width_case_and_punctuation(self) -> None:
+        assert normalize_message("なぜ Ｂ が間違い？") == normalize_message(
+            "なぜbが間違い"
+        )
+
+    def test_strips_polite_suffix(self) -> None:
+        assert normalize_message("もっと詳しく教えてください。") == "もっと詳しく教え"
+        assert normalize_message("なぜBが間違いなのですか？") == "なぜbが間違い"
+
+    def test_keeps_message_made_only_of_suffix(self) -> None:
+        assert normalize_message("か") == "か"
+
+    def test_key_tokens(self) -> None:
+        assert key_tokens(normalize_message("選択肢Bと2の違い")) == {"b", "2"}
+
+    def test_key_tokens_include_polarity_markers(self) -> None:
+        assert key_tokens(normalize_message("Bが不正解の理由")) == {"b", "不", "正解"}
+        assert key_tokens(normalize_message("デメリットは？")) == {"デメリット"}
+        assert key_tokens(normalize_message("Bが正しくない理由")) == {
+            "b", "正し", "ない",
+        }
+
+
+class TestEmbedMessage:
+    """n-gram 埋め込み"""
+
+    def test_is_unit_vector(self) -> None:
+        vector = embed_message("もっと詳しく教え")
+        assert vector.shape == (chat_answer_cache.EMBEDDING_DIM,)
+        assert np.linalg.norm(vector) == pytest.approx(1.0)
+
+    def test_empty_message(self) -> None:
+        assert not embed_message("").any()
+
+    def test_paraphrase_is_closer_than_different_question(self) -> None:
+        base = embed_message(normalize_message("もっと詳しく教えて"))
+        similar = embed_message(normalize_message("もっと詳しく教えてください"))
+        different = embed_message(normalize_message("なぜ正解なのか"))
+        assert base @ similar > settings.chat_answer_cache_similarity
+        assert base @ different < settings.chat_answer_cache_similarity
+
+
+class TestLookupAnswer:
+    """キャッシュの検索・保存"""
+
+    def test_miss_then_hit(self) -> None:
+        assert lookup_answer(QUESTION_ID, CONTEXT, "もっと詳しく教えて") is None
+        store_answer(QUESTION_ID, CONTEXT, "もっと詳しく教えて", "詳しい解説")
+
+        for message in ("もっと詳しく教えて！", "もっと詳しく教えてください"):
+            assert lookup_answer(QUESTION_ID, CONTEXT, message) == "詳しい解説"
+        assert get_answer_cache_stats() == {"entries": 1, "hits": 2, "misses": 1}
+
+    def test_different_choice_letter_misses(self) -> None:
+        store_answer(QUESTION_ID, CONTEXT, "なぜBが間違いなのですか", "Bの解説")
+        assert lookup_answer(QUESTION_ID, CONTEXT, "なぜCが間違いなのですか") is None
+
+    def test_dissimilar_message_misses(self) -> None:
+        store_answer(QUESTION_ID, CONTEXT, "なぜBが間違いなのですか", "Bの解説")
+        assert lookup_answer(QUESTION_ID, CONTEXT, "なぜBが正解なのですか") is None
+
+    @pytest.mark.parametrize(
+        ("stored", "asked"),
+        [
+            ("Bが正解の理由を教えて", "Bが不正解の理由を教えて"),
+            ("この手法の利点は？", "この手法の欠点は？"),
+            ("Bが正しい理由は？", "Bが正しくない理由は？"),
+            ("メリットは？", "デメリットは？"),
+            ("学習率が大きいとどうなる？", "学習率が小さいとどうなる？"),
+        ],
+    )
+    def test_opposite_polarity_misses(self, stored: str, asked: str) -> None:
+        """否定・反対の語だけが違う質問は類似度が高くても別の質問として扱う"""
+        store_answer(QUESTION_ID, CONTEXT, stored, "キャッシュ済みの回答")
+
+        assert lookup_answer(QUESTION_ID, CONTEXT, asked) is None
+        assert lookup_answer(QUESTION_ID, CONTEXT, stored) == "キャッシュ済みの回答"
+
+    def test_same_polarity_paraphrase_hits(self) -> None:
+        store_answer(QUESTION_ID, CONTEXT, "Bが不正解の理由を教えて", "Bの解説")
+        assert lookup_answer(
+            QUESTION_ID, CONTEXT, "Bが不正解の理由を教えてください"
+        ) == "Bの解説"
+
+    def test_other_question_misses(self) -> None:
+        store_answer(QUESTION_ID, CONTEXT, "もっと詳しく教えて", "詳しい解説")
+        assert lookup_answer(uuid.uuid4(), CONTEXT, "もっと詳しく教えて") is None
+
+    def test_changed_context_misses_and_drops_entry(self) -> None:
+        store_answer(QUESTION_ID, CONTEXT, "もっと詳しく教えて", "詳しい解説")
+        new_context = question_context_hash(
+            "問題文", ["A", "B", "C", "D"], 1, "新しい解説"
+        )
+
+        assert lookup_answer(QUESTION_ID, new_context, "もっと詳しく教えて") is None
+        assert get_answer_cache_stats()["entries"] == 0
+
+    def test_expired_entry_misses(self) -> None:
+        store_answer(QUESTION_ID, CONTEXT, "もっと詳しく教えて", "詳しい解説")
+        now = chat_answer_cache.time.monotonic()
+        with patch.object(
+            chat_answer_cache.time, "monotonic",
+            return_value=now + settings.chat_answer_cache_ttl_seconds + 1,
+        ):
+            assert lookup_answer(QUESTION_ID, CONTEXT, "もっと詳しく教えて") is None
+        assert get_answer_cache_stats()["entries"] == 0
+
+    def test_evicts_least_recently_used(self) -> None:
+        with patch.object(settings, "chat_answer_cache_max_entries", 2):
+            store_answer(QUESTION_ID, CONTEXT, "選択肢Aの意味", "A")
+            store_answer(QUESTION_ID, CONTEXT, "選択肢Bの意味", "B")
+            # Aを使ったので、次に追加すると最も使われていないBが捨てられる
+            assert lookup_answer(QUESTION_ID, CONTEXT, "選択肢Aの意味") == "A"
+            store_answer(QUESTION_ID, CONTEXT, "選択肢Cの意味", "C")
+
+            assert lookup_answer(QUESTION_ID, CONTEXT, "選択肢Bの意味") is None
+            assert lookup_answer(QUESTION_ID, CONTEXT, "選択肢Aの意味") == "A"
+            assert lookup_answer(QUESTION_ID, CONTEXT, "選択肢Cの意味") == "C"
+
+    def test_disabled_when_max_entries_is_zero(self) -> None:
+        with patch.object(settings, "chat_answer_cache_max_entries", 0):
+            store_answer(QUESTION_ID, CONTEXT, "もっと詳しく教えて", "詳しい解説")
+            assert lookup_answer(QUESTION_ID, CONTEXT, "もっと詳しく教えて") is None
+        assert get_answer_cache_stats()["entries"] == 0
+
+    def test_invalidate_question_answers(self) -> None:
+        other = uuid.uuid4()
+        store_answer(QUESTION_ID, CONTEXT, "もっと詳しく教えて", "詳しい解説")
+        store_answer(other, CONTEXT, "もっと詳しく教えて", "別の問題の解説")
+
+        invalidate_question_answers(QUESTION_ID)
+
+        assert lookup_answer(QUESTION_ID, CONTEXT, "もっと詳しく教えて") is None
+        assert lookup_answer(other, CONTEXT, "もっと詳しく教えて") == "別の問題の解説"
@@ -1,4 +1,5 @@
 """チャットAPIエンドポイントのテスト"""
+import asyncio
 import uuid
 from typing import AsyncGenerator
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -8,6 +9,10 @@ from httpx import ASGITransport, AsyncClient
 
 from app.main import app
 from app.core.database import get_db
+from app.services.chat_answer_cache import clear_answer_cache
+from app.services.chat_conversation import ConversationContext
+
+CONVERSATION_ID = uuid.UUID("87654321-4321-4321-4321-cba987654321")
 
 
 class MockQuestion:
@@ -44,6 +49,30 @@ class MockDBSession:
     async def commit(self) -> None:
         pass
 
+    async def close(self) -> None:
+        pass
+
+
+@pytest.fixture(autouse=True)
+def mock_conversation():
+    """会話の保存はモックする（APIテストではDBを使わない）"""
+    context = ConversationContext(
+        conversation_id=CONVERSATION_ID,
+        summary="",
+        history=[],
+    )
+    with patch(
+        "app.api.chat.start_conversation_turn", AsyncMock(return_value=context)
+    ) as start, patch("app.api.chat.save_chat_reply", AsyncMock()) as save:
+        yield start, save
+
+
+@pytest.fixture(autouse=True)
+def _clear_answer_cache():
+    clear_answer_cache()
+    yield
+    clear_answer_cache()
+
 
 @pytest.fixture
 def mock_db() -> MockDBSession:
@@ -185,3 +214,373 @@ async def test_chat_with_history(
             assert "追加回答" in response.text
     finally:
         app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_chat_generations_returns_stats() -> None:
+    """生成中のチャットの監視情報が返る"""
+    stats = {
+        "active_count": 1,
+        "by_backend": {"api": 1},
+        "oldest_age_seconds": 2.5,
+        "completed_total": 3,
+        "cancelled_total": 1,
+        "failed_total": 0,
+        "generations": [
+            {
+                "id": "abc",
+                "question_id": str(uuid.uuid4()),
+                "backend": "api",
+                "started_at": "2026-01-01T00:00:00",
+                "age_seconds": 2.5,
+                "chunk_count": 4,
+            }
+        ],
+    }
+
+    llm_cache_stats = {
+        "entries": 2,
+        "bytes": 512,
+        "max_bytes": 4096,
+        "session_hits": 3,
+        "session_misses": 1,
+        "namespaces": {"pdf_extraction": {"entries": 2, "bytes": 512, "hits": 3}},
+    }
+    llm_cache = MagicMock()
+    llm_cache.stats = AsyncMock(return_value=llm_cache_stats)
+
+    with patch(
+        "app.api.chat.get_chat_generation_stats", return_value=stats
+    ), patch("app.api.chat.get_llm_cache", return_value=llm_cache):
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+        ) as client:
+            response = await client.get("/api/questions/chat/generations")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["active_count"] == 1
+    assert data["cancelled_total"] == 1
+    assert data["generations"][0]["chunk_count"] == 4
+    assert data["answer_cache"] == {"entries": 0, "hits": 0, "misses": 0}
+    assert data["llm_cache"] == llm_cache_stats
+
+
+class CountingDBSession(MockDBSession):
+    """接続の貸し出し数を数えるモックセッション（close で返却）"""
+
+    checked_out = 0
+    peak = 0
+
+    def __init__(self, question: MockQuestion) -> None:
+        super().__init__()
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = question
+        self.set_execute_result(result)
+        self._open = False
+
+    async def execute(self, query: object) -> MagicMock:
+        if not self._open:
+            self._open = True
+            CountingDBSession.checked_out += 1
+            CountingDBSession.peak = max(
+                CountingDBSession.peak, CountingDBSession.checked_out
+            )
+        return await super().execute(query)
+
+    async def close(self) -> None:
+        if self._open:
+            self._open = False
+            CountingDBSession.checked_out -= 1
+
+
+@pytest.mark.asyncio
+async def test_chat_releases_session_before_streaming(
+    mock_question: MockQuestion,
+) -> None:
+    """50件のチャットが同時にストリーミング中でも接続を保持しない"""
+    concurrency = 50
+    CountingDBSession.checked_out = 0
+    CountingDBSession.peak = 0
+    streaming = 0
+    all_streaming = asyncio.Event()
+    release = asyncio.Event()
+    checked_out_while_streaming: list[int] = []
+
+    async def override_get_db() -> AsyncGenerator[CountingDBSession, None]:
+        session = CountingDBSession(mock_question)
+        try:
+            yield session
+        finally:
+            await session.close()
+
+    def slow_stream(*args, **kwargs):
+        async def generate():
+            nonlocal streaming
+            streaming += 1
+            if streaming == concurrency:
+                all_streaming.set()
+            yield "data: 生成中\n\n"
+            await release.wait()
+            yield "data: 完了\n\n"
+        return generate()
+
+    async def observe() -> None:
+        await all_streaming.wait()
+        checked_out_while_streaming.append(CountingDBSession.checked_out)
+        release.set()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with patch("app.api.chat.stream_chat_response", side_effect=slow_stream):
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                observer = asyncio.create_task(observe())
+                responses = await asyncio.wait_for(
+                    asyncio.gather(*[
+                        client.post(
+                            f"/api/questions/{mock_question.id}/chat",
+                            json={"message": "質問です"},
+                        )
+                        for _ in range(concurrency)
+                    ]),
+                    timeout=10,
+                )
+                await observer
+    finally:
+        app.dependency_overrides.clear()
+
+    assert all(r.status_code == 200 and "完了" in r.text for r in responses)
+    # ストリーミング中の貸し出し数は0、同時に保持したのは読み込み中の分だけ
+    assert checked_out_while_streaming == [0]
+    assert CountingDBSession.peak < concurrency
+    assert CountingDBSession.checked_out == 0
+
+
+@pytest.mark.asyncio
+async def test_chat_returns_conversation_id_and_uses_server_history(
+    mock_db: MockDBSession, mock_question: MockQuestion, mock_conversation
+) -> None:
+    """会話IDをヘッダーで返し、サーバー側の要約・履歴でプロンプトを作る"""
+    start, save = mock_conversation
+    start.return_value = ConversationContext(
+        conversation_id=CONVERSATION_ID,
+        summary="ユーザー: 最初の質問",
+        history=[{"role": "assistant", "content": "直前の回答"}],
+    )
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = mock_question
+    mock_db.set_execute_result(mock_result)
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    captured: dict = {}
+
+    def fake_stream(**kwargs):
+        captured.update(kwargs)
+
+        async def generate():
+            yield "data: 回答\n\n"
+            await kwargs["on_complete"]("回答")
+        return generate()
+
+    try:
+        with patch("app.api.chat.stream_chat_response", side_effect=fake_stream):
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                response = await client.post(
+                    f"/api/questions/{mock_question.id}/chat",
+                    json={
+                        "message": "続きの質問",
+                        "conversation_id": str(CONVERSATION_ID),
+                    },
+                )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.headers["x-conversation-id"] == str(CONVERSATION_ID)
+    assert start.await_args.args[2] == CONVERSATION_ID
+    assert captured["summary"] == "ユーザー: 最初の質問"
+    assert captured["history"] == [{"role": "assistant", "content": "直前の回答"}]
+    save.assert_awaited_once_with(CONVERSATION_ID, "回答")
+
+
+@pytest.mark.asyncio
+async def test_chat_404_for_unknown_conversation(
+    mock_db: MockDBSession, mock_question: MockQuestion, mock_conversation
+) -> None:
+    """存在しない会話IDで404"""
+    start, _ = mock_conversation
+    start.return_value = None
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = mock_question
+    mock_db.set_execute_result(mock_result)
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+        ) as client:
+            response = await client.post(
+                f"/api/questions/{mock_question.id}/chat",
+                json={"message": "質問", "conversation_id": str(uuid.uuid4())},
+            )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_chat_conversation(mock_question: MockQuestion) -> None:
+    """保存済みの会話を取得できる"""
+    from datetime import datetime
+
+    conversation = MagicMock()
+    conversation.id = CONVERSATION_ID
+    conversation.question_id = mock_question.id
+    conversation.summary = "要約"
+    messages = [
+        MagicMock(role="user", content="質問", created_at=datetime(2026, 1, 1)),
+        MagicMock(role="assistant", content="回答", created_at=datetime(2026, 1, 1)),
+    ]
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield MockDBSession()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with patch(
+            "app.api.chat.get_conversation_messages",
+            AsyncMock(return_value=(conversation, messages)),
+        ):
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                response = await client.get(
+                    f"/api/questions/{mock_question.id}/chat/{CONVERSATION_ID}"
+                )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["summary"] == "要約"
+    assert [m["content"] for m in data["messages"]] == ["質問", "回答"]
+
+
+async def _post_chats(
+    mock_db: MockDBSession, question: MockQuestion, messages: list[str], fake_stream
+) -> list:
+    """同じ問題に順にチャットを送る"""
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = question
+    mock_db.set_execute_result(mock_result)
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    responses = []
+    try:
+        with patch("app.api.chat.stream_chat_response", side_effect=fake_stream):
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                for message in messages:
+                    responses.append(await client.post(
+                        f"/api/questions/{question.id}/chat",
+                        json={"message": message},
+                    ))
+    finally:
+        app.dependency_overrides.clear()
+    return responses
+
+
+def _counting_stream(calls: list):
+    def fake_stream(**kwargs):
+        calls.append(kwargs["user_message"])
+
+        async def generate():
+            yield "data: 生成した回答\n\n"
+            await kwargs["on_complete"]("生成した回答")
+        return generate()
+    return fake_stream
+
+
+@pytest.mark.asyncio
+async def test_chat_replays_cached_answer_for_similar_first_message(
+    mock_db: MockDBSession, mock_question: MockQuestion, mock_conversation
+) -> None:
+    """最初の質問が以前の質問と類似していればキャッシュ済みの回答を返す"""
+    _, save = mock_conversation
+    calls: list = []
+
+    responses = await _post_chats(
+        mock_db,
+        mock_question,
+        ["もっと詳しく教えて", "もっと詳しく教えてください！"],
+        _counting_stream(calls),
+    )
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert calls == ["もっと詳しく教えて"]
+    assert "生成した回答" in responses[1].text
+    assert responses[1].headers["x-conversation-id"] == str(CONVERSATION_ID)
+    # キャッシュから返した回答も会話に保存する
+    assert save.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_chat_skips_cache_with_prior_history(
+    mock_db: MockDBSession, mock_question: MockQuestion, mock_conversation
+) -> None:
+    """前の会話がある場合はキャッシュを使わず保存もしない"""
+    start, _ = mock_conversation
+    start.return_value = ConversationContext(
+        conversation_id=CONVERSATION_ID,
+        summary="",
+        history=[
+            {"role": "user", "content": "最初の質問"},
+            {"role": "assistant", "content": "最初の回答"},
+        ],
+    )
+    calls: list = []
+
+    await _post_chats(
+        mock_db,
+        mock_question,
+        ["もっと詳しく教えて", "もっと詳しく教えて"],
+        _counting_stream(calls),
+    )
+
+    assert calls == ["もっと詳しく教えて", "もっと詳しく教えて"]
+
+
+@pytest.mark.asyncio
+async def test_chat_cache_misses_after_explanation_changes(
+    mock_db: MockDBSession, mock_question: MockQuestion
+) -> None:
+    """解説が変わった問題ではキャッシュ済みの回答を返さない"""
+    calls: list = []
+    fake_stream = _counting_stream(calls)
+
+    await _post_chats(mock_db, mock_question, ["もっと詳しく教えて"], fake_stream)
+    mock_question.explanation = "再生成した解説"
+    await _post_chats(mock_db, mock_question, ["もっと詳しく教えて"], fake_stream)
+
+    assert len(calls) == 2
@@ -0,0 +1,215 @@
+"""問題チャットの会話履歴のテスト"""
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.config import settings
+from app.models.chat_conversation import ChatConversation, ChatMessage
+from app.services.chat_conversation import (
+    SUMMARY_SNIPPET_CHARS,
+    compact_messages,
+    estimate_tokens,
+    start_conversation_turn,
+    summarize_messages,
+    trim_summary,
+)
+
+
+def _message(seq: int, role: str, content: str) -> ChatMessage:
+    return ChatMessage(
+        conversation_id=uuid.uuid4(),
+        seq=seq,
+        role=role,
+        content=content,
+        token_count=estimate_tokens(content),
+    )
+
+
+def _turns(count: int, length: int = 200) -> list[ChatMessage]:
+    """user/assistant が交互に並ぶメッセージ"""
+    return [
+        _message(
+            i,
+            "user" if i % 2 == 0 else "assistant",
+            f"メッセージ{i}。" + "あ" * length,
+        )
+        for i in range(count)
+    ]
+
+
+class TestEstimateTokens:
+    """トークン数の概算のテスト"""
+
+    def test_ascii_and_japanese(self) -> None:
+        assert estimate_tokens("abcd" * 10) == 10
+        assert estimate_tokens("勾配消失") == 4
+        assert estimate_tokens("") == 0
+
+
+class TestSummarizeMessages:
+    """抽出的要約のテスト"""
+
+    def test_keeps_first_sentence_with_role(self) -> None:
+        """各メッセージの冒頭文を役割付きで残す"""
+        lines = summarize_messages([
+            _message(0, "user", "なぜBが間違いですか？ 詳しく教えてください。"),
+            _message(
+                1, "assistant", "Bは損失関数の説明です。\n活性化関数ではありません。"
+            ),
+        ])
+
+        assert lines == [
+            "ユーザー: なぜBが間違いですか？",
+            "アシスタント: Bは損失関数の説明です。",
+        ]
+
+    def test_truncates_long_sentence(self) -> None:
+        """長い文は SUMMARY_SNIPPET_CHARS 文字で切る"""
+        [line] = summarize_messages([_message(0, "user", "あ" * 500)])
+
+        assert len(line) == len("ユーザー: ") + SUMMARY_SNIPPET_CHARS + 1
+
+    def test_trim_summary_drops_oldest_lines(self) -> None:
+        """予算を超えたら古い行から捨てる"""
+        lines = ["古い" * 10, "中間" * 10, "新しい" * 10]
+
+        assert trim_summary(lines, 50) == ["中間" * 10, "新しい" * 10]
+
+
+class TestCompactMessages:
+    """トークン予算による畳み込みのテスト"""
+
+    def test_within_budget_is_unchanged(self) -> None:
+        messages = _turns(4, length=10)
+
+        compacted = compact_messages("", messages, budget=1000, summary_budget=100)
+        assert compacted == ("", 0)
+
+    def test_folds_oldest_turns_over_budget(self) -> None:
+        """予算を超えた古いターンを要約に畳み込み、質問と回答を分けない"""
+        messages = _turns(10)
+
+        summary, folded = compact_messages(
+            "", messages, budget=700, summary_budget=1000
+        )
+
+        remaining = messages[folded:]
+        assert folded % 2 == 0
+        assert sum(m.token_count for m in remaining) <= 700
+        assert remaining[0].role == "user"
+        assert summary.splitlines()[0].startswith("ユーザー: メッセージ0。")
+
+    def test_keeps_latest_messages_even_if_over_budget(self) -> None:
+        """予算より大きいメッセージでも直近のやり取りは原文で残す"""
+        messages = _turns(2, length=5000)
+
+        _, folded = compact_messages("", messages, budget=100, summary_budget=100)
+
+        assert folded == 0
+
+    def test_context_size_stays_bounded(self) -> None:
+        """会話が伸びても直近の履歴と要約の合計は予算内に収まる"""
+        budget, summary_budget = 1000, 300
+        summary = ""
+        recent: list[ChatMessage] = []
+        sizes = []
+        for seq, message in enumerate(_turns(60)):
+            recent.append(message)
+            summary, folded = compact_messages(summary, recent, budget, summary_budget)
+            recent = recent[folded:]
+            sizes.append(
+                sum(m.token_count for m in recent) + estimate_tokens(summary)
+            )
+
+        assert max(sizes[20:]) <= budget + summary_budget + 250
+
+
+def _mock_db(
+    conversation: ChatConversation | None,
+    recent: list[ChatMessage],
+) -> MagicMock:
+    db = MagicMock()
+    lock_result = MagicMock()
+    lock_result.scalar_one_or_none.return_value = conversation
+    messages_result = MagicMock()
+    messages_result.scalars.return_value.all.return_value = recent
+    results = [messages_result]
+    if conversation is not None:
+        results.insert(0, lock_result)
+    db.execute = AsyncMock(side_effect=results)
+    db.flush = AsyncMock()
+    return db
+
+
+class TestStartConversationTurn:
+    """ターン開始のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_creates_conversation_with_seed_history(self) -> None:
+        """会話IDがなければ新規作成し、クライアントの履歴を取り込む"""
+        question_id = uuid.uuid4()
+        db = _mock_db(None, [])
+
+        context = await start_conversation_turn(
+            db,
+            question_id,
+            None,
+            "続きの質問",
+            seed_history=[
+                {"role": "user", "content": "最初の質問"},
+                {"role": "assistant", "content": "最初の回答"},
+            ],
+        )
+
+        added = [call.args[0] for call in db.add.call_args_list]
+        conversation = added[0]
+        assert isinstance(conversation, ChatConversation)
+        assert conversation.question_id == question_id
+        assert context.conversation_id == conversation.id
+        assert [(m.seq, m.role, m.content) for m in added[1:]] == [
+            (0, "user", "最初の質問"),
+            (1, "assistant", "最初の回答"),
+            (2, "user", "続きの質問"),
+        ]
+        assert conversation.message_count == 3
+
+    @pytest.mark.asyncio
+    async def test_returns_none_for_other_question(self) -> None:
+        """別の問題の会話IDは使えない"""
+        conversation = ChatConversation(id=uuid.uuid4(), question_id=uuid.uuid4())
+        db = _mock_db(conversation, [])
+
+        context = await start_conversation_turn(
+            db, uuid.uuid4(), conversation.id, "質問"
+        )
+
+        assert context is None
+
+    @pytest.mark.asyncio
+    async def test_compacts_history_over_budget(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """予算を超えた既存の履歴は要約に回し、直近だけをプロンプトに使う"""
+        monkeypatch.setattr(settings, "chat_history_token_budget", 700)
+        question_id = uuid.uuid4()
+        recent = _turns(10)
+        conversation = ChatConversation(
+            id=uuid.uuid4(),
+            question_id=question_id,
+            summary="",
+            summarized_until=0,
+            message_count=10,
+        )
+        db = _mock_db(conversation, recent)
+
+        context = await start_conversation_turn(
+            db, question_id, conversation.id, "新しい質問"
+        )
+
+        assert conversation.summarized_until > 0
+        assert context.summary == conversation.summary != ""
+        assert len(context.history) == 10 - conversation.summarized_until
+        new_message = db.add.call_args.args[0]
+        assert (new_message.seq, new_message.content) == (10, "新しい質問")
+        assert conversation.message_count == 11
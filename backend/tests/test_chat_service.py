@@ -1,11 +1,63 @@
 """チャットサービスのテスト"""
 import asyncio
 import json
+import uuid
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from app.services.chat_service import build_prompt, stream_chat_response
+from app.core.config import settings
+from app.services import chat_service
+from app.services.chat_service import (
+    build_messages,
+    build_prompt,
+    get_chat_generation_stats,
+    load_question_snapshot,
+    resolve_chat_backend,
+    stream_chat_response,
+    stream_until_disconnect,
+)
+
+
+@pytest.fixture(autouse=True)
+def _reset_chat_slots(monkeypatch: pytest.MonkeyPatch) -> None:
+    """テストごとにセマフォを作り直す（イベントループがテストごとに異なるため）"""
+    monkeypatch.setattr(chat_service, "_chat_slots", None)
+
+
+class TestLoadQuestionSnapshot:
+    """問題スナップショットのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_copies_question_fields(self) -> None:
+        """ORMオブジェクトから切り離したコピーを返す"""
+        question = MagicMock()
+        question.id = uuid.uuid4()
+        question.content = "問題文"
+        question.choices = ["A", "B"]
+        question.correct_answer = 1
+        question.explanation = "解説"
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = question
+        db = AsyncMock()
+        db.execute.return_value = result
+
+        snapshot = await load_question_snapshot(db, question.id)
+
+        assert snapshot.content == "問題文"
+        assert snapshot.choices == ["A", "B"]
+        assert snapshot.choices is not question.choices
+        assert snapshot.correct_answer == 1
+
+    @pytest.mark.asyncio
+    async def test_returns_none_when_missing(self) -> None:
+        """存在しない問題はNone"""
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = None
+        db = AsyncMock()
+        db.execute.return_value = result
+
+        assert await load_question_snapshot(db, uuid.uuid4()) is None
 
 
 class TestBuildPrompt:
@@ -60,7 +112,11 @@ class TestBuildPrompt:
 
 
 class TestStreamChatResponse:
-    """ストリーミングレスポンスのテスト"""
+    """ストリーミングレスポンスのテスト（CLIバックエンド）"""
+
+    @pytest.fixture(autouse=True)
+    def _use_cli_backend(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(settings, "chat_backend", "cli")
 
     @pytest.mark.asyncio
     async def test_streams_text_from_assistant_event(self) -> None:
@@ -86,7 +142,7 @@ class TestStreamChatResponse:
         mock_process.stderr.read = AsyncMock(return_value=b"")
         mock_process.wait = AsyncMock(return_value=0)
 
-        with patch("app.services.chat_service.asyncio") as mock_asyncio:
+        with patch("app.services.claude_cli.asyncio") as mock_asyncio:
             mock_asyncio.create_subprocess_exec = AsyncMock(return_value=mock_process)
 
             chunks: list[str] = []
@@ -130,7 +186,7 @@ class TestStreamChatResponse:
         mock_process.stderr.read = AsyncMock(return_value=b"")
         mock_process.wait = AsyncMock(return_value=0)
 
-        with patch("app.services.chat_service.asyncio") as mock_asyncio:
+        with patch("app.services.claude_cli.asyncio") as mock_asyncio:
             mock_asyncio.create_subprocess_exec = AsyncMock(return_value=mock_process)
 
             chunks: list[str] = []
@@ -166,7 +222,7 @@ class TestStreamChatResponse:
         mock_process.stderr.read = AsyncMock(return_value=b"CLI error occurred")
         mock_process.wait = AsyncMock(return_value=1)
 
-        with patch("app.services.chat_service.asyncio") as mock_asyncio:
+        with patch("app.services.claude_cli.asyncio") as mock_asyncio:
             mock_asyncio.create_subprocess_exec = AsyncMock(return_value=mock_process)
             mock_asyncio.subprocess = asyncio.subprocess
 
@@ -207,7 +263,7 @@ class TestStreamChatResponse:
         mock_process.stderr.read = AsyncMock(return_value=b"")
         mock_process.wait = AsyncMock(return_value=0)
 
-        with patch("app.services.chat_service.asyncio") as mock_asyncio:
+        with patch("app.services.claude_cli.asyncio") as mock_asyncio:
             mock_asyncio.create_subprocess_exec = AsyncMock(return_value=mock_process)
 
             chunks: list[str] = []
@@ -250,7 +306,7 @@ class TestStreamChatResponse:
         mock_process.stderr.read = AsyncMock(return_value=b"")
         mock_process.wait = AsyncMock(return_value=0)
 
-        with patch("app.services.chat_service.asyncio") as mock_asyncio:
+        with patch("app.services.claude_cli.asyncio") as mock_asyncio:
             mock_asyncio.create_subprocess_exec = AsyncMock(return_value=mock_process)
 
             chunks: list[str] = []
@@ -268,3 +324,329 @@ class TestStreamChatResponse:
         assert len(chunks) == 1
         payload = json.loads(chunks[0][6:].strip())
         assert payload == "テキスト部分"
+
+
+class TestBuildMessages:
+    """Messages API 用の会話変換のテスト"""
+
+    def test_appends_user_message_after_history(self) -> None:
+        """履歴の後ろに新しいメッセージが user として並ぶ"""
+        messages = build_messages(
+            [
+                {"role": "user", "content": "最初の質問"},
+                {"role": "assistant", "content": "最初の回答"},
+            ],
+            "続きの質問",
+        )
+
+        assert messages == [
+            {"role": "user", "content": "最初の質問"},
+            {"role": "assistant", "content": "最初の回答"},
+            {"role": "user", "content": "続きの質問"},
+        ]
+
+    def test_drops_leading_assistant_and_merges_same_role(self) -> None:
+        """先頭の assistant は除き、連続する同じ role はまとめる"""
+        messages = build_messages(
+            [
+                {"role": "assistant", "content": "挨拶"},
+                {"role": "user", "content": "質問1"},
+                {"role": "user", "content": "質問2"},
+                {"role": "assistant", "content": ""},
+            ],
+            "質問3",
+        )
+
+        assert messages == [{"role": "user", "content": "質問1\n\n質問2\n\n質問3"}]
+
+
+class TestResolveChatBackend:
+    """バックエンド選択のテスト"""
+
+    @pytest.mark.parametrize(
+        ("backend", "api_key", "expected"),
+        [
+            ("auto", "sk-test", "api"),
+            ("auto", "", "cli"),
+            ("cli", "sk-test", "cli"),
+            ("api", "", "api"),
+        ],
+    )
+    def test_resolves_backend(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        backend: str,
+        api_key: str,
+        expected: str,
+    ) -> None:
+        monkeypatch.setattr(settings, "chat_backend", backend)
+        monkeypatch.setattr(settings, "anthropic_api_key", api_key)
+
+        assert resolve_chat_backend() == expected
+
+
+async def _collect(**overrides) -> list[str]:
+    """stream_chat_response の出力をすべて集める"""
+    params = {
+        "question_content": "テスト問題",
+        "choices": ["A", "B", "C", "D"],
+        "correct_answer": 0,
+        "explanation": "解説",
+        "history": [],
+        "user_message": "質問",
+    }
+    params.update(overrides)
+    return [chunk async for chunk in stream_chat_response(**params)]
+
+
+class TestStreamChatResponseApi:
+    """ストリーミングレスポンスのテスト（APIバックエンド）"""
+
+    @pytest.fixture(autouse=True)
+    def _use_api_backend(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(settings, "chat_backend", "api")
+
+    @pytest.mark.asyncio
+    async def test_streams_text_deltas(self) -> None:
+        """APIのテキスト差分がそれぞれSSEイベントになる"""
+        captured: dict = {}
+
+        async def fake_stream(system, messages):
+            captured["system"] = system
+            captured["messages"] = messages
+            for text in ["活性化", "関数は", "\n非線形"]:
+                yield text
+
+        with patch("app.services.chat_service.stream_message_text", fake_stream), \
+                patch("app.services.chat_service.stream_claude_cli") as mock_cli:
+            chunks = await _collect(
+                history=[{"role": "user", "content": "前の質問"}],
+                user_message="新しい質問",
+            )
+
+        texts = [json.loads(c[6:].strip()) for c in chunks]
+        assert texts == ["活性化", "関数は", "\n非線形"]
+        # 問題コンテキストはキャッシュ可能なプレフィックスとして渡す
+        assert "テスト問題" in captured["system"][0]["text"]
+        assert captured["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert captured["messages"] == [
+            {"role": "user", "content": "前の質問\n\n新しい質問"}
+        ]
+        mock_cli.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_cli_before_first_chunk(self) -> None:
+        """最初のチャンク前にAPIが失敗したらCLIで生成する"""
+
+        async def failing_stream(system, messages):
+            raise RuntimeError("connection refused")
+            yield  # pragma: no cover
+
+        async def fake_cli(prompt):
+            assert "質問" in prompt
+            yield "CLIの回答"
+
+        with patch("app.services.chat_service.stream_message_text", failing_stream), \
+                patch("app.services.chat_service.stream_claude_cli", fake_cli):
+            chunks = await _collect()
+
+        assert [json.loads(c[6:].strip()) for c in chunks] == ["CLIの回答"]
+
+    @pytest.mark.asyncio
+    async def test_error_after_first_chunk_does_not_fall_back(self) -> None:
+        """途中まで送った後の失敗はエラーイベントで終える（二重回答にしない）"""
+
+        async def broken_stream(system, messages):
+            yield "途中まで"
+            raise RuntimeError("stream reset")
+
+        with patch("app.services.chat_service.stream_message_text", broken_stream), \
+                patch("app.services.chat_service.stream_claude_cli") as mock_cli:
+            chunks = await _collect()
+
+        assert json.loads(chunks[0][6:].strip()) == "途中まで"
+        assert "エラー" in chunks[-1]
+        mock_cli.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_limits_concurrent_generations(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """同時生成数が chat_max_concurrency を超えない"""
+        monkeypatch.setattr(settings, "chat_max_concurrency", 3)
+        active = 0
+        peak = 0
+
+        async def slow_stream(system, messages):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            yield "回答"
+            active -= 1
+
+        with patch("app.services.chat_service.stream_message_text", slow_stream):
+            results = await asyncio.gather(*[_collect() for _ in range(10)])
+
+        assert all(len(chunks) == 1 for chunks in results)
+        assert peak == 3
+
+
+class TestStreamUntilDisconnect:
+    """クライアント切断時の中止とレジストリのテスト"""
+
+    @pytest.fixture(autouse=True)
+    def _reset_registry(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(chat_service, "_generations", {})
+        monkeypatch.setattr(
+            chat_service,
+            "_generation_totals",
+            {"completed": 0, "cancelled": 0, "failed": 0},
+        )
+
+    @pytest.mark.asyncio
+    async def test_relays_all_chunks(self) -> None:
+        """切断がなければすべてのチャンクを中継し、完了として数える"""
+
+        async def stream():
+            for text in ["a", "b", "c"]:
+                yield text
+
+        never = asyncio.Event()
+        chunks = [c async for c in stream_until_disconnect(stream(), never.wait)]
+
+        stats = get_chat_generation_stats()
+        assert chunks == ["a", "b", "c"]
+        assert stats["active_count"] == 0
+        assert stats["completed_total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_generation(self) -> None:
+        """切断されたら生成を中止し、生成側の後始末を待つ"""
+        disconnected = asyncio.Event()
+        cleaned_up = False
+
+        async def stream():
+            nonlocal cleaned_up
+            try:
+                yield "最初"
+                await asyncio.sleep(60)
+                yield "届かない"
+            finally:
+                cleaned_up = True
+
+        chunks: list[str] = []
+        async for chunk in stream_until_disconnect(
+            stream(), disconnected.wait, question_id="q1"
+        ):
+            chunks.append(chunk)
+            stats = get_chat_generation_stats()
+            assert stats["active_count"] == 1
+            assert stats["generations"][0]["question_id"] == "q1"
+            disconnected.set()
+
+        stats = get_chat_generation_stats()
+        assert chunks == ["最初"]
+        assert cleaned_up
+        assert stats["active_count"] == 0
+        assert stats["cancelled_total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_consumer_cancel_cancels_generation(self) -> None:
+        """レスポンス側のタスクがキャンセルされても生成を中止する"""
+        started = asyncio.Event()
+        cleaned_up = asyncio.Event()
+
+        async def stream():
+            try:
+                started.set()
+                await asyncio.sleep(60)
+                yield "届かない"
+            finally:
+                cleaned_up.set()
+
+        async def consume() -> None:
+            never = asyncio.Event()
+            async for _ in stream_until_disconnect(stream(), never.wait):
+                pass
+
+        task = asyncio.create_task(consume())
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert cleaned_up.is_set()
+        assert get_chat_generation_stats()["active_count"] == 0
+
+
+class TestConversationContext:
+    """要約と応答の記録のテスト"""
+
+    def test_prompt_includes_summary(self) -> None:
+        """CLI用プロンプトに要約が含まれる"""
+        prompt = build_prompt(
+            question_content="テスト問題",
+            choices=["A", "B"],
+            correct_answer=0,
+            explanation="解説",
+            history=[],
+            user_message="質問",
+            summary="ユーザー: 以前の質問",
+        )
+
+        assert "これまでの会話の要約" in prompt
+        assert "ユーザー: 以前の質問" in prompt
+
+    @pytest.mark.asyncio
+    async def test_summary_follows_cached_prefix(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """要約はキャッシュ対象の問題コンテキストの後ろに置く"""
+        monkeypatch.setattr(settings, "chat_backend", "api")
+        captured: dict = {}
+
+        async def fake_stream(system, messages):
+            captured["system"] = system
+            yield "回答"
+
+        with patch("app.services.chat_service.stream_message_text", fake_stream):
+            await _collect(summary="ユーザー: 以前の質問")
+
+        assert len(captured["system"]) == 2
+        assert "cache_control" not in captured["system"][1]
+        assert "以前の質問" in captured["system"][1]["text"]
+
+    @pytest.mark.asyncio
+    async def test_on_complete_receives_full_reply(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """生成し終えた応答全文をコールバックに渡す"""
+        monkeypatch.setattr(settings, "chat_backend", "api")
+        on_complete = AsyncMock()
+
+        async def fake_stream(system, messages):
+            for text in ["前半", "後半"]:
+                yield text
+
+        with patch("app.services.chat_service.stream_message_text", fake_stream):
+            await _collect(on_complete=on_complete)
+
+        on_complete.assert_awaited_once_with("前半後半")
+
+    @pytest.mark.asyncio
+    async def test_on_complete_not_called_on_error(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """生成に失敗した応答は記録しない"""
+        monkeypatch.setattr(settings, "chat_backend", "api")
+        on_complete = AsyncMock()
+
+        async def broken_stream(system, messages):
+            yield "途中まで"
+            raise RuntimeError("stream reset")
+
+        with patch("app.services.chat_service.stream_message_text", broken_stream):
+            await _collect(on_complete=on_complete)
+
+        on_complete.assert_not_awaited()
@@ -1,9 +1,10 @@
 """Claude CLI共通モジュールのテスト"""
-from unittest.mock import AsyncMock, patch
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from app.services.claude_cli import ClaudeCLIError, call_claude_cli
+from app.services.claude_cli import ClaudeCLIError, call_claude_cli, stream_claude_cli
 
 
 class TestCallClaudeCli:
@@ -68,3 +69,86 @@ class TestClaudeCLIError:
         """raiseしてcatchできる"""
         with pytest.raises(ClaudeCLIError):
             raise ClaudeCLIError("test error")
+
+
+def _hanging_process(pid: int = 4242) -> MagicMock:
+    """出力せずに待ち続けるCLIプロセスのモック"""
+    process = MagicMock()
+    process.pid = pid
+    process.returncode = None
+    hang = asyncio.Event()
+
+    async def readline() -> bytes:
+        await hang.wait()
+        return b""
+
+    async def wait() -> int:
+        await hang.wait()
+        return process.returncode
+
+    def terminate() -> None:
+        process.returncode = -15
+        hang.set()
+
+    process.stdout.readline = readline
+    process.wait = wait
+    process.terminate = MagicMock(side_effect=terminate)
+    process.kill = MagicMock()
+    return process
+
+
+class TestStreamClaudeCli:
+    """stream_claude_cli の中断処理のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_cancel_terminates_process(self) -> None:
+        """キャンセルされたらCLIプロセスを終了させる"""
+        process = _hanging_process()
+
+        async def consume() -> None:
+            async for _ in stream_claude_cli("prompt"):
+                pass
+
+        with patch("asyncio.create_subprocess_exec", AsyncMock(return_value=process)):
+            task = asyncio.create_task(consume())
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        process.terminate.assert_called_once()
+        process.kill.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_kills_process_ignoring_sigterm(self) -> None:
+        """SIGTERM で終了しないプロセスは kill する"""
+        process = _hanging_process()
+        process.terminate = MagicMock()
+
+        def kill() -> None:
+            process.returncode = -9
+
+        async def wait() -> int:
+            if process.returncode is None:
+                await asyncio.sleep(10)
+            return process.returncode
+
+        process.kill = MagicMock(side_effect=kill)
+        process.wait = wait
+
+        async def consume() -> None:
+            async for _ in stream_claude_cli("prompt"):
+                pass
+
+        with patch("asyncio.create_subprocess_exec", AsyncMock(return_value=process)), \
+                patch("app.services.claude_cli.TERMINATE_TIMEOUT_SECONDS", 0.01):
+            task = asyncio.create_task(consume())
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        process.terminate.assert_called_once()
+        process.kill.assert_called_once()
@@ -32,12 +32,17 @@ class MockDBSession:
         self._execute_results: list[MagicMock] = []
         self._execute_index = 0
         self.added_objects: list[object] = []
+        self.inserted_rows: list[dict] = []
 
     def set_execute_results(self, results: list[MagicMock]) -> None:
         self._execute_results = results
         self._execute_index = 0
 
-    async def execute(self, query: object) -> MagicMock:
+    async def execute(self, query: object, params: object = None) -> MagicMock:
+        if params is not None:
+            # 行のリストを渡す一括INSERT
+            self.inserted_rows.extend(params)
+            return MagicMock()
         if self._execute_index < len(self._execute_results):
             result = self._execute_results[self._execute_index]
             self._execute_index += 1
@@ -79,7 +84,7 @@ async def test_import_uses_claude_content_type_plain(
 
     # 重複チェック: 新規
     mock_no_duplicate = MagicMock()
-    mock_no_duplicate.scalar_one_or_none.return_value = None
+    mock_no_duplicate.scalars.return_value.all.return_value = []
 
     # カテゴリマップ構築用（空）
     mock_all_categories = MagicMock()
@@ -127,9 +132,9 @@ async def test_import_uses_claude_content_type_plain(
             assert response.status_code == 200
 
             # 保存されたオブジェクトを確認
-            assert len(mock_db.added_objects) == 1
-            saved_question = mock_db.added_objects[0]
-            assert saved_question.content_type == "plain"
+            assert len(mock_db.inserted_rows) == 1
+            saved_question = mock_db.inserted_rows[0]
+            assert saved_question["content_type"] == "plain"
 
     finally:
         app.dependency_overrides.clear()
@@ -147,7 +152,7 @@ async def test_import_uses_claude_content_type_markdown(
     mock_category_result.scalar_one_or_none.return_value = mock_category
 
     mock_no_duplicate = MagicMock()
-    mock_no_duplicate.scalar_one_or_none.return_value = None
+    mock_no_duplicate.scalars.return_value.all.return_value = []
 
     # カテゴリマップ構築用（空）
     mock_all_categories = MagicMock()
@@ -194,9 +199,9 @@ async def test_import_uses_claude_content_type_markdown(
 
             assert response.status_code == 200
 
-            assert len(mock_db.added_objects) == 1
-            saved_question = mock_db.added_objects[0]
-            assert saved_question.content_type == "markdown"
+            assert len(mock_db.inserted_rows) == 1
+            saved_question = mock_db.inserted_rows[0]
+            assert saved_question["content_type"] == "markdown"
 
     finally:
         app.dependency_overrides.clear()
@@ -214,7 +219,7 @@ async def test_import_uses_claude_content_type_code(
     mock_category_result.scalar_one_or_none.return_value = mock_category
 
     mock_no_duplicate = MagicMock()
-    mock_no_duplicate.scalar_one_or_none.return_value = None
+    mock_no_duplicate.scalars.return_value.all.return_value = []
 
     # カテゴリマップ構築用（空）
     mock_all_categories = MagicMock()
@@ -261,9 +266,9 @@ async def test_import_uses_claude_content_type_code(
 
             assert response.status_code == 200
 
-            assert len(mock_db.added_objects) == 1
-            saved_question = mock_db.added_objects[0]
-            assert saved_question.content_type == "code"
+            assert len(mock_db.inserted_rows) == 1
+            saved_question = mock_db.inserted_rows[0]
+            assert saved_question["content_type"] == "code"
 
     finally:
         app.dependency_overrides.clear()
@@ -281,7 +286,7 @@ async def test_import_defaults_to_plain_when_no_content_type(
     mock_category_result.scalar_one_or_none.return_value = mock_category
 
     mock_no_duplicate = MagicMock()
-    mock_no_duplicate.scalar_one_or_none.return_value = None
+    mock_no_duplicate.scalars.return_value.all.return_value = []
 
     # カテゴリマップ構築用（空）
     mock_all_categories = MagicMock()
@@ -328,9 +333,9 @@ async def test_import_defaults_to_plain_when_no_content_type(
 
             assert response.status_code == 200
 
-            assert len(mock_db.added_objects) == 1
-            saved_question = mock_db.added_objects[0]
-            assert saved_question.content_type == "plain"
+            assert len(mock_db.inserted_rows) == 1
+            saved_question = mock_db.inserted_rows[0]
+            assert saved_question["content_type"] == "plain"
 
     finally:
         app.dependency_overrides.clear()
@@ -12,7 +12,9 @@ from httpx import ASGITransport, AsyncClient
 
 from app.main import app
 from app.core.database import get_db
-from app.services.question_service import get_question_hash
+from sqlalchemy.dialects import postgresql
+
+from app.services.question_service import get_question_hash, get_questions_by_hashes
 
 
 class TestContentHash:
@@ -46,6 +48,37 @@ class TestContentHash:
         assert len(result) == 32
 
 
+class TestGetQuestionsByHashes:
+    """既存問題の一括検索のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_single_query_with_array_parameter(self) -> None:
+        """ハッシュの数によらず配列パラメータ1つのクエリになる"""
+        first = MagicMock(content_hash="a" * 32)
+        duplicate = MagicMock(content_hash="a" * 32)
+        second = MagicMock(content_hash="b" * 32)
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = [first, duplicate, second]
+        db = MagicMock()
+        db.execute = AsyncMock(return_value=result)
+
+        found = await get_questions_by_hashes(db, ["b" * 32, "a" * 32, "a" * 32])
+
+        assert found == {"a" * 32: first, "b" * 32: second}
+        db.execute.assert_awaited_once()
+        compiled = db.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+        assert "= ANY (%(content_hashes)s::VARCHAR[])" in str(compiled)
+        assert compiled.params == {"content_hashes": ["a" * 32, "b" * 32]}
+
+    @pytest.mark.asyncio
+    async def test_no_hashes_skips_query(self) -> None:
+        db = MagicMock()
+        db.execute = AsyncMock()
+
+        assert await get_questions_by_hashes(db, []) == {}
+        db.execute.assert_not_awaited()
+
+
 class MockCategory:
     """テスト用のカテゴリモック"""
 
@@ -78,13 +111,20 @@ class MockDBSession:
     def __init__(self) -> None:
         self._execute_results: list[MagicMock] = []
         self._execute_index = 0
+        self.execute_count = 0
         self.added_objects: list[object] = []
+        self.inserted_rows: list[dict] = []
 
     def set_execute_results(self, results: list[MagicMock]) -> None:
         self._execute_results = results
         self._execute_index = 0
 
-    async def execute(self, query: object) -> MagicMock:
+    async def execute(self, query: object, params: object = None) -> MagicMock:
+        self.execute_count += 1
+        if params is not None:
+            # 行のリストを渡す一括INSERT
+            self.inserted_rows.extend(params)
+            return MagicMock()
         if self._execute_index < len(self._execute_results):
             result = self._execute_results[self._execute_index]
             self._execute_index += 1
@@ -129,12 +169,9 @@ async def test_import_skips_duplicate_questions(
     mock_category_result = MagicMock()
     mock_category_result.scalar_one_or_none.return_value = mock_category
 
-    # 重複チェック: 1問目は既存、2問目は新規
-    mock_duplicate_result_1 = MagicMock()
-    mock_duplicate_result_1.scalar_one_or_none.return_value = existing_question  # 重複あり
-
-    mock_duplicate_result_2 = MagicMock()
-    mock_duplicate_result_2.scalar_one_or_none.return_value = None  # 重複なし
+    # 重複チェック（全問まとめて1回）: 1問目は既存、2問目は新規
+    mock_duplicate_result = MagicMock()
+    mock_duplicate_result.scalars.return_value.all.return_value = [existing_question]
 
     # カテゴリマップ構築用（空）
     mock_all_categories = MagicMock()
@@ -143,8 +180,7 @@ async def test_import_skips_duplicate_questions(
     mock_db.set_execute_results([
         mock_category_result,
         mock_all_categories,
-        mock_duplicate_result_1,
-        mock_duplicate_result_2,
+        mock_duplicate_result,
     ])
 
     # Claude CLIの抽出結果をモック
@@ -194,6 +230,8 @@ async def test_import_skips_duplicate_questions(
             data = response.json()
             assert data["count"] == 2  # 抽出された問題数
             assert data["saved_count"] == 1  # 保存された問題数（重複1件がスキップされた）
+            inserted = [row["content"] for row in mock_db.inserted_rows]
+            assert inserted == ["これは新規問題です。"]
 
     finally:
         app.dependency_overrides.clear()
@@ -213,7 +251,7 @@ async def test_import_saves_all_new_questions(
 
     # 重複チェック: すべて新規
     mock_no_duplicate = MagicMock()
-    mock_no_duplicate.scalar_one_or_none.return_value = None
+    mock_no_duplicate.scalars.return_value.all.return_value = []
 
     # カテゴリマップ構築用（空）
     mock_all_categories = MagicMock()
@@ -223,7 +261,6 @@ async def test_import_saves_all_new_questions(
         mock_category_result,
         mock_all_categories,
         mock_no_duplicate,
-        mock_no_duplicate,
     ])
 
     mock_questions = [
@@ -271,6 +308,8 @@ async def test_import_saves_all_new_questions(
             data = response.json()
             assert data["count"] == 2
             assert data["saved_count"] == 2  # すべて保存
+            inserted = [row["content"] for row in mock_db.inserted_rows]
+            assert inserted == ["新規問題1", "新規問題2"]
 
     finally:
         app.dependency_overrides.clear()
@@ -290,7 +329,10 @@ async def test_import_skips_all_duplicate_questions(
 
     # 重複チェック: すべて重複
     mock_duplicate = MagicMock()
-    mock_duplicate.scalar_one_or_none.return_value = MockQuestion()
+    mock_duplicate.scalars.return_value.all.return_value = [
+        MockQuestion(get_question_hash("重複問題1")),
+        MockQuestion(get_question_hash("重複問題2")),
+    ]
 
     # カテゴリマップ構築用（空）
     mock_all_categories = MagicMock()
@@ -300,7 +342,6 @@ async def test_import_skips_all_duplicate_questions(
         mock_category_result,
         mock_all_categories,
         mock_duplicate,
-        mock_duplicate,
     ])
 
     mock_questions = [
@@ -348,6 +389,71 @@ async def test_import_skips_all_duplicate_questions(
             data = response.json()
             assert data["count"] == 2  # 抽出された問題数
             assert data["saved_count"] == 0  # すべてスキップ
+            assert mock_db.inserted_rows == []
+
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_import_batches_duplicate_check_and_inserts(
+    mock_db: MockDBSession,
+    sample_pdf_bytes: bytes,
+) -> None:
+    """問題数によらず重複チェック1回・INSERT1回で保存し、インポート内の重複も除く"""
+    mock_category_result = MagicMock()
+    mock_category_result.scalar_one_or_none.return_value = MockCategory()
+    mock_all_categories = MagicMock()
+    mock_all_categories.scalars.return_value.all.return_value = []
+    mock_no_duplicate = MagicMock()
+    mock_no_duplicate.scalars.return_value.all.return_value = []
+    mock_db.set_execute_results([
+        mock_category_result,
+        mock_all_categories,
+        mock_no_duplicate,
+    ])
+
+    contents = [f"新規問題{i}" for i in range(50)] + ["新規問題0"]
+    mock_questions = [
+        {
+            "content": content,
+            "choices": ["A", "B", "C", "D"],
+            "correct_answer": 0,
+            "explanation": "解説",
+            "difficulty": 3,
+        }
+        for content in contents
+    ]
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    try:
+        with patch("app.api.questions.extract_text_from_pdf") as mock_extract_text, \
+             patch("app.api.questions.extract_questions_from_text") as mock_extract:
+
+            mock_extract_text.return_value = "テスト問題のテキスト"
+            mock_extract.return_value = mock_questions
+
+            pdf_file = ("test.pdf", BytesIO(sample_pdf_bytes), "application/pdf")
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                response = await client.post(
+                    "/api/questions/import",
+                    files={"file": pdf_file},
+                    data={"save_to_db": "true", "use_mineru": "false"},
+                )
+
+            assert response.status_code == 200
+            assert response.json()["saved_count"] == 50
+            assert len(mock_db.inserted_rows) == 50
+            assert len({row["content_hash"] for row in mock_db.inserted_rows}) == 50
+            # デフォルトカテゴリ・カテゴリ一覧・重複チェック・問題のINSERT・画像のINSERT
+            assert mock_db.execute_count <= 5
 
     finally:
         app.dependency_overrides.clear()
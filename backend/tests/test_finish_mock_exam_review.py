@@ -1,12 +1,14 @@
 """finish_mock_exam → 復習アイテム連携のテスト"""
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import AsyncIterator
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from fastapi import HTTPException
 
-from app.models.mock_exam import MockExam, MockExamAnswer
-from app.services.review_service import update_review_on_answer
+from app.models.mock_exam import MockExam
 
 
 class MockDBSession:
@@ -17,18 +19,24 @@ class MockDBSession:
         self._call_count = 0
         self._added: list[object] = []
         self._committed = False
+        self._savepoints = 0
 
     def set_execute_results(self, results: list[MagicMock]) -> None:
         self._execute_results = results
         self._call_count = 0
 
-    async def execute(self, query: object) -> MagicMock:
+    async def execute(self, query: object, params: object = None) -> MagicMock:
         if self._call_count < len(self._execute_results):
             result = self._execute_results[self._call_count]
             self._call_count += 1
             return result
         return MagicMock()
 
+    @asynccontextmanager
+    async def begin_nested(self) -> AsyncIterator[None]:
+        self._savepoints += 1
+        yield
+
     def add(self, obj: object) -> None:
         self._added.append(obj)
 
@@ -39,198 +47,153 @@ class MockDBSession:
         pass
 
 
-def _make_exam_with_answers(
-    user_id: str = "test_user",
-    answers_data: list[dict] | None = None,
-) -> MockExam:
-    """テスト用の模試とその回答を作成"""
-    exam = MockExam(
+def _make_exam(user_id: str = "test_user", status: str = "in_progress") -> MockExam:
+    """テスト用の模試を作成"""
+    return MockExam(
         id=uuid.uuid4(),
         user_id=user_id,
         started_at=datetime.utcnow(),
         total_questions=3,
-        status="in_progress",
+        status=status,
     )
 
-    if answers_data is None:
-        answers_data = [
-            {"is_correct": False, "exam_area": "機械学習"},
-            {"is_correct": True, "exam_area": "深層学習の基礎"},
-            {"is_correct": None, "exam_area": "応用数学"},
-        ]
-
-    exam.answers = []
-    for i, ad in enumerate(answers_data):
-        answer = MockExamAnswer(
-            id=uuid.uuid4(),
-            mock_exam_id=exam.id,
-            question_id=uuid.uuid4(),
-            question_index=i,
-            selected_answer=1 if ad["is_correct"] is not None else None,
-            is_correct=ad["is_correct"],
-            answered_at=datetime.utcnow() if ad["is_correct"] is not None else None,
-            category_name=ad["exam_area"],
-            exam_area=ad["exam_area"],
-        )
-        exam.answers.append(answer)
 
+def _make_finished_exam() -> MockExam:
+    """スイーパーが採点済みの模試"""
+    exam = _make_exam(status="finished")
+    exam.finished_at = datetime.utcnow()
+    exam.correct_count = 2
+    exam.score = 66.7
+    exam.passed = False
+    exam.category_scores = {
+        "機械学習": {"total": 3, "correct": 2, "accuracy": 66.7, "grade": "C"},
+    }
+    exam.analysis = "保存済みの分析"
     return exam
 
 
-@pytest.mark.asyncio
-async def test_finish_mock_exam_calls_update_review_for_incorrect() -> None:
-    """不正解の回答に対して update_review_on_answer が呼ばれる"""
-    exam = _make_exam_with_answers(answers_data=[
-        {"is_correct": False, "exam_area": "機械学習"},
-        {"is_correct": True, "exam_area": "深層学習の基礎"},
-    ])
-
-    with patch(
-        "app.api.mock_exam.update_review_on_answer",
-        new_callable=AsyncMock,
-    ) as mock_review:
-        mock_review.return_value = None
-
-        # finish_mock_exam のインポートと呼出し
-        from app.api.mock_exam import finish_mock_exam
-        from app.schemas.mock_exam import MockExamFinishRequest
-
-        # exam取得のモック
-        mock_db = MockDBSession()
-        exam_result = MagicMock()
-        exam_result.scalar_one_or_none.return_value = exam
-        mock_db.set_execute_results([exam_result])
+def _area_row(area: str, total: int, correct: int) -> MagicMock:
+    return MagicMock(
+        exam_area=area, topic=None, area_rolled_up=0, total=total, correct=correct
+    )
 
-        request = MockExamFinishRequest(user_id=exam.user_id)
-        await finish_mock_exam(exam.id, request, mock_db)
 
-        # 2回呼ばれる（不正解1回 + 正解1回）
-        assert mock_review.call_count == 2
+def _topic_row(topic: str, total: int, correct: int) -> MagicMock:
+    return MagicMock(
+        exam_area=None, topic=topic, area_rolled_up=1, total=total, correct=correct
+    )
 
-        # 不正解の呼び出しを確認
-        calls = mock_review.call_args_list
-        incorrect_call = calls[0]
-        assert incorrect_call.args[1] == exam.answers[0].question_id
-        assert incorrect_call.args[2] == exam.user_id
-        assert incorrect_call.args[3] is False
 
-        # 正解の呼び出しを確認
-        correct_call = calls[1]
-        assert correct_call.args[1] == exam.answers[1].question_id
-        assert correct_call.args[2] == exam.user_id
-        assert correct_call.args[3] is True
+def _setup_db(exam: MockExam, rows: list[MagicMock]) -> MockDBSession:
+    """模試取得 → GROUPING SETS 集計の順に結果を返すセッション"""
+    mock_db = MockDBSession()
+    exam_result = MagicMock()
+    exam_result.scalar_one_or_none.return_value = exam
+    agg_result = MagicMock()
+    agg_result.all.return_value = rows
+    mock_db.set_execute_results([exam_result, agg_result])
+    return mock_db
 
 
 @pytest.mark.asyncio
-async def test_finish_mock_exam_calls_update_review_for_correct() -> None:
-    """正解の回答に対して update_review_on_answer が呼ばれ correct_count が加算される"""
-    exam = _make_exam_with_answers(answers_data=[
-        {"is_correct": True, "exam_area": "深層学習の基礎"},
+async def test_finish_mock_exam_applies_review_items_once() -> None:
+    """復習アイテムへの反映は模試単位で1回だけ呼ばれる"""
+    exam = _make_exam()
+    mock_db = _setup_db(exam, [
+        _area_row("機械学習", 1, 0),
+        _area_row("深層学習の基礎", 1, 1),
     ])
 
     with patch(
-        "app.api.mock_exam.update_review_on_answer",
+        "app.services.mock_exam_service.apply_exam_answers_to_review_items",
         new_callable=AsyncMock,
-    ) as mock_review:
-        mock_review.return_value = None
+    ) as mock_apply:
+        mock_apply.return_value = 1
 
         from app.api.mock_exam import finish_mock_exam
         from app.schemas.mock_exam import MockExamFinishRequest
 
-        mock_db = MockDBSession()
-        exam_result = MagicMock()
-        exam_result.scalar_one_or_none.return_value = exam
-        mock_db.set_execute_results([exam_result])
-
         request = MockExamFinishRequest(user_id=exam.user_id)
         await finish_mock_exam(exam.id, request, mock_db)
 
-        # 正解に対して呼ばれる
-        assert mock_review.call_count == 1
-        call = mock_review.call_args_list[0]
-        assert call.args[3] is True
+        mock_apply.assert_awaited_once_with(mock_db, exam.id, exam.user_id)
+        # セーブポイント内で実行される
+        assert mock_db._savepoints == 1
+        assert mock_db._committed is True
 
 
 @pytest.mark.asyncio
-async def test_finish_mock_exam_skips_unanswered() -> None:
-    """未回答（is_correct=None）の回答はスキップされる"""
-    exam = _make_exam_with_answers(answers_data=[
-        {"is_correct": None, "exam_area": "応用数学"},
-        {"is_correct": None, "exam_area": "機械学習"},
+async def test_finish_mock_exam_scores_from_aggregate() -> None:
+    """集計クエリの結果から分野別・トピック別スコアが組み立てられる"""
+    exam = _make_exam()
+    mock_db = _setup_db(exam, [
+        _area_row("機械学習", 2, 1),
+        _area_row("応用数学", 1, 1),
+        _topic_row("CNN", 2, 2),
     ])
 
     with patch(
-        "app.api.mock_exam.update_review_on_answer",
+        "app.services.mock_exam_service.apply_exam_answers_to_review_items",
         new_callable=AsyncMock,
-    ) as mock_review:
+    ):
         from app.api.mock_exam import finish_mock_exam
         from app.schemas.mock_exam import MockExamFinishRequest
 
-        mock_db = MockDBSession()
-        exam_result = MagicMock()
-        exam_result.scalar_one_or_none.return_value = exam
-        mock_db.set_execute_results([exam_result])
-
         request = MockExamFinishRequest(user_id=exam.user_id)
-        await finish_mock_exam(exam.id, request, mock_db)
+        result = await finish_mock_exam(exam.id, request, mock_db)
 
-        # 未回答はスキップ
-        assert mock_review.call_count == 0
+    assert result.correct_count == 2
+    assert result.score == pytest.approx(66.7)
+    areas = {c.area_name: c for c in result.category_scores}
+    assert areas["機械学習"].total == 2
+    assert areas["機械学習"].accuracy == 50.0
+    assert areas["応用数学"].accuracy == 100.0
+    assert exam.status == "finished"
+    assert exam.category_scores["機械学習"]["correct"] == 1
+    # トピック別スコアと分析は模試に保存される
+    assert exam.topic_scores == {"CNN": {"total": 2, "correct": 2, "accuracy": 100.0}}
+    assert exam.analysis == result.analysis
 
 
 @pytest.mark.asyncio
-async def test_finish_mock_exam_mixed_answers() -> None:
-    """混合パターン: 不正解・正解・未回答が正しく処理される"""
-    exam = _make_exam_with_answers(answers_data=[
-        {"is_correct": False, "exam_area": "機械学習"},
-        {"is_correct": True, "exam_area": "深層学習の基礎"},
-        {"is_correct": None, "exam_area": "応用数学"},
-    ])
+async def test_finish_mock_exam_without_answers() -> None:
+    """回答行がない場合は0点で終了する"""
+    exam = _make_exam()
+    mock_db = _setup_db(exam, [])
 
     with patch(
-        "app.api.mock_exam.update_review_on_answer",
+        "app.services.mock_exam_service.apply_exam_answers_to_review_items",
         new_callable=AsyncMock,
-    ) as mock_review:
-        mock_review.return_value = None
-
+    ):
         from app.api.mock_exam import finish_mock_exam
         from app.schemas.mock_exam import MockExamFinishRequest
 
-        mock_db = MockDBSession()
-        exam_result = MagicMock()
-        exam_result.scalar_one_or_none.return_value = exam
-        mock_db.set_execute_results([exam_result])
-
         request = MockExamFinishRequest(user_id=exam.user_id)
-        await finish_mock_exam(exam.id, request, mock_db)
+        result = await finish_mock_exam(exam.id, request, mock_db)
 
-        # 不正解1回 + 正解1回 = 2回（未回答はスキップ）
-        assert mock_review.call_count == 2
+    assert result.score == 0.0
+    assert result.category_scores == []
+    assert result.passed is False
 
 
 @pytest.mark.asyncio
 async def test_finish_mock_exam_review_error_does_not_break_result() -> None:
     """復習アイテム更新で例外が発生しても模試結果は正常に返される"""
-    exam = _make_exam_with_answers(answers_data=[
-        {"is_correct": False, "exam_area": "機械学習"},
-        {"is_correct": True, "exam_area": "深層学習の基礎"},
+    exam = _make_exam()
+    mock_db = _setup_db(exam, [
+        _area_row("機械学習", 1, 0),
+        _area_row("深層学習の基礎", 1, 1),
     ])
 
     with patch(
-        "app.api.mock_exam.update_review_on_answer",
+        "app.services.mock_exam_service.apply_exam_answers_to_review_items",
         new_callable=AsyncMock,
-    ) as mock_review:
-        # 全ての呼び出しで例外を発生させる
-        mock_review.side_effect = Exception("DB接続エラー")
+    ) as mock_apply:
+        mock_apply.side_effect = Exception("DB接続エラー")
 
         from app.api.mock_exam import finish_mock_exam
         from app.schemas.mock_exam import MockExamFinishRequest
 
-        mock_db = MockDBSession()
-        exam_result = MagicMock()
-        exam_result.scalar_one_or_none.return_value = exam
-        mock_db.set_execute_results([exam_result])
-
         request = MockExamFinishRequest(user_id=exam.user_id)
         # 例外が発生しても正常にレスポンスが返る
         result = await finish_mock_exam(exam.id, request, mock_db)
@@ -239,3 +202,83 @@ async def test_finish_mock_exam_review_error_does_not_break_result() -> None:
         assert result.score is not None
         # commitが呼ばれた（模試結果が保存された）
         assert mock_db._committed is True
+
+
+@pytest.mark.asyncio
+async def test_finish_already_finished_exam_returns_stored_result() -> None:
+    """スイーパーが終了済みの模試は再採点せず、保存済みの結果を返す"""
+    exam = _make_finished_exam()
+    mock_db = _setup_db(exam, [])
+
+    with patch(
+        "app.services.mock_exam_service.apply_exam_answers_to_review_items",
+        new_callable=AsyncMock,
+    ) as mock_apply, patch(
+        "app.api.mock_exam.finish_exam", new_callable=AsyncMock
+    ) as mock_finish, patch(
+        "app.api.mock_exam.get_exam_percentiles",
+        new_callable=AsyncMock,
+        return_value=(40.0, {"機械学習": 50.0}),
+    ):
+        from app.api.mock_exam import finish_mock_exam
+        from app.schemas.mock_exam import MockExamFinishRequest
+
+        request = MockExamFinishRequest(user_id=exam.user_id)
+        result = await finish_mock_exam(exam.id, request, mock_db)
+
+    mock_finish.assert_not_called()
+    mock_apply.assert_not_called()
+    assert result.status == "finished"
+    assert result.score == 66.7
+    assert result.analysis == "保存済みの分析"
+    assert result.percentile == 40.0
+    assert result.category_scores[0].percentile == 50.0
+
+
+@pytest.mark.asyncio
+async def test_finish_expired_exam_is_rejected() -> None:
+    """スイーパーが期限切れにした模試は0点で終了させない"""
+    exam = _make_exam(status="expired")
+    mock_db = _setup_db(exam, [])
+
+    with patch(
+        "app.api.mock_exam.finish_exam", new_callable=AsyncMock
+    ) as mock_finish, patch(
+        "app.services.mock_exam_service.record_exam_scores", new_callable=AsyncMock
+    ) as mock_record:
+        from app.api.mock_exam import finish_mock_exam
+        from app.schemas.mock_exam import MockExamFinishRequest
+
+        request = MockExamFinishRequest(user_id=exam.user_id)
+        with pytest.raises(HTTPException) as exc_info:
+            await finish_mock_exam(exam.id, request, mock_db)
+
+    assert exc_info.value.status_code == 400
+    mock_finish.assert_not_called()
+    mock_record.assert_not_called()
+    assert exam.status == "expired"
+
+
+@pytest.mark.asyncio
+async def test_finish_exam_refinish_skips_review_items() -> None:
+    """終了済みの模試を再採点しても復習アイテムに二重に反映しない"""
+    from app.services.mock_exam_service import finish_exam
+
+    exam = _make_finished_exam()
+    mock_db = MockDBSession()
+    agg_result = MagicMock()
+    agg_result.all.return_value = [_area_row("機械学習", 3, 2)]
+    mock_db.set_execute_results([agg_result])
+
+    with patch(
+        "app.services.mock_exam_service.apply_exam_answers_to_review_items",
+        new_callable=AsyncMock,
+    ) as mock_apply, patch(
+        "app.services.mock_exam_service.record_exam_scores", new_callable=AsyncMock
+    ) as mock_record:
+        scores = await finish_exam(mock_db, exam)
+
+    assert scores["correct_count"] == 2
+    mock_apply.assert_not_called()
+    mock_record.assert_not_called()
+    assert mock_db._savepoints == 0
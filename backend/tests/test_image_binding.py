@@ -12,6 +12,10 @@ from httpx import ASGITransport, AsyncClient
 
 from app.main import app
 from app.core.database import get_db
+from sqlalchemy.dialects import postgresql
+
+from app.services.image_linker import insert_question_images
+from app.services.question_service import get_question_hash
 from app.services.mineru_extractor import ExtractedImage, MinerUExtractionResult
 from app.services.vlm_analyzer import VLMAnalysisResult
 
@@ -32,12 +36,17 @@ class MockDBSession:
         self._execute_results: list[MagicMock] = []
         self._execute_index = 0
         self.added_objects: list[object] = []
+        self.inserted_rows: list[dict] = []
 
     def set_execute_results(self, results: list[MagicMock]) -> None:
         self._execute_results = results
         self._execute_index = 0
 
-    async def execute(self, query: object) -> MagicMock:
+    async def execute(self, query: object, params: object = None) -> MagicMock:
+        if params is not None:
+            # 行のリストを渡す一括INSERT
+            self.inserted_rows.extend(params)
+            return MagicMock()
         if self._execute_index < len(self._execute_results):
             result = self._execute_results[self._execute_index]
             self._execute_index += 1
@@ -380,3 +389,134 @@ async def test_image_binding_missing_image(
 
     finally:
         app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_insert_question_images_single_statement() -> None:
+    """画像レコードは ON CONFLICT DO NOTHING の1文でまとめて挿入する"""
+    question_id = uuid.uuid4()
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "question_id": question_id,
+            "file_path": f"/static/images/{i}.png",
+            "alt_text": None,
+            "position": i,
+            "image_type": "diagram",
+        }
+        for i in range(3)
+    ]
+    result = MagicMock()
+    result.all.return_value = [(row["id"],) for row in rows[:2]]
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=result)
+
+    assert await insert_question_images(db, rows) == 2
+    db.execute.assert_awaited_once()
+    sql = str(db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT ON CONSTRAINT uq_question_image_path DO NOTHING" in sql
+    assert "RETURNING question_images.id" in sql
+
+
+@pytest.mark.asyncio
+async def test_insert_question_images_no_rows() -> None:
+    db = MagicMock()
+    db.execute = AsyncMock()
+
+    assert await insert_question_images(db, []) == 0
+    db.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_image_binding_to_existing_question_without_images(
+    mock_db: MockDBSession,
+    sample_pdf_bytes: bytes,
+    sample_png_bytes: bytes,
+) -> None:
+    """重複した既存問題に画像がなければ、画像レコードだけを追加する"""
+    existing_question = MagicMock(
+        id=uuid.uuid4(),
+        content_hash=get_question_hash("既存問題"),
+        images=[],
+    )
+    mock_category_result = MagicMock()
+    mock_category_result.scalar_one_or_none.return_value = MockCategory()
+    mock_all_categories = MagicMock()
+    mock_all_categories.scalars.return_value.all.return_value = []
+    mock_existing = MagicMock()
+    mock_existing.scalars.return_value.all.return_value = [existing_question]
+    mock_db.set_execute_results([
+        mock_category_result,
+        mock_all_categories,
+        mock_existing,
+    ])
+
+    mock_mineru_result = MinerUExtractionResult(
+        markdown="# テスト\n\n![図1](image_001.png)",
+        images=[
+            ExtractedImage(
+                filename="image_001.png",
+                data=sample_png_bytes,
+                page_number=1,
+                position=0,
+            ),
+        ],
+        metadata={},
+    )
+    mock_questions = [
+        {
+            "content": "既存問題",
+            "choices": ["A", "B", "C", "D"],
+            "correct_answer": 0,
+            "explanation": "解説",
+            "difficulty": 3,
+            "image_refs": ["image_001.png"],
+        },
+    ]
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    try:
+        with patch("app.api.questions.MinerUExtractor") as mock_extractor_class, \
+             patch("app.api.questions.VLMAnalyzer") as mock_vlm_class, \
+             patch("app.api.questions.ImageStorage") as mock_storage_class, \
+             patch("app.api.questions.insert_question_images") as mock_insert_images, \
+             patch("app.api.questions.link_images_by_semantic_matching"), \
+             patch("app.api.questions.extract_questions_from_text") as mock_extract:
+
+            mock_extractor_class.return_value.extract = AsyncMock(
+                return_value=mock_mineru_result
+            )
+            mock_vlm_class.return_value.analyze = AsyncMock(return_value=None)
+            mock_storage_class.return_value.save.return_value = MagicMock(
+                id=uuid.uuid4(),
+                file_path="/static/images/test.png",
+            )
+            mock_insert_images.return_value = 1
+            mock_extract.return_value = mock_questions
+
+            pdf_file = ("test.pdf", BytesIO(sample_pdf_bytes), "application/pdf")
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                response = await client.post(
+                    "/api/questions/import",
+                    files={"file": pdf_file},
+                    data={"save_to_db": "true"},
+                )
+
+            assert response.status_code == 200
+            assert response.json()["saved_count"] == 0
+            assert mock_db.inserted_rows == []
+            mock_insert_images.assert_awaited_once()
+            rows = mock_insert_images.await_args.args[1]
+            assert [(row["question_id"], row["position"]) for row in rows] == [
+                (existing_question.id, 0)
+            ]
+
+    finally:
+        app.dependency_overrides.clear()
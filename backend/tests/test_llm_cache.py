@@ -0,0 +1,172 @@
+"""LLM応答キャッシュ（SQLite）のテスト"""
+import asyncio
+import sqlite3
+import zlib
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from app.services import llm_cache
+from app.services.llm_cache import LLMCache
+
+
+@pytest.fixture
+def cache(tmp_path: Path):
+    cache = LLMCache(tmp_path / "llm_cache.sqlite3", max_bytes=1 << 20)
+    yield cache
+    cache.close()
+
+
+class TestLLMCache:
+    """キーバリューストアの基本動作"""
+
+    @pytest.mark.asyncio
+    async def test_set_and_get(self, cache: LLMCache) -> None:
+        value = [{"content": "問題文", "choices": ["A", "B"], "correct_answer": 0}]
+        await cache.set("pdf_extraction", "key1", value)
+
+        assert await cache.get("pdf_extraction", "key1") == value
+        assert await cache.get("pdf_extraction", "missing") is None
+        # namespace が違えば別のエントリ
+        assert await cache.get("other", "key1") is None
+
+    @pytest.mark.asyncio
+    async def test_overwrite(self, cache: LLMCache) -> None:
+        await cache.set("ns", "key", [1])
+        await cache.set("ns", "key", [2])
+
+        assert await cache.get("ns", "key") == [2]
+        assert (await cache.stats())["entries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_values_are_compressed_in_wal_mode(self, cache: LLMCache) -> None:
+        value = {"explanation": "同じ解説の繰り返し。" * 200}
+        await cache.set("ns", "key", value)
+
+        conn = sqlite3.connect(cache.path)
+        try:
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            blob, size = conn.execute("SELECT value, size FROM entries").fetchone()
+        finally:
+            conn.close()
+        assert mode == "wal"
+        assert size == len(blob) < len(value["explanation"].encode())
+        assert zlib.decompress(blob)
+
+    @pytest.mark.asyncio
+    async def test_persists_across_instances(self, tmp_path: Path) -> None:
+        path = tmp_path / "llm_cache.sqlite3"
+        first = LLMCache(path, max_bytes=1 << 20)
+        await first.set("ns", "key", {"a": 1})
+        first.close()
+
+        second = LLMCache(path, max_bytes=1 << 20)
+        try:
+            assert await second.get("ns", "key") == {"a": 1}
+        finally:
+            second.close()
+
+    @pytest.mark.asyncio
+    async def test_clear(self, cache: LLMCache) -> None:
+        await cache.set("a", "k1", 1)
+        await cache.set("a", "k2", 2)
+        await cache.set("b", "k1", 3)
+
+        assert await cache.clear("a") == 2
+        assert await cache.get("b", "k1") == 3
+        assert await cache.clear() == 1
+        assert (await cache.stats())["entries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_corrupt_value_is_a_miss(self, cache: LLMCache) -> None:
+        await cache.set("ns", "key", [1])
+        conn = sqlite3.connect(cache.path)
+        conn.execute("UPDATE entries SET value = x'00'")
+        conn.commit()
+        conn.close()
+
+        assert await cache.get("ns", "key") is None
+
+    @pytest.mark.asyncio
+    async def test_concurrent_access(self, cache: LLMCache) -> None:
+        await asyncio.gather(*[cache.set("ns", f"key{i}", i) for i in range(50)])
+        values = await asyncio.gather(*[cache.get("ns", f"key{i}") for i in range(50)])
+
+        assert values == list(range(50))
+
+
+class TestEviction:
+    """サイズ上限とLRU削除"""
+
+    @staticmethod
+    def _entry_size(tmp_path: Path) -> int:
+        conn = sqlite3.connect(tmp_path / "llm_cache.sqlite3")
+        try:
+            return conn.execute("SELECT MAX(size) FROM entries").fetchone()[0]
+        finally:
+            conn.close()
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self, tmp_path: Path) -> None:
+        cache = LLMCache(tmp_path / "llm_cache.sqlite3", max_bytes=1 << 20)
+        try:
+            # 同じ大きさのエントリ3件分の上限にする
+            times = iter(range(1000, 2000))
+            with patch.object(llm_cache.time, "time", side_effect=lambda: next(times)):
+                for key in ("a", "b", "c"):
+                    await cache.set("ns", key, {"v": key})
+                cache.max_bytes = self._entry_size(tmp_path) * 3
+
+                # a を使ったので、d を追加すると最も古く使われた b が消える
+                assert await cache.get("ns", "a") == {"v": "a"}
+                await cache.set("ns", "d", {"v": "d"})
+
+            assert await cache.get("ns", "b") is None
+            for key in ("a", "c", "d"):
+                assert await cache.get("ns", key) == {"v": key}
+        finally:
+            cache.close()
+
+    @pytest.mark.asyncio
+    async def test_total_size_stays_under_cap(self, tmp_path: Path) -> None:
+        cache = LLMCache(tmp_path / "llm_cache.sqlite3", max_bytes=4096)
+        try:
+            for i in range(200):
+                await cache.set("ns", f"key{i}", {"text": f"エントリ{i}" * 20})
+
+            stats = await cache.stats()
+            assert 0 < stats["bytes"] <= 4096
+            # 最後に書いたものは残っている
+            assert await cache.get("ns", "key199") is not None
+        finally:
+            cache.close()
+
+
+class TestStats:
+    """アクセス統計"""
+
+    @pytest.mark.asyncio
+    async def test_records_hits_and_access_time(self, cache: LLMCache) -> None:
+        times = iter([100.0, 200.0, 300.0])
+        with patch.object(llm_cache.time, "time", side_effect=lambda: next(times)):
+            await cache.set("ns", "key", [1])
+            await cache.get("ns", "key")
+            await cache.get("ns", "key")
+        await cache.get("ns", "missing")
+
+        stats = await cache.stats()
+        assert stats["entries"] == 1
+        assert stats["session_hits"] == 2
+        assert stats["session_misses"] == 1
+        assert stats["namespaces"]["ns"]["hits"] == 2
+        assert stats["namespaces"]["ns"]["oldest_access"] == 300.0
+
+    @pytest.mark.asyncio
+    async def test_unreadable_cache_returns_empty_stats(
+        self, cache: LLMCache
+    ) -> None:
+        with patch.object(
+            cache, "_stats", side_effect=sqlite3.OperationalError("locked")
+        ):
+            assert await cache.stats() == {}
@@ -1,7 +1,7 @@
 """画像マッチングのテスト
 
 sentence-transformersを使用した問題-画像マッチングのユニットテスト
-numpy/sentence-transformersはオプショナル依存(vlm)のため、未インストール時はスキップ
+scikit-learn/sentence-transformersはオプショナル依存(vlm)のため、未インストール時はスキップ
 """
 import json
 import pytest
@@ -9,6 +9,9 @@ from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 np = pytest.importorskip("numpy", reason="numpy is required for image matching tests")
+pytest.importorskip(
+    "sklearn", reason="scikit-learn is required for image matching tests"
+)
 
 
 class TestImageMatcher:
@@ -0,0 +1,216 @@
+"""模試AI分析キャッシュのテスト"""
+import asyncio
+import time
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services import mock_exam_analysis_cache
+from app.services.mock_exam_analysis_cache import (
+    ACCURACY_BUCKET_WIDTH,
+    FAILED_STATUS_TTL_SECONDS,
+    WEAK_TOPIC_COUNT,
+    build_score_profile,
+    get_cached_analysis,
+    is_ai_analysis_failed,
+    is_ai_analysis_pending,
+    score_profile_key,
+    start_ai_analysis,
+)
+
+
+def _category_scores(**accuracies: float) -> dict:
+    return {
+        area: {"total": 10, "correct": int(acc // 10), "accuracy": acc, "grade": "B"}
+        for area, acc in accuracies.items()
+    }
+
+
+class TestBuildScoreProfile:
+    """スコアプロファイル正規化のテスト"""
+
+    def test_buckets_area_accuracy(self) -> None:
+        profile = build_score_profile(
+            passed=True,
+            category_scores=_category_scores(応用数学=72.5, 機械学習=100.0),
+        )
+        assert profile["areas"] == {"応用数学": 70, "機械学習": 100}
+        assert 72.5 // ACCURACY_BUCKET_WIDTH == 7
+
+    def test_similar_scores_share_key(self) -> None:
+        """同じ帯に入るスコアは同じキーになる"""
+        a = build_score_profile(True, _category_scores(応用数学=71.0, 機械学習=55.0))
+        b = build_score_profile(True, _category_scores(機械学習=59.9, 応用数学=78.0))
+        assert score_profile_key(a) == score_profile_key(b)
+
+    def test_pass_fail_changes_key(self) -> None:
+        scores = _category_scores(応用数学=71.0)
+        passed_key = score_profile_key(build_score_profile(True, scores))
+        failed_key = score_profile_key(build_score_profile(False, scores))
+        assert passed_key != failed_key
+
+    def test_weak_topics_lowest_below_threshold(self) -> None:
+        topic_scores = {
+            "CNN": {"total": 4, "correct": 1, "accuracy": 25.0},
+            "RNN": {"total": 4, "correct": 2, "accuracy": 50.0},
+            "ベイズ則": {"total": 4, "correct": 0, "accuracy": 0.0},
+            "線形代数": {"total": 4, "correct": 4, "accuracy": 100.0},
+            "正則化": {"total": 4, "correct": 2, "accuracy": 50.0},
+        }
+        profile = build_score_profile(
+            False, _category_scores(応用数学=50.0), topic_scores
+        )
+        assert len(profile["weak_topics"]) == WEAK_TOPIC_COUNT
+        assert profile["weak_topics"][:2] == ["ベイズ則", "CNN"]
+        assert "線形代数" not in profile["weak_topics"]
+
+
+class TestGetCachedAnalysis:
+    """キャッシュ参照のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_single_update_returning(self) -> None:
+        """ヒット数の更新と取得を1文で行う"""
+        db = AsyncMock()
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = "分析"
+        db.execute.return_value = result
+
+        cached = await get_cached_analysis(db, build_score_profile(True, {}))
+
+        assert cached == "分析"
+        assert db.execute.await_count == 1
+        sql = str(db.execute.await_args.args[0])
+        assert sql.startswith("UPDATE mock_exam_analysis_cache")
+        assert "RETURNING" in sql
+
+    @pytest.mark.asyncio
+    async def test_disabled_skips_lookup(self) -> None:
+        db = AsyncMock()
+        with patch(
+            "app.services.mock_exam_analysis_cache.settings.mock_exam_ai_analysis_cache_enabled",
+            False,
+        ):
+            assert await get_cached_analysis(db, build_score_profile(True, {})) is None
+        db.execute.assert_not_called()
+
+
+class TestStartAIAnalysis:
+    """single-flight 生成のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_same_exam_shares_task(self) -> None:
+        exam_id = uuid.uuid4()
+        release = asyncio.Event()
+        calls = 0
+
+        async def generate() -> str:
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "分析"
+
+        with patch(
+            "app.services.mock_exam_analysis_cache.save_ai_analysis",
+            new_callable=AsyncMock,
+        ) as mock_save:
+            first = start_ai_analysis(exam_id, {}, generate)
+            second = start_ai_analysis(exam_id, {}, generate)
+            assert first is second
+            assert is_ai_analysis_pending(exam_id)
+
+            release.set()
+            assert await first == "分析"
+            await asyncio.sleep(0)
+
+        assert calls == 1
+        mock_save.assert_awaited_once()
+        assert not is_ai_analysis_pending(exam_id)
+
+    @pytest.mark.asyncio
+    async def test_failed_generation_is_not_saved(self) -> None:
+        exam_id = uuid.uuid4()
+        with patch(
+            "app.services.mock_exam_analysis_cache.save_ai_analysis",
+            new_callable=AsyncMock,
+        ) as mock_save:
+            result = await start_ai_analysis(exam_id, {}, AsyncMock(return_value=None))
+
+        assert result is None
+        mock_save.assert_not_called()
+        await asyncio.sleep(0)
+        assert is_ai_analysis_failed(exam_id)
+
+    @pytest.mark.asyncio
+    async def test_generation_error_is_logged_and_recorded(self) -> None:
+        exam_id = uuid.uuid4()
+        with patch("app.services.mock_exam_analysis_cache.logger") as mock_logger:
+            task = start_ai_analysis(
+                exam_id, {}, AsyncMock(side_effect=RuntimeError("LLM down"))
+            )
+            with pytest.raises(RuntimeError):
+                await task
+            await asyncio.sleep(0)
+
+        assert mock_logger.error.call_count == 1
+        assert "LLM down" in mock_logger.error.call_args.args[0]
+        assert not is_ai_analysis_pending(exam_id)
+        assert is_ai_analysis_failed(exam_id)
+
+    @pytest.mark.asyncio
+    async def test_failure_expires_and_is_cleared_on_retry(self) -> None:
+        exam_id = uuid.uuid4()
+        with patch(
+            "app.services.mock_exam_analysis_cache.save_ai_analysis",
+            new_callable=AsyncMock,
+        ):
+            await start_ai_analysis(exam_id, {}, AsyncMock(return_value=None))
+            await asyncio.sleep(0)
+            assert is_ai_analysis_failed(exam_id)
+
+            expired = time.monotonic() + FAILED_STATUS_TTL_SECONDS
+            with patch(
+                "app.services.mock_exam_analysis_cache.time.monotonic",
+                return_value=expired,
+            ):
+                assert not is_ai_analysis_failed(exam_id)
+
+            await start_ai_analysis(exam_id, {}, AsyncMock(return_value=None))
+            await asyncio.sleep(0)
+            assert is_ai_analysis_failed(exam_id)
+
+            retry = start_ai_analysis(exam_id, {}, AsyncMock(return_value="分析"))
+            assert not is_ai_analysis_failed(exam_id)
+            assert await retry == "分析"
+            await asyncio.sleep(0)
+
+        assert not is_ai_analysis_failed(exam_id)
+
+    @pytest.mark.asyncio
+    async def test_expired_failures_are_pruned_on_new_failure(self) -> None:
+        """期限切れの失敗記録は次の失敗を記録するときに捨てる"""
+        old_ids = [uuid.uuid4() for _ in range(3)]
+        new_id = uuid.uuid4()
+        now = time.monotonic()
+
+        with patch(
+            "app.services.mock_exam_analysis_cache.time.monotonic",
+            return_value=now,
+        ):
+            for exam_id in old_ids:
+                await start_ai_analysis(exam_id, {}, AsyncMock(return_value=None))
+                await asyncio.sleep(0)
+        assert all(exam_id in mock_exam_analysis_cache._failed for exam_id in old_ids)
+
+        with patch(
+            "app.services.mock_exam_analysis_cache.time.monotonic",
+            return_value=now + FAILED_STATUS_TTL_SECONDS,
+        ):
+            await start_ai_analysis(new_id, {}, AsyncMock(return_value=None))
+            await asyncio.sleep(0)
+
+        assert not any(
+            exam_id in mock_exam_analysis_cache._failed for exam_id in old_ids
+        )
+        assert is_ai_analysis_failed(new_id)
@@ -0,0 +1,193 @@
+"""模試スコアのパーセンタイル算出テスト"""
+import uuid
+from datetime import datetime
+from typing import AsyncIterator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.mock_exam import MockExam
+from app.services.mock_exam_percentile import (
+    BIN_COUNT,
+    OVERALL_AREA,
+    get_exam_percentiles,
+    percentile_from_bins,
+    rebuild_score_distribution,
+    record_exam_scores,
+    score_bin,
+)
+
+
+class TestScoreBin:
+    def test_floor_to_percent(self) -> None:
+        assert score_bin(0.0) == 0
+        assert score_bin(64.9) == 64
+        assert score_bin(65.0) == 65
+
+    def test_clamped(self) -> None:
+        assert score_bin(100.0) == BIN_COUNT - 1
+        assert score_bin(-1.0) == 0
+
+
+class TestPercentileFromBins:
+    def test_empty_distribution(self) -> None:
+        assert percentile_from_bins([0] * BIN_COUNT, 50.0) is None
+
+    def test_mid_rank(self) -> None:
+        """下位の件数 + 同じビンの半数で計算する"""
+        bins = [0] * BIN_COUNT
+        bins[40] = 2
+        bins[60] = 4
+        bins[80] = 4
+        # 60点: 下位2件 + 同ビン4件の半数 → 4 / 10
+        assert percentile_from_bins(bins, 60.5) == 40.0
+        assert percentile_from_bins(bins, 100.0) == 100.0
+        assert percentile_from_bins(bins, 10.0) == 0.0
+
+    def test_matches_naive_count(self) -> None:
+        """全件走査による計算と一致する"""
+        scores = [12.0, 35.5, 35.9, 50.0, 64.0, 65.0, 72.3, 72.8, 88.0, 100.0]
+        bins = [0] * BIN_COUNT
+        for s in scores:
+            bins[score_bin(s)] += 1
+        for target in scores:
+            below = sum(1 for s in scores if score_bin(s) < score_bin(target))
+            same = sum(1 for s in scores if score_bin(s) == score_bin(target))
+            naive = round((below + same / 2) / len(scores) * 100.0, 1)
+            assert percentile_from_bins(bins, target) == naive
+
+
+class TestRecordExamScores:
+    @pytest.mark.asyncio
+    async def test_single_upsert(self) -> None:
+        """総合 + 分野ごとの1ビンずつを1文で加算する"""
+        db = AsyncMock()
+        await record_exam_scores(
+            db,
+            72.0,
+            {
+                "機械学習": {"accuracy": 55.0},
+                "応用数学": {"accuracy": 100.0},
+            },
+        )
+        assert db.execute.await_count == 1
+        compiled = db.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        assert "INSERT INTO mock_exam_score_bins" in sql
+        assert "ON CONFLICT (area, bin) DO UPDATE" in sql
+        values = list(compiled.params.values())
+        assert OVERALL_AREA in values
+        assert 72 in values and 55 in values and 100 in values
+
+
+class TestRebuildScoreDistribution:
+    @pytest.mark.asyncio
+    async def test_locks_bins_before_reading_exams(self) -> None:
+        """再構築中の模試終了と競合しないよう、読み込み前に分布をロックする"""
+        calls: list[str] = []
+        rows = [
+            MagicMock(score=72.0, category_scores={"機械学習": {"accuracy": 55.0}}),
+            MagicMock(score=72.5, category_scores=None),
+        ]
+
+        async def stream_rows() -> AsyncIterator[MagicMock]:
+            for row in rows:
+                yield row
+
+        async def stream(query: object) -> object:
+            calls.append("stream")
+            return stream_rows()
+
+        async def execute(statement: object, params: object = None) -> MagicMock:
+            calls.append(str(statement.compile(dialect=postgresql.dialect())))
+            return MagicMock()
+
+        db = AsyncMock()
+        db.stream.side_effect = stream
+        db.execute.side_effect = execute
+
+        exam_count = await rebuild_score_distribution(db)
+
+        assert exam_count == 2
+        assert calls[0] == "LOCK TABLE mock_exam_score_bins IN EXCLUSIVE MODE"
+        assert calls[1] == "stream"
+        assert calls[2].startswith("DELETE FROM mock_exam_score_bins")
+        assert calls[3].startswith("INSERT INTO mock_exam_score_bins")
+        inserted = db.execute.await_args_list[-1].args[1]
+        assert {"area": OVERALL_AREA, "bin": 72, "count": 2} in inserted
+        assert {"area": "機械学習", "bin": 55, "count": 1} in inserted
+
+
+class TestGetExamPercentiles:
+    @pytest.mark.asyncio
+    async def test_overall_and_area(self) -> None:
+        db = AsyncMock()
+        result = MagicMock()
+        result.all.return_value = [
+            MagicMock(area=OVERALL_AREA, bin=50, count=1),
+            MagicMock(area=OVERALL_AREA, bin=70, count=1),
+            MagicMock(area="機械学習", bin=30, count=3),
+        ]
+        db.execute.return_value = result
+
+        overall, by_area = await get_exam_percentiles(
+            db, 70.0, {"機械学習": {"accuracy": 90.0}, "応用数学": {"accuracy": 50.0}}
+        )
+
+        assert db.execute.await_count == 1
+        assert overall == 75.0
+        assert by_area == {"機械学習": 100.0, "応用数学": None}
+
+
+class TestFinishRecordsDistribution:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "status,expected_calls", [("in_progress", 1), ("finished", 0)]
+    )
+    async def test_records_only_on_first_finish(
+        self, status: str, expected_calls: int
+    ) -> None:
+        """再終了では分布に二重計上しない"""
+        from app.api.mock_exam import finish_mock_exam
+        from app.schemas.mock_exam import MockExamFinishRequest
+
+        exam = MockExam(
+            id=uuid.uuid4(),
+            user_id="u",
+            started_at=datetime.utcnow(),
+            total_questions=1,
+            status=status,
+            correct_count=1,
+            score=100.0,
+            passed=True,
+        )
+        db = AsyncMock()
+        exam_result = MagicMock()
+        exam_result.scalar_one_or_none.return_value = exam
+        db.execute.return_value = exam_result
+        db.begin_nested = MagicMock()
+
+        with patch(
+            "app.services.mock_exam_service.aggregate_exam_scores",
+            new_callable=AsyncMock,
+            return_value={
+                "correct_count": 1,
+                "score": 100.0,
+                "passed": True,
+                "category_scores": {},
+                "topic_scores": {},
+            },
+        ), patch(
+            "app.services.mock_exam_service.record_exam_scores", new_callable=AsyncMock
+        ) as mock_record, patch(
+            "app.api.mock_exam.get_exam_percentiles",
+            new_callable=AsyncMock,
+            return_value=(80.0, {}),
+        ):
+            result = await finish_mock_exam(
+                exam.id, MockExamFinishRequest(user_id="u"), db
+            )
+
+        assert mock_record.await_count == expected_calls
+        assert result.percentile == 80.0
@@ -0,0 +1,260 @@
+"""模試プールのテスト"""
+import uuid
+from typing import AsyncGenerator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.core.database import get_db
+from app.main import app
+from app.models.mock_exam_pool import MockExamPoolSet
+from app.services import mock_exam_pool
+from app.services.mock_exam_config import EXAM_AREAS
+from app.services.mock_exam_pool import (
+    mark_pool_stale,
+    pop_exam_set,
+    refill_pool,
+    validate_exam_set,
+)
+
+
+class MockDBSession:
+    """モックDBセッション"""
+
+    def __init__(self) -> None:
+        self._execute_results: list[MagicMock] = []
+        self._execute_index = 0
+        self.executed: list[object] = []
+        self.added_objects: list[object] = []
+        self._committed = False
+
+    def set_execute_results(self, results: list[MagicMock]) -> None:
+        self._execute_results = results
+        self._execute_index = 0
+
+    async def execute(self, query: object, params: object = None) -> MagicMock:
+        self.executed.append(query)
+        if self._execute_index < len(self._execute_results):
+            result = self._execute_results[self._execute_index]
+            self._execute_index += 1
+            return result
+        return MagicMock()
+
+    def add(self, obj: object) -> None:
+        self.added_objects.append(obj)
+
+    def add_all(self, objs: list[object]) -> None:
+        self.added_objects.extend(objs)
+
+    async def commit(self) -> None:
+        self._committed = True
+
+
+def _make_payload() -> list[dict]:
+    """EXAM_AREAS の配分どおりの問題セット"""
+    payload = []
+    for area, config in EXAM_AREAS.items():
+        for _ in range(config["question_count"]):
+            payload.append({
+                "question_id": str(uuid.uuid4()),
+                "content": "プール問題",
+                "choices": ["A", "B", "C", "D"],
+                "content_type": "plain",
+                "exam_area": area,
+                "category_name": config["db_category"],
+                "topic": "トピック",
+                "images": [],
+            })
+    return payload
+
+
+def _make_selected(payload: list[dict]) -> list[dict]:
+    """payload と同じ内容の select_questions_for_exam 出力"""
+    selected = []
+    for item in payload:
+        q = MagicMock()
+        q.id = uuid.UUID(item["question_id"])
+        q.content = item["content"]
+        q.choices = item["choices"]
+        q.content_type = "plain"
+        q.topic = item["topic"]
+        q.images = []
+        selected.append({
+            "question": q,
+            "exam_area": item["exam_area"],
+            "category_name": item["category_name"],
+        })
+    return selected
+
+
+@pytest.fixture(autouse=True)
+def reset_fingerprint() -> None:
+    mark_pool_stale()
+    yield
+    mark_pool_stale()
+
+
+class TestValidateExamSet:
+    def test_valid_set(self) -> None:
+        assert validate_exam_set(_make_payload()) is True
+
+    def test_area_shortage_is_invalid(self) -> None:
+        payload = _make_payload()[1:]
+        assert validate_exam_set(payload) is False
+
+    def test_duplicate_question_is_invalid(self) -> None:
+        payload = _make_payload()
+        payload[1]["question_id"] = payload[0]["question_id"]
+        assert validate_exam_set(payload) is False
+
+
+class TestPopExamSet:
+    @pytest.mark.asyncio
+    async def test_returns_none_before_first_refill(self) -> None:
+        """フィンガープリント未計算の間はDBに問い合わせない"""
+        mock_db = MockDBSession()
+        assert await pop_exam_set(mock_db) is None
+        assert mock_db.executed == []
+
+    @pytest.mark.asyncio
+    async def test_returns_payload(self) -> None:
+        payload = _make_payload()
+        mock_db = MockDBSession()
+        result = MagicMock()
+        result.first.return_value = (payload,)
+        mock_db.set_execute_results([result])
+
+        with patch.object(mock_exam_pool, "_current_fingerprint", "f" * 32):
+            popped = await pop_exam_set(mock_db)
+
+        assert popped == payload
+        sql = str(mock_db.executed[0].compile())
+        assert "DELETE FROM mock_exam_pool_sets" in sql
+        assert "RETURNING" in sql
+
+    @pytest.mark.asyncio
+    async def test_returns_none_when_pool_empty(self) -> None:
+        mock_db = MockDBSession()
+        result = MagicMock()
+        result.first.return_value = None
+        mock_db.set_execute_results([result])
+
+        with patch.object(mock_exam_pool, "_current_fingerprint", "f" * 32):
+            assert await pop_exam_set(mock_db) is None
+
+
+class TestRefillPool:
+    @pytest.mark.asyncio
+    async def test_fills_missing_sets(self) -> None:
+        payload = _make_payload()
+        mock_db = MockDBSession()
+        delete_result = MagicMock()
+        count_result = MagicMock()
+        count_result.scalar_one.return_value = 0
+        mock_db.set_execute_results([delete_result, count_result])
+
+        with patch(
+            "app.services.mock_exam_pool.compute_question_fingerprint",
+            new_callable=AsyncMock,
+            return_value="a" * 32,
+        ), patch(
+            "app.services.mock_exam_pool.select_questions_for_exam",
+            new_callable=AsyncMock,
+            return_value=_make_selected(payload),
+        ), patch.object(mock_exam_pool.settings, "mock_exam_pool_refill_batch", 2):
+            created = await refill_pool(mock_db)
+
+        assert created == 2
+        assert len(mock_db.added_objects) == 2
+        pool_set = mock_db.added_objects[0]
+        assert isinstance(pool_set, MockExamPoolSet)
+        assert pool_set.question_fingerprint == "a" * 32
+        assert pool_set.total_questions == len(payload)
+        assert mock_db._committed is True
+        assert mock_exam_pool.get_current_fingerprint() == "a" * 32
+
+    @pytest.mark.asyncio
+    async def test_skips_sets_that_do_not_meet_quota(self) -> None:
+        payload = _make_payload()[:10]
+        mock_db = MockDBSession()
+        count_result = MagicMock()
+        count_result.scalar_one.return_value = 0
+        mock_db.set_execute_results([MagicMock(), count_result])
+
+        with patch(
+            "app.services.mock_exam_pool.compute_question_fingerprint",
+            new_callable=AsyncMock,
+            return_value="a" * 32,
+        ), patch(
+            "app.services.mock_exam_pool.select_questions_for_exam",
+            new_callable=AsyncMock,
+            return_value=_make_selected(payload),
+        ):
+            created = await refill_pool(mock_db)
+
+        assert created == 0
+        assert mock_db.added_objects == []
+
+    @pytest.mark.asyncio
+    async def test_does_not_exceed_pool_size(self) -> None:
+        mock_db = MockDBSession()
+        count_result = MagicMock()
+        pool_size = mock_exam_pool.settings.mock_exam_pool_size
+        count_result.scalar_one.return_value = pool_size
+        mock_db.set_execute_results([MagicMock(), count_result])
+
+        with patch(
+            "app.services.mock_exam_pool.compute_question_fingerprint",
+            new_callable=AsyncMock,
+            return_value="a" * 32,
+        ), patch(
+            "app.services.mock_exam_pool.select_questions_for_exam",
+            new_callable=AsyncMock,
+        ) as mock_select:
+            created = await refill_pool(mock_db)
+
+        assert created == 0
+        mock_select.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_start_mock_exam_uses_pooled_set() -> None:
+    """プールにセットがあれば問題選択を行わずに払い出す"""
+    payload = _make_payload()
+    mock_db = MockDBSession()
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with patch(
+            "app.api.mock_exam.pop_exam_set",
+            new_callable=AsyncMock,
+            return_value=payload,
+        ), patch(
+            "app.api.mock_exam.select_questions_for_exam",
+            new_callable=AsyncMock,
+        ) as mock_select:
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                response = await client.post(
+                    "/api/mock-exam/start",
+                    json={"user_id": "test-user"},
+                )
+
+        assert response.status_code == 200
+        mock_select.assert_not_called()
+        data = response.json()
+        assert data["total_questions"] == len(payload)
+        assert data["questions"][0]["question_id"] == payload[0]["question_id"]
+        assert data["questions"][0]["content"] == "プール問題"
+        # ヘッダーと回答枠はORMを経由せずINSERTで書き込まれる
+        assert mock_db.added_objects == []
+        assert len(mock_db.executed) == 2
+        assert mock_db._committed is True
+    finally:
+        app.dependency_overrides.clear()
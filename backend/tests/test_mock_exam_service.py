@@ -8,8 +8,10 @@ from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 
 from app.services.mock_exam_service import (
+    ANSWER_COPY_THRESHOLD,
     calculate_scores,
     generate_rule_based_analysis,
+    insert_exam_rows,
     select_questions_for_exam,
 )
 from app.services.mock_exam_config import get_grade
@@ -385,3 +387,72 @@ class TestSelectQuestionsForExam:
         assert "question" in item
         assert "exam_area" in item
         assert "category_name" in item
+
+
+def _make_exam_rows(size: int) -> tuple[dict, list[dict]]:
+    exam_id = uuid.uuid4()
+    exam_row = {"id": exam_id, "user_id": "u", "total_questions": size}
+    answer_rows = [
+        {
+            "id": uuid.uuid4(),
+            "mock_exam_id": exam_id,
+            "question_id": uuid.uuid4(),
+            "question_index": i,
+            "category_name": "機械学習",
+            "exam_area": "機械学習",
+            "topic": None,
+        }
+        for i in range(size)
+    ]
+    return exam_row, answer_rows
+
+
+class TestInsertExamRows:
+    """模試ヘッダー・回答枠の一括書き込みテスト"""
+
+    @pytest.mark.asyncio
+    async def test_writes_header_and_answers_in_two_statements(self) -> None:
+        """ヘッダー1文 + 回答枠1文（行リストをまとめて渡す）で書き込むこと"""
+        exam_row, answer_rows = _make_exam_rows(100)
+        db = AsyncMock()
+
+        await insert_exam_rows(db, exam_row, answer_rows)
+
+        assert db.execute.await_count == 2
+        header_call, answers_call = db.execute.await_args_list
+        assert "mock_exams" in str(header_call.args[0])
+        assert header_call.args[1] == [exam_row]
+        assert "mock_exam_answers" in str(answers_call.args[0])
+        assert answers_call.args[1] == answer_rows
+        db.add.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_header_only_when_no_answers(self) -> None:
+        exam_row, _ = _make_exam_rows(0)
+        db = AsyncMock()
+
+        await insert_exam_rows(db, exam_row, [])
+
+        assert db.execute.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_large_exam_uses_copy(self) -> None:
+        """閾値以上の回答枠はCOPYで書き込むこと"""
+        exam_row, answer_rows = _make_exam_rows(ANSWER_COPY_THRESHOLD)
+        driver_connection = MagicMock()
+        driver_connection.copy_records_to_table = AsyncMock()
+        raw_connection = MagicMock(driver_connection=driver_connection)
+        connection = MagicMock()
+        connection.get_raw_connection = AsyncMock(return_value=raw_connection)
+        db = AsyncMock()
+        db.connection.return_value = connection
+
+        await insert_exam_rows(db, exam_row, answer_rows)
+
+        # ヘッダーのみexecute、回答枠はCOPY
+        assert db.execute.await_count == 1
+        driver_connection.copy_records_to_table.assert_awaited_once()
+        call = driver_connection.copy_records_to_table.await_args
+        assert call.args[0] == "mock_exam_answers"
+        assert len(call.kwargs["records"]) == ANSWER_COPY_THRESHOLD
+        assert call.kwargs["columns"][0] == "id"
@@ -0,0 +1,114 @@
+"""放置模試スイーパーのテスト"""
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.mock_exam import MockExam
+from app.services.mock_exam_config import TIME_LIMIT_MINUTES
+from app.services.mock_exam_sweeper import (
+    sweep_abandoned_exams,
+    sweep_all_abandoned_exams,
+)
+
+
+def _make_exam() -> MockExam:
+    return MockExam(
+        id=uuid.uuid4(),
+        user_id="u",
+        started_at=datetime(2026, 3, 1, 9, 0, 0),
+        total_questions=100,
+        status="in_progress",
+    )
+
+
+def _session(exams: list[MockExam], answered_ids: list[uuid.UUID]) -> AsyncMock:
+    db = AsyncMock()
+    exams_result = MagicMock()
+    exams_result.scalars.return_value.all.return_value = exams
+    answered_result = MagicMock()
+    answered_result.scalars.return_value.all.return_value = answered_ids
+    db.execute.side_effect = [exams_result, answered_result, MagicMock(), MagicMock()]
+    return db
+
+
+def _sql(call: object) -> str:
+    return str(call.args[0].compile(dialect=postgresql.dialect()))
+
+
+class TestSweepAbandonedExams:
+
+    @pytest.mark.asyncio
+    async def test_claims_batch_with_skip_locked(self) -> None:
+        db = _session([], [])
+        now = datetime(2026, 3, 2, 0, 0, 0)
+
+        counts = await sweep_abandoned_exams(db, now=now, batch_size=10)
+
+        assert counts == {"finished": 0, "expired": 0}
+        compiled = db.execute.await_args_list[0].args[0].compile(
+            dialect=postgresql.dialect()
+        )
+        sql = str(compiled)
+        assert "FOR UPDATE SKIP LOCKED" in sql
+        assert "LIMIT" in sql
+        cutoff = [v for v in compiled.params.values() if isinstance(v, datetime)][0]
+        assert cutoff < now - timedelta(minutes=TIME_LIMIT_MINUTES)
+
+    @pytest.mark.asyncio
+    async def test_finishes_answered_and_expires_unanswered(self) -> None:
+        answered, untouched = _make_exam(), _make_exam()
+        db = _session([answered, untouched], [answered.id])
+
+        with patch(
+            "app.services.mock_exam_sweeper.finish_exam",
+            new_callable=AsyncMock,
+        ) as mock_finish:
+            counts = await sweep_abandoned_exams(db, batch_size=10)
+
+        assert counts == {"finished": 1, "expired": 1}
+        mock_finish.assert_awaited_once()
+        assert mock_finish.await_args.args[1] is answered
+
+        calls = db.execute.await_args_list
+        assert len(calls) == 4
+        assert _sql(calls[2]).startswith("UPDATE mock_exams")
+        assert _sql(calls[3]).startswith("DELETE FROM mock_exam_answers")
+
+
+class TestSweepAllAbandonedExams:
+
+    @pytest.mark.asyncio
+    async def test_repeats_until_partial_batch(self) -> None:
+        """満杯のバッチが続く間は繰り返し、バッチごとにコミットする"""
+        sessions: list[AsyncMock] = []
+
+        @asynccontextmanager
+        async def session_maker() -> AsyncIterator[AsyncMock]:
+            db = AsyncMock()
+            sessions.append(db)
+            yield db
+
+        batches = [
+            {"finished": 1, "expired": 1},
+            {"finished": 0, "expired": 1},
+        ]
+        with patch(
+            "app.services.mock_exam_sweeper.async_session_maker", session_maker
+        ), patch(
+            "app.services.mock_exam_sweeper.settings.mock_exam_sweep_batch_size", 2
+        ), patch(
+            "app.services.mock_exam_sweeper.sweep_abandoned_exams",
+            new_callable=AsyncMock,
+            side_effect=batches,
+        ):
+            totals = await sweep_all_abandoned_exams()
+
+        assert totals == {"finished": 1, "expired": 2}
+        assert len(sessions) == 2
+        for db in sessions:
+            db.commit.assert_awaited_once()
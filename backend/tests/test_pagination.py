@@ -0,0 +1,27 @@
+"""キーセットページネーションのカーソルのテスト"""
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip() -> None:
+    """カーソルのエンコード・デコード"""
+    row_id = uuid.uuid4()
+    at = datetime(2026, 3, 1, 12, 0, 0, 123456)
+
+    cursor = encode_cursor(at, row_id)
+
+    assert cursor == f"2026-03-01T12:00:00.123456_{row_id}"
+    assert decode_cursor(cursor) == (at, row_id)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    ["not-a-cursor", "2026-03-09T09:00:00", f"_{uuid.uuid4()}", "2026-03-09_xyz"],
+)
+def test_invalid_cursor_raises_value_error(cursor: str) -> None:
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
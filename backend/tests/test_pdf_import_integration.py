@@ -3,6 +3,7 @@
 MinerU/VLM/ImageStorage統合のテスト
 """
 import uuid
+from pathlib import Path
 from typing import AsyncGenerator
 from unittest.mock import AsyncMock, MagicMock, patch
 from io import BytesIO
@@ -32,12 +33,17 @@ class MockDBSession:
         self._execute_results: list[MagicMock] = []
         self._execute_index = 0
         self.added_objects: list[object] = []
+        self.inserted_rows: list[dict] = []
 
     def set_execute_results(self, results: list[MagicMock]) -> None:
         self._execute_results = results
         self._execute_index = 0
 
-    async def execute(self, query: object) -> MagicMock:
+    async def execute(self, query: object, params: object = None) -> MagicMock:
+        if params is not None:
+            # 行のリストを渡す一括INSERT
+            self.inserted_rows.extend(params)
+            return MagicMock()
         if self._execute_index < len(self._execute_results):
             result = self._execute_results[self._execute_index]
             self._execute_index += 1
@@ -300,3 +306,55 @@ async def test_import_pdf_vlm_timeout_continues(
 
     finally:
         app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_import_pdf_passes_spooled_file_path(
+    mock_db: MockDBSession,
+    sample_pdf_bytes: bytes,
+) -> None:
+    """アップロードは一時ファイルに書き出してパスで渡し、終了後に削除する"""
+    mock_category_result = MagicMock()
+    mock_category_result.scalar_one_or_none.return_value = MockCategory()
+    mock_db.set_execute_results([mock_category_result])
+
+    received: dict[str, object] = {}
+
+    async def fake_extract(
+        pdf_data: object, **kwargs: object
+    ) -> MinerUExtractionResult:
+        received["source"] = pdf_data
+        received["content"] = Path(pdf_data).read_bytes()
+        return MinerUExtractionResult(markdown="問1. テスト", images=[], metadata={})
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    try:
+        with patch("app.api.questions.MinerUExtractor") as mock_extractor_class, \
+             patch("app.api.questions.extract_questions_from_text") as mock_extract:
+            mock_extractor_class.return_value.extract = AsyncMock(
+                side_effect=fake_extract
+            )
+            mock_extract.return_value = []
+
+            pdf_file = ("test.pdf", BytesIO(sample_pdf_bytes), "application/pdf")
+            async with AsyncClient(
+                transport=ASGITransport(app=app),
+                base_url="http://test",
+            ) as client:
+                response = await client.post(
+                    "/api/questions/import",
+                    files={"file": pdf_file},
+                    data={"save_to_db": "true"},
+                )
+
+        assert response.status_code == 200
+        assert isinstance(received["source"], Path)
+        assert received["content"] == sample_pdf_bytes
+        assert not received["source"].exists()
+
+    finally:
+        app.dependency_overrides.clear()
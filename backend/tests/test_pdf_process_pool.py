@@ -0,0 +1,244 @@
+"""PDF解析のプロセスプールのテスト"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import AsyncGenerator
+from unittest.mock import MagicMock, patch
+
+import pymupdf
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.main import app
+from app.services import pdf_process_pool
+from app.services.mineru_extractor import MinerUError, MinerUExtractor
+from app.services.pdf_extractor import extract_page_texts, extract_text_from_pdf
+from app.services.pdf_process_pool import (
+    shutdown_pdf_process_pool,
+    split_page_ranges,
+    spool_pdf,
+)
+
+
+def make_pdf(pages: int, lines: int = 40, with_images: bool = False) -> bytes:
+    """テキスト（と画像）を含むPDFを生成"""
+    doc = pymupdf.open()
+    for i in range(pages):
+        page = doc.new_page()
+        for j in range(lines):
+            page.insert_text(
+                (40, 40 + j * 16),
+                f"Page {i} line {j}: the quick brown fox jumps over the lazy dog",
+                fontsize=9,
+            )
+        if with_images:
+            pix = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 8, 8), False)
+            pix.set_rect(pix.irect, (i * 40 % 256, 0, 0))
+            page.insert_image(pymupdf.Rect(300, 700, 340, 740), pixmap=pix)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _shutdown_pool():
+    yield
+    shutdown_pdf_process_pool()
+
+
+@pytest.fixture
+def parallel_settings():
+    """小さいPDFでもプロセスプールでページ範囲ごとに解析する"""
+    with patch.object(settings, "pdf_parse_workers", 2), patch.object(
+        settings, "pdf_parse_parallel_min_bytes", 0
+    ):
+        yield
+
+
+class TestSplitPageRanges:
+    """ページ範囲の分割"""
+
+    def test_even_split(self) -> None:
+        assert split_page_ranges(10, 2) == [(0, 5), (5, 10)]
+
+    def test_uneven_split_covers_all_pages(self) -> None:
+        ranges = split_page_ranges(10, 4)
+        assert ranges == [(0, 3), (3, 6), (6, 8), (8, 10)]
+
+    def test_more_parts_than_pages(self) -> None:
+        assert split_page_ranges(2, 8) == [(0, 1), (1, 2)]
+
+    def test_no_pages(self) -> None:
+        assert split_page_ranges(0, 4) == []
+
+
+class TestMapPageRanges:
+    """ページ範囲の並列処理"""
+
+    @pytest.mark.asyncio
+    async def test_small_pdf_runs_in_thread(self) -> None:
+        """しきい値未満のPDFはプロセスプールを使わない"""
+        with patch.object(
+            pdf_process_pool, "get_pdf_process_pool", side_effect=AssertionError
+        ):
+            text = await extract_text_from_pdf(make_pdf(3))
+
+        assert "Page 0 line 0" in text
+        assert "Page 2 line 39" in text
+
+    @pytest.mark.asyncio
+    async def test_parallel_text_matches_sequential(self, parallel_settings) -> None:
+        """ページ範囲に分けて抽出しても順序・内容は一括抽出と同じ"""
+        data = make_pdf(13)
+        expected = "\n".join(text for _, text, _ in extract_page_texts(data))
+
+        assert await extract_text_from_pdf(data) == expected
+
+    @pytest.mark.asyncio
+    async def test_parallel_images_keep_page_order(self, parallel_settings) -> None:
+        """画像もページ順に連番が振られる"""
+        images = await MinerUExtractor()._extract_images_with_fallback(
+            make_pdf(5, lines=1, with_images=True)
+        )
+
+        assert [img.page_number for img in images] == [0, 1, 2, 3, 4]
+        assert [img.filename for img in images] == [f"image_{i}.png" for i in range(5)]
+
+    @pytest.mark.asyncio
+    async def test_accepts_file_path(self, parallel_settings, tmp_path) -> None:
+        path = tmp_path / "book.pdf"
+        path.write_bytes(make_pdf(4))
+
+        text = await extract_text_from_pdf(str(path))
+
+        assert text.index("Page 0 line 0") < text.index("Page 3 line 0")
+
+
+    def test_pypdf_log_level_is_not_toggled_per_call(self) -> None:
+        """スレッドから同時に抽出してもpypdfのロガーレベルは変わらない"""
+        pypdf_logger = logging.getLogger("pypdf")
+        data = make_pdf(2, lines=1)
+
+        assert pypdf_logger.level == logging.ERROR
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: extract_page_texts(data), range(8)))
+
+        assert all(len(pages) == 2 for pages in results)
+        assert pypdf_logger.level == logging.ERROR
+
+
+class TestSpoolPdf:
+    """アップロードの一時ファイルへの書き出し"""
+
+    @pytest.mark.asyncio
+    async def test_writes_identical_content_in_chunks(self) -> None:
+        data = make_pdf(3)
+        upload = BytesIO(data)
+        upload.read()  # 読み進めた位置からでも先頭から書き出す
+        upload.read = MagicMock(wraps=upload.read)
+
+        with patch.object(pdf_process_pool, "SPOOL_CHUNK_SIZE", 1024):
+            path = await spool_pdf(upload)
+        try:
+            assert path.read_bytes() == data
+            sizes = [call.args[0] for call in upload.read.call_args_list]
+            assert sizes and set(sizes) == {1024}
+        finally:
+            path.unlink()
+
+    @pytest.mark.asyncio
+    async def test_mineru_fallback_accepts_file_path(self, tmp_path) -> None:
+        """MinerUが使えない場合もパスのまま pypdf で抽出できる"""
+        path = tmp_path / "book.pdf"
+        path.write_bytes(make_pdf(2, with_images=True))
+        extractor = MinerUExtractor()
+
+        with patch.object(extractor, "_is_mineru_available", return_value=False):
+            result = await extractor.extract(path, fallback_on_error=True)
+
+        assert "Page 1 line 0" in result.markdown
+        assert len(result.images) == 2
+
+    @pytest.mark.asyncio
+    async def test_empty_file_is_rejected(self, tmp_path) -> None:
+        path = tmp_path / "empty.pdf"
+        path.touch()
+
+        with pytest.raises(MinerUError, match="Empty"):
+            await MinerUExtractor().extract(path, fallback_on_error=True)
+
+
+class TestEventLoopResponsiveness:
+    """大きいPDFの解析中も他のリクエストに応答できる"""
+
+    @staticmethod
+    async def _measure_lag(work) -> tuple[float, list[float]]:
+        """work の実行中、10msごとのタイマーの最大遅延と /health の応答時間を測る"""
+        stop = asyncio.Event()
+        max_lag = 0.0
+        health_latencies: list[float] = []
+
+        async def ticker() -> None:
+            nonlocal max_lag
+            while not stop.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                max_lag = max(max_lag, time.perf_counter() - start - 0.01)
+
+        async def poll_health(client: AsyncClient) -> None:
+            while not stop.is_set():
+                start = time.perf_counter()
+                response = await client.get("/health")
+                assert response.status_code == 200
+                health_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.02)
+
+        async def override_get_db() -> AsyncGenerator[MagicMock, None]:
+            db = MagicMock()
+            db.execute = MagicMock(side_effect=lambda *_: asyncio.sleep(0))
+            yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            async with AsyncClient(
+                transport=ASGITransport(app=app), base_url="http://test"
+            ) as client:
+                tasks = [
+                    asyncio.create_task(ticker()),
+                    asyncio.create_task(poll_health(client)),
+                ]
+                await asyncio.sleep(0.05)
+                try:
+                    await work()
+                finally:
+                    stop.set()
+                    await asyncio.gather(*tasks)
+        finally:
+            app.dependency_overrides.clear()
+        return max_lag, health_latencies
+
+    @pytest.mark.asyncio
+    async def test_event_loop_stays_responsive_during_big_import(
+        self, parallel_settings
+    ) -> None:
+        data = make_pdf(40)
+        # プロセスの起動は計測から外す
+        await extract_text_from_pdf(make_pdf(2))
+
+        async def parse_on_event_loop() -> None:
+            extract_page_texts(data)
+
+        # 比較用: 以前のようにイベントループ上で解析すると、その間はタイマーが止まる
+        blocking_lag, _ = await self._measure_lag(parse_on_event_loop)
+        lag, health_latencies = await self._measure_lag(
+            lambda: extract_text_from_pdf(data)
+        )
+
+        assert lag < 0.1
+        assert lag < blocking_lag / 3
+        assert len(health_latencies) >= 5
+        assert max(health_latencies) < 0.1
@@ -1,11 +1,17 @@
 """PDF問題抽出サービスのテスト"""
+import asyncio
+import json
 import uuid
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from app.services.claude_cli import ClaudeCLIError
+from app.core.config import settings
+from app.services import pdf_extractor
+from app.services.llm_cache import LLMCache
 from app.services.pdf_extractor import (
+    ExtractionReport,
     call_claude_cli,
     extract_questions_from_text,
     extract_text_from_pdf,
@@ -14,6 +20,15 @@ from app.services.pdf_extractor import (
 )
 
 
+@pytest.fixture(autouse=True)
+def _isolated_llm_cache(tmp_path, monkeypatch):
+    """抽出キャッシュはテストごとの一時ファイルに書く"""
+    cache = LLMCache(tmp_path / "llm_cache.sqlite3", max_bytes=1 << 20)
+    monkeypatch.setattr(pdf_extractor, "get_llm_cache", lambda: cache)
+    yield cache
+    cache.close()
+
+
 class TestCallClaudeCli:
     """Claude CLI呼び出しのテスト"""
 
@@ -213,6 +228,210 @@ class TestExtractQuestionsFromText:
             assert "Unexpected error" in str(exc_info.value)
 
 
+def _chunk_response(chunk_no: int) -> str:
+    """チャンク番号を問題文に含む1問分のレスポンス"""
+    return json.dumps([{
+        "content": f"チャンク{chunk_no}の問題",
+        "choices": ["A", "B", "C", "D"],
+        "correct_answer": 0,
+        "explanation": "解説",
+        "difficulty": 2,
+    }])
+
+
+class TestParallelChunkExtraction:
+    """チャンクの並行抽出のテスト"""
+
+    CHUNKS = [f"チャンク{i}のテキスト" for i in range(1, 7)]
+
+    @staticmethod
+    def _chunk_no(prompt: str) -> int:
+        return int(prompt.split("チャンク")[1][0])
+
+    def _patch_chunks(self):
+        return patch(
+            "app.services.pdf_extractor.split_text_into_chunks",
+            return_value=self.CHUNKS,
+        )
+
+    @pytest.mark.asyncio
+    async def test_results_keep_chunk_order(self) -> None:
+        """後のチャンクが先に終わってもチャンク順に返す"""
+        async def fake_cli(prompt: str) -> str:
+            chunk_no = self._chunk_no(prompt)
+            await asyncio.sleep(0.01 * (7 - chunk_no))
+            return _chunk_response(chunk_no)
+
+        with (
+            self._patch_chunks(),
+            patch("app.services.pdf_extractor.call_claude_cli", side_effect=fake_cli),
+        ):
+            result = await extract_questions_from_text(
+                "本文", source="test", use_cache=False
+            )
+
+        expected = [f"チャンク{i}の問題" for i in range(1, 7)]
+        assert [q["content"] for q in result] == expected
+        assert [q["chunk_index"] for q in result] == list(range(1, 7))
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_limited(self) -> None:
+        """同時に処理するチャンク数は設定値まで"""
+        in_flight = 0
+        peak = 0
+
+        async def fake_cli(prompt: str) -> str:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return _chunk_response(self._chunk_no(prompt))
+
+        with (
+            patch.object(settings, "pdf_extraction_concurrency", 2),
+            self._patch_chunks(),
+            patch("app.services.pdf_extractor.call_claude_cli", side_effect=fake_cli),
+        ):
+            result = await extract_questions_from_text(
+                "本文", source="test", use_cache=False
+            )
+
+        assert len(result) == 6
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk_does_not_cancel_others(self) -> None:
+        """1チャンクが失敗しても他のチャンクは最後まで処理する"""
+        async def fake_cli(prompt: str) -> str:
+            chunk_no = self._chunk_no(prompt)
+            if chunk_no == 1:
+                raise ClaudeCLIError("timeout")
+            await asyncio.sleep(0.01)
+            return _chunk_response(chunk_no)
+
+        report = ExtractionReport()
+        with (
+            self._patch_chunks(),
+            patch("app.services.pdf_extractor.call_claude_cli", side_effect=fake_cli),
+        ):
+            result = await extract_questions_from_text(
+                "本文", source="test", use_cache=False, report=report
+            )
+
+        assert [q["chunk_index"] for q in result] == [2, 3, 4, 5, 6]
+        assert report.failed_chunks == 1
+        assert "timeout" in report.chunks[0].error
+
+    @pytest.mark.asyncio
+    async def test_report_records_latency_and_speedup(self) -> None:
+        """チャンクごとの所要時間と並列化による短縮を記録する"""
+        async def fake_cli(prompt: str) -> str:
+            await asyncio.sleep(0.05)
+            return _chunk_response(self._chunk_no(prompt))
+
+        report = ExtractionReport()
+        with (
+            patch.object(settings, "pdf_extraction_concurrency", 6),
+            self._patch_chunks(),
+            patch("app.services.pdf_extractor.call_claude_cli", side_effect=fake_cli),
+        ):
+            await extract_questions_from_text(
+                "本文", source="test", use_cache=False, report=report
+            )
+
+        assert report.chunk_count == 6
+        assert report.concurrency == 6
+        assert all(c.latency_seconds >= 0.05 for c in report.chunks)
+        assert all(c.question_count == 1 for c in report.chunks)
+        assert report.serial_seconds >= 0.3
+        assert report.speedup > 3
+
+
+class TestChunkCache:
+    """チャンク単位の抽出キャッシュのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_reimport_only_processes_changed_chunks(self) -> None:
+        """変更されたチャンクだけCLIを呼び、残りはキャッシュから返す"""
+        async def fake_cli(prompt: str) -> str:
+            return _chunk_response(int(prompt.split("チャンク")[1][0]))
+
+        original = [f"チャンク{i}のテキスト" for i in range(1, 5)]
+        revised = original[:2] + ["チャンク3のテキスト（改訂）"] + original[3:]
+
+        with patch(
+            "app.services.pdf_extractor.call_claude_cli", side_effect=fake_cli
+        ) as mock_cli:
+            with patch(
+                "app.services.pdf_extractor.split_text_into_chunks",
+                return_value=original,
+            ):
+                await extract_questions_from_text("本文", source="test")
+            assert mock_cli.await_count == 4
+
+            report = ExtractionReport()
+            with patch(
+                "app.services.pdf_extractor.split_text_into_chunks",
+                return_value=revised,
+            ):
+                result = await extract_questions_from_text(
+                    "改訂版の本文", source="改訂版", report=report
+                )
+
+        assert mock_cli.await_count == 5
+        assert [c.cached for c in report.chunks] == [True, True, False, True]
+        assert report.cache_hits == 3
+        assert report.cache_hit_rate == 0.75
+        # キャッシュから返した問題にも今回のメタデータを付ける
+        assert [q["chunk_index"] for q in result] == [1, 2, 3, 4]
+        assert all(q["source"] == "改訂版" for q in result)
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk_is_not_cached(self) -> None:
+        """失敗したチャンクはキャッシュせず次回に再試行する"""
+        with patch(
+            "app.services.pdf_extractor.call_claude_cli", new_callable=AsyncMock
+        ) as mock_cli:
+            mock_cli.side_effect = [ClaudeCLIError("timeout"), _chunk_response(1)]
+            with pytest.raises(PDFExtractionError):
+                await extract_questions_from_text("チャンク1", source="test")
+            result = await extract_questions_from_text("チャンク1", source="test")
+
+        assert mock_cli.await_count == 2
+        assert result[0]["content"] == "チャンク1の問題"
+
+    @pytest.mark.asyncio
+    async def test_prompt_version_change_misses(self, monkeypatch) -> None:
+        """プロンプトのバージョンが変わると以前のキャッシュは使わない"""
+        with patch(
+            "app.services.pdf_extractor.call_claude_cli", new_callable=AsyncMock
+        ) as mock_cli:
+            mock_cli.return_value = _chunk_response(1)
+            await extract_questions_from_text("チャンク1", source="test")
+            monkeypatch.setattr(pdf_extractor, "EXTRACTION_PROMPT_VERSION", "changed")
+            await extract_questions_from_text("チャンク1", source="test")
+
+        assert mock_cli.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_use_cache_false_skips_cache(self, _isolated_llm_cache) -> None:
+        """use_cache=False ではキャッシュを読み書きしない"""
+        with patch(
+            "app.services.pdf_extractor.call_claude_cli", new_callable=AsyncMock
+        ) as mock_cli:
+            mock_cli.return_value = _chunk_response(1)
+            await extract_questions_from_text(
+                "チャンク1", source="test", use_cache=False
+            )
+            await extract_questions_from_text("チャンク1", source="test")
+
+        assert mock_cli.await_count == 2
+        # 2回目の呼び出しで書いた1件だけ
+        stats = await _isolated_llm_cache.stats()
+        assert stats["entries"] == 1
+
+
 class TestParseLlmResponseEdgeCases:
     """LLMレスポンスパースの追加テスト"""
 
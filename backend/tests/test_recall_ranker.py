@@ -0,0 +1,232 @@
+"""忘却曲線ランキングのテスト"""
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.recall_ranker import (
+    UNSEEN_RECALL,
+    build_recall_arrays,
+    epoch_seconds,
+    invalidate_question_catalog,
+    load_question_arrays,
+    priority_scores,
+    rank_top_k,
+    recall_probability,
+    top_k_indices,
+)
+
+NOW = datetime(2026, 3, 1, 9, 0, 0)
+
+
+class TestRecallProbability:
+    """想起確率のテスト"""
+
+    def test_decays_with_elapsed_time(self) -> None:
+        recall = recall_probability(
+            np.array([0.0, 1.0, 7.0]), np.zeros(3, dtype=np.int32)
+        )
+        assert recall[0] == pytest.approx(1.0)
+        assert recall[0] > recall[1] > recall[2]
+
+    def test_streak_slows_forgetting(self) -> None:
+        recall = recall_probability(np.array([3.0, 3.0]), np.array([0, 3]))
+        assert recall[1] > recall[0]
+
+    def test_unseen_uses_prior(self) -> None:
+        recall = recall_probability(np.array([np.nan]), np.array([0]))
+        assert recall[0] == UNSEEN_RECALL
+
+
+class TestBuildRecallArrays:
+    """配列化のテスト"""
+
+    def test_columns(self) -> None:
+        category = uuid.uuid4()
+        rows = [
+            ("a", category, epoch_seconds(NOW - timedelta(days=2)), 1),
+            ("b", None, None, None),
+        ]
+        arrays = build_recall_arrays(rows, {category: 0.7}, NOW)
+
+        assert arrays.ids == ["a", "b"]
+        assert arrays.elapsed_days[0] == pytest.approx(2.0)
+        assert np.isnan(arrays.elapsed_days[1])
+        assert arrays.streak.tolist() == [1, 0]
+        assert arrays.category_idx.tolist() == [0, -1]
+        assert arrays.category_weakness.tolist() == [0.7]
+
+    def test_empty(self) -> None:
+        arrays = build_recall_arrays([], {}, NOW)
+        assert len(arrays) == 0
+        assert rank_top_k(arrays, 5) == []
+
+
+class TestEpochSeconds:
+    """UNIX 秒変換のテスト"""
+
+    def test_naive_datetime_as_utc(self) -> None:
+        assert epoch_seconds(datetime(1970, 1, 2)) == 86400.0
+
+
+class TestRanking:
+    """優先度・上位k件のテスト"""
+
+    def test_weak_category_ranks_higher(self) -> None:
+        weak, strong = uuid.uuid4(), uuid.uuid4()
+        last = epoch_seconds(NOW - timedelta(days=1))
+        arrays = build_recall_arrays(
+            [("strong", strong, last, 0), ("weak", weak, last, 0)],
+            {weak: 0.8, strong: 0.1},
+            NOW,
+        )
+        priority, _ = priority_scores(arrays)
+        assert priority[1] > priority[0]
+
+    def test_top_k_sorted_descending(self) -> None:
+        scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3])
+        assert top_k_indices(scores, 3).tolist() == [1, 3, 2]
+        assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 4, 0]
+        assert top_k_indices(scores, 0).tolist() == []
+
+    def test_top_k_shuffles_ties(self) -> None:
+        scores = np.array([0.9] + [0.5] * 20)
+        rng = np.random.default_rng(0)
+
+        picks = [top_k_indices(scores, 2, rng).tolist() for _ in range(50)]
+
+        # 最高スコアは常に先頭、同点の残り1枠はばらつく
+        assert all(pick[0] == 0 for pick in picks)
+        assert len({pick[1] for pick in picks}) > 1
+
+    def test_top_k_without_rng_is_deterministic(self) -> None:
+        scores = np.full(20, 0.5)
+        assert top_k_indices(scores, 3).tolist() == [0, 1, 2]
+        assert top_k_indices(scores, 3).tolist() == [0, 1, 2]
+
+    def test_top_k_with_rng_keeps_order(self) -> None:
+        scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3])
+        rng = np.random.default_rng(0)
+        assert top_k_indices(scores, 3, rng).tolist() == [1, 3, 2]
+
+    def test_rank_top_k_matches_full_sort(self) -> None:
+        rng = np.random.default_rng(0)
+        categories = [uuid.uuid4() for _ in range(5)]
+        rows = [
+            (
+                i,
+                categories[i % 5],
+                epoch_seconds(NOW - timedelta(hours=float(rng.uniform(0, 24 * 30)))),
+                int(rng.integers(0, 4)),
+            )
+            for i in range(500)
+        ]
+        arrays = build_recall_arrays(
+            rows, {c: float(rng.uniform()) for c in categories}, NOW
+        )
+        priority, _ = priority_scores(arrays)
+
+        ranked = rank_top_k(arrays, 10)
+
+        assert [r.id for r in ranked] == np.argsort(-priority)[:10].tolist()
+        assert all(0.0 <= r.recall_probability <= 1.0 for r in ranked)
+
+
+class TestLoadQuestionArrays:
+    """候補問題の読み込みクエリのテスト"""
+
+    @pytest.fixture(autouse=True)
+    def clear_question_catalog(self) -> None:
+        invalidate_question_catalog()
+
+    @staticmethod
+    def _db(
+        catalog_rows: list[tuple], user_rows: list[tuple], repeat: int = 1
+    ) -> AsyncMock:
+        db = AsyncMock()
+        catalog = MagicMock()
+        catalog.all.return_value = catalog_rows
+        user_stats = MagicMock()
+        user_stats.all.return_value = user_rows
+        db.execute.side_effect = [catalog] + [user_stats] * repeat
+        return db
+
+    @staticmethod
+    def _sql(db: AsyncMock, index: int) -> str:
+        query = db.execute.await_args_list[index].args[0]
+        return str(query.compile(dialect=postgresql.dialect()))
+
+    @pytest.mark.asyncio
+    async def test_catalog_and_user_stats_queries(self) -> None:
+        category_id = uuid.uuid4()
+        answered, unseen, recent = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        last = epoch_seconds(NOW - timedelta(days=2))
+        db = self._db(
+            [(answered, category_id), (unseen, category_id), (recent, category_id)],
+            [(answered, last, 2), (recent, last, 0)],
+        )
+
+        arrays = await load_question_arrays(
+            db, "test_user", {category_id: 0.5}, exclude_ids=[recent], now=NOW
+        )
+
+        assert arrays.ids == [answered, unseen]
+        assert arrays.elapsed_days[0] == pytest.approx(2.0)
+        assert np.isnan(arrays.elapsed_days[1])
+        assert arrays.streak.tolist() == [2, 0]
+        assert db.execute.await_count == 2
+
+        catalog_sql = self._sql(db, 0)
+        assert "questions.framework" in catalog_sql
+        assert "answers" not in catalog_sql
+
+        user_sql = self._sql(db, 1)
+        assert "FULL OUTER JOIN" in user_sql
+        assert "EXTRACT(epoch FROM" in user_sql
+        # 問題テーブルは読まない
+        assert "FROM questions" not in user_sql
+        assert "NOT IN" not in user_sql
+
+    @pytest.mark.asyncio
+    async def test_review_item_only_question_uses_review_recency(self) -> None:
+        """模試で間違えただけの問題は未回答ではなく直近に間違えた問題として扱う"""
+        category_id = uuid.uuid4()
+        failed_in_exam, unseen = uuid.uuid4(), uuid.uuid4()
+        # 回答がなく復習アイテムだけの行（最終回答日時は復習アイテムのもの）
+        db = self._db(
+            [(failed_in_exam, category_id), (unseen, category_id)],
+            [(failed_in_exam, epoch_seconds(NOW - timedelta(days=3)), 0)],
+        )
+
+        arrays = await load_question_arrays(
+            db, "test_user", {category_id: 0.5}, now=NOW
+        )
+
+        assert arrays.elapsed_days[0] == pytest.approx(3.0)
+        assert np.isnan(arrays.elapsed_days[1])
+        assert [r.id for r in rank_top_k(arrays, 2)] == [failed_in_exam, unseen]
+
+        user_sql = self._sql(db, 1)
+        assert "greatest(" in user_sql.lower()
+        assert "review_items.last_answered_at" in user_sql
+
+    @pytest.mark.asyncio
+    async def test_catalog_is_cached_until_invalidated(self) -> None:
+        question_id = uuid.uuid4()
+        db = self._db([(question_id, None)], [], repeat=2)
+
+        await load_question_arrays(db, "test_user", {}, now=NOW)
+        await load_question_arrays(db, "other_user", {}, now=NOW)
+        assert db.execute.await_count == 3
+
+        invalidate_question_catalog()
+        db.execute.side_effect = None
+        db.execute.return_value = MagicMock(all=MagicMock(return_value=[]))
+        arrays = await load_question_arrays(db, "test_user", {}, now=NOW)
+
+        # 破棄後は問題一覧を読み直す
+        assert db.execute.await_count == 5
+        assert len(arrays) == 0
@@ -167,6 +167,39 @@ class TestRegenerateExplanationSingle:
         finally:
             app.dependency_overrides.clear()
 
+    @pytest.mark.asyncio
+    async def test_regenerate_explanation_invalidates_chat_answers(self) -> None:
+        """再生成するとその問題のチャット回答キャッシュを破棄する"""
+        mock_question = MockQuestion()
+        mock_db = MockDBSession()
+
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = mock_question
+        mock_db.add_execute_result(mock_result)
+
+        async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+            yield mock_db
+
+        app.dependency_overrides[get_db] = override_get_db
+
+        try:
+            with patch(
+                "app.api.questions.generate_explanation",
+                new_callable=AsyncMock,
+                return_value="新しい解説",
+            ), patch("app.api.questions.invalidate_question_answers") as invalidate:
+                async with AsyncClient(
+                    transport=ASGITransport(app=app),
+                    base_url="http://test",
+                ) as client:
+                    await client.post(
+                        f"/api/questions/{mock_question.id}/regenerate-explanation"
+                    )
+
+            invalidate.assert_called_once_with(mock_question.id)
+        finally:
+            app.dependency_overrides.clear()
+
 
 class TestRegenerateExplanationsBulk:
     """一括解説再生成APIのテスト"""
@@ -1,6 +1,6 @@
 """復習APIエンドポイントのテスト"""
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Any, AsyncGenerator
 from unittest.mock import MagicMock
 
@@ -10,6 +10,8 @@ from httpx import ASGITransport, AsyncClient
 from app.main import app
 from app.core.database import get_db
 from app.models.review_item import ReviewItem
+from app.services.recall_ranker import epoch_seconds
+from app.services.review_service import clear_review_stats_cache
 
 
 class MockDBSession:
@@ -36,6 +38,11 @@ def mock_db() -> MockDBSession:
     return MockDBSession()
 
 
+@pytest.fixture(autouse=True)
+def _clear_stats_cache() -> None:
+    clear_review_stats_cache()
+
+
 @pytest.mark.asyncio
 async def test_get_review_items_empty(mock_db: MockDBSession) -> None:
     """復習アイテムが空の場合、空リストを返す"""
@@ -107,17 +114,72 @@ async def test_get_review_items_with_data(mock_db: MockDBSession) -> None:
 
 
 @pytest.mark.asyncio
-async def test_get_review_stats(mock_db: MockDBSession) -> None:
-    """復習統計を返す"""
-    # active_count
-    active_result = MagicMock()
-    active_result.scalar.return_value = 5
+async def test_get_due_items(mock_db: MockDBSession) -> None:
+    """期限到来アイテムをスケジュール付きで返す"""
+    now = datetime.now()
+    item = ReviewItem(
+        id=uuid.uuid4(),
+        question_id=uuid.uuid4(),
+        user_id="test_user",
+        correct_count=1,
+        status="active",
+        first_wrong_at=now,
+        last_answered_at=now,
+        interval_days=3,
+        ease=2.5,
+        next_review_at=now,
+    )
+    result_mock = MagicMock()
+    result_mock.scalars.return_value.all.return_value = [item]
+    mock_db.set_execute_results([result_mock])
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+        ) as client:
+            response = await client.get(
+                "/api/review/due?user_id=test_user&limit=10"
+            )
+            too_many = await client.get(
+                "/api/review/due?user_id=test_user&limit=1000"
+            )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data[0]["interval_days"] == 3
+        assert data[0]["next_review_at"] is not None
+        assert too_many.status_code == 422
+    finally:
+        app.dependency_overrides.clear()
 
-    # mastered_count
-    mastered_result = MagicMock()
-    mastered_result.scalar.return_value = 3
 
-    mock_db.set_execute_results([active_result, mastered_result])
+@pytest.mark.asyncio
+async def test_get_review_stats(mock_db: MockDBSession) -> None:
+    """復習統計を返す"""
+    category_id = uuid.uuid4()
+    stats_result = MagicMock()
+    stats_result.all.return_value = [
+        MagicMock(
+            status="active",
+            category_id=category_id,
+            category_name="CNN",
+            count=5,
+            due_today=2,
+        ),
+        MagicMock(
+            status="mastered",
+            category_id=category_id,
+            category_name="CNN",
+            count=3,
+            due_today=0,
+        ),
+    ]
+    mock_db.set_execute_results([stats_result])
 
     async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
         yield mock_db
@@ -137,6 +199,16 @@ async def test_get_review_stats(mock_db: MockDBSession) -> None:
         assert data["active_count"] == 5
         assert data["mastered_count"] == 3
         assert data["total_count"] == 8
+        assert data["due_today_count"] == 2
+        assert data["category_counts"] == [
+            {
+                "category_id": str(category_id),
+                "category_name": "CNN",
+                "active_count": 5,
+                "mastered_count": 3,
+                "due_today_count": 2,
+            }
+        ]
     finally:
         app.dependency_overrides.clear()
 
@@ -180,3 +252,59 @@ async def test_get_mastered_items(mock_db: MockDBSession) -> None:
         assert data[0]["correct_count"] == 10
     finally:
         app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_get_next_items_ranked_by_priority(mock_db: MockDBSession) -> None:
+    """忘れかけているアイテムほど先に返す"""
+    now = datetime.now()
+    category_id = uuid.uuid4()
+    fresh = ReviewItem(
+        id=uuid.uuid4(),
+        question_id=uuid.uuid4(),
+        user_id="test_user",
+        correct_count=1,
+        status="active",
+        first_wrong_at=now,
+        last_answered_at=now - timedelta(hours=1),
+    )
+    stale = ReviewItem(
+        id=uuid.uuid4(),
+        question_id=uuid.uuid4(),
+        user_id="test_user",
+        correct_count=1,
+        status="active",
+        first_wrong_at=now,
+        last_answered_at=now - timedelta(days=10),
+    )
+    weakness_result = MagicMock()
+    weakness_result.all.return_value = [
+        MagicMock(category_id=category_id, total=4, correct=2)
+    ]
+    arrays_result = MagicMock()
+    arrays_result.all.return_value = [
+        (item.id, category_id, epoch_seconds(item.last_answered_at), item.correct_count)
+        for item in (fresh, stale)
+    ]
+    items_result = MagicMock()
+    items_result.scalars.return_value.all.return_value = [fresh, stale]
+    mock_db.set_execute_results([weakness_result, arrays_result, items_result])
+
+    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
+        yield mock_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+        ) as client:
+            response = await client.get("/api/review/next?user_id=test_user")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [d["id"] for d in data] == [str(stale.id), str(fresh.id)]
+        assert data[0]["priority"] > data[1]["priority"]
+        assert data[0]["recall_probability"] < data[1]["recall_probability"]
+    finally:
+        app.dependency_overrides.clear()
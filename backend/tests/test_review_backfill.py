@@ -1,186 +1,158 @@
-"""バックフィル（既存模試の遡及処理）のテスト"""
-import uuid
-from datetime import datetime
+"""バックフィル（回答履歴の再生）のテスト"""
 from typing import Any
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+from sqlalchemy.dialects import postgresql
 
-from app.models.mock_exam import MockExam, MockExamAnswer
-
-
-def _make_finished_exam(
-    user_id: str = "test_user",
-    answers_data: list[dict] | None = None,
-) -> MockExam:
-    """完了済み模試を作成"""
-    exam = MockExam(
-        id=uuid.uuid4(),
-        user_id=user_id,
-        started_at=datetime.utcnow(),
-        finished_at=datetime.utcnow(),
-        total_questions=3,
-        correct_count=1,
-        score=33.3,
-        passed=False,
-        status="finished",
-    )
-    if answers_data is None:
-        answers_data = [
-            {"is_correct": False, "exam_area": "機械学習"},
-            {"is_correct": True, "exam_area": "深層学習の基礎"},
-            {"is_correct": False, "exam_area": "応用数学"},
-        ]
-    exam.answers = []
-    for i, ad in enumerate(answers_data):
-        exam.answers.append(MockExamAnswer(
-            id=uuid.uuid4(),
-            mock_exam_id=exam.id,
-            question_id=uuid.uuid4(),
-            question_index=i,
-            selected_answer=1,
-            is_correct=ad["is_correct"],
-            answered_at=datetime.utcnow(),
-            category_name=ad["exam_area"],
-            exam_area=ad["exam_area"],
-        ))
-    return exam
-
-
-def _make_in_progress_exam(user_id: str = "test_user") -> MockExam:
-    """進行中の模試を作成"""
-    exam = MockExam(
-        id=uuid.uuid4(),
-        user_id=user_id,
-        started_at=datetime.utcnow(),
-        total_questions=3,
-        status="in_progress",
-    )
-    exam.answers = []
-    return exam
-
-
-class MockScalarsAll:
-    """db.execute().scalars().all() をモック"""
-
-    def __init__(self, items: list[Any]) -> None:
-        self._items = items
-
-    def scalars(self) -> "MockScalarsAll":
-        return self
-
-    def all(self) -> list[Any]:
-        return self._items
+from app.services.review_service import (
+    backfill_review_items_for_user,
+    build_review_replay_query,
+    clear_review_stats_cache,
+    get_review_stats,
+    replay_review_history,
+)
 
 
-@pytest.mark.asyncio
-async def test_backfill_processes_finished_exams() -> None:
-    """完了済み模試の不正解が復習アイテムに追加される"""
-    exam = _make_finished_exam()
+def _sql(statement: Any) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
 
+def _mock_db(exam_count: int = 2, rowcount: int = 5) -> MagicMock:
+    """1回目: 完了済み模試数、2回目: 再生UPSERT の結果を返すセッション"""
+    count_result = MagicMock()
+    count_result.scalar.return_value = exam_count
+    upsert_result = MagicMock(rowcount=rowcount)
     mock_db = MagicMock()
-    mock_db.execute = AsyncMock(return_value=MockScalarsAll([exam]))
+    mock_db.execute = AsyncMock(side_effect=[count_result, upsert_result])
+    mock_db.commit = AsyncMock()
+    return mock_db
 
-    with patch(
-        "app.services.review_service.update_review_on_answer",
-        new_callable=AsyncMock,
-    ) as mock_update:
-        mock_update.return_value = None
 
-        from app.services.review_service import backfill_review_items_for_user
+@pytest.mark.asyncio
+async def test_backfill_replays_history_in_one_statement() -> None:
+    """模試数の取得と1文のUPSERTだけで完了する"""
+    mock_db = _mock_db(exam_count=2, rowcount=5)
 
-        result = await backfill_review_items_for_user(mock_db, "test_user")
+    result = await backfill_review_items_for_user(mock_db, "test_user")
 
-        assert result["exams_processed"] == 1
-        # 3問全てに対して呼ばれる（不正解2 + 正解1）
-        assert mock_update.call_count == 3
+    assert result == {"exams_processed": 2, "items_created": 5}
+    assert mock_db.execute.await_count == 2
+    sql = _sql(mock_db.execute.await_args_list[1].args[0])
+    assert sql.startswith("INSERT INTO review_items")
+    assert "ON CONFLICT ON CONSTRAINT uq_review_items_question_user DO UPDATE" in sql
 
 
 @pytest.mark.asyncio
-async def test_backfill_skips_in_progress_exams() -> None:
-    """in_progress の模試はスキップされる"""
-    finished = _make_finished_exam()
-    in_progress = _make_in_progress_exam()
+async def test_backfill_no_finished_exams() -> None:
+    """完了済み模試・回答がない場合"""
+    mock_db = _mock_db(exam_count=0, rowcount=0)
 
-    mock_db = MagicMock()
-    # クエリはstatus="finished"でフィルタするので、finishedのみ返す
-    mock_db.execute = AsyncMock(return_value=MockScalarsAll([finished]))
+    result = await backfill_review_items_for_user(mock_db, "test_user")
 
-    with patch(
-        "app.services.review_service.update_review_on_answer",
-        new_callable=AsyncMock,
-    ) as mock_update:
-        mock_update.return_value = None
+    assert result["exams_processed"] == 0
+    assert result["items_created"] == 0
 
-        from app.services.review_service import backfill_review_items_for_user
 
-        result = await backfill_review_items_for_user(mock_db, "test_user")
+def test_replay_query_unions_answers_and_finished_exams() -> None:
+    """answers と完了済み模試の回答を合わせてウィンドウ関数で再生する"""
+    sql = _sql(build_review_replay_query("test_user"))
 
-        # finishedのみ処理
-        assert result["exams_processed"] == 1
+    assert "FROM answers" in sql
+    assert "UNION ALL" in sql
+    assert "FROM mock_exam_answers JOIN mock_exams" in sql
+    assert "mock_exams.status = " in sql
+    assert "mock_exam_answers.is_correct IS NOT NULL" in sql
+    assert "row_number() OVER (PARTITION BY events.user_id, events.question_id" in sql
+    assert "FILTER (WHERE sequenced.is_correct IS false) OVER" in sql
+    assert "answers.user_id = " in sql
+    assert "mock_exams.user_id = " in sql
 
 
-@pytest.mark.asyncio
-async def test_backfill_idempotent() -> None:
-    """2回実行しても結果が同じ（冪等性）"""
-    exam = _make_finished_exam()
+def test_replay_query_for_all_users() -> None:
+    """ユーザー指定なしでは全ユーザーを対象にする"""
+    sql = _sql(build_review_replay_query())
+
+    assert "answers.user_id = " not in sql
+    assert "mock_exams.user_id = " not in sql
+
 
+@pytest.mark.asyncio
+async def test_replay_overwrites_with_replayed_state() -> None:
+    """競合時は加算せず再生結果で上書きする（冪等）"""
     mock_db = MagicMock()
-    mock_db.execute = AsyncMock(return_value=MockScalarsAll([exam]))
+    mock_db.execute = AsyncMock(return_value=MagicMock(rowcount=3))
+
+    await replay_review_history(mock_db, "test_user")
+    await replay_review_history(mock_db, "test_user")
+
+    sql = _sql(mock_db.execute.await_args.args[0])
+    set_clause = sql.split("DO UPDATE SET", 1)[1]
+    for column in (
+        "correct_count",
+        "status",
+        "first_wrong_at",
+        "last_answered_at",
+        "mastered_at",
+        "interval_days",
+        "ease",
+        "next_review_at",
+    ):
+        assert f"{column} = excluded.{column}" in set_clause
+    assert "review_items.correct_count +" not in set_clause
 
-    with patch(
-        "app.services.review_service.update_review_on_answer",
-        new_callable=AsyncMock,
-    ) as mock_update:
-        mock_update.return_value = None
 
-        from app.services.review_service import backfill_review_items_for_user
+@pytest.mark.asyncio
+async def test_replay_invalidates_stats_cache() -> None:
+    """再生後は統計キャッシュが破棄される"""
+    clear_review_stats_cache()
+    stats_db = AsyncMock()
+    stats_db.execute.return_value = MagicMock(all=MagicMock(return_value=[]))
+    await get_review_stats(stats_db, "test_user")
 
-        result1 = await backfill_review_items_for_user(mock_db, "test_user")
-        result2 = await backfill_review_items_for_user(mock_db, "test_user")
+    mock_db = MagicMock()
+    mock_db.execute = AsyncMock(return_value=MagicMock(rowcount=0))
+    await replay_review_history(mock_db)
 
-        # 同じ結果
-        assert result1["exams_processed"] == result2["exams_processed"]
+    await get_review_stats(stats_db, "test_user")
+    assert stats_db.execute.await_count == 2
+    clear_review_stats_cache()
 
 
 @pytest.mark.asyncio
-async def test_backfill_no_finished_exams() -> None:
-    """完了済み模試がない場合"""
-    mock_db = MagicMock()
-    mock_db.execute = AsyncMock(return_value=MockScalarsAll([]))
+async def test_backfill_endpoint_commits_to_db() -> None:
+    """バックフィルAPIエンドポイントが db.commit() を呼ぶ"""
+    from app.api.review import backfill_review_items
+    from app.schemas.review import BackfillRequest
 
-    with patch(
-        "app.services.review_service.update_review_on_answer",
-        new_callable=AsyncMock,
-    ):
-        from app.services.review_service import backfill_review_items_for_user
+    mock_db = _mock_db()
 
-        result = await backfill_review_items_for_user(mock_db, "test_user")
+    request = BackfillRequest(user_id="test_user")
+    await backfill_review_items(request, mock_db)
 
-        assert result["exams_processed"] == 0
-        assert result["items_created"] == 0
+    mock_db.commit.assert_awaited_once()
 
 
 @pytest.mark.asyncio
-async def test_backfill_endpoint_commits_to_db() -> None:
-    """バックフィルAPIエンドポイントが db.commit() を呼ぶ"""
-    exam = _make_finished_exam()
+async def test_backfill_endpoint_invalidates_stats_after_commit() -> None:
+    """コミット前に作り直された統計キャッシュはコミット後に破棄される"""
+    from app.api.review import backfill_review_items
+    from app.schemas.review import BackfillRequest
 
-    mock_db = MagicMock()
-    mock_db.execute = AsyncMock(return_value=MockScalarsAll([exam]))
-    mock_db.commit = AsyncMock()
+    clear_review_stats_cache()
+    stats_db = AsyncMock()
+    stats_db.execute.return_value = MagicMock(all=MagicMock(return_value=[]))
 
-    with patch(
-        "app.services.review_service.update_review_on_answer",
-        new_callable=AsyncMock,
-    ) as mock_update:
-        mock_update.return_value = None
+    async def stats_during_commit() -> None:
+        # 同時の /stats がコミット前のデータでキャッシュを作り直す
+        await get_review_stats(stats_db, "test_user")
 
-        from app.api.review import backfill_review_items
-        from app.schemas.review import BackfillRequest
+    mock_db = _mock_db()
+    mock_db.commit.side_effect = stats_during_commit
 
-        request = BackfillRequest(user_id="test_user")
-        await backfill_review_items(request, mock_db)
+    await backfill_review_items(BackfillRequest(user_id="test_user"), mock_db)
+    await get_review_stats(stats_db, "test_user")
 
-        # db.commit() が呼ばれていること
-        mock_db.commit.assert_awaited_once()
+    # コミット後の取得はキャッシュを使わずに集計し直す
+    assert stats_db.execute.await_count == 2
+    clear_review_stats_cache()
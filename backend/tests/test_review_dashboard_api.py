@@ -1,195 +1,225 @@
 """復習アイテム詳細取得API（ダッシュボード用）のテスト"""
 import uuid
-from datetime import datetime
-from typing import Any
-from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import datetime, timedelta
+from typing import Any, AsyncGenerator, Optional
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
-from sqlalchemy.orm import selectinload
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.dialects import postgresql
 
-from app.models.category import Category
-from app.models.question import Question
-from app.models.review_item import ReviewItem
+from app.core.database import get_db
+from app.core.pagination import decode_cursor, encode_cursor
+from app.main import app
+from app.services.review_service import get_review_items_with_details
 
 
-def _make_review_item_with_question(
-    status: str = "active",
-    correct_count: int = 3,
-    category_name: str = "機械学習",
-) -> ReviewItem:
-    """問題データ付きの復習アイテムを作成"""
-    category = Category(
-        id=uuid.uuid4(),
-        name=category_name,
-    )
-    question = Question(
-        id=uuid.uuid4(),
-        category_id=category.id,
-        content="これはテスト問題です。" * 10,  # 長い問題文
-        choices=["A", "B", "C", "D"],
-        correct_answer=2,
-        explanation="解説文",
-        difficulty=3,
-        source="テスト",
-    )
-    question.category = category
+class _Row:
+    """射影クエリの結果行（属性アクセスと _mapping を持つ）"""
 
-    item = ReviewItem(
+    def __init__(self, **values: Any) -> None:
+        self._mapping = values
+        for key, value in values.items():
+            setattr(self, key, value)
+
+
+def _detail_row(
+    status: str = "active",
+    correct_count: int = 1,
+    category_name: Optional[str] = "機械学習",
+    last_answered_at: Optional[datetime] = None,
+    total_count: int = 1,
+) -> _Row:
+    last_answered_at = last_answered_at or datetime(2026, 3, 1, 12, 0, 0)
+    return _Row(
         id=uuid.uuid4(),
-        question_id=question.id,
+        question_id=uuid.uuid4(),
         user_id="test_user",
         correct_count=correct_count,
         status=status,
-        first_wrong_at=datetime.utcnow(),
-        last_answered_at=datetime.utcnow(),
-        mastered_at=datetime.utcnow() if status == "mastered" else None,
+        first_wrong_at=last_answered_at,
+        last_answered_at=last_answered_at,
+        mastered_at=last_answered_at if status == "mastered" else None,
+        interval_days=1,
+        ease=2.5,
+        next_review_at=None,
+        question_content="これはテスト問題です。" * 9,
+        question_category_name=category_name,
+        total_count=total_count,
     )
-    item.question = question
-
-    return item
 
 
-class MockScalarsAll:
-    """db.execute().scalars().all() をモック"""
-
-    def __init__(self, items: list[Any]) -> None:
-        self._items = items
+def _mock_db(*results: list[Any]) -> MagicMock:
+    mock_db = MagicMock()
+    mock_db.execute = AsyncMock(
+        side_effect=[MagicMock(all=MagicMock(return_value=rows)) for rows in results]
+    )
+    return mock_db
 
-    def scalars(self) -> "MockScalarsAll":
-        return self
 
-    def all(self) -> list[Any]:
-        return self._items
+def _sql(mock_db: MagicMock, call: int = 0) -> str:
+    query = mock_db.execute.await_args_list[call].args[0]
+    return str(query.compile(dialect=postgresql.dialect()))
 
 
 @pytest.mark.asyncio
-async def test_get_review_items_with_details_returns_question_content() -> None:
-    """問題内容（先頭100文字）が含まれる"""
-    item = _make_review_item_with_question()
+async def test_get_review_items_with_details_projects_columns() -> None:
+    """問題文はDB側で先頭100文字に切り詰め、カテゴリ名と共に射影する"""
+    mock_db = _mock_db([_detail_row()])
 
-    mock_db = MagicMock()
-    mock_db.execute = AsyncMock(return_value=MockScalarsAll([item]))
+    page = await get_review_items_with_details(mock_db, "test_user")
 
-    from app.services.review_service import get_review_items_with_details
+    sql = _sql(mock_db)
+    assert "left(questions.content" in sql
+    assert "categories.name AS question_category_name" in sql
+    # ORMオブジェクトを読み込まない
+    assert "questions.explanation" not in sql
+    assert "questions.choices" not in sql
+    assert page["items"][0]["question_category_name"] == "機械学習"
 
-    result = await get_review_items_with_details(mock_db, "test_user")
 
-    assert len(result) == 1
-    assert "question_content" in result[0]
-    # 100文字以下に切り詰められている
-    assert len(result[0]["question_content"]) <= 100
+@pytest.mark.asyncio
+async def test_get_review_items_with_details_includes_all_fields() -> None:
+    """全フィールドが含まれ、総件数はページ情報として返る"""
+    mock_db = _mock_db([_detail_row(total_count=7)])
+
+    page = await get_review_items_with_details(mock_db, "test_user")
+
+    detail = page["items"][0]
+    for key in (
+        "id",
+        "question_id",
+        "user_id",
+        "correct_count",
+        "status",
+        "first_wrong_at",
+        "last_answered_at",
+        "mastered_at",
+        "interval_days",
+        "ease",
+        "next_review_at",
+        "question_content",
+        "question_category_name",
+    ):
+        assert key in detail
+    assert "total_count" not in detail
+    assert page["total_count"] == 7
+    assert page["next_cursor"] is None
 
 
 @pytest.mark.asyncio
-async def test_get_review_items_with_details_returns_category_name() -> None:
-    """カテゴリ名が含まれる"""
-    item = _make_review_item_with_question(category_name="深層学習の基礎")
+@pytest.mark.parametrize("status_filter", ["active", "mastered"])
+async def test_get_review_items_with_details_status_filter(status_filter: str) -> None:
+    """statusフィルタが一覧と総件数の両方に掛かる"""
+    mock_db = _mock_db([_detail_row(status=status_filter)])
 
-    mock_db = MagicMock()
-    mock_db.execute = AsyncMock(return_value=MockScalarsAll([item]))
+    page = await get_review_items_with_details(
+        mock_db, "test_user", status_filter=status_filter
+    )
 
-    from app.services.review_service import get_review_items_with_details
+    compiled = mock_db.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+    assert str(compiled).count("review_items.status = ") == 2
+    assert status_filter in compiled.params.values()
+    assert page["items"][0]["status"] == status_filter
 
-    result = await get_review_items_with_details(mock_db, "test_user")
 
-    assert result[0]["question_category_name"] == "深層学習の基礎"
+@pytest.mark.asyncio
+async def test_get_review_items_with_details_keyset_pagination() -> None:
+    """limit+1件目があれば次ページのカーソルを返し、カーソルは行値比較に使う"""
+    base = datetime(2026, 3, 1, 12, 0, 0)
+    rows = [
+        _detail_row(last_answered_at=base - timedelta(minutes=i), total_count=5)
+        for i in range(3)
+    ]
+    mock_db = _mock_db(rows)
+
+    page = await get_review_items_with_details(mock_db, "test_user", limit=2)
+
+    assert len(page["items"]) == 2
+    assert page["total_count"] == 5
+    assert page["next_cursor"] == encode_cursor(
+        rows[1].last_answered_at, rows[1].id
+    )
+    sql = _sql(mock_db)
+    assert "ORDER BY review_items.last_answered_at DESC, review_items.id DESC" in sql
+    assert "LIMIT" in sql
 
+    cursor = decode_cursor(page["next_cursor"])
+    mock_db = _mock_db([rows[2]])
+    await get_review_items_with_details(mock_db, "test_user", limit=2, cursor=cursor)
+    assert "(review_items.last_answered_at, review_items.id) < (" in _sql(mock_db)
 
-@pytest.mark.asyncio
-async def test_get_review_items_with_details_filter_active() -> None:
-    """statusフィルタでactiveのみ取得可能"""
-    active = _make_review_item_with_question(status="active")
-    mastered = _make_review_item_with_question(status="mastered", correct_count=10)
 
+@pytest.mark.asyncio
+async def test_get_review_items_with_details_empty_page_after_cursor() -> None:
+    """カーソル以降が空のときだけ総件数を別途数える"""
     mock_db = MagicMock()
-    # フィルタされた結果（activeのみ）を返す
-    mock_db.execute = AsyncMock(return_value=MockScalarsAll([active]))
-
-    from app.services.review_service import get_review_items_with_details
+    mock_db.execute = AsyncMock(
+        side_effect=[
+            MagicMock(all=MagicMock(return_value=[])),
+            MagicMock(scalar_one=MagicMock(return_value=4)),
+        ]
+    )
 
-    result = await get_review_items_with_details(
-        mock_db, "test_user", status_filter="active"
+    page = await get_review_items_with_details(
+        mock_db, "test_user", cursor=(datetime(2026, 1, 1), uuid.uuid4())
     )
 
-    assert len(result) == 1
-    assert result[0]["status"] == "active"
+    assert page == {"items": [], "total_count": 4, "next_cursor": None}
+    assert mock_db.execute.await_count == 2
 
 
-@pytest.mark.asyncio
-async def test_get_review_items_with_details_filter_mastered() -> None:
-    """statusフィルタでmasteredのみ取得可能"""
-    mastered = _make_review_item_with_question(status="mastered", correct_count=10)
+async def _get(mock_db: MagicMock, query: str) -> Any:
+    async def override_get_db() -> AsyncGenerator[MagicMock, None]:
+        yield mock_db
 
-    mock_db = MagicMock()
-    mock_db.execute = AsyncMock(return_value=MockScalarsAll([mastered]))
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+        ) as client:
+            return await client.get(f"/api/review/items/detailed?{query}")
+    finally:
+        app.dependency_overrides.clear()
 
-    from app.services.review_service import get_review_items_with_details
 
-    result = await get_review_items_with_details(
-        mock_db, "test_user", status_filter="mastered"
+@pytest.mark.asyncio
+async def test_detailed_endpoint_returns_paging_headers() -> None:
+    """総件数と次ページカーソルをヘッダーで返す"""
+    rows = [_detail_row(total_count=3) for _ in range(3)]
+    mock_db = _mock_db(rows)
+
+    response = await _get(mock_db, "user_id=test_user&status=active&limit=2")
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert response.headers["X-Total-Count"] == "3"
+    assert response.headers["X-Next-Cursor"] == encode_cursor(
+        rows[1].last_answered_at, rows[1].id
     )
 
-    assert len(result) == 1
-    assert result[0]["status"] == "mastered"
-
 
 @pytest.mark.asyncio
-async def test_get_review_items_with_details_includes_all_fields() -> None:
-    """全フィールドが正しく含まれる"""
-    item = _make_review_item_with_question()
-
-    mock_db = MagicMock()
-    mock_db.execute = AsyncMock(return_value=MockScalarsAll([item]))
-
-    from app.services.review_service import get_review_items_with_details
+async def test_detailed_endpoint_last_page_has_no_cursor() -> None:
+    """最終ページでは X-Next-Cursor を付けない"""
+    mock_db = _mock_db([_detail_row()])
 
-    result = await get_review_items_with_details(mock_db, "test_user")
+    response = await _get(mock_db, "user_id=test_user")
 
-    detail = result[0]
-    assert "id" in detail
-    assert "question_id" in detail
-    assert "user_id" in detail
-    assert "correct_count" in detail
-    assert "status" in detail
-    assert "first_wrong_at" in detail
-    assert "last_answered_at" in detail
-    assert "question_content" in detail
-    assert "question_category_name" in detail
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count"] == "1"
+    assert "X-Next-Cursor" not in response.headers
 
 
 @pytest.mark.asyncio
-async def test_get_review_items_with_details_eager_loads_category() -> None:
-    """Question.category がeager loadされる（async環境での遅延ロード防止）"""
-    item = _make_review_item_with_question(category_name="応用数学")
+async def test_detailed_endpoint_rejects_invalid_cursor_and_limit() -> None:
+    """不正なカーソル・上限超えの limit は422"""
+    mock_db = _mock_db()
 
-    captured_query = {}
+    bad_cursor = await _get(mock_db, "user_id=test_user&cursor=broken")
+    too_many = await _get(mock_db, "user_id=test_user&limit=1000")
 
-    original_execute = AsyncMock(return_value=MockScalarsAll([item]))
-
-    async def capture_execute(query):
-        captured_query["query"] = query
-        return original_execute.return_value
-
-    mock_db = MagicMock()
-    mock_db.execute = capture_execute
-
-    from app.services.review_service import get_review_items_with_details
-
-    result = await get_review_items_with_details(mock_db, "test_user")
-
-    # クエリにQuestion.categoryのeager loadオプションが含まれている
-    query = captured_query["query"]
-    load_options = query._with_options
-    # selectinload(ReviewItem.question).selectinload(Question.category) が設定されている
-    # Load オブジェクトの path にcategoryが含まれるか確認
-    has_category_load = False
-    for opt in load_options:
-        path_str = str(getattr(opt, "path", ""))
-        if "category" in path_str.lower():
-            has_category_load = True
-            break
-    assert has_category_load, (
-        "Question.category のeager loadが設定されていない。"
-        "async SQLAlchemy では遅延ロードが不可のため、"
-        "selectinload(ReviewItem.question).selectinload(Question.category) が必要。"
-    )
+    assert bad_cursor.status_code == 422
+    assert too_many.status_code == 422
+    mock_db.execute.assert_not_awaited()
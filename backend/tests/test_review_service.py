@@ -1,23 +1,38 @@
 """復習サービスのテスト"""
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Any, Optional
 from unittest.mock import MagicMock, AsyncMock, patch
 
 import pytest
 
 from app.models.review_item import ReviewItem
+from sqlalchemy.dialects import postgresql
+
 from app.services.review_service import (
+    INITIAL_EASE,
+    INITIAL_INTERVAL_DAYS,
+    MIN_EASE,
+    apply_exam_answers_to_review_items,
+    get_due_review_items,
+    next_interval_days,
     handle_incorrect_answer,
     handle_correct_answer,
     update_review_on_answer,
     get_active_review_items,
     get_mastered_items,
     get_review_stats,
+    clear_review_stats_cache,
+    invalidate_review_stats,
     MASTERY_THRESHOLD,
 )
 
 
+@pytest.fixture(autouse=True)
+def _clear_stats_cache() -> None:
+    clear_review_stats_cache()
+
+
 class MockDBSession:
     """テスト用モックDBセッション"""
 
@@ -266,6 +281,107 @@ class TestUpdateReviewOnAnswer:
             mock_handler.assert_called_once_with(db, question_id, user_id)
 
 
+class TestReviewSchedule:
+    """間隔反復スケジュールのテスト"""
+
+    def _item(self, **kwargs: Any) -> ReviewItem:
+        now = datetime.now()
+        fields = dict(
+            id=uuid.uuid4(),
+            question_id=uuid.uuid4(),
+            user_id="test_user",
+            correct_count=0,
+            status="active",
+            first_wrong_at=now,
+            last_answered_at=now,
+            interval_days=INITIAL_INTERVAL_DAYS,
+            ease=INITIAL_EASE,
+        )
+        fields.update(kwargs)
+        return ReviewItem(**fields)
+
+    def test_next_interval_grows_by_ease(self) -> None:
+        assert next_interval_days(1, 2.5) == 3
+        assert next_interval_days(3, 2.5) == 8
+        # ease が小さくても最低1日は伸びる
+        assert next_interval_days(1, MIN_EASE) == 2
+
+    @pytest.mark.asyncio
+    async def test_new_item_due_next_day(self) -> None:
+        db = MockDBSession()
+        result_mock = MagicMock()
+        result_mock.scalar_one_or_none.return_value = None
+        db.set_execute_results([result_mock])
+
+        item = await handle_incorrect_answer(db, uuid.uuid4(), "test_user")
+
+        assert item.interval_days == INITIAL_INTERVAL_DAYS
+        assert item.ease == INITIAL_EASE
+        assert item.next_review_at == item.last_answered_at + timedelta(days=1)
+
+    @pytest.mark.asyncio
+    async def test_correct_extends_interval(self) -> None:
+        db = MockDBSession()
+        existing = self._item(interval_days=3)
+        result_mock = MagicMock()
+        result_mock.scalar_one_or_none.return_value = existing
+        db.set_execute_results([result_mock])
+
+        item = await handle_correct_answer(db, existing.question_id, "test_user")
+
+        assert item.interval_days == 8
+        assert item.next_review_at == item.last_answered_at + timedelta(days=8)
+
+    @pytest.mark.asyncio
+    async def test_incorrect_resets_interval_and_lowers_ease(self) -> None:
+        db = MockDBSession()
+        existing = self._item(interval_days=8, ease=1.4)
+        result_mock = MagicMock()
+        result_mock.scalar_one_or_none.return_value = existing
+        db.set_execute_results([result_mock])
+
+        item = await handle_incorrect_answer(db, existing.question_id, "test_user")
+
+        assert item.interval_days == INITIAL_INTERVAL_DAYS
+        assert item.ease == MIN_EASE
+        assert item.next_review_at == item.last_answered_at + timedelta(days=1)
+
+    @pytest.mark.asyncio
+    async def test_mastered_item_leaves_due_queue(self) -> None:
+        db = MockDBSession()
+        existing = self._item(correct_count=MASTERY_THRESHOLD - 1)
+        result_mock = MagicMock()
+        result_mock.scalar_one_or_none.return_value = existing
+        db.set_execute_results([result_mock])
+
+        item = await handle_correct_answer(db, existing.question_id, "test_user")
+
+        assert item.status == "mastered"
+        assert item.next_review_at is None
+
+
+class TestGetDueReviewItems:
+    """期限到来アイテム取得のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_bounded_query_on_next_review_at(self) -> None:
+        db = AsyncMock()
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = []
+        db.execute.return_value = result
+        now = datetime(2026, 3, 1, 9, 0, 0)
+
+        await get_due_review_items(db, "test_user", limit=5, now=now)
+
+        compiled = db.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        assert "review_items.next_review_at <=" in sql
+        assert "ORDER BY review_items.next_review_at ASC" in sql
+        assert "LIMIT" in sql
+        assert compiled.params["param_1"] == 5
+        assert now in compiled.params.values()
+
+
 class TestGetActiveReviewItems:
     """復習キュー取得のテスト"""
 
@@ -323,25 +439,183 @@ class TestGetMasteredItems:
         assert result[0].status == "mastered"
 
 
+def _stats_row(
+    status: str,
+    category_id: uuid.UUID,
+    category_name: str,
+    count: int,
+    due_today: int = 0,
+) -> MagicMock:
+    return MagicMock(
+        status=status,
+        category_id=category_id,
+        category_name=category_name,
+        count=count,
+        due_today=due_today,
+    )
+
+
 class TestGetReviewStats:
     """統計取得のテスト"""
 
     @pytest.mark.asyncio
     async def test_returns_stats(self) -> None:
-        """統計情報を返す"""
-        db = MockDBSession()
-
-        # active_count
-        active_result = MagicMock()
-        active_result.scalar.return_value = 5
-
-        # mastered_count
-        mastered_result = MagicMock()
-        mastered_result.scalar.return_value = 3
-
-        db.set_execute_results([active_result, mastered_result])
+        """ステータス × カテゴリの集計から合計・期限・カテゴリ別件数を返す"""
+        db = AsyncMock()
+        cnn, rnn = uuid.uuid4(), uuid.uuid4()
+        result = MagicMock()
+        result.all.return_value = [
+            _stats_row("active", cnn, "CNN", 3, due_today=2),
+            _stats_row("mastered", cnn, "CNN", 1),
+            _stats_row("active", rnn, "RNN", 2, due_today=1),
+            _stats_row("mastered", rnn, "RNN", 2),
+        ]
+        db.execute.return_value = result
 
         stats = await get_review_stats(db, "test_user")
+
+        assert db.execute.await_count == 1
         assert stats["active_count"] == 5
         assert stats["mastered_count"] == 3
         assert stats["total_count"] == 8
+        assert stats["due_today_count"] == 3
+        assert stats["category_counts"] == [
+            {
+                "category_id": cnn,
+                "category_name": "CNN",
+                "active_count": 3,
+                "mastered_count": 1,
+                "due_today_count": 2,
+            },
+            {
+                "category_id": rnn,
+                "category_name": "RNN",
+                "active_count": 2,
+                "mastered_count": 2,
+                "due_today_count": 1,
+            },
+        ]
+
+    @pytest.mark.asyncio
+    async def test_single_group_by_statement(self) -> None:
+        """1文の GROUP BY で、due_today は翌日0時未満を FILTER で数える"""
+        db = AsyncMock()
+        db.execute.return_value = MagicMock(all=MagicMock(return_value=[]))
+        now = datetime(2026, 3, 1, 21, 30, 0)
+
+        stats = await get_review_stats(db, "test_user", now=now)
+
+        compiled = db.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        assert "GROUP BY review_items.status, questions.category_id" in sql
+        assert "FILTER (WHERE review_items.status" in sql
+        assert datetime(2026, 3, 2) in compiled.params.values()
+        assert stats["total_count"] == 0
+        assert stats["category_counts"] == []
+
+    @pytest.mark.asyncio
+    async def test_cached_until_invalidated(self) -> None:
+        """2回目はキャッシュから返し、書き込みで破棄される"""
+        db = AsyncMock()
+        cnn = uuid.uuid4()
+        result = MagicMock()
+        result.all.return_value = [_stats_row("active", cnn, "CNN", 1)]
+        db.execute.return_value = result
+
+        first = await get_review_stats(db, "test_user")
+        first["active_count"] = 999
+        second = await get_review_stats(db, "test_user")
+        assert db.execute.await_count == 1
+        assert second["active_count"] == 1
+
+        invalidate_review_stats("test_user")
+        await get_review_stats(db, "test_user")
+        assert db.execute.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_review_writes_invalidate_cache(self) -> None:
+        """回答・模試反映で該当ユーザーのキャッシュが破棄される"""
+        db = AsyncMock()
+        db.execute.return_value = MagicMock(
+            all=MagicMock(return_value=[]),
+            scalar_one_or_none=MagicMock(return_value=None),
+            rowcount=0,
+        )
+        db.add = MagicMock()
+
+        await get_review_stats(db, "test_user")
+        await get_review_stats(db, "other_user")
+        await handle_incorrect_answer(db, uuid.uuid4(), "test_user")
+        await get_review_stats(db, "test_user")
+        await get_review_stats(db, "other_user")
+        assert db.execute.await_count == 4
+
+        await apply_exam_answers_to_review_items(db, uuid.uuid4(), "other_user")
+        await get_review_stats(db, "other_user")
+        assert db.execute.await_count == 6
+
+    @pytest.mark.asyncio
+    async def test_cache_disabled(self) -> None:
+        """TTL 0 ではキャッシュしない"""
+        db = AsyncMock()
+        db.execute.return_value = MagicMock(all=MagicMock(return_value=[]))
+
+        with patch(
+            "app.services.review_service.settings.review_stats_cache_ttl_seconds", 0
+        ):
+            await get_review_stats(db, "test_user")
+            await get_review_stats(db, "test_user")
+
+        assert db.execute.await_count == 2
+
+
+class TestApplyExamAnswersToReviewItems:
+    """模試回答の一括反映テスト"""
+
+    @pytest.mark.asyncio
+    async def test_single_upsert_statement(self) -> None:
+        """模試の回答から導出した1文のINSERT ... ON CONFLICTで反映する"""
+        db = AsyncMock()
+        db.execute.return_value = MagicMock(rowcount=4)
+
+        count = await apply_exam_answers_to_review_items(db, uuid.uuid4(), "test_user")
+
+        assert count == 4
+        assert db.execute.await_count == 1
+        sql = str(
+            db.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+        )
+        assert sql.startswith("INSERT INTO review_items")
+        assert "FROM mock_exam_answers" in sql
+        assert "ON CONFLICT ON CONSTRAINT uq_review_items_question_user" in sql
+        assert "DO UPDATE SET" in sql
+        db.add.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_mastery_threshold_in_update(self) -> None:
+        """習得判定に MASTERY_THRESHOLD を使う"""
+        db = AsyncMock()
+        db.execute.return_value = MagicMock(rowcount=0)
+
+        await apply_exam_answers_to_review_items(db, uuid.uuid4(), "test_user")
+
+        stmt = db.execute.await_args.args[0]
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        assert MASTERY_THRESHOLD in params.values()
+        assert "mastered" in params.values()
+
+    @pytest.mark.asyncio
+    async def test_advances_schedule(self) -> None:
+        """間隔反復スケジュールも同じ文で更新する"""
+        db = AsyncMock()
+        db.execute.return_value = MagicMock(rowcount=0)
+
+        await apply_exam_answers_to_review_items(db, uuid.uuid4(), "test_user")
+
+        sql = str(
+            db.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+        )
+        assert "interval_days =" in sql
+        assert "ease =" in sql
+        assert "next_review_at =" in sql
+        assert "make_interval" in sql
@@ -1,13 +1,15 @@
 """スマート出題サービスのテスト"""
 import uuid
-from typing import AsyncGenerator
-from unittest.mock import MagicMock
+from datetime import datetime, timedelta
+from typing import Any, AsyncGenerator
+from unittest.mock import MagicMock, patch
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 
 from app.main import app
 from app.core.database import get_db
+from app.services.recall_ranker import epoch_seconds, invalidate_question_catalog
 
 
 class MockQuestionImage:
@@ -45,6 +47,7 @@ class MockDBSession:
         self._execute_results: list[MagicMock] = []
         self._call_count = 0
         self._mock_question: MockQuestion | None = None
+        self.queries: list[Any] = []
 
     def set_mock_question(self, question: MockQuestion) -> None:
         self._mock_question = question
@@ -54,6 +57,7 @@ class MockDBSession:
         self._call_count = 0
 
     async def execute(self, query: object) -> MagicMock:
+        self.queries.append(query)
         if self._call_count < len(self._execute_results):
             result = self._execute_results[self._call_count]
             self._call_count += 1
@@ -71,159 +75,269 @@ def mock_db() -> MockDBSession:
     return MockDBSession()
 
 
-@pytest.mark.asyncio
-async def test_get_smart_question_prioritizes_weak_areas(mock_db: MockDBSession) -> None:
-    """苦手分野から優先的に出題される"""
-    weak_category_id = uuid.uuid4()
-    mock_question = MockQuestion(category_id=weak_category_id)
-    mock_db.set_mock_question(mock_question)
+@pytest.fixture(autouse=True)
+def clear_question_catalog() -> None:
+    """テスト間で出題候補の問題一覧のキャッシュを共有しない"""
+    invalidate_question_catalog()
+
+
+def _recent_result(question_ids: list[uuid.UUID] | None = None) -> MagicMock:
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = question_ids or []
+    return result
+
+
+def _weakness_result(rows: list[tuple[uuid.UUID, int, int]]) -> MagicMock:
+    """(category_id, total, correct) の行を返す結果"""
+    result = MagicMock()
+    result.all.return_value = [
+        MagicMock(category_id=category_id, total=total, correct=correct)
+        for category_id, total, correct in rows
+    ]
+    return result
+
 
-    # 苦手カテゴリの取得結果
-    weak_areas_result = MagicMock()
-    weak_areas_result.all.return_value = [(weak_category_id, "苦手カテゴリ", 10, 3, 30.0)]
+def _candidate_results(rows: list[tuple[Any, ...]]) -> list[MagicMock]:
+    """候補 (question_id, category_id, 最終回答の UNIX 秒, streak) に対する
+    問題一覧の結果とユーザーの回答・復習状況の結果
+    """
+    catalog = MagicMock()
+    catalog.all.return_value = [(row[0], row[1]) for row in rows]
+    user_stats = MagicMock()
+    user_stats.all.return_value = [
+        (row[0], row[2], row[3])
+        for row in rows
+        if row[2] is not None or row[3] is not None
+    ]
+    return [catalog, user_stats]
 
-    # 最近回答した問題ID（空）
-    recent_result = MagicMock()
-    recent_result.scalars.return_value.all.return_value = []
 
-    # 問題取得結果
-    question_result = MagicMock()
-    question_result.scalar_one_or_none.return_value = mock_question
+def _question_result(questions: list[MockQuestion]) -> MagicMock:
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = questions
+    return result
 
-    mock_db.set_execute_results([weak_areas_result, recent_result, question_result])
 
+def _selected_question_ids(query: Any) -> Any:
+    """出題候補の問題を取得したクエリの Question.id IN (...) の値"""
+    return query.whereclause.right.value
+
+
+async def _get_smart(mock_db: MockDBSession) -> Any:
     async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
         yield mock_db
 
     app.dependency_overrides[get_db] = override_get_db
-
     try:
         async with AsyncClient(
             transport=ASGITransport(app=app),
             base_url="http://test",
         ) as client:
-            response = await client.get("/api/questions/smart?user_id=test_user")
-
-        assert response.status_code == 200
-        data = response.json()
-        assert data["category_id"] == str(weak_category_id)
+            return await client.get("/api/questions/smart?user_id=test_user")
     finally:
         app.dependency_overrides.clear()
 
 
 @pytest.mark.asyncio
-async def test_get_smart_question_falls_back_to_random(mock_db: MockDBSession) -> None:
-    """苦手分野がない場合はランダム出題"""
-    mock_question = MockQuestion()
-    mock_db.set_mock_question(mock_question)
-
-    # 苦手カテゴリなし
-    weak_areas_result = MagicMock()
-    weak_areas_result.all.return_value = []
-
-    # 最近回答した問題ID（空）
-    recent_result = MagicMock()
-    recent_result.scalars.return_value.all.return_value = []
+async def test_get_smart_question_prioritizes_weak_areas(
+    mock_db: MockDBSession,
+) -> None:
+    """苦手分野から優先的に出題される"""
+    weak_category_id = uuid.uuid4()
+    strong_category_id = uuid.uuid4()
+    weak_question = MockQuestion(category_id=weak_category_id)
+    strong_question = MockQuestion(category_id=strong_category_id)
 
-    # ランダム問題取得結果
-    random_result = MagicMock()
-    random_result.scalar_one_or_none.return_value = mock_question
+    mock_db.set_execute_results([
+        _recent_result(),
+        _weakness_result([(weak_category_id, 10, 3), (strong_category_id, 10, 9)]),
+        *_candidate_results([
+            (strong_question.id, strong_category_id, None, None),
+            (weak_question.id, weak_category_id, None, None),
+        ]),
+        _question_result([weak_question]),
+    ])
 
-    mock_db.set_execute_results([weak_areas_result, recent_result, random_result])
+    with patch("app.api.questions.SMART_CANDIDATE_COUNT", 1):
+        response = await _get_smart(mock_db)
 
-    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
-        yield mock_db
+    assert response.status_code == 200
+    assert response.json()["category_id"] == str(weak_category_id)
+    assert _selected_question_ids(mock_db.queries[-1]) == [weak_question.id]
 
-    app.dependency_overrides[get_db] = override_get_db
 
-    try:
-        async with AsyncClient(
-            transport=ASGITransport(app=app),
-            base_url="http://test",
-        ) as client:
-            response = await client.get("/api/questions/smart?user_id=test_user")
-
-        assert response.status_code == 200
-        data = response.json()
-        assert data["id"] == str(mock_question.id)
-    finally:
-        app.dependency_overrides.clear()
+@pytest.mark.asyncio
+async def test_get_smart_question_prioritizes_forgotten_questions(
+    mock_db: MockDBSession,
+) -> None:
+    """同じカテゴリなら時間が経って忘れかけている問題を優先"""
+    category_id = uuid.uuid4()
+    fresh = MockQuestion(category_id=category_id)
+    stale = MockQuestion(category_id=category_id)
+    now = datetime.now()
+
+    mock_db.set_execute_results([
+        _recent_result(),
+        _weakness_result([(category_id, 10, 5)]),
+        *_candidate_results([
+            (fresh.id, category_id, epoch_seconds(now - timedelta(hours=1)), 1),
+            (stale.id, category_id, epoch_seconds(now - timedelta(days=14)), 1),
+        ]),
+        _question_result([stale]),
+    ])
+
+    with patch("app.api.questions.SMART_CANDIDATE_COUNT", 1):
+        response = await _get_smart(mock_db)
+
+    assert response.status_code == 200
+    assert _selected_question_ids(mock_db.queries[-1]) == [stale.id]
 
 
 @pytest.mark.asyncio
-async def test_get_smart_question_no_questions_found(mock_db: MockDBSession) -> None:
-    """問題がない場合は404"""
-    # 苦手カテゴリなし
-    weak_areas_result = MagicMock()
-    weak_areas_result.all.return_value = []
+async def test_get_smart_question_without_history(mock_db: MockDBSession) -> None:
+    """回答履歴がなくても出題できる"""
+    mock_question = MockQuestion()
 
-    # 最近回答した問題ID（空）
-    recent_result = MagicMock()
-    recent_result.scalars.return_value.all.return_value = []
+    mock_db.set_execute_results([
+        _recent_result(),
+        _weakness_result([]),
+        *_candidate_results(
+            [(mock_question.id, mock_question.category_id, None, None)]
+        ),
+        _question_result([mock_question]),
+    ])
 
-    # 問題なし
-    no_question_result = MagicMock()
-    no_question_result.scalar_one_or_none.return_value = None
+    response = await _get_smart(mock_db)
 
-    mock_db.set_execute_results([weak_areas_result, recent_result, no_question_result, no_question_result])
+    assert response.status_code == 200
+    assert response.json()["id"] == str(mock_question.id)
 
-    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
-        yield mock_db
 
-    app.dependency_overrides[get_db] = override_get_db
+@pytest.mark.asyncio
+async def test_get_smart_question_no_questions_found(mock_db: MockDBSession) -> None:
+    """候補の問題がない場合は404"""
+    mock_db.set_execute_results([
+        _recent_result(),
+        _weakness_result([]),
+        *_candidate_results([]),
+    ])
 
-    try:
-        async with AsyncClient(
-            transport=ASGITransport(app=app),
-            base_url="http://test",
-        ) as client:
-            response = await client.get("/api/questions/smart?user_id=test_user")
+    response = await _get_smart(mock_db)
 
-        assert response.status_code == 404
-    finally:
-        app.dependency_overrides.clear()
+    assert response.status_code == 404
+    # 問題本体の取得は行わない
+    assert len(mock_db.queries) == 4
 
 
 @pytest.mark.asyncio
 async def test_get_smart_question_with_images(mock_db: MockDBSession) -> None:
     """画像を持つ問題のimagesリレーションがロードされる"""
     mock_question = MockQuestion()
-    # 画像を追加
     mock_image = MockQuestionImage(question_id=mock_question.id)
     mock_question.images = [mock_image]
-    mock_db.set_mock_question(mock_question)
 
-    # 苦手カテゴリなし
-    weak_areas_result = MagicMock()
-    weak_areas_result.all.return_value = []
+    mock_db.set_execute_results([
+        _recent_result(),
+        _weakness_result([]),
+        *_candidate_results(
+            [(mock_question.id, mock_question.category_id, None, None)]
+        ),
+        _question_result([mock_question]),
+    ])
 
-    # 最近回答した問題ID（空）
-    recent_result = MagicMock()
-    recent_result.scalars.return_value.all.return_value = []
+    response = await _get_smart(mock_db)
 
-    # ランダム問題取得結果
-    random_result = MagicMock()
-    random_result.scalar_one_or_none.return_value = mock_question
+    assert response.status_code == 200
+    data = response.json()
+    assert "images" in data
+    assert len(data["images"]) == 1
+    assert data["images"][0]["alt_text"] == "テスト画像"
+    assert data["images"][0]["image_type"] == "diagram"
 
-    mock_db.set_execute_results([weak_areas_result, recent_result, random_result])
 
-    async def override_get_db() -> AsyncGenerator[MockDBSession, None]:
-        yield mock_db
+@pytest.mark.asyncio
+async def test_get_smart_question_shuffles_ties(mock_db: MockDBSession) -> None:
+    """同点の候補（同じカテゴリの未回答問題）は毎回同じ問題に偏らない"""
+    category_id = uuid.uuid4()
+    questions = [MockQuestion(category_id=category_id) for _ in range(20)]
+    rows = [(q.id, category_id, None, None) for q in questions]
+
+    picked = set()
+    with patch("app.api.questions.SMART_CANDIDATE_COUNT", 1):
+        for _ in range(20):
+            invalidate_question_catalog()
+            mock_db.queries.clear()
+            mock_db.set_execute_results([
+                _recent_result(),
+                _weakness_result([]),
+                *_candidate_results(rows),
+                _question_result(questions[:1]),
+            ])
+            response = await _get_smart(mock_db)
+            assert response.status_code == 200
+            picked.update(_selected_question_ids(mock_db.queries[-1]))
+
+    assert len(picked) > 1
 
-    app.dependency_overrides[get_db] = override_get_db
 
-    try:
-        async with AsyncClient(
-            transport=ASGITransport(app=app),
-            base_url="http://test",
-        ) as client:
-            response = await client.get("/api/questions/smart?user_id=test_user")
-
-        assert response.status_code == 200
-        data = response.json()
-        assert "images" in data
-        assert len(data["images"]) == 1
-        assert data["images"][0]["alt_text"] == "テスト画像"
-        assert data["images"][0]["image_type"] == "diagram"
-    finally:
-        app.dependency_overrides.clear()
+@pytest.mark.asyncio
+async def test_get_smart_question_reuses_question_catalog(
+    mock_db: MockDBSession,
+) -> None:
+    """2回目以降は問題一覧を読み直さない"""
+    mock_question = MockQuestion()
+    catalog, user_stats = _candidate_results(
+        [(mock_question.id, mock_question.category_id, None, None)]
+    )
+
+    mock_db.set_execute_results([
+        _recent_result(),
+        _weakness_result([]),
+        catalog,
+        user_stats,
+        _question_result([mock_question]),
+    ])
+    assert (await _get_smart(mock_db)).status_code == 200
+    assert len(mock_db.queries) == 5
+
+    mock_db.queries.clear()
+    mock_db.set_execute_results([
+        _recent_result(),
+        _weakness_result([]),
+        user_stats,
+        _question_result([mock_question]),
+    ])
+    response = await _get_smart(mock_db)
+
+    assert response.status_code == 200
+    assert response.json()["id"] == str(mock_question.id)
+    assert len(mock_db.queries) == 4
+
+
+@pytest.mark.asyncio
+async def test_get_smart_question_skips_deleted_candidates(
+    mock_db: MockDBSession,
+) -> None:
+    """キャッシュ上の候補が削除済みなら残りの候補から出題する"""
+    category_id = uuid.uuid4()
+    deleted = MockQuestion(category_id=category_id)
+    remaining = MockQuestion(category_id=category_id)
+
+    mock_db.set_execute_results([
+        _recent_result(),
+        _weakness_result([]),
+        *_candidate_results([
+            (deleted.id, category_id, None, None),
+            (remaining.id, category_id, None, None),
+        ]),
+        _question_result([remaining]),
+    ])
+
+    response = await _get_smart(mock_db)
+
+    assert response.status_code == 200
+    assert response.json()["id"] == str(remaining.id)
+    assert set(_selected_question_ids(mock_db.queries[-1])) == {
+        deleted.id,
+        remaining.id,
+    }
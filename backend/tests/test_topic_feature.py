@@ -122,7 +122,7 @@ class MockDBSession:
         self._execute_results = results
         self._execute_index = 0
 
-    async def execute(self, query: object) -> MagicMock:
+    async def execute(self, query: object, params: object = None) -> MagicMock:
         if self._execute_index < len(self._execute_results):
             result = self._execute_results[self._execute_index]
             self._execute_index += 1
@@ -135,7 +135,6 @@ class MockDBSession:
 
     def add(self, obj: object) -> None:
         self.added_objects.append(obj)
-
     async def flush(self) -> None:
         pass
 
@@ -18,6 +18,8 @@ export function ExplanationChat({ question }: ExplanationChatProps) {
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  // サーバー側に保存された会話のID（2回目以降は履歴の代わりに送る）
+  const conversationIdRef = useRef<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   // 新しいメッセージが追加されたらスクロール
@@ -48,13 +50,17 @@ export function ExplanationChat({ question }: ExplanationChatProps) {
         {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({
-            message: userMessage,
-            history: messages.map((m) => ({
-              role: m.role,
-              content: m.content,
-            })),
-          }),
+          body: JSON.stringify(
+            conversationIdRef.current
+              ? { message: userMessage, conversation_id: conversationIdRef.current }
+              : {
+                  message: userMessage,
+                  history: messages.map((m) => ({
+                    role: m.role,
+                    content: m.content,
+                  })),
+                },
+          ),
         },
       );
 
@@ -62,6 +68,11 @@ export function ExplanationChat({ question }: ExplanationChatProps) {
         throw new Error('API request failed');
       }
 
+      const conversationId = response.headers?.get('X-Conversation-Id');
+      if (conversationId) {
+        conversationIdRef.current = conversationId;
+      }
+
       const reader = response.body?.getReader();
       if (!reader) throw new Error('No response body');
 
@@ -87,6 +87,38 @@ describe('ExplanationChat', () => {
     );
   });
 
+  it('2回目以降は会話IDを送り、履歴は送らない', async () => {
+    const encoder = new TextEncoder();
+    const makeStream = (text: string) =>
+      new ReadableStream({
+        start(controller) {
+          controller.enqueue(encoder.encode(`data: "${text}"\n\n`));
+          controller.close();
+        },
+      });
+    const headers = new Headers({ 'X-Conversation-Id': 'conv-1' });
+
+    mockFetch
+      .mockResolvedValueOnce({ ok: true, headers, body: makeStream('回答1') })
+      .mockResolvedValueOnce({ ok: true, headers, body: makeStream('回答2') });
+
+    render(<ExplanationChat question={mockQuestion} />);
+
+    const input = screen.getByPlaceholderText(/質問/);
+    for (const [text, answer] of [['質問1', '回答1'], ['質問2', '回答2']]) {
+      fireEvent.change(input, { target: { value: text } });
+      await act(async () => {
+        fireEvent.click(screen.getByRole('button', { name: /送信/ }));
+      });
+      await waitFor(() => {
+        expect(screen.getByText(answer)).toBeInTheDocument();
+      });
+    }
+
+    const secondBody = JSON.parse(mockFetch.mock.calls[1][1].body);
+    expect(secondBody).toEqual({ message: '質問2', conversation_id: 'conv-1' });
+  });
+
   it('送信中はボタンが無効化される', async () => {
     // 解決しないPromiseでストリーミング中を再現
     let resolveStream: () => void;
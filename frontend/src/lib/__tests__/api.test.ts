@@ -18,6 +18,7 @@ import {
   fetchStudyPlanSummary,
   fetchCategoryCoverage,
   fetchMockExamHistory,
+  fetchReviewItemsDetailed,
   type CategoryCoverage,
 } from '../api';
 import type { Question, Answer, StudyPlan, StudyPlanSummary } from '@/types';
@@ -712,6 +713,36 @@ describe('fetchMockExamHistory', () => {
     );
   });
 
+  it('next_cursor がなくなるまで全ページを取得する', async () => {
+    mockFetch
+      .mockResolvedValueOnce({
+        ok: true,
+        json: async () => ({
+          exams: [{ exam_id: 'e1' }, { exam_id: 'e2' }],
+          total_count: 3,
+          next_cursor: '2026-03-09T09:00:00_e2',
+        }),
+      })
+      .mockResolvedValueOnce({
+        ok: true,
+        json: async () => ({
+          exams: [{ exam_id: 'e3' }],
+          total_count: 3,
+          next_cursor: null,
+        }),
+      });
+
+    const result = await fetchMockExamHistory('test-user');
+
+    expect(result.exams.map((e) => e.examId)).toEqual(['e1', 'e2', 'e3']);
+    expect(result.totalCount).toBe(3);
+    expect(mockFetch).toHaveBeenCalledTimes(2);
+    expect(mockFetch.mock.calls[0][0]).not.toContain('cursor=');
+    expect(mockFetch.mock.calls[1][0]).toContain(
+      `cursor=${encodeURIComponent('2026-03-09T09:00:00_e2')}`
+    );
+  });
+
   it('タイムアウト時にエラーをスローする', async () => {
     vi.useFakeTimers();
 
@@ -736,6 +767,34 @@ describe('fetchMockExamHistory', () => {
   });
 });
 
+describe('fetchReviewItemsDetailed', () => {
+  beforeEach(() => {
+    mockFetch.mockClear();
+  });
+
+  it('X-Next-Cursor がなくなるまで全ページを取得する', async () => {
+    mockFetch
+      .mockResolvedValueOnce({
+        ok: true,
+        headers: new Headers({ 'X-Total-Count': '3', 'X-Next-Cursor': 'c1' }),
+        json: async () => [{ id: 'r1' }, { id: 'r2' }],
+      })
+      .mockResolvedValueOnce({
+        ok: true,
+        headers: new Headers({ 'X-Total-Count': '3' }),
+        json: async () => [{ id: 'r3' }],
+      });
+
+    const result = await fetchReviewItemsDetailed('test-user', 'active');
+
+    expect(result.map((item) => item.id)).toEqual(['r1', 'r2', 'r3']);
+    expect(mockFetch).toHaveBeenCalledTimes(2);
+    expect(mockFetch.mock.calls[0][0]).toContain('status=active');
+    expect(mockFetch.mock.calls[0][0]).not.toContain('cursor=');
+    expect(mockFetch.mock.calls[1][0]).toContain('cursor=c1');
+  });
+});
+
 describe('Category Coverage API', () => {
   beforeEach(() => {
     mockFetch.mockClear();
@@ -79,8 +79,13 @@ export async function fetchMockExamResult(examId: string): Promise<MockExamResul
   return parseResponse<MockExamResult>(response);
 }
 
+/** 模試履歴の1回の取得件数（サーバー側の上限） */
+const HISTORY_PAGE_LIMIT = 200;
+
 /**
  * 模試履歴を取得
+ *
+ * サーバーはページ単位で返すため、next_cursor がなくなるまで続けて取得する
  */
 export async function fetchMockExamHistory(
   userId: string
@@ -89,21 +94,39 @@ export async function fetchMockExamHistory(
   const timeoutId = setTimeout(() => controller.abort(), 30000);
 
   try {
-    const response = await fetch(
-      `${API_BASE_URL}/api/mock-exam/history?user_id=${userId}`,
-      {
+    const exams: MockExamHistoryItem[] = [];
+    let totalCount = 0;
+    let cursor: string | null = null;
+    do {
+      const params = new URLSearchParams({
+        user_id: userId,
+        limit: String(HISTORY_PAGE_LIMIT),
+      });
+      if (cursor) {
+        params.set('cursor', cursor);
+      }
+      const response = await fetch(`${API_BASE_URL}/api/mock-exam/history?${params}`, {
         method: 'GET',
         headers: { 'Content-Type': 'application/json' },
         signal: controller.signal,
+      });
+
+      const page = await parseResponse<{
+        exams: MockExamHistoryItem[];
+        totalCount: number;
+        nextCursor?: string | null;
+      }>(response);
+      if (!page) {
+        break;
       }
-    );
+      exams.push(...page.exams);
+      totalCount = page.totalCount;
+      cursor = page.nextCursor ?? null;
+    } while (cursor);
 
+    return { exams, totalCount };
+  } finally {
     clearTimeout(timeoutId);
-    const data = await parseResponse<{ exams: MockExamHistoryItem[]; totalCount: number }>(response);
-    return data || { exams: [], totalCount: 0 };
-  } catch (e) {
-    clearTimeout(timeoutId);
-    throw e;
   }
 }
 
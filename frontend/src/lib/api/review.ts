@@ -47,25 +47,46 @@ export async function fetchReviewStats(userId: string): Promise<ReviewStats | nu
   return parseResponse<ReviewStats>(response);
 }
 
+/** 復習アイテム詳細の1回の取得件数（サーバー側の上限） */
+const DETAILED_ITEMS_PAGE_LIMIT = 200;
+
 /**
  * 復習アイテム詳細（問題内容・カテゴリ名付き）を取得
+ *
+ * サーバーはページ単位で返すため、X-Next-Cursor ヘッダーがなくなるまで続けて取得する
  */
 export async function fetchReviewItemsDetailed(
   userId: string,
   status?: 'active' | 'mastered'
 ): Promise<ReviewItemDetail[]> {
-  const params = new URLSearchParams({ user_id: userId });
-  if (status) {
-    params.set('status', status);
-  }
+  const items: ReviewItemDetail[] = [];
+  let cursor: string | null = null;
+  do {
+    const params = new URLSearchParams({
+      user_id: userId,
+      limit: String(DETAILED_ITEMS_PAGE_LIMIT),
+    });
+    if (status) {
+      params.set('status', status);
+    }
+    if (cursor) {
+      params.set('cursor', cursor);
+    }
 
-  const response = await fetch(`${API_BASE_URL}/api/review/items/detailed?${params}`, {
-    method: 'GET',
-    headers: { 'Content-Type': 'application/json' },
-  });
+    const response = await fetch(`${API_BASE_URL}/api/review/items/detailed?${params}`, {
+      method: 'GET',
+      headers: { 'Content-Type': 'application/json' },
+    });
 
-  const data = await parseResponse<ReviewItemDetail[]>(response);
-  return data || [];
+    const data = await parseResponse<ReviewItemDetail[]>(response);
+    if (!data) {
+      break;
+    }
+    items.push(...data);
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+
+  return items;
 }
 
 /**